@@ -13,13 +13,16 @@ from labridge.tools.paper.download.arxiv_download import ArXivSearchDownloadTool
 from labridge.tools.memory.experiment.retrieve import ExperimentLogRetrieveTool
 from labridge.tools.paper.temporary_papers.insert import AddNewRecentPaperTool
 from labridge.tools.memory.chat.retrieve import ChatMemoryRetrieverTool
+from labridge.tools.memory.federated_search import FederatedSearchTool
 from labridge.tools.instrument.retrieve import InstrumentRetrieverTool
 from labridge.tools.external.xy_platform import XYPlatformMoveTool
 from labridge.agent.react.prompt import LABRIDGE_CHAT_SYSTEM_HEADER
 from labridge.accounts.users import AccountManager
 from labridge.agent.react.react import InstructReActAgent
+from labridge.agent.react.session import AgentSessionPool, CHAT_SESSION_MAX_NUM
 from labridge.agent.chat_msg.msg_types import PackedUserMessage, AgentResponse
 from labridge.models.utils import get_models
+from labridge.common.utils.priority import LLM_PRIORITY_GATE
 from labridge.tools.memory.experiment.insert import (
 	CreateNewExperimentLogTool,
 	SetCurrentExperimentTool,
@@ -37,13 +40,23 @@ class LabChatAgent:
 	r"""
 	This is the Chat agent following the ReAct framework, with access to multiple tools
 	ranging papers, instruments and experiments.
+
+	Each user chats in an own session of the `chat_engine`, so that the chats of different users run concurrently
+	without sharing the memory or the task state, refer to `AgentSessionPool`.
+
+	Args:
+		chat_engine (InstructReActAgent): The agent whose tools and LLM are shared by the sessions.
+			Defaults to the one built by `get_chat_engine`.
+		max_sessions (int): The maximum number of the concurrent chats. Defaults to `CHAT_SESSION_MAX_NUM`.
 	"""
 
 	def __init__(
 		self,
 		chat_engine: InstructReActAgent = None,
+		max_sessions: int = CHAT_SESSION_MAX_NUM,
 	):
 		self._chat_engine = chat_engine
+		self._sessions = AgentSessionPool(agent_fn=lambda: self.chat_engine, max_sessions=max_sessions)
 		self._short_memory_manager = ShortMemoryManager()
 		self._account_manager = AccountManager()
 		self._chatting_status = {}
@@ -70,6 +83,10 @@ class LabChatAgent:
 	def set_chatting(self, user_id: str, chatting: bool):
 		self._chatting_status[user_id] = chatting
 
+	@property
+	def sessions(self) -> AgentSessionPool:
+		return self._sessions
+
 	@property
 	def short_memory_manager(self):
 		return self._short_memory_manager
@@ -79,15 +96,16 @@ class LabChatAgent:
 		user_id = packed_msgs.user_id
 		self.set_chatting(user_id=user_id, chatting=True)
 		packed_json = packed_msgs.dumps()
-		chat_history = self.short_memory_manager.load_memory(user_id=user_id)
 
-		response = await self.chat_engine.achat(
-			message=packed_json,
-			chat_history=chat_history,
-		)
-		chat_history = self.chat_engine.memory.get()
-		self.short_memory_manager.save_memory(user_id=user_id, chat_history=chat_history)
-		self.chat_engine.reset()
+		async with self.sessions.session(user_id=user_id) as session:
+			chat_history = self.short_memory_manager.load_memory(user_id=user_id)
+			async with LLM_PRIORITY_GATE.ainteractive():
+				response = await session.achat(
+					message=packed_json,
+					chat_history=chat_history,
+				)
+			chat_history = session.memory.get()
+			self.short_memory_manager.save_memory(user_id=user_id, chat_history=chat_history)
 
 		ref_paths = response.metadata["references"]
 		if len(ref_paths) < 1:
@@ -100,34 +118,19 @@ class LabChatAgent:
 		return agent_response
 
 	def test_chat(self, packed_msgs: PackedUserMessage) -> AgentResponse:
-		r""" Debug. """
-		user_id = packed_msgs.user_id
-		self.set_chatting(user_id=user_id, chatting=True)
-		packed_json = packed_msgs.dumps()
-		chat_history = self.short_memory_manager.load_memory(user_id=user_id)
-
-		response = self.chat_engine.chat(
-			message=packed_json,
-			chat_history=chat_history,
-		)
-		chat_history = self.chat_engine.memory.get()
-		self.short_memory_manager.save_memory(user_id=user_id, chat_history=chat_history)
-
-		ref_paths = response.metadata["references"]
-		if len(ref_paths) < 1:
-			ref_paths = None
-
-		agent_response = AgentResponse(
-			response=response.response,
-			references=ref_paths,
-		)
-		return agent_response
+		r"""
+		Debug. Run `chat` in a new event loop, so that the chat goes through the user's session in the same way:
+		the cap of the concurrent sessions, the user's lock and the reset after the chat.
+		Not to be called inside a running event loop, use `chat` instead.
+		"""
+		return asyncio.run(self.chat(packed_msgs=packed_msgs))
 
 	def get_tools(self) -> List[AsyncBaseTool]:
 		r""" Available tools. """
 		return [
 			ChatMemoryRetrieverTool(),
 			ExperimentLogRetrieveTool(),
+			FederatedSearchTool(),
 			CreateNewExperimentLogTool(),
 			SetCurrentExperimentTool(),
 			RecordExperimentLogTool(),
@@ -162,3 +165,4 @@ Settings.llm = llm
 
 ChatAgent = LabChatAgent()
 CacheSharedPaperStorage = SharedPaperStorage.from_default(llm=Settings.llm, embed_model=Settings.embed_model)
+CacheSharedPaperStorage.start_summary_worker()
@@ -72,6 +72,8 @@ class InstructReActAgent(AgentRunner):
 		handle_reasoning_failure_fn (Optional[Callable[[CallbackManager, Exception], ToolOutput]]):
 		enable_instruct (bool): Whether to enable user's instructing in the reasoning phase.
 		enable_comment (bool): Whether to enable user's commenting in the acting phase.
+		agent_worker (Optional[InstructReActAgentWorker]): An existing step engine to share, refer to `new_session`.
+			If given, the `tools`, `llm` and the other step engine arguments are ignored.
 	"""
 	def __init__(
 		self,
@@ -88,29 +90,65 @@ class InstructReActAgent(AgentRunner):
 		ToolOutput]] = None,
 		enable_instruct: bool = False,
 		enable_comment: bool = False,
+		agent_worker: Optional[InstructReActAgentWorker] = None,
 	):
-		self.user_id_list = AccountManager().get_users()
-		self.chat_group_list = AccountManager().get_chat_groups()
-		step_engine = InstructReActAgentWorker.from_tools(
-			tools=tools,
-			tool_retriever=tool_retriever,
-			user_id_list=self.user_id_list,
-			chat_group_id_list=self.chat_group_list,
-			llm=llm,
-			max_iterations=max_iterations,
-			react_chat_formatter=react_chat_formatter,
-			output_parser=output_parser,
-			callback_manager=callback_manager,
-			verbose=verbose,
-			handle_reasoning_failure_fn=handle_reasoning_failure_fn,
-			enable_instruct=enable_instruct,
-		)
+		if agent_worker is not None:
+			self.user_id_list = agent_worker.user_id_list
+			self.chat_group_list = agent_worker.chat_group_id_list
+			step_engine = agent_worker
+		else:
+			self.user_id_list = AccountManager().get_users()
+			self.chat_group_list = AccountManager().get_chat_groups()
+			step_engine = InstructReActAgentWorker.from_tools(
+				tools=tools,
+				tool_retriever=tool_retriever,
+				user_id_list=self.user_id_list,
+				chat_group_id_list=self.chat_group_list,
+				llm=llm,
+				max_iterations=max_iterations,
+				react_chat_formatter=react_chat_formatter,
+				output_parser=output_parser,
+				callback_manager=callback_manager,
+				verbose=verbose,
+				handle_reasoning_failure_fn=handle_reasoning_failure_fn,
+				enable_instruct=enable_instruct,
+			)
 		self._enable_comment = enable_comment
 		super().__init__(
 			step_engine,
 			memory=memory,
 			llm=llm,
 			callback_manager=callback_manager,
+			verbose=verbose,
+		)
+
+	def new_session(self, memory: Optional[BaseMemory] = None) -> "InstructReActAgent":
+		r"""
+		Create an agent session sharing the step engine (the tools, the LLM and the prompts) and the callback manager
+		of this agent, with its own memory and task state, so that the chats of different sessions do not interfere.
+		The retrieving tools keep per-call state in their retrievers, they serialize the calls of the sessions,
+		refer to `RetrieverBaseTool`.
+
+		Args:
+			memory (Optional[BaseMemory]): The short-term memory of the session.
+				Defaults to an empty `ChatMemoryBuffer` with the token limit of this agent's memory.
+
+		Returns:
+			InstructReActAgent: The new session.
+		"""
+		if memory is None:
+			memory = ChatMemoryBuffer.from_defaults(
+				token_limit=getattr(self.memory, "token_limit", None),
+				llm=self.agent_worker._llm,
+			)
+		return InstructReActAgent(
+			tools=[],
+			llm=self.agent_worker._llm,
+			memory=memory,
+			callback_manager=self.callback_manager,
+			verbose=self.verbose,
+			enable_comment=self._enable_comment,
+			agent_worker=self.agent_worker,
 		)
 
 	def update_user_id_list(self):
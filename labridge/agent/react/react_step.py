@@ -48,7 +48,7 @@ from typing import (
     Callable,
 )
 
-from labridge.func_modules.memory.chat.chat_memory import update_chat_memory
+from labridge.func_modules.memory.chat.memory_writer import CHAT_MEMORY_WRITER
 from labridge.tools.utils import unpack_tool_output
 from labridge.accounts.users import AccountManager
 from labridge.agent.chat_msg.msg_types import ChatBuffer
@@ -546,13 +546,16 @@ class InstructReActAgentWorker(ReActAgentWorker):
 		)
 
 	def finalize_task(self, task: Task, **kwargs: Any) -> None:
-		"""Finalize task, after all the steps are completed."""
+		"""
+		Finalize task, after all the steps are completed.
+		The long-term chat memory is updated by the background `CHAT_MEMORY_WRITER`, the reply is not delayed.
+		"""
 		user_id = task.extra_state.get("user_id", None)
 		chat_group_id = task.extra_state.get("chat_group_id", None)
 
 		if chat_group_id is not None:
 			if chat_group_id in self.chat_group_id_list:
-				update_chat_memory(
+				CHAT_MEMORY_WRITER.submit(
 					memory_id=user_id,
 					chat_messages=task.extra_state["new_memory"].get_all(),
 				)
@@ -561,7 +564,7 @@ class InstructReActAgentWorker(ReActAgentWorker):
 					print_text(f"The chat group {chat_group_id} is not registered.", color="cyan", end="\n")
 		else:
 			if user_id in self.user_id_list:
-				update_chat_memory(
+				CHAT_MEMORY_WRITER.submit(
 					memory_id=user_id,
 					chat_messages=task.extra_state["new_memory"].get_all(),
 				)
@@ -0,0 +1,95 @@
+import asyncio
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from .react import InstructReActAgent
+
+
+CHAT_SESSION_MAX_NUM = 8
+
+
+class AgentSessionPool(object):
+	r"""
+	The per-user sessions of an `InstructReActAgent`.
+
+	All sessions share the step engine of the agent, that is, the tools, the LLM and the prompts.
+	Each user has an own session with its own memory and task state, created by `InstructReActAgent.new_session`:
+
+	- The chats of a user run one after another in the user's session.
+	- The chats of different users run concurrently, at most `max_sessions` of them at a time.
+
+	Args:
+		agent_fn (Callable[[], InstructReActAgent]): Returns the agent whose step engine is shared.
+			It is called once, when the first session is created.
+		max_sessions (int): The maximum number of the concurrently running sessions.
+			Defaults to `CHAT_SESSION_MAX_NUM`.
+	"""
+	def __init__(
+		self,
+		agent_fn: Callable[[], InstructReActAgent],
+		max_sessions: int = CHAT_SESSION_MAX_NUM,
+	):
+		if max_sessions < 1:
+			raise ValueError(f"max_sessions should be a positive integer, got {max_sessions}.")
+		self._agent_fn = agent_fn
+		self._agent: Optional[InstructReActAgent] = None
+		self._max_sessions = max_sessions
+		self._sessions: Dict[str, InstructReActAgent] = {}
+		self._user_locks: Dict[str, asyncio.Lock] = {}
+		self._slots = asyncio.Semaphore(max_sessions)
+		self._running_num = 0
+
+	@property
+	def agent(self) -> InstructReActAgent:
+		r""" The agent whose step engine is shared by the sessions. """
+		if self._agent is None:
+			self._agent = self._agent_fn()
+		return self._agent
+
+	@property
+	def max_sessions(self) -> int:
+		return self._max_sessions
+
+	@property
+	def running_num(self) -> int:
+		r""" The number of the currently running sessions. """
+		return self._running_num
+
+	def get_session(self, user_id: str) -> InstructReActAgent:
+		r"""
+		Get the session of a user, create one if it does not exist.
+
+		Args:
+			user_id (str): The user id.
+
+		Returns:
+			InstructReActAgent: The user's session.
+		"""
+		if user_id not in self._sessions:
+			self._sessions[user_id] = self.agent.new_session()
+		return self._sessions[user_id]
+
+	@asynccontextmanager
+	async def session(self, user_id: str) -> AsyncIterator[InstructReActAgent]:
+		r"""
+		Run a chat in the user's session.
+		Waits for the user's previous chat and for a free slot, and resets the session's memory and task state
+		after the chat.
+
+		Args:
+			user_id (str): The user id.
+
+		Yields:
+			InstructReActAgent: The user's session.
+		"""
+		user_lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+		async with user_lock:
+			async with self._slots:
+				session = self.get_session(user_id)
+				self._running_num += 1
+				try:
+					yield session
+				finally:
+					self._running_num -= 1
+					session.reset()
@@ -13,9 +13,8 @@ from labridge.callback.base.operation_log import OperationOutputLog, OP_DESCRIPT
 from pathlib import Path
 from typing import Tuple, Optional, List
 
-from labridge.func_modules.paper.download.arxiv import Result
 from labridge.func_modules.paper.store.temporary_store import TMP_PAPER_WAREHOUSE_DIR
-from labridge.func_modules.paper.download.async_utils import adownload_file
+from labridge.func_modules.paper.download.async_arxiv import AsyncArxivClient, ARXIV_CLIENT
 from labridge.func_modules.paper.store.temporary_store import RecentPaperStore
 from labridge.func_modules.reference.paper import PaperInfo
 
@@ -48,6 +47,7 @@ class ArxivDownloadOperation(CallBackOperationBase):
 		llm (LLM): The used LLM.
 		embed_model (BaseEmbedding): The used embedding model.
 		verbose (bool): Whether to show the inner progress.
+		arxiv_client (AsyncArxivClient): The client that downloads the papers. Defaults to the shared `ARXIV_CLIENT`.
 	"""
 	def __init__(
 		self,
@@ -55,6 +55,7 @@ class ArxivDownloadOperation(CallBackOperationBase):
 		embed_model: BaseEmbedding = None,
 		verbose: bool = False,
 		op_name: str = None,
+		arxiv_client: AsyncArxivClient = None,
 	):
 		root = Path(__file__)
 
@@ -63,6 +64,7 @@ class ArxivDownloadOperation(CallBackOperationBase):
 
 		self.root = root
 		self._fs = fsspec.filesystem("file")
+		self.arxiv_client = arxiv_client or ARXIV_CLIENT
 		embed_model = embed_model or Settings.embed_model
 		llm = llm or Settings.llm
 		super().__init__(
@@ -137,22 +139,7 @@ class ArxivDownloadOperation(CallBackOperationBase):
 				- If the paper is successfully downloaded, return the file_path.
 				- If the downloading fails, return None.
 		"""
-		if None in [user_id, title, pdf_url]:
-			raise ValueError("should provide valid user_id, title, pdf_url to download paper.")
-		file_dir, file_name = self._get_default_path(user_id=user_id, title=title)
-		result = Result(entry_id="")
-		result.pdf_url = pdf_url
-
-		if self._verbose:
-			print_text(text=f"Downloading paper '{title}' ...", color="pink", end="\n")
-
-		try:
-			result.download_pdf(dirpath=file_dir, filename=file_name)
-			file_path = str(Path(file_dir) / file_name)
-			return file_path
-		except Exception as e:
-			print(f"Download failed. Error: {e}")
-			return None
+		return self.arxiv_client.run_sync(self.adownload_paper(user_id=user_id, title=title, pdf_url=pdf_url))
 
 	async def adownload_paper(self, user_id: str, title: str, pdf_url: str) -> Optional[str]:
 		r"""
@@ -167,7 +154,7 @@ class ArxivDownloadOperation(CallBackOperationBase):
 		if self._verbose:
 			print_text(text=f"Downloading paper '{title}' ...", color="pink", end="\n")
 		try:
-			await adownload_file(url=pdf_url, save_path=file_path)
+			await self.arxiv_client.adownload_pdf(pdf_url=pdf_url, save_path=file_path)
 			return file_path
 		except Exception as e:
 			print(f"Download failed. Error: {e}")
@@ -244,14 +231,20 @@ class ArxivDownloadOperation(CallBackOperationBase):
 
 		succeed, fail = [], []
 
-		for info in paper_infos:
-			pdf_url = info.get("pdf_url", None)
-			title = info.get("title", None)
-			file_path = self.download_paper(
-				user_id=user_id,
-				title=title,
-				pdf_url=pdf_url,
+		async def download_all():
+			return await asyncio.gather(
+				*[
+					self.adownload_paper(
+						user_id=user_id,
+						title=info.get("title", None),
+						pdf_url=info.get("pdf_url", None),
+					) for info in paper_infos
+				]
 			)
+
+		file_paths = self.arxiv_client.run_sync(download_all())
+		for info, file_path in zip(paper_infos, file_paths):
+			title = info.get("title", None)
 			if file_path is None:
 				fail.append(title)
 			else:
@@ -12,7 +12,7 @@ from labridge.callback.base.operation_log import OperationOutputLog, OP_DESCRIPT
 from pathlib import Path
 from typing import cast
 
-from labridge.func_modules.paper.store.temporary_store import RecentPaperStore
+from labridge.func_modules.paper.store.temporary_store import RecentPaperStore, TMP_PAPER_FILE_PATH_KEY
 from labridge.func_modules.reference.paper import PaperInfo
 from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
 
@@ -48,7 +48,7 @@ class PaperSummarizeOperation(CallBackOperationBase):
 		self._fs = fsspec.filesystem("file")
 		embed_model = embed_model or Settings.embed_model
 		llm = llm or Settings.llm
-		self._summarizer = PaperBatchSummarize(llm=llm)
+		self._summarizer = PaperBatchSummarize(llm=llm, abs_file_path_key=TMP_PAPER_FILE_PATH_KEY)
 		super().__init__(
 			llm=llm,
 			embed_model=embed_model,
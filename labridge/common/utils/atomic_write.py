@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Union
+
+
+r"""
+Atomic file writing.
+
+The contents are written to a temporary file unique to the writer, in the same directory as the target file,
+which then replaces the target file. Concurrent writers of the same file never interleave or collide on a shared
+temporary name, and a crash never leaves a partially written file.
+"""
+
+
+@contextmanager
+def atomic_open(file_path: Union[str, Path], mode: str = "w", encoding: str = "utf-8") -> Iterator[IO]:
+	r"""
+	Open a temporary file to be written, which replaces `file_path` when the block exits without an error.
+	On an error, the temporary file is removed and `file_path` is left unchanged.
+
+	Args:
+		file_path (Union[str, Path]): The target file path. The parent directory is created if missing.
+		mode (str): `w` for text, `wb` for bytes.
+		encoding (str): The encoding in the text mode.
+
+	Yields:
+		IO: The opened temporary file.
+	"""
+	if mode not in ("w", "wb"):
+		raise ValueError(f"Expect the mode 'w' or 'wb', got {mode}.")
+	file_path = Path(file_path)
+	file_path.parent.mkdir(parents=True, exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(dir=str(file_path.parent), prefix=f"{file_path.name}.", suffix=".tmp")
+	try:
+		with os.fdopen(fd, mode, encoding=None if mode == "wb" else encoding) as f:
+			yield f
+		os.replace(tmp_path, str(file_path))
+	except BaseException:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		raise
+
+
+def atomic_write(file_path: Union[str, Path], data: Union[str, bytes], encoding: str = "utf-8"):
+	r"""
+	Write a file atomically, refer to `atomic_open`.
+
+	Args:
+		file_path (Union[str, Path]): The target file path.
+		data (Union[str, bytes]): The contents.
+		encoding (str): The encoding of a str `data`.
+	"""
+	with atomic_open(file_path, mode="wb" if isinstance(data, bytes) else "w", encoding=encoding) as f:
+		f.write(data)
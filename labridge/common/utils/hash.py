@@ -0,0 +1,27 @@
+import hashlib
+import fsspec
+
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(file_path: str, fs: fsspec.AbstractFileSystem = None) -> str:
+	r"""
+	Get the SHA-256 hex digest of a file's content. The file is read in chunks.
+
+	Args:
+		file_path (str): The file path.
+		fs (fsspec.AbstractFileSystem): The file system. Defaults to the local file system.
+
+	Returns:
+		str: The hex digest.
+	"""
+	fs = fs or fsspec.filesystem("file")
+	hash_worker = hashlib.sha256()
+	with fs.open(file_path, "rb") as f:
+		while True:
+			chunk = f.read(HASH_CHUNK_SIZE)
+			if not chunk:
+				break
+			hash_worker.update(chunk)
+	return hash_worker.hexdigest()
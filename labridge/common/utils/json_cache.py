@@ -0,0 +1,166 @@
+import json
+import atexit
+import fsspec
+import threading
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from labridge.common.utils.atomic_write import atomic_write
+
+
+r"""
+A JSON file cache shared by the cache classes of the lab server, such as the DOI, paper summary and paper source caches.
+
+The puts are kept in memory and persisted in batches. Each persist re-reads the cache file and merges the pending
+puts into it, so that the entries written by other instances are kept, and the file is replaced atomically through
+a temporary file unique to the writer.
+"""
+
+
+JSON_CACHE_PERSIST_EVERY = 16
+
+_SHARED_CACHES: Dict[str, "JsonFileCache"] = {}
+_SHARED_CACHES_LOCK = threading.Lock()
+
+
+class JsonFileCache(object):
+	r"""
+	A thread-safe dictionary persisted in a JSON file.
+
+	The dictionary is either flat `{key: value}`, or divided into sections `{section: {key: value}}`.
+
+	Args:
+		persist_path (str): The path of the cache file.
+		sections (Optional[Sequence[str]]): The section names. If not given, the dictionary is flat.
+		persist_every (int): A persist is due once this number of puts are pending.
+			Defaults to `JSON_CACHE_PERSIST_EVERY`.
+	"""
+	def __init__(
+		self,
+		persist_path: str,
+		sections: Optional[Sequence[str]] = None,
+		persist_every: int = JSON_CACHE_PERSIST_EVERY,
+	):
+		self.persist_path = persist_path
+		self.sections = list(sections) if sections else None
+		self.persist_every = max(1, persist_every)
+		self._fs = fsspec.filesystem("file")
+		self._lock = threading.RLock()
+		self._data: Dict[str, Any] = self._empty_data()
+		# {(section, key): value}, the puts not persisted yet.
+		self._pending: Dict[Tuple[Optional[str], str], Any] = {}
+		self.load()
+
+	@classmethod
+	def shared(
+		cls,
+		persist_path: str,
+		sections: Optional[Sequence[str]] = None,
+	) -> "JsonFileCache":
+		r"""
+		The cache instance shared in the process for a cache file.
+		The pending puts of a shared cache are persisted at exit.
+
+		Args:
+			persist_path (str): The path of the cache file.
+			sections (Optional[Sequence[str]]): The section names. If not given, the dictionary is flat.
+
+		Returns:
+			JsonFileCache: The shared cache.
+		"""
+		cache_key = str(Path(persist_path).resolve())
+		with _SHARED_CACHES_LOCK:
+			cache = _SHARED_CACHES.get(cache_key, None)
+			if cache is None:
+				cache = cls(persist_path=persist_path, sections=sections)
+				_SHARED_CACHES[cache_key] = cache
+				atexit.register(cache.persist)
+			return cache
+
+	def _empty_data(self) -> Dict[str, Any]:
+		if self.sections is None:
+			return {}
+		return {section: {} for section in self.sections}
+
+	def _read_file(self) -> Dict[str, Any]:
+		r""" Read the cache file. A missing or broken cache file is read as empty. """
+		data = self._empty_data()
+		if not self._fs.exists(self.persist_path):
+			return data
+		try:
+			with self._fs.open(self.persist_path, "rb") as f:
+				file_data = json.load(f)
+		except (OSError, ValueError):
+			return data
+		if not isinstance(file_data, dict):
+			return data
+		if self.sections is None:
+			return file_data
+		for section in self.sections:
+			section_data = file_data.get(section, None)
+			if isinstance(section_data, dict):
+				data[section] = section_data
+		return data
+
+	def _section_data(self, data: Dict[str, Any], section: Optional[str]) -> Dict[str, Any]:
+		if section is None:
+			return data
+		return data.setdefault(section, {})
+
+	def load(self):
+		r""" Load the cache file, keeping the pending puts. """
+		with self._lock:
+			data = self._read_file()
+			for (section, key), value in self._pending.items():
+				self._section_data(data, section)[key] = value
+			self._data = data
+
+	def get(self, key: str, section: Optional[str] = None) -> Optional[Any]:
+		r"""
+		Get a cached value.
+
+		Args:
+			key (str): The key.
+			section (Optional[str]): The section of the key, for a sectioned cache.
+
+		Returns:
+			Optional[Any]: The value. If not cached, return None.
+		"""
+		with self._lock:
+			return self._section_data(self._data, section).get(key, None)
+
+	def put(self, key: str, value: Any, section: Optional[str] = None) -> bool:
+		r"""
+		Put a value into the cache. The value is persisted by a later `persist`.
+
+		Args:
+			key (str): The key.
+			value (Any): A JSON serializable value.
+			section (Optional[str]): The section of the key, for a sectioned cache.
+
+		Returns:
+			bool: Whether a persist is due.
+		"""
+		with self._lock:
+			self._section_data(self._data, section)[key] = value
+			self._pending[(section, key)] = value
+			return len(self._pending) >= self.persist_every
+
+	@property
+	def pending_num(self) -> int:
+		r""" The number of the puts not persisted yet. """
+		return len(self._pending)
+
+	def persist(self):
+		r"""
+		Persist the pending puts.
+		The cache file is re-read and merged with the pending puts, then replaced atomically by a temporary file
+		in the same directory. The lock is held throughout, so that the writers of the process never interleave.
+		"""
+		with self._lock:
+			if not self._pending:
+				return
+			self.load()
+			atomic_write(self.persist_path, json.dumps(self._data, ensure_ascii=False))
+			self._pending.clear()
@@ -0,0 +1,71 @@
+import threading
+
+from contextlib import contextmanager, asynccontextmanager
+
+
+class LLMPriorityGate(object):
+	r"""
+	A gate giving interactive LLM calls (e.g. chatting with users) priority over background LLM jobs.
+
+	Interactive callers enter the gate while they are served. Background workers wait until no interactive caller
+	is inside before they start a new job, so that a long background job never delays a chat turn at its start.
+
+	Args:
+		idle_grace (float): Seconds without any interactive caller before the background jobs resume.
+	"""
+	def __init__(self, idle_grace: float = 1.0):
+		self.idle_grace = idle_grace
+		self._interactive_num = 0
+		self._condition = threading.Condition()
+
+	@property
+	def interactive_num(self) -> int:
+		return self._interactive_num
+
+	def enter_interactive(self):
+		with self._condition:
+			self._interactive_num += 1
+
+	def exit_interactive(self):
+		with self._condition:
+			self._interactive_num -= 1
+			self._condition.notify_all()
+
+	@contextmanager
+	def interactive(self):
+		r""" Mark the enclosed block as an interactive LLM usage. """
+		self.enter_interactive()
+		try:
+			yield
+		finally:
+			self.exit_interactive()
+
+	@asynccontextmanager
+	async def ainteractive(self):
+		r""" Mark the enclosed block as an interactive LLM usage, async version. """
+		self.enter_interactive()
+		try:
+			yield
+		finally:
+			self.exit_interactive()
+
+	def wait_background_turn(self, timeout: float = None) -> bool:
+		r"""
+		Block the background worker until no interactive caller has been inside for `self.idle_grace` seconds.
+
+		Args:
+			timeout (float): The max seconds to wait for the interactive callers to leave. Defaults to None, wait forever.
+
+		Returns:
+			bool: Whether the background worker may proceed.
+		"""
+		with self._condition:
+			while True:
+				if not self._condition.wait_for(lambda: self._interactive_num == 0, timeout=timeout):
+					return False
+				# Chats usually come in bursts, wait a little in case the user is still chatting.
+				if not self._condition.wait_for(lambda: self._interactive_num > 0, timeout=self.idle_grace):
+					return True
+
+
+LLM_PRIORITY_GATE = LLMPriorityGate()
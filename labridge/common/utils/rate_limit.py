@@ -0,0 +1,42 @@
+import time
+import asyncio
+import threading
+
+
+class AsyncTokenBucket(object):
+	r"""
+	A token bucket limiting the rate of requests to a remote service.
+
+	Tokens are refilled at `rate` per second up to `capacity`. Each request takes one token, and waits if the bucket
+	is empty. The waiting requests reserve their tokens in arrival order, so they are released `1 / rate` seconds
+	apart. The bucket may be shared by coroutines in different event loops and threads.
+
+	Args:
+		rate (float): Tokens refilled per second.
+		capacity (float): The maximum number of tokens, i.e. the allowed burst. Defaults to 1.
+	"""
+	def __init__(self, rate: float, capacity: float = 1.0):
+		if rate <= 0 or capacity < 1:
+			raise ValueError("The rate must be positive and the capacity must be at least 1.")
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = capacity
+		self._updated_at = time.monotonic()
+		self._lock = threading.Lock()
+
+	def _reserve(self) -> float:
+		r""" Take a token, return the seconds to wait before it is available. """
+		with self._lock:
+			now = time.monotonic()
+			self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+			self._updated_at = now
+			self._tokens -= 1
+			if self._tokens >= 0:
+				return 0.0
+			return -self._tokens / self.rate
+
+	async def acquire(self):
+		r""" Wait until a token is available. """
+		delay = self._reserve()
+		if delay > 0:
+			await asyncio.sleep(delay)
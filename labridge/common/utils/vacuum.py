@@ -0,0 +1,303 @@
+import fsspec
+
+from pathlib import Path
+from typing import List, Set
+
+from llama_index.core.data_structs.data_structs import IndexDict
+from llama_index.core.schema import BaseNode, NodeRelationship
+from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.index_store import SimpleIndexStore
+from llama_index.core.vector_stores import SimpleVectorStore
+
+
+r"""
+Vacuum of the persisted vector index storages.
+
+Deleting nodes with `VectorStoreIndex.delete_nodes` leaves the docstore entries, the `index_struct` entries,
+the document hashes and the relationships pointing to the deleted nodes behind, so that a storage keeps
+growing with the updates even if its live contents do not.
+
+A vacuum rewrites a storage with only the nodes reachable from the storage's root nodes, keeping their embeddings,
+and validates the rewritten storage with `check_storage` before replacing the old one.
+"""
+
+
+# The relationships followed from the root nodes. The SOURCE relationship refers to a document out of the storage.
+VACUUM_FOLLOWED_RELATIONSHIPS = (
+	NodeRelationship.CHILD,
+	NodeRelationship.NEXT,
+	NodeRelationship.PREVIOUS,
+	NodeRelationship.PARENT,
+)
+VACUUM_TMP_DIR_SUFFIX = ".vacuum"
+
+
+class VacuumReport(object):
+	r"""
+	The result of vacuuming a storage.
+
+	Args:
+		persist_dir (str): The persist directory of the storage.
+		removed_node_ids (List[str]): The removed docstore nodes.
+		removed_vector_num (int): The number of the removed embeddings.
+		removed_hash_num (int): The number of the removed document hashes.
+		pruned_relation_num (int): The number of the removed relationships pointing to missing nodes.
+		bytes_before (int): The size of the storage files before the vacuum.
+		bytes_after (int): The size of the storage files after the vacuum.
+	"""
+	def __init__(
+		self,
+		persist_dir: str,
+		removed_node_ids: List[str],
+		removed_vector_num: int,
+		removed_hash_num: int,
+		pruned_relation_num: int,
+		bytes_before: int,
+		bytes_after: int,
+	):
+		self.persist_dir = persist_dir
+		self.removed_node_ids = removed_node_ids
+		self.removed_vector_num = removed_vector_num
+		self.removed_hash_num = removed_hash_num
+		self.pruned_relation_num = pruned_relation_num
+		self.bytes_before = bytes_before
+		self.bytes_after = bytes_after
+
+	@property
+	def bytes_reclaimed(self) -> int:
+		return self.bytes_before - self.bytes_after
+
+	def __str__(self) -> str:
+		return (
+			f"{self.persist_dir}: removed {len(self.removed_node_ids)} nodes, {self.removed_vector_num} vectors, "
+			f"{self.removed_hash_num} hashes, {self.pruned_relation_num} relationships; "
+			f"reclaimed {self.bytes_reclaimed} bytes ({self.bytes_before} -> {self.bytes_after})."
+		)
+
+
+def storage_size(persist_dir: str) -> int:
+	r""" The total size of the json files of a persisted storage, in bytes. """
+	fs = fsspec.filesystem("file")
+	if not fs.exists(persist_dir):
+		return 0
+	return sum(fs.size(path) for path in fs.glob(f"{persist_dir}/*.json"))
+
+
+def reachable_node_ids(docstore: SimpleDocumentStore, root_ids: List[str]) -> Set[str]:
+	r"""
+	The ids of the docstore nodes reachable from the root nodes along the relationships.
+
+	Args:
+		docstore (SimpleDocumentStore): The docstore.
+		root_ids (List[str]): The root node ids, the missing ones are ignored.
+
+	Returns:
+		Set[str]: The reachable node ids, including the existing root ids.
+	"""
+	docs = docstore.docs
+	reachable = set()
+	stack = [node_id for node_id in root_ids if node_id in docs]
+	while stack:
+		node_id = stack.pop()
+		if node_id in reachable:
+			continue
+		reachable.add(node_id)
+		for related_id in _related_ids(docs[node_id]):
+			if related_id in docs and related_id not in reachable:
+				stack.append(related_id)
+	return reachable
+
+
+def _related_ids(node: BaseNode) -> List[str]:
+	related_ids = []
+	for relation in VACUUM_FOLLOWED_RELATIONSHIPS:
+		related = node.relationships.get(relation, None)
+		if related is None:
+			continue
+		if isinstance(related, list):
+			related_ids.extend([info.node_id for info in related])
+		else:
+			related_ids.append(related.node_id)
+	return related_ids
+
+
+def _get_index_struct(storage_context: StorageContext, index_id: str) -> IndexDict:
+	index_struct = storage_context.index_store.get_index_struct(struct_id=index_id)
+	if index_struct is None:
+		raise ValueError(f"The index {index_id} does not exist in the storage.")
+	return index_struct
+
+
+def check_storage(storage_context: StorageContext, index_id: str, root_ids: List[str]) -> List[str]:
+	r"""
+	Check the consistency of a vector index storage:
+
+	1. Each docstore node is reachable from the root nodes.
+	2. Each relationship (except SOURCE) of a docstore node points to a docstore node.
+	3. Each docstore node has an embedding, and each embedding belongs to a docstore node.
+	4. The nodes of the `index_struct` are the embedded nodes.
+	5. Each ref_doc_info refers to existing nodes only.
+	6. Each document hash belongs to a docstore node or the ref_doc of one.
+
+	Args:
+		storage_context (StorageContext): The storage, with a `SimpleVectorStore`.
+		index_id (str): The id of the vector index in the storage.
+		root_ids (List[str]): The root node ids of the storage.
+
+	Returns:
+		List[str]: The found problems. Empty if the storage is consistent.
+	"""
+	docstore = storage_context.docstore
+	vector_data = storage_context.vector_store.data
+	index_struct = _get_index_struct(storage_context=storage_context, index_id=index_id)
+	docs = docstore.docs
+	doc_ids = set(docs.keys())
+	vector_ids = set(vector_data.embedding_dict.keys())
+
+	problems = []
+	for node_id in sorted(doc_ids - reachable_node_ids(docstore=docstore, root_ids=root_ids)):
+		problems.append(f"Node {node_id} is not reachable from the root nodes.")
+	for node_id, node in docs.items():
+		for related_id in _related_ids(node):
+			if related_id not in doc_ids:
+				problems.append(f"Node {node_id} refers to a missing node {related_id}.")
+	for node_id in sorted(doc_ids - vector_ids):
+		problems.append(f"Node {node_id} has no embedding.")
+	for node_id in sorted(vector_ids - doc_ids):
+		problems.append(f"The embedding {node_id} belongs to no node.")
+	for node_id in sorted(set(vector_data.metadata_dict.keys()) - vector_ids):
+		problems.append(f"The vector metadata {node_id} belongs to no embedding.")
+	for node_id in sorted(set(index_struct.nodes_dict.keys()) ^ vector_ids):
+		problems.append(f"The index entry {node_id} does not match the embeddings.")
+
+	ref_doc_ids = set()
+	for ref_doc_id, ref_doc_info in (docstore.get_all_ref_doc_info() or {}).items():
+		ref_doc_ids.add(ref_doc_id)
+		for node_id in ref_doc_info.node_ids:
+			if node_id not in doc_ids:
+				problems.append(f"The ref doc {ref_doc_id} refers to a missing node {node_id}.")
+	for hash_doc_id in set(docstore.get_all_document_hashes().values()):
+		if hash_doc_id not in doc_ids and hash_doc_id not in ref_doc_ids:
+			problems.append(f"The document hash of {hash_doc_id} belongs to no node.")
+	return problems
+
+
+def _prune_relationships(node: BaseNode, live_ids: Set[str]) -> int:
+	r""" Remove the relationships pointing to the removed nodes, return the number of the removed ones. """
+	pruned = 0
+	for relation in VACUUM_FOLLOWED_RELATIONSHIPS:
+		related = node.relationships.get(relation, None)
+		if related is None:
+			continue
+		if isinstance(related, list):
+			kept = [info for info in related if info.node_id in live_ids]
+			pruned += len(related) - len(kept)
+			node.relationships[relation] = kept
+		elif related.node_id not in live_ids:
+			del node.relationships[relation]
+			pruned += 1
+	return pruned
+
+
+def vacuum_storage(persist_dir: str, index_id: str, root_ids: List[str]) -> VacuumReport:
+	r"""
+	Rewrite a persisted vector index storage with only the nodes reachable from the root nodes.
+
+	- The reachable nodes keep their embeddings, so that nothing is embedded again.
+	  A reachable node without an embedding is a broken storage, it fails the check and the storage is kept as is.
+	- The relationships pointing to the removed nodes are removed.
+	- The document hashes of the removed nodes and their ref_docs are removed.
+
+	The rewritten storage is persisted in a temporary directory, checked by `check_storage`,
+	and then replaces the storage files. Other files in the persist directory are kept.
+
+	Args:
+		persist_dir (str): The persist directory of the storage.
+		index_id (str): The id of the vector index in the storage.
+		root_ids (List[str]): The root node ids of the storage.
+
+	Returns:
+		VacuumReport: The removed contents and the reclaimed bytes.
+
+	Raises:
+		ValueError: If the rewritten storage fails the consistency check.
+	"""
+	bytes_before = storage_size(persist_dir)
+	storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+	docstore = storage_context.docstore
+	vector_data = storage_context.vector_store.data
+	index_struct = _get_index_struct(storage_context=storage_context, index_id=index_id)
+
+	docs = docstore.docs
+	live_ids = reachable_node_ids(docstore=docstore, root_ids=root_ids)
+	live_nodes = [docs[node_id] for node_id in docs.keys() if node_id in live_ids]
+
+	pruned_relation_num = 0
+	ref_doc_ids = set()
+	for node in live_nodes:
+		pruned_relation_num += _prune_relationships(node=node, live_ids=live_ids)
+		if node.ref_doc_id is not None:
+			ref_doc_ids.add(node.ref_doc_id)
+
+	new_docstore = SimpleDocumentStore()
+	new_docstore.add_documents(live_nodes, allow_update=True)
+	for ref_doc_id in ref_doc_ids:
+		doc_hash = docstore.get_document_hash(ref_doc_id)
+		if doc_hash is not None and ref_doc_id not in live_ids:
+			new_docstore.set_document_hash(ref_doc_id, doc_hash)
+
+	new_vector_store = SimpleVectorStore()
+	new_index_struct = IndexDict()
+	new_index_struct.index_id = index_struct.index_id
+	new_index_struct.summary = index_struct.summary
+	embedded_nodes = []
+	for node in live_nodes:
+		embedding = vector_data.embedding_dict.get(node.node_id, None)
+		if embedding is None:
+			continue
+		embedded_node = node.copy()
+		embedded_node.embedding = embedding
+		embedded_nodes.append(embedded_node)
+		new_index_struct.add_node(node, text_id=node.node_id)
+	new_vector_store.add(embedded_nodes)
+
+	new_index_store = SimpleIndexStore()
+	new_index_store.add_index_struct(new_index_struct)
+	new_storage_context = StorageContext.from_defaults(
+		docstore=new_docstore,
+		index_store=new_index_store,
+		vector_store=new_vector_store,
+	)
+
+	problems = check_storage(storage_context=new_storage_context, index_id=index_id, root_ids=root_ids)
+	if problems:
+		raise ValueError(f"The vacuumed storage of {persist_dir} is inconsistent:\n" + "\n".join(problems))
+
+	fs = fsspec.filesystem("file")
+	tmp_dir = f"{persist_dir.rstrip('/')}{VACUUM_TMP_DIR_SUFFIX}"
+	if fs.exists(tmp_dir):
+		fs.rm(tmp_dir, recursive=True)
+	new_storage_context.persist(persist_dir=tmp_dir)
+	for tmp_path in fs.glob(f"{tmp_dir}/*.json"):
+		fs.mv(tmp_path, str(Path(persist_dir) / Path(tmp_path).name))
+	fs.rm(tmp_dir, recursive=True)
+
+	removed_hash_num = len(set(docstore.get_all_document_hashes().values())) - len(
+		set(new_docstore.get_all_document_hashes().values())
+	)
+	return VacuumReport(
+		persist_dir=persist_dir,
+		removed_node_ids=sorted(set(docs.keys()) - live_ids),
+		removed_vector_num=len(vector_data.embedding_dict) - len(embedded_nodes),
+		removed_hash_num=removed_hash_num,
+		pruned_relation_num=pruned_relation_num,
+		bytes_before=bytes_before,
+		bytes_after=storage_size(persist_dir),
+	)
+
+
+def check_persisted_storage(persist_dir: str, index_id: str, root_ids: List[str]) -> List[str]:
+	r""" Check the consistency of a persisted storage, refer to `check_storage`. """
+	storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+	return check_storage(storage_context=storage_context, index_id=index_id, root_ids=root_ids)
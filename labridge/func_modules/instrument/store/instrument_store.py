@@ -6,6 +6,7 @@ from llama_index.core.embeddings import BaseEmbedding
 from llama_index.core.settings import Settings
 from llama_index.core import load_index_from_storage
 from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
 from llama_index.core.ingestion import run_transformations
 from llama_index.core.schema import (
 	TextNode,
@@ -19,6 +20,7 @@ from llama_index.core.readers import SimpleDirectoryReader
 from pathlib import Path
 from typing import List, Dict, Any, Union
 from labridge.accounts.super_users import InstrumentSuperUserManager
+from labridge.common.utils.vacuum import VacuumReport, vacuum_storage, check_storage
 
 
 DEFAULT_INSTRUMENT_VECTOR_PERSIST_DIR = "storage/instruments"
@@ -405,6 +407,41 @@ class InstrumentStorage(object):
 			fs.makedirs(persist_dir)
 		self.vector_index.storage_context.persist(persist_dir=persist_dir)
 
+	@staticmethod
+	def vacuum_root_ids(docstore: BaseDocumentStore) -> List[str]:
+		r""" The root nodes of the storage. """
+		return [INSTRUMENT_ROOT_NODE_NAME]
+
+	def check_consistency(self) -> List[str]:
+		r""" Check the consistency of the storage, refer to `check_storage`. """
+		return check_storage(
+			storage_context=self.vector_index.storage_context,
+			index_id=INSTRUMENT_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+
+	def vacuum(self) -> VacuumReport:
+		r"""
+		Persist the storage, rewrite it with only the nodes reachable from the root node and reload it.
+		The documents deleted by `delete_instrument_doc` are removed from the docstore.
+		Refer to `vacuum_storage`.
+
+		Returns:
+			VacuumReport: The removed contents and the reclaimed bytes.
+		"""
+		self.persist()
+		report = vacuum_storage(
+			persist_dir=self.persist_dir,
+			index_id=INSTRUMENT_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+		self.vector_index = load_index_from_storage(
+			storage_context=StorageContext.from_defaults(persist_dir=self.persist_dir),
+			index_id=INSTRUMENT_VECTOR_INDEX_ID,
+			embed_model=self.vector_index._embed_model,
+		)
+		return report
+
 
 if __name__ == "__main__":
 	fs = fsspec.filesystem("file")
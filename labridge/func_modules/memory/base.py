@@ -1,3 +1,4 @@
+import datetime
 import llama_index.core.instrumentation as instrument
 
 from llama_index.core.indices.vector_store.retrievers.retriever import VectorIndexRetriever
@@ -5,10 +6,10 @@ from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.vector_stores.types import FilterOperator
 from llama_index.core import Settings
-from llama_index.core.schema import NodeWithScore
+from llama_index.core.schema import NodeWithScore, BaseNode
 from llama_index.core.vector_stores.types import MetadataFilter
 
-from typing import List, Any
+from typing import List, Any, Tuple
 from abc import abstractmethod
 from labridge.common.utils.time import (
 	str_to_datetime,
@@ -24,12 +25,32 @@ CHAT_MEMORY_RELEVANT_TOP_K = 3
 
 LOG_DATE_NAME = "date"
 LOG_TIME_NAME = "time"
+# The POSIX timestamp of a log node, recorded when the node is written.
+LOG_TIMESTAMP_NAME = "timestamp"
 
 MEMORY_NODE_TYPE_NAME = "node_type"
 LOG_NODE_TYPE = "log_node"
 NOT_LOG_NODE_TYPE = "not_log_node"
 
 
+def get_log_timestamp(node: BaseNode) -> float:
+	r"""
+	Get the timestamp of a log node.
+	For the nodes written without a timestamp, it is parsed from the `LOG_DATE_NAME` and `LOG_TIME_NAME` metadata.
+
+	Args:
+		node (BaseNode): A log node.
+
+	Returns:
+		float: The POSIX timestamp.
+	"""
+	timestamp = node.metadata.get(LOG_TIMESTAMP_NAME, None)
+	if timestamp is None:
+		date_str, time_str = node.metadata[LOG_DATE_NAME][0], node.metadata[LOG_TIME_NAME][0]
+		timestamp = str_to_datetime(date_str=date_str, time_str=time_str).timestamp()
+	return timestamp
+
+
 class LogBaseRetriever(object):
 	r"""
 	This is the base class for log-type information retriever, such as chat history and experiment log.
@@ -73,6 +94,23 @@ class LogBaseRetriever(object):
 			end_date_str=end_date_str,
 		)
 
+	def _parse_time_range(self, start_date_str: str, end_date_str: str) -> Tuple[float, float]:
+		r"""
+		Get the timestamps of the beginning of the start date and the beginning of the day after the end date.
+
+		Args:
+			start_date_str (str): The string of the start date in a specific format, specified in `common.utils.time`.
+			end_date_str (str): The string of the end date.
+
+		Returns:
+			Tuple[float, float]: The start timestamp and the end timestamp.
+		"""
+		date_list = self._parse_date(start_date_str=start_date_str, end_date_str=end_date_str)
+		start = str_to_datetime(date_str=date_list[0], time_str="00:00:00").timestamp()
+		end_day = str_to_datetime(date_str=date_list[-1], time_str="00:00:00") + datetime.timedelta(days=1)
+		end = end_day.timestamp()
+		return start, end
+
 	@abstractmethod
 	def get_memory_vector_retriever(self) -> VectorIndexRetriever:
 		r""" Get the vector index retriever from the memory """
@@ -129,15 +167,7 @@ class LogBaseRetriever(object):
 		"""
 		if len(memory_nodes) < 1:
 			return []
-		nodes_datetime = []
-		for node in memory_nodes:
-			node_date_str = node.node.metadata[LOG_DATE_NAME][0]
-			node_time_str = node.node.metadata[LOG_TIME_NAME][0]
-			nodes_datetime.append(str_to_datetime(date_str=node_date_str, time_str=node_time_str))
-
-		sorted_items = sorted(zip(memory_nodes, nodes_datetime), key=lambda x: x[1], reverse=descending)
-		sorted_nodes, sorted_datetime = zip(*sorted_items)
-		return sorted_nodes
+		return sorted(memory_nodes, key=lambda x: get_log_timestamp(x.node), reverse=descending)
 
 	def _add_context(self, content_nodes: List[NodeWithScore]) -> List[NodeWithScore]:
 		r"""
@@ -1,14 +1,20 @@
+import json
 import fsspec
+import logging
+import datetime
 
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core import load_index_from_storage
 from llama_index.core.storage import StorageContext
-from llama_index.core.bridge.pydantic import Field
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 from llama_index.core import Settings
+from llama_index.core.llms import LLM
+from llama_index.core.prompts import PromptTemplate
 from llama_index.core.schema import (
 	TextNode,
 	NodeRelationship,
@@ -27,9 +33,21 @@ from llama_index.core.base.llms.types import (
 )
 
 from labridge.accounts.users import AccountManager
-from labridge.common.utils.time import get_time
+from labridge.common.utils.priority import LLMPriorityGate, LLM_PRIORITY_GATE
+from labridge.common.utils.time import get_time, str_to_date, str_to_datetime, DATE_FORMAT
+from labridge.common.utils.vacuum import VacuumReport, vacuum_storage, check_storage
 from labridge.models.utils import get_models
-from labridge.func_modules.memory.base import LOG_DATE_NAME, LOG_TIME_NAME
+from labridge.func_modules.memory.base import (
+	LOG_DATE_NAME,
+	LOG_TIME_NAME,
+	LOG_TIMESTAMP_NAME,
+	MEMORY_NODE_TYPE_NAME,
+	get_log_timestamp,
+)
+from labridge.func_modules.memory.time_index import LogTimeIndex, LOG_TIME_INDEX_ALL_KEY
+
+
+logger = logging.getLogger(__name__)
 
 
 CHAT_MEMORY_PERSIST_DIR = "storage/chat_memory"
@@ -39,6 +57,59 @@ MEMORY_FIRST_NODE_NAME = "init_node"
 CHAT_GROUP_MEMBERS_NODE_NAME = "members"
 MEMORY_LAST_NODE_ID_NAME = "last_node_id"
 
+# Chat records older than this are compacted into daily digest nodes.
+CHAT_MEMORY_KEEP_DAYS = 7
+# The raw chat records of the compacted days, relative to the persist_dir of a memory.
+CHAT_MEMORY_ARCHIVE_DIR = "archive"
+CHAT_DIGEST_NODE_TYPE = "chat_digest"
+CHAT_DIGEST_ID_PREFIX = "digest_"
+CHAT_DIGEST_RECORD_NUM_NAME = "record_num"
+# Recorded in the node `MEMORY_LAST_NODE_ID_NAME`: the dates before it have been compacted.
+CHAT_MEMORY_COMPACTED_BEFORE_NAME = "compacted_before"
+CHAT_DIGEST_MAX_INPUT_CHARS = 12000
+CHAT_DIGEST_MAX_CHARS = 2000
+# The max seconds a digest waits for the chats to leave the LLM, refer to `LLMPriorityGate`.
+CHAT_DIGEST_GATE_TIMEOUT = 60.0
+
+CHAT_DIGEST_PROMPT = PromptTemplate(
+	"The following are the chat records between an assistant and a user (or a chat group) on {date}, "
+	"including the logs of the tools called by the assistant.\n"
+	"---------------------\n"
+	"{chat_records}\n"
+	"---------------------\n"
+	"Write a concise digest of these chat records for later retrieval. "
+	"List the discussed topics, the user's questions and requests, the mentioned papers, experiments, "
+	"names and numbers, and the conclusions or results. Use the language of the chat records.\n"
+	"Digest: "
+)
+
+
+def summarize_chat_records(date: str, chat_records: List[str], llm: LLM = None) -> str:
+	r"""
+	Summarize the chat records of a day with the LLM.
+	If the LLM fails, the leading part of the records is used instead.
+
+	Args:
+		date (str): The date of the chat records.
+		chat_records (List[str]): The texts of the chat record nodes in time order.
+		llm (LLM): The used LLM. Defaults to `Settings.llm`.
+
+	Returns:
+		str: The digest.
+	"""
+	records_str = "\n".join(chat_records)
+	try:
+		llm = llm or Settings.llm
+		response = llm.complete(
+			CHAT_DIGEST_PROMPT.format(date=date, chat_records=records_str[:CHAT_DIGEST_MAX_INPUT_CHARS])
+		)
+		digest = response.text.strip()
+		if digest:
+			return digest[:CHAT_DIGEST_MAX_CHARS]
+	except Exception:
+		logger.exception("Summarizing the chat records on %s failed.", date)
+	return records_str[:CHAT_DIGEST_MAX_CHARS]
+
 
 class ChatVectorMemory(VectorMemory):
 	r"""
@@ -54,11 +125,14 @@ class ChatVectorMemory(VectorMemory):
 		useful for filtering in retrieving.
 		The metadata `date` and `time` is recorded in a list format for the convenience of metadata filtering.
 		For example: ['2024-08-10'], ['09:05:03'].
+		The metadata `LOG_TIMESTAMP_NAME` is also recorded, and the chat log nodes are indexed by it
+		in a `LogTimeIndex` with the key `LOG_TIME_INDEX_ALL_KEY`.
 	"""
 	persist_dir: str = Field(
 		default="",
 		description="The persist dir of the memory index relative to the root.",
 	)
+	_time_index: Optional[LogTimeIndex] = PrivateAttr(default=None)
 	def __init__(
 		self,
 		vector_index: VectorStoreIndex,
@@ -204,6 +278,49 @@ class ChatVectorMemory(VectorMemory):
 			retriever_kwargs=retriever_kwargs,
 		)
 
+	@property
+	def time_index(self) -> LogTimeIndex:
+		r""" The time index of the chat log nodes, rebuilt from the chain if the memory is persisted without it. """
+		if self._time_index is None:
+			time_index = LogTimeIndex.from_persist_dir(self.persist_dir)
+			if time_index is None:
+				time_index = LogTimeIndex()
+				for node in self._chat_node_chain()[1:]:
+					time_index.add(
+						key=LOG_TIME_INDEX_ALL_KEY,
+						node_id=node.node_id,
+						timestamp=get_log_timestamp(node),
+					)
+			self._time_index = time_index
+		return self._time_index
+
+	def get_last_records(self, num: int) -> List[BaseNode]:
+		r"""
+		Get the most recent chat log nodes.
+
+		Args:
+			num (int): The number of nodes.
+
+		Returns:
+			List[BaseNode]: At most `num` chat log nodes, in chronological order.
+		"""
+		node_ids = self.time_index.last(key=LOG_TIME_INDEX_ALL_KEY, num=num)
+		return self.vector_index.docstore.get_nodes(node_ids)
+
+	def get_records_between(self, start: datetime.datetime, end: datetime.datetime) -> List[BaseNode]:
+		r"""
+		Get the chat log nodes recorded in the time range [start, end).
+
+		Args:
+			start (datetime.datetime): The start time, included.
+			end (datetime.datetime): The end time, excluded.
+
+		Returns:
+			List[BaseNode]: The chat log nodes in chronological order.
+		"""
+		node_ids = self.time_index.between(key=LOG_TIME_INDEX_ALL_KEY, start=start.timestamp(), end=end.timestamp())
+		return self.vector_index.docstore.get_nodes(node_ids)
+
 	def update_node(self, node_id: str, node: BaseNode):
 		r"""
 		Update a node in the vector index.
@@ -215,6 +332,102 @@ class ChatVectorMemory(VectorMemory):
 		self.vector_index.delete_nodes([node_id])
 		self.vector_index.insert_nodes([node])
 
+	def _new_batch_node(self, message: ChatMessage) -> TextNode:
+		r""" A new batch text node with the date and time of the message. """
+		batch_node = _get_starter_node_for_new_batch()
+		date_str, time_str = message.additional_kwargs[LOG_DATE_NAME], message.additional_kwargs[LOG_TIME_NAME]
+		batch_node.metadata[LOG_DATE_NAME] = [date_str,]
+		batch_node.metadata[LOG_TIME_NAME] = [time_str,]
+		batch_node.metadata[LOG_TIMESTAMP_NAME] = str_to_datetime(date_str=date_str, time_str=time_str).timestamp()
+		batch_node.excluded_embed_metadata_keys.append(LOG_TIMESTAMP_NAME)
+		batch_node.excluded_llm_metadata_keys.append(LOG_TIMESTAMP_NAME)
+		return batch_node
+
+	def put_messages(self, messages: List[ChatMessage]) -> None:
+		r"""
+		Put the chat messages of a whole turn.
+
+		The messages are assembled into batch text nodes in memory: a USER or SYSTEM message starts a new batch,
+		other messages are appended to the current batch. Then all the batch text nodes are embedded in one call,
+		and the links are updated once:
+
+		- Last Text Node -> next_node = the first new batch node
+		- The new batch nodes are linked with each other through `prev_node` and `next_node`.
+		- The node `MEMORY_LAST_NODE_ID_NAME` records the last new batch node.
+
+		Only the text of the batch nodes is embedded, the links are updated in the docstore without re-embedding.
+
+		Metadata: `LOG_DATE_NAME`: [date, ]; `LOG_TIME_NAME`: [time, ]
+
+		Args:
+			messages (List[ChatMessage]): The chat messages.
+		"""
+		if not messages:
+			return
+
+		# Load the time index before the chain changes.
+		time_index = self.time_index
+		# The current batch has been committed in this session, and the leading messages are appended to it.
+		extended_node = None
+		new_nodes = []
+		batch_node = None
+		for message in messages:
+			if not self.batch_by_user_message or message.role in [MessageRole.USER, MessageRole.SYSTEM, ]:
+				batch_node = self._new_batch_node(message)
+				new_nodes.append(batch_node)
+			elif batch_node is None:
+				if self.cur_batch_textnode.text:
+					extended_node = self.cur_batch_textnode
+					batch_node = extended_node
+				else:
+					batch_node = self._new_batch_node(message)
+					new_nodes.append(batch_node)
+
+			sub_dict = _stringify_chat_message(message)
+			role = sub_dict["role"]
+			content = sub_dict["content"] or ""
+			batch_node.text += (
+				f">>> {role} message:\n"
+				f"{content.strip()}\n"
+			)
+
+		docstore = self.vector_index.docstore
+		updated_nodes = []
+		if new_nodes:
+			last_info_node = docstore.get_node(MEMORY_LAST_NODE_ID_NAME)
+			last_node_id = last_info_node.text
+			if extended_node is not None and extended_node.node_id == last_node_id:
+				last_node = extended_node
+			else:
+				last_node = docstore.get_node(last_node_id)
+				updated_nodes.append(last_node)
+
+			prev_node = last_node
+			for node in new_nodes:
+				prev_node.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=node.node_id)
+				node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=prev_node.node_id)
+				prev_node = node
+
+			last_info_node.set_content(new_nodes[-1].node_id)
+			updated_nodes.append(last_info_node)
+
+		commit_nodes = new_nodes
+		if extended_node is not None:
+			self.vector_index.delete_nodes([extended_node.node_id])
+			commit_nodes = [extended_node] + new_nodes
+		# One embedding call for the whole turn.
+		self.vector_index.insert_nodes(commit_nodes)
+		for node in new_nodes:
+			time_index.add(
+				key=LOG_TIME_INDEX_ALL_KEY,
+				node_id=node.node_id,
+				timestamp=node.metadata[LOG_TIMESTAMP_NAME],
+			)
+		# The links do not change the embedded contents, update them in the docstore only.
+		if updated_nodes:
+			docstore.add_documents(updated_nodes, allow_update=True)
+		self.cur_batch_textnode = commit_nodes[-1]
+
 	def put(self, message: ChatMessage) -> None:
 		"""
 		Put chat history.
@@ -228,41 +441,12 @@ class ChatVectorMemory(VectorMemory):
 		- New Text Node -> prev_node = Last Text Node
 		- let New Text Node be the Last Text Node
 
+		To put the messages of a whole turn, use `put_messages` instead.
+
 		Args:
 			message (ChatMessage): a chat message.
 		"""
-		if not self.batch_by_user_message or message.role in [MessageRole.USER, MessageRole.SYSTEM, ]:
-			# if not batching by user message, commit to vector store immediately after adding
-			self.cur_batch_textnode = _get_starter_node_for_new_batch()
-			# add date and time
-			self.cur_batch_textnode.metadata[LOG_DATE_NAME] = [message.additional_kwargs[LOG_DATE_NAME],]
-			self.cur_batch_textnode.metadata[LOG_TIME_NAME] = [message.additional_kwargs[LOG_TIME_NAME],]
-			# add previous and next relationships.
-			last_info_node = self.vector_index.docstore.get_node(MEMORY_LAST_NODE_ID_NAME)
-			last_node_id = last_info_node.text
-			last_node = self.vector_index.docstore.get_node(last_node_id)
-			last_node.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(
-				node_id=self.cur_batch_textnode.node_id
-			)
-			self.cur_batch_textnode.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(
-				node_id=last_node.node_id
-			)
-			# update last node id
-			last_info_node.set_content(self.cur_batch_textnode.node_id)
-			self.update_node(node_id=last_node_id, node=last_node)
-			self.update_node(node_id=MEMORY_LAST_NODE_ID_NAME, node=last_info_node)
-
-		# update current batch textnode
-		sub_dict = _stringify_chat_message(message)
-		role = sub_dict["role"]
-		content = sub_dict["content"] or ""
-		new_msg = (
-			f">>> {role} message:\n"
-			f"{content.strip()}\n"
-		)
-		self.cur_batch_textnode.text += new_msg
-		# self.cur_batch_textnode.metadata["sub_dicts"].append(sub_dict)
-		self._commit_node(override_last=True)
+		self.put_messages([message])
 
 	def persist(self, persist_dir: str = None):
 		persist_dir = persist_dir or self.persist_dir
@@ -270,20 +454,263 @@ class ChatVectorMemory(VectorMemory):
 		if not fs.exists(persist_dir):
 			fs.makedirs(persist_dir)
 		self.vector_index.storage_context.persist(persist_dir=persist_dir)
+		self.time_index.persist(persist_dir=persist_dir)
+
+	@staticmethod
+	def vacuum_root_ids(docstore: BaseDocumentStore) -> List[str]:
+		r""" The root nodes of the storage: the first node of the chat chain, the info node and the members node. """
+		return [MEMORY_FIRST_NODE_NAME, MEMORY_LAST_NODE_ID_NAME, CHAT_GROUP_MEMBERS_NODE_NAME]
+
+	def check_consistency(self) -> List[str]:
+		r""" Check the consistency of the storage, refer to `check_storage`. """
+		return check_storage(
+			storage_context=self.vector_index.storage_context,
+			index_id=CHAT_MEMORY_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+
+	def vacuum(self) -> VacuumReport:
+		r"""
+		Persist the storage, rewrite it with only the nodes reachable from the root nodes and reload it.
+		Refer to `vacuum_storage`.
+
+		Returns:
+			VacuumReport: The removed contents and the reclaimed bytes.
+		"""
+		self.persist()
+		report = vacuum_storage(
+			persist_dir=self.persist_dir,
+			index_id=CHAT_MEMORY_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+		self.vector_index = load_index_from_storage(
+			storage_context=StorageContext.from_defaults(persist_dir=self.persist_dir),
+			index_id=CHAT_MEMORY_VECTOR_INDEX_ID,
+			embed_model=self.vector_index._embed_model,
+		)
+		self.time_index.delete(report.removed_node_ids)
+		self.time_index.persist(persist_dir=self.persist_dir)
+		return report
+
+	def _archive_path(self, date: str) -> str:
+		return str(Path(self.persist_dir) / CHAT_MEMORY_ARCHIVE_DIR / f"{date}.json")
+
+	def load_archived_nodes(self, date: str) -> List[Tuple[TextNode, Optional[List[float]]]]:
+		r"""
+		Load the raw chat record nodes of a compacted day from the archive.
+
+		Args:
+			date (str): The date of a digest node.
+
+		Returns:
+			List[Tuple[TextNode, Optional[List[float]]]]: The archived nodes and their embeddings.
+		"""
+		archive_path = self._archive_path(date)
+		fs = fsspec.filesystem("file")
+		if not fs.exists(archive_path):
+			return []
+		with fs.open(archive_path, "r", encoding="utf-8") as f:
+			records = json.load(f)
+		return [(TextNode.from_dict(record["node"]), record["embedding"]) for record in records]
+
+	def _archive_nodes(self, date: str, nodes: List[TextNode]):
+		r"""
+		Add the raw chat record nodes with their embeddings to the archive of the date.
+		The records are keyed by the node id, so that archiving the same nodes again, e.g. when a compaction
+		is retried after a crash before the index is persisted, does not duplicate them.
+		"""
+		# {node_id: record}, in time order.
+		records = {
+			node.node_id: {"node": node.to_dict(), "embedding": embedding}
+			for node, embedding in self.load_archived_nodes(date)
+		}
+		vector_store = self.vector_index.vector_store
+		for node in nodes:
+			try:
+				embedding = vector_store.get(node.node_id)
+			except (KeyError, NotImplementedError):
+				embedding = None
+			records[node.node_id] = {"node": node.to_dict(), "embedding": embedding}
+
+		archive_path = self._archive_path(date)
+		fs = fsspec.filesystem("file")
+		fs.makedirs(str(Path(archive_path).parent), exist_ok=True)
+		with fs.open(archive_path, "w", encoding="utf-8") as f:
+			json.dump(list(records.values()), f, ensure_ascii=False)
+
+	def _chat_node_chain(self) -> List[BaseNode]:
+		r""" The chat record nodes from the first node along `next_node`. """
+		docstore = self.vector_index.docstore
+		node = docstore.get_node(MEMORY_FIRST_NODE_NAME)
+		chain = [node]
+		while node.next_node is not None:
+			node = docstore.get_node(node.next_node.node_id)
+			chain.append(node)
+		return chain
+
+	@staticmethod
+	def is_digest_node(node: BaseNode) -> bool:
+		return node.metadata.get(MEMORY_NODE_TYPE_NAME, None) == CHAT_DIGEST_NODE_TYPE
+
+	def compact(
+		self,
+		keep_days: int = CHAT_MEMORY_KEEP_DAYS,
+		summarize_fn: Callable[[str, List[str]], str] = None,
+		gate: LLMPriorityGate = None,
+	) -> int:
+		r"""
+		Roll up the chat records older than `keep_days` days into one digest node per day.
+
+		- The digest node of a day summarizes the chat records of that day, and is embedded with the date metadata,
+		  so that date filters keep working. A day compacted again is re-summarized from its digest and new records.
+		- The raw chat record nodes are removed from the index and archived with their embeddings
+		  under `CHAT_MEMORY_ARCHIVE_DIR`. They are only read when a digest is retrieved, refer to `load_archived_nodes`.
+		- The digest nodes take the place of the raw nodes in the `prev_node` / `next_node` chain.
+
+		Thus the active index holds the recent chat records and one node per older day.
+		The compaction runs at most once a day, the compacted date is recorded in the node `MEMORY_LAST_NODE_ID_NAME`.
+
+		The digests are background LLM jobs: each one waits for its turn at the `gate`, so that the chats are served
+		first. If the chats keep the LLM busy for `CHAT_DIGEST_GATE_TIMEOUT` seconds, the memory is left unchanged
+		and compacted in a later update.
+
+		Args:
+			keep_days (int): The chat records of the recent `keep_days` days are kept.
+			summarize_fn (Callable[[str, List[str]], str]): Summarize the chat records of a date.
+				Defaults to `summarize_chat_records`.
+			gate (LLMPriorityGate): The priority gate of the LLM. Defaults to `LLM_PRIORITY_GATE`.
+
+		Returns:
+			int: The number of compacted chat record nodes.
+		"""
+		summarize_fn = summarize_fn or summarize_chat_records
+		gate = gate or LLM_PRIORITY_GATE
+		cutoff_date = (datetime.date.today() - datetime.timedelta(days=keep_days)).strftime(DATE_FORMAT)
+		docstore = self.vector_index.docstore
+		last_info_node = docstore.get_node(MEMORY_LAST_NODE_ID_NAME)
+		compacted_before = last_info_node.metadata.get(CHAT_MEMORY_COMPACTED_BEFORE_NAME, None)
+		if compacted_before is not None and str_to_date(compacted_before) >= str_to_date(cutoff_date):
+			return 0
+
+		# Load the time index before the chain changes.
+		time_index = self.time_index
+		chain = self._chat_node_chain()
+		# {date: raw nodes}, in time order.
+		old_nodes: Dict[str, List[BaseNode]] = {}
+		for node in chain[1:]:
+			node_date = node.metadata[LOG_DATE_NAME][0]
+			if not self.is_digest_node(node) and str_to_date(node_date) < str_to_date(cutoff_date):
+				old_nodes.setdefault(node_date, []).append(node)
+
+		if not old_nodes:
+			last_info_node.metadata[CHAT_MEMORY_COMPACTED_BEFORE_NAME] = cutoff_date
+			docstore.add_documents([last_info_node], allow_update=True)
+			return 0
+
+		digest_nodes: Dict[str, TextNode] = {}
+		# The raw nodes and the re-summarized digest nodes.
+		removed_ids = [node.node_id for nodes in old_nodes.values() for node in nodes]
+		for date, nodes in old_nodes.items():
+			digest_id = f"{CHAT_DIGEST_ID_PREFIX}{date}"
+			chat_records = [node.get_content() for node in nodes]
+			record_num = len(nodes)
+			first_time = nodes[0].metadata[LOG_TIME_NAME]
+			if docstore.document_exists(digest_id):
+				old_digest = docstore.get_node(digest_id)
+				chat_records.insert(0, old_digest.text)
+				record_num += old_digest.metadata[CHAT_DIGEST_RECORD_NUM_NAME]
+				first_time = old_digest.metadata[LOG_TIME_NAME]
+				removed_ids.append(digest_id)
+
+			if not gate.wait_background_turn(timeout=CHAT_DIGEST_GATE_TIMEOUT):
+				logger.info("The LLM is busy with chats, the compaction of %s is postponed.", self.persist_dir)
+				return 0
+			excluded_keys = [MEMORY_NODE_TYPE_NAME, CHAT_DIGEST_RECORD_NUM_NAME, LOG_TIMESTAMP_NAME]
+			digest_nodes[date] = TextNode(
+				id_=digest_id,
+				text=summarize_fn(date, chat_records),
+				metadata={
+					LOG_DATE_NAME: [date, ],
+					LOG_TIME_NAME: first_time,
+					LOG_TIMESTAMP_NAME: str_to_datetime(date_str=date, time_str=first_time[0]).timestamp(),
+					MEMORY_NODE_TYPE_NAME: CHAT_DIGEST_NODE_TYPE,
+					CHAT_DIGEST_RECORD_NUM_NAME: record_num,
+				},
+				excluded_embed_metadata_keys=excluded_keys,
+				excluded_llm_metadata_keys=list(excluded_keys),
+			)
+
+		# The index is persisted after the compaction, archive the raw nodes before they are removed from it.
+		for date, nodes in old_nodes.items():
+			self._archive_nodes(date=date, nodes=nodes)
+		last_info_node.metadata[CHAT_MEMORY_COMPACTED_BEFORE_NAME] = cutoff_date
+
+		# Replace the raw nodes with the digest nodes in the chain, and relink it.
+		# A digest node takes the place of the first node of its date.
+		new_chain = []
+		chain_ids = set()
+		for node in chain:
+			if node.node_id != MEMORY_FIRST_NODE_NAME and node.metadata[LOG_DATE_NAME][0] in digest_nodes:
+				node = digest_nodes[node.metadata[LOG_DATE_NAME][0]]
+			if node.node_id in chain_ids:
+				continue
+			chain_ids.add(node.node_id)
+			new_chain.append(node)
+
+		relinked_nodes = []
+		for prev_node, node in zip(new_chain[:-1], new_chain[1:]):
+			if prev_node.next_node is None or prev_node.next_node.node_id != node.node_id:
+				prev_node.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=node.node_id)
+				relinked_nodes.append(prev_node)
+			if node.prev_node is None or node.prev_node.node_id != prev_node.node_id:
+				node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=prev_node.node_id)
+				relinked_nodes.append(node)
+		if NodeRelationship.NEXT in new_chain[-1].relationships:
+			del new_chain[-1].relationships[NodeRelationship.NEXT]
+			relinked_nodes.append(new_chain[-1])
+
+		self.vector_index.delete_nodes(removed_ids, delete_from_docstore=True)
+		for node_id in removed_ids:
+			self.vector_index.index_struct.delete(node_id)
+		time_index.delete(removed_ids)
+
+		last_info_node.set_content(new_chain[-1].node_id)
+		if self.cur_batch_textnode.node_id in removed_ids:
+			self.cur_batch_textnode = _get_starter_node_for_new_batch()
+
+		# One embedding call for all the digest nodes.
+		self.vector_index.insert_nodes(list(digest_nodes.values()))
+		for node in digest_nodes.values():
+			time_index.add(
+				key=LOG_TIME_INDEX_ALL_KEY,
+				node_id=node.node_id,
+				timestamp=node.metadata[LOG_TIMESTAMP_NAME],
+			)
+		digest_ids = set(node.node_id for node in digest_nodes.values())
+		updated_nodes = {
+			node.node_id: node for node in relinked_nodes + [last_info_node] if node.node_id not in digest_ids
+		}
+		docstore.add_documents(list(updated_nodes.values()), allow_update=True)
+		self.vector_index.storage_context.index_store.add_index_struct(self.vector_index.index_struct)
+		return sum(len(nodes) for nodes in old_nodes.values())
 
 
 def update_chat_memory(
 	memory_id: str,
 	chat_messages: List[ChatMessage],
-	embed_model: BaseEmbedding = None
+	embed_model: BaseEmbedding = None,
+	keep_days: Optional[int] = CHAT_MEMORY_KEEP_DAYS,
 ):
 	r"""
 	Update the user/chat_group specific chat memory.
+	The chat records older than `keep_days` days are compacted into daily digests, refer to `ChatVectorMemory.compact`.
 
 	Args:
 		memory_id (str): user_id or chat_group_id
 		chat_messages (List[ChatMessage]): New chat messages.
 		embed_model (BaseEmbedding): The used embedding model.
+		keep_days (Optional[int]): The chat records of the recent `keep_days` days are kept.
+			If None, the memory is not compacted.
 
 	Returns:
 		None or an Error string.
@@ -297,9 +724,9 @@ def update_chat_memory(
 	if not isinstance(chat_memory, ChatVectorMemory):
 		return chat_memory
 
-	for msg in chat_messages:
-		chat_memory.put(msg)
-
+	chat_memory.put_messages(chat_messages)
+	if keep_days is not None:
+		chat_memory.compact(keep_days=keep_days)
 	chat_memory.persist()
 
 
@@ -0,0 +1,163 @@
+import atexit
+import asyncio
+import logging
+import threading
+
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import ChatMessage
+
+from labridge.func_modules.memory.chat.chat_memory import update_chat_memory
+
+
+logger = logging.getLogger(__name__)
+
+
+CHAT_MEMORY_WRITER_WORKERS = 2
+
+
+class ChatMemoryWriter(object):
+	r"""
+	A write-behind writer of the long-term chat memory, keeping the embedding and persisting off the request path.
+
+	- Each memory id (a user_id or a chat_group_id) has an ordered queue of chat turns.
+	  The turns of a memory are written by one worker at a time, in the submitted order.
+	- A worker takes all the queued turns of a memory at once, puts them in one `put_messages` call,
+	  and persists the memory once.
+	- Pending turns are flushed when the writer is stopped, and the writer stops at interpreter exit.
+
+	Args:
+		embed_model (BaseEmbedding): The used embedding model. Defaults to `Settings.embed_model`.
+		max_workers (int): The number of worker threads, i.e. the number of memories written concurrently.
+		write_fn (Callable): The function writing a list of messages to a memory.
+			Defaults to `update_chat_memory`.
+	"""
+	def __init__(
+		self,
+		embed_model: BaseEmbedding = None,
+		max_workers: int = CHAT_MEMORY_WRITER_WORKERS,
+		write_fn: Callable[..., Optional[str]] = None,
+	):
+		self.embed_model = embed_model
+		self.max_workers = max_workers
+		self.write_fn = write_fn or update_chat_memory
+		self._pending: Dict[str, List[List[ChatMessage]]] = {}
+		self._ready: Deque[str] = deque()
+		self._active: Set[str] = set()
+		self._condition = threading.Condition()
+		self._threads: List[threading.Thread] = []
+		self._stopping = False
+		self._atexit_registered = False
+
+	@property
+	def is_running(self) -> bool:
+		return any(thread.is_alive() for thread in self._threads)
+
+	@property
+	def pending_num(self) -> int:
+		r""" The number of turns not written yet. """
+		with self._condition:
+			return sum(len(turns) for turns in self._pending.values())
+
+	def start(self):
+		with self._condition:
+			if self.is_running:
+				return
+			self._stopping = False
+			self._threads = [
+				threading.Thread(target=self._run, name=f"chat-memory-writer-{idx}", daemon=True)
+				for idx in range(self.max_workers)
+			]
+			for thread in self._threads:
+				thread.start()
+			if not self._atexit_registered:
+				atexit.register(self.stop)
+				self._atexit_registered = True
+
+	def submit(self, memory_id: str, chat_messages: List[ChatMessage]):
+		r"""
+		Queue the messages of a chat turn. Returns at once, the writer starts if not running.
+
+		Args:
+			memory_id (str): user_id or chat_group_id.
+			chat_messages (List[ChatMessage]): New chat messages.
+		"""
+		if not chat_messages:
+			return
+		self.start()
+		with self._condition:
+			turns = self._pending.setdefault(memory_id, [])
+			turns.append(list(chat_messages))
+			if len(turns) == 1 and memory_id not in self._active:
+				self._ready.append(memory_id)
+			self._condition.notify_all()
+
+	def flush(self, timeout: float = None) -> bool:
+		r"""
+		Wait until all the queued turns are written.
+
+		Args:
+			timeout (float): The max seconds to wait. Defaults to None, wait forever.
+
+		Returns:
+			bool: Whether all the turns are written.
+		"""
+		with self._condition:
+			if self._pending and not self.is_running:
+				raise RuntimeError("The chat memory writer is not running.")
+			return self._condition.wait_for(lambda: not self._pending and not self._active, timeout=timeout)
+
+	async def aflush(self, timeout: float = None) -> bool:
+		r""" Wait until all the queued turns are written, without blocking the event loop. """
+		return await asyncio.to_thread(self.flush, timeout)
+
+	def stop(self, timeout: float = None):
+		r""" Flush the queued turns and stop the workers. """
+		if self.is_running:
+			self.flush(timeout=timeout)
+		with self._condition:
+			self._stopping = True
+			self._condition.notify_all()
+		for thread in self._threads:
+			thread.join(timeout=timeout)
+
+	def _next_job(self) -> Optional[str]:
+		r""" Wait for a memory with queued turns, None if stopping. """
+		with self._condition:
+			self._condition.wait_for(lambda: self._ready or self._stopping)
+			if not self._ready:
+				return None
+			memory_id = self._ready.popleft()
+			self._active.add(memory_id)
+			return memory_id
+
+	def _run(self):
+		while True:
+			memory_id = self._next_job()
+			if memory_id is None:
+				return
+
+			with self._condition:
+				turns = self._pending.pop(memory_id, [])
+			try:
+				error = self.write_fn(
+					memory_id=memory_id,
+					chat_messages=[msg for turn in turns for msg in turn],
+					embed_model=self.embed_model,
+				)
+				if error is not None:
+					logger.warning("Writing the chat memory of %s failed: %s", memory_id, error)
+			except Exception:
+				logger.exception("Writing the chat memory of %s failed.", memory_id)
+
+			with self._condition:
+				self._active.discard(memory_id)
+				# New turns arrived while writing.
+				if memory_id in self._pending:
+					self._ready.append(memory_id)
+				self._condition.notify_all()
+
+
+CHAT_MEMORY_WRITER = ChatMemoryWriter()
@@ -4,20 +4,22 @@ from llama_index.core.indices.vector_store.retrievers.retriever import VectorInd
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core import Settings
-from llama_index.core.schema import NodeWithScore
-from llama_index.core.vector_stores.types import MetadataFilters
+from llama_index.core.schema import NodeWithScore, MetadataMode
 
-from typing import List, Any
+from typing import List, Any, Optional
 from labridge.models.utils import get_models
 from labridge.func_modules.memory.chat.chat_memory import ChatVectorMemory
+from labridge.func_modules.memory.time_index import LOG_TIME_INDEX_ALL_KEY
 
-from labridge.func_modules.memory.base import LogBaseRetriever
+from labridge.func_modules.memory.base import LogBaseRetriever, LOG_DATE_NAME
 
 
 dispatcher = instrument.get_dispatcher(__name__)
 
 
 CHAT_MEMORY_RELEVANT_TOP_K = 3
+# The number of archived chat records added for a retrieved digest node.
+CHAT_DIGEST_RECORD_TOP_K = 2
 
 
 class ChatMemoryRetriever(LogBaseRetriever):
@@ -25,24 +27,31 @@ class ChatMemoryRetriever(LogBaseRetriever):
 	This is a retriever that retrieve in the permanent chat history of a user or a chat group.
 	You can use this tool when you want to obtain the historical interaction between you and the user.
 
+	The old chat records are compacted into daily digest nodes. If a digest node is retrieved, its most relevant
+	archived chat records are added to the results.
+
 	Args:
 		embed_model (BaseEmbedding): The used embedding model, if not specified, will use the `Settings.embed_model`
 		final_use_context (bool): Whether to add the context nodes of the retrieved log nodes to the final results.
 			Defaults to True.
 		relevant_top_k (int): The top-k relevant nodes in retrieving will be used as the retrieved results.
 			Defaults to `CHAT_MEMORY_RELEVANT_TOP_K`.
+		digest_record_top_k (int): The number of archived chat records added for a retrieved digest node.
+			Defaults to `CHAT_DIGEST_RECORD_TOP_K`.
 	"""
 	def __init__(
 		self,
 		embed_model: BaseEmbedding = None,
 		final_use_context: bool = True,
-		relevant_top_k: int = CHAT_MEMORY_RELEVANT_TOP_K
+		relevant_top_k: int = CHAT_MEMORY_RELEVANT_TOP_K,
+		digest_record_top_k: int = CHAT_DIGEST_RECORD_TOP_K,
 	):
 		super().__init__(
 			embed_model=embed_model,
 			final_use_context=final_use_context,
 			relevant_top_k=relevant_top_k,
 		)
+		self.digest_record_top_k = digest_record_top_k
 
 	def get_memory_vector_retriever(self) -> VectorIndexRetriever:
 		memory_retriever = self.memory.vector_index.as_retriever(
@@ -58,6 +67,60 @@ class ChatMemoryRetriever(LogBaseRetriever):
 	def get_memory_vector_index(self) -> VectorStoreIndex:
 		return self.memory.vector_index
 
+	def _get_candidate_node_ids(self, start_date: Optional[str], end_date: Optional[str]) -> List[str]:
+		r"""
+		Get the chat log node ids in the date range from the time index of the memory.
+		If the start date or the end date is not given, all the chat log node ids are returned.
+		"""
+		if None in [start_date, end_date]:
+			return self.memory.time_index.all(key=LOG_TIME_INDEX_ALL_KEY)
+		start, end = self._parse_time_range(start_date_str=start_date, end_date_str=end_date)
+		return self.memory.time_index.between(key=LOG_TIME_INDEX_ALL_KEY, start=start, end=end)
+
+	def _has_digest(self, chat_nodes: List[NodeWithScore]) -> bool:
+		return any(ChatVectorMemory.is_digest_node(node.node) for node in chat_nodes)
+
+	def _add_archived_records(
+		self,
+		chat_nodes: List[NodeWithScore],
+		query_embedding: Optional[List[float]],
+	) -> List[NodeWithScore]:
+		r"""
+		Add the most relevant archived chat records of each retrieved digest node.
+		The archive of a day is only read when its digest node is retrieved.
+
+		Args:
+			chat_nodes (List[NodeWithScore]): The retrieved nodes.
+			query_embedding (Optional[List[float]]): The embedding of the query, None if no digest node is retrieved.
+
+		Returns:
+			List[NodeWithScore]: The retrieved nodes and the added chat records, sorted by datetime.
+		"""
+		if query_embedding is None:
+			return chat_nodes
+
+		final_nodes = list(chat_nodes)
+		for node in chat_nodes:
+			if not ChatVectorMemory.is_digest_node(node.node):
+				continue
+			records = self.memory.load_archived_nodes(date=node.node.metadata[LOG_DATE_NAME][0])
+			missing = [record_node for record_node, embedding in records if embedding is None]
+			if missing:
+				missing_embeddings = iter(self.embed_model.get_text_embedding_batch(
+					[record_node.get_content(metadata_mode=MetadataMode.EMBED) for record_node in missing]
+				))
+				records = [
+					(record_node, embedding if embedding is not None else next(missing_embeddings))
+					for record_node, embedding in records
+				]
+			scored = [
+				NodeWithScore(node=record_node, score=self.embed_model.similarity(query_embedding, embedding))
+				for record_node, embedding in records
+			]
+			scored.sort(key=lambda x: x.score, reverse=True)
+			final_nodes.extend(scored[:self.digest_record_top_k])
+		return list(self.sort_retrieved_nodes(memory_nodes=final_nodes))
+
 	@dispatcher.span
 	def retrieve(
 		self,
@@ -96,20 +159,19 @@ class ChatMemoryRetriever(LogBaseRetriever):
 				retriever_kwargs={}, )
 			self.memory_vector_retriever = self.get_memory_vector_retriever()
 
-		# get the candidate date list.
-		date_list = self._parse_date(start_date_str=start_date, end_date_str=end_date)
-		metadata_filters =  MetadataFilters(
-			filters=[
-				self.get_date_filter(date_list=date_list),
-			]
-		)
-		self.memory_vector_retriever._filters = metadata_filters
+		candidate_ids = self._get_candidate_node_ids(start_date=start_date, end_date=end_date)
+		if not candidate_ids:
+			return []
+		self.memory_vector_retriever._node_ids = candidate_ids
 		chat_nodes = self.memory_vector_retriever.retrieve(item_to_be_retrieved)
 		self.reset_vector_retriever()
 		# get the results, add prev node and next node to it (if in a same date.).
 		if self.final_use_context:
 			chat_nodes = self._add_context(content_nodes=chat_nodes)
-		return chat_nodes
+		query_embedding = None
+		if self._has_digest(chat_nodes):
+			query_embedding = self.embed_model.get_query_embedding(item_to_be_retrieved)
+		return self._add_archived_records(chat_nodes=chat_nodes, query_embedding=query_embedding)
 
 	@dispatcher.span
 	async def aretrieve(
@@ -151,19 +213,19 @@ class ChatMemoryRetriever(LogBaseRetriever):
 			)
 			self.memory_vector_retriever = self.get_memory_vector_retriever()
 
-		# get the candidate date list.
-		date_list = self._parse_date(start_date_str=start_date, end_date_str=end_date)
-		metadata_filters = MetadataFilters(
-			filters=[
-				self.get_date_filter(date_list=date_list),
-			]
-		)
-		self.memory_vector_retriever._filters = metadata_filters
+		candidate_ids = self._get_candidate_node_ids(start_date=start_date, end_date=end_date)
+		if not candidate_ids:
+			return []
+		self.memory_vector_retriever._node_ids = candidate_ids
 		chat_nodes = await self.memory_vector_retriever.aretrieve(item_to_be_retrieved)
+		self.reset_vector_retriever()
 		# get the results, add prev node and next node to it (if in a same date.).
 		if self.final_use_context:
 			chat_nodes = self._add_context(content_nodes=chat_nodes)
-		return chat_nodes
+		query_embedding = None
+		if self._has_digest(chat_nodes):
+			query_embedding = await self.embed_model.aget_query_embedding(item_to_be_retrieved)
+		return self._add_archived_records(chat_nodes=chat_nodes, query_embedding=query_embedding)
 
 
 if __name__ == "__main__":
@@ -1,33 +1,58 @@
+import time
+import atexit
 import fsspec
 import datetime
+import threading
 
 from llama_index.core.storage.chat_store.simple_chat_store import SimpleChatStore
 from llama_index.core.base.llms.types import ChatMessage
 
-from labridge.common.utils.time import get_time, str_to_date, str_to_time, str_to_datetime
+from labridge.common.utils.time import get_time, str_to_date, str_to_time, str_to_datetime, datetime_to_str
 
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 
 
 SHORT_MEMORY_PERSIST_DIR = "storage/short_memory"
+# Seconds without a new message before a user's short-term memory is written to disk.
+SHORT_MEMORY_FLUSH_DELAY = 5.0
 
 
 class ShortMemoryManager(object):
 	r"""
 	This class manage the short-term chat memories between the agent and users.
 
+	The chat histories are cached in memory, thus a chat turn involves no file access. A cached history expires
+	after `valid_delta_time`, the same as the persisted one. The histories are written to disk by a background
+	thread once the user is idle for `flush_delay` seconds, and all of them are written by `flush`,
+	which is called at interpreter exit.
+
 	Attributes:
 		_root (Optional[str]): The project root.
 		_valid_delta_days (Optional[int]): Only valid chat histories will be loaded.
 		_valid_delta_hours (Optional[int]): Same as above.
 		_valid_delta_minutes (Optional[int]): Same as above.
+
+	Args:
+		flush_delay (float): Seconds without a new message before a user's history is written to disk.
 	"""
 	_root: Optional[str] = None
 	_valid_delta_days: Optional[int] = 0
 	_valid_delta_hours: Optional[int] = 2
 	_valid_delta_minutes: Optional[int] = 30
 
+	def __init__(self, flush_delay: float = SHORT_MEMORY_FLUSH_DELAY):
+		self.flush_delay = flush_delay
+		# {user_id: (saved datetime, chat history)}
+		self._cache: Dict[str, Tuple[datetime.datetime, List[ChatMessage]]] = {}
+		# {user_id: monotonic time of the last unsaved change}
+		self._dirty: Dict[str, float] = {}
+		self._condition = threading.Condition()
+		# Serializes the disk writes, so that a newer history is never overwritten by an older one.
+		self._persist_lock = threading.Lock()
+		self._flusher: Optional[threading.Thread] = None
+		self._atexit_registered = False
+
 	@property
 	def root(self) -> str:
 		r""" Return the project root """
@@ -57,15 +82,81 @@ class ShortMemoryManager(object):
 		last_datetime = str_to_datetime(date_str=date_str, time_str=time_str)
 		return last_datetime
 
+	def _persist_path(self, user_id: str) -> str:
+		return str(Path(self.root) / f"{SHORT_MEMORY_PERSIST_DIR}/{user_id}.json")
+
+	def _is_expired(self, saved_at: datetime.datetime) -> bool:
+		return saved_at + self.valid_delta_time < datetime.datetime.now()
+
+	def _start_flusher(self):
+		if self._flusher is not None and self._flusher.is_alive():
+			return
+		self._flusher = threading.Thread(target=self._run_flusher, name="short-memory-flusher", daemon=True)
+		self._flusher.start()
+		if not self._atexit_registered:
+			atexit.register(self.flush)
+			self._atexit_registered = True
+
+	def _run_flusher(self):
+		r""" Write the histories of the idle users, and evict the expired histories. """
+		while True:
+			with self._condition:
+				if not self._dirty:
+					self._evict_expired()
+					self._condition.wait()
+					continue
+				wait_time = min(self._dirty.values()) + self.flush_delay - time.monotonic()
+				if wait_time > 0:
+					self._condition.wait(timeout=wait_time)
+					continue
+			self._flush_users(idle_only=True)
+
+	def _evict_expired(self):
+		r""" Remove the expired histories from the cache, must be called with `self._condition` held. """
+		expired = [
+			user_id for user_id, (saved_at, _) in self._cache.items()
+			if user_id not in self._dirty and self._is_expired(saved_at)
+		]
+		for user_id in expired:
+			del self._cache[user_id]
+
+	def _flush_users(self, idle_only: bool):
+		r""" Write the changed histories to disk. """
+		with self._persist_lock:
+			with self._condition:
+				now = time.monotonic()
+				user_ids = [
+					user_id for user_id, changed_at in self._dirty.items()
+					if not idle_only or now - changed_at >= self.flush_delay
+				]
+				snapshots = {user_id: self._cache[user_id] for user_id in user_ids}
+				for user_id in user_ids:
+					del self._dirty[user_id]
+
+			for user_id, (saved_at, chat_history) in snapshots.items():
+				date, h_m_s = datetime_to_str(saved_at)
+				time_key = self._pack_time_key(date_str=date, time_str=h_m_s)
+				chat_store = SimpleChatStore(store={time_key: chat_history})
+				chat_store.persist(persist_path=self._persist_path(user_id))
+
+	def flush(self):
+		r""" Write all the changed histories to disk. """
+		self._flush_users(idle_only=False)
+
 	def clear_memory(self, user_id: str):
-		persist_path = Path(self.root) / f"{SHORT_MEMORY_PERSIST_DIR}/{user_id}.json"
-		fs = fsspec.filesystem("file")
-		if fs.exists(persist_path):
-			fs.rm(persist_path)
+		with self._persist_lock:
+			with self._condition:
+				self._cache.pop(user_id, None)
+				self._dirty.pop(user_id, None)
+			persist_path = self._persist_path(user_id)
+			fs = fsspec.filesystem("file")
+			if fs.exists(persist_path):
+				fs.rm(persist_path)
 
 	def load_memory(self, user_id: str) -> Optional[List[ChatMessage]]:
 		r"""
 		Only chat messages within the valid time delta will be loaded.
+		The history is read from disk only if it is not cached.
 
 		Args:
 			user_id (str): The user_id of a lab member.
@@ -74,37 +165,53 @@ class ShortMemoryManager(object):
 			The loaded short memory:
 				If the short memory storage does not exist or the datetime of the short memory is invalid, return None.
 		"""
-		persist_path = Path(self.root) / f"{SHORT_MEMORY_PERSIST_DIR}/{user_id}.json"
+		with self._condition:
+			cached = self._cache.get(user_id, None)
+		if cached is None:
+			cached = self._load_from_disk(user_id)
+			if cached is None:
+				return None
+			with self._condition:
+				# A newer history may be saved in the meantime.
+				cached = self._cache.setdefault(user_id, cached)
+
+		saved_at, chat_history = cached
+		if self._is_expired(saved_at):
+			with self._condition:
+				if user_id not in self._dirty and self._cache.get(user_id) is cached:
+					del self._cache[user_id]
+			return None
+		return list(chat_history)
+
+	def _load_from_disk(self, user_id: str) -> Optional[Tuple[datetime.datetime, List[ChatMessage]]]:
+		r""" Read the persisted history and its saved datetime. """
+		persist_path = self._persist_path(user_id)
 		fs = fsspec.filesystem("file")
 		if not fs.exists(persist_path):
 			return None
 
-		chat_store = SimpleChatStore.from_persist_path(persist_path=str(persist_path))
+		chat_store = SimpleChatStore.from_persist_path(persist_path=persist_path)
 		keys = chat_store.get_keys()
 		if len(keys) < 1:
 			fs.rm(persist_path)
 			return None
-		time_key = chat_store.get_keys()[0]
+		time_key = keys[0]
 		last_datetime = self._unpack_time_key(time_key=time_key)
-		now = datetime.datetime.now()
-		if last_datetime + self.valid_delta_time < now:
-			return None
-		return chat_store.store[time_key]
+		return last_datetime, chat_store.store[time_key]
 
 	def save_memory(self, user_id: str, chat_history: List[ChatMessage]):
 		r"""
-		Persist the short-term memory for the user's next chat request.
+		Keep the short-term memory for the user's next chat request.
+		It is written to disk in the background once the user is idle for `self.flush_delay` seconds.
 
 		Args:
 			user_id (str): The user id of a Lab member.
 			chat_history (List[ChatMessage]): Current chat history between the user and agent.
 		"""
 		date, h_m_s = get_time()
-		time_key = self._pack_time_key(date_str=date, time_str=h_m_s)
-		store_dict = {
-			time_key: chat_history,
-		}
-		chat_store = SimpleChatStore(store=store_dict)
-		persist_path = Path(self.root) / f"{SHORT_MEMORY_PERSIST_DIR}/{user_id}.json"
-		persist_path = str(persist_path)
-		chat_store.persist(persist_path=persist_path)
+		saved_at = str_to_datetime(date_str=date, time_str=h_m_s)
+		with self._condition:
+			self._cache[user_id] = (saved_at, list(chat_history))
+			self._dirty[user_id] = time.monotonic()
+			self._start_flusher()
+			self._condition.notify_all()
@@ -1,10 +1,12 @@
 import fsspec
 import uuid
+import datetime
 
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core import load_index_from_storage
 from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
 from llama_index.core.schema import (
 	TextNode,
 	NodeRelationship,
@@ -12,18 +14,23 @@ from llama_index.core.schema import (
 	BaseNode,
 )
 
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable
 
 from labridge.accounts.users import AccountManager
-from labridge.common.utils.time import get_time, str_to_datetime
+from labridge.common.utils.time import get_time, str_to_datetime, datetime_to_str
+from labridge.common.utils.vacuum import VacuumReport, vacuum_storage, check_storage
 from labridge.func_modules.memory.base import (
 	LOG_DATE_NAME,
 	LOG_TIME_NAME,
+	LOG_TIMESTAMP_NAME,
 	MEMORY_NODE_TYPE_NAME,
 	LOG_NODE_TYPE,
 	NOT_LOG_NODE_TYPE,
+	get_log_timestamp,
 )
+from labridge.func_modules.memory.time_index import LogTimeIndex, LOG_TIME_INDEX_ALL_KEY
 
 
 EXPERIMENT_LOG_ATTACHMENT_DIR = "documents/experiment_files"
@@ -37,9 +44,14 @@ INIT_NODE_NAME = "root_node"
 RECENT_EXPERIMENT_NODE_NAME = "recent_experiment"
 EXPERIMENT_LAST_NODE_ID_PREFIX = "last_log"
 
+# The number of logs embedded together when putting a stream of logs.
+EXPERIMENT_LOG_BATCH_SIZE = 64
+
 RECENT_EXPERIMENT_NAME_KEY = "experiment_name"
 RECENT_EXPERIMENT_START_TIME_KEY = "start_time"
 RECENT_EXPERIMENT_END_TIME_KEY = "end_time"
+RECENT_EXPERIMENT_START_TIMESTAMP_KEY = "start_timestamp"
+RECENT_EXPERIMENT_END_TIMESTAMP_KEY = "end_timestamp"
 EXPERIMENT_LOG_ATTACHMENT_KEY = "attachment"
 
 
@@ -62,6 +74,9 @@ class ExperimentLog(object):
 	Additionally, a recent_experiment node records the most recent experiment of the user, with the start time and the
 	end time of the experiment.
 
+	The log nodes are also indexed by their timestamps in a `LogTimeIndex`, grouped by the experiment names
+	and `LOG_TIME_INDEX_ALL_KEY`, refer to `get_last_logs` and `get_logs_between`.
+
 	Args:
 		vector_index (VectorStoreIndex): The vector database storing the experiment logs.
 		persist_dir (str): The persist directory.
@@ -79,6 +94,7 @@ class ExperimentLog(object):
 		for idx in range(5):
 			root = root.parent
 		self._root = root
+		self._time_index = None
 
 	@classmethod
 	def from_storage(
@@ -190,6 +206,61 @@ class ExperimentLog(object):
 			persist_dir=persist_dir,
 		)
 
+	@property
+	def time_index(self) -> LogTimeIndex:
+		r""" The time index of the log nodes, rebuilt from the docstore if the storage is persisted without it. """
+		if self._time_index is None:
+			self._time_index = LogTimeIndex.from_persist_dir(self.persist_dir) or self._build_time_index()
+		return self._time_index
+
+	def _build_time_index(self) -> LogTimeIndex:
+		r""" Index the log nodes of all experiments, except for the header nodes. """
+		time_index = LogTimeIndex()
+		for experiment_name in self.get_all_experiments() or []:
+			for node_id in self.get_expr_log_node_ids(experiment_name)[1:]:
+				timestamp = get_log_timestamp(self._get_node(node_id))
+				time_index.add(key=experiment_name, node_id=node_id, timestamp=timestamp)
+				time_index.add(key=LOG_TIME_INDEX_ALL_KEY, node_id=node_id, timestamp=timestamp)
+		return time_index
+
+	def get_last_logs(self, experiment_name: str, num: int) -> List[BaseNode]:
+		r"""
+		Get the most recent logs of an experiment.
+
+		Args:
+			experiment_name (str): The experiment name.
+			num (int): The number of logs.
+
+		Returns:
+			List[BaseNode]: At most `num` log nodes, in chronological order.
+		"""
+		node_ids = self.time_index.last(key=experiment_name, num=num)
+		return self.vector_index.docstore.get_nodes(node_ids)
+
+	def get_logs_between(
+		self,
+		start: datetime.datetime,
+		end: datetime.datetime,
+		experiment_name: str = None,
+	) -> List[BaseNode]:
+		r"""
+		Get the logs recorded in the time range [start, end).
+
+		Args:
+			start (datetime.datetime): The start time, included.
+			end (datetime.datetime): The end time, excluded.
+			experiment_name (str): If given, only the logs of this experiment are returned. Defaults to None.
+
+		Returns:
+			List[BaseNode]: The log nodes in chronological order.
+		"""
+		node_ids = self.time_index.between(
+			key=experiment_name or LOG_TIME_INDEX_ALL_KEY,
+			start=start.timestamp(),
+			end=end.timestamp(),
+		)
+		return self.vector_index.docstore.get_nodes(node_ids)
+
 	def get_recent_experiment(self) -> Optional[str]:
 		r""" Get the most recent experiment name. """
 		recent_node = self._get_node(node_id=RECENT_EXPERIMENT_NODE_NAME)
@@ -199,6 +270,13 @@ class ExperimentLog(object):
 		if expr_name is None:
 			return None
 
+		start_timestamp = metadata.get(RECENT_EXPERIMENT_START_TIMESTAMP_KEY, None)
+		end_timestamp = metadata.get(RECENT_EXPERIMENT_END_TIMESTAMP_KEY, None)
+		if None not in [start_timestamp, end_timestamp]:
+			if start_timestamp <= datetime.datetime.now().timestamp() <= end_timestamp:
+				return expr_name
+			return None
+
 		start_date_str, start_time_str = metadata[RECENT_EXPERIMENT_START_TIME_KEY]
 		end_date_str, end_time_str = metadata[RECENT_EXPERIMENT_END_TIME_KEY]
 
@@ -269,6 +347,17 @@ class ExperimentLog(object):
 			end_date, end_time
 		)
 		recent_node.metadata[RECENT_EXPERIMENT_NAME_KEY] = experiment_name
+		try:
+			start_timestamp = str_to_datetime(date_str=start_date, time_str=start_time).timestamp()
+			end_timestamp = str_to_datetime(date_str=end_date, time_str=end_time).timestamp()
+		except ValueError:
+			# Checked again in `get_recent_experiment`.
+			start_timestamp, end_timestamp = None, None
+		recent_node.metadata[RECENT_EXPERIMENT_START_TIMESTAMP_KEY] = start_timestamp
+		recent_node.metadata[RECENT_EXPERIMENT_END_TIMESTAMP_KEY] = end_timestamp
+		timestamp_keys = [RECENT_EXPERIMENT_START_TIMESTAMP_KEY, RECENT_EXPERIMENT_END_TIMESTAMP_KEY]
+		recent_node.excluded_embed_metadata_keys = timestamp_keys
+		recent_node.excluded_llm_metadata_keys = timestamp_keys
 		self._update_node(
 			node_id=RECENT_EXPERIMENT_NODE_NAME,
 			node=recent_node,
@@ -369,12 +458,14 @@ class ExperimentLog(object):
 		extra_metadata: dict = None,
 	) -> TextNode:
 		r""" A new node with `node_type` """
-		date, h_m_s = get_time()
+		now = datetime.datetime.now()
+		date, h_m_s = datetime_to_str(now)
 		metadata = extra_metadata or dict()
 		metadata.update(
 			{
 				LOG_DATE_NAME: [date, ],
 				LOG_TIME_NAME: [h_m_s, ],
+				LOG_TIMESTAMP_NAME: now.timestamp(),
 				MEMORY_NODE_TYPE_NAME: node_type,
 			}
 		)
@@ -384,8 +475,8 @@ class ExperimentLog(object):
 			text=text,
 			metadata=metadata,
 		)
-		node.excluded_embed_metadata_keys = [MEMORY_NODE_TYPE_NAME, ]
-		node.excluded_llm_metadata_keys = [MEMORY_NODE_TYPE_NAME, ]
+		node.excluded_embed_metadata_keys = [MEMORY_NODE_TYPE_NAME, LOG_TIMESTAMP_NAME, ]
+		node.excluded_llm_metadata_keys = [MEMORY_NODE_TYPE_NAME, LOG_TIMESTAMP_NAME, ]
 		return node
 
 	def record_attachment(self, file_path: str) -> str:
@@ -419,55 +510,142 @@ class ExperimentLog(object):
 		- last_store_node -> set_content(new_log_node.node_id)
 		- experiment_node -> add_child(new_log_node)
 
+		To put many logs, use `put_many` or `put_stream` instead.
+
 		Args:
 			experiment_name (str): An existing experiment name.
 			log_str (str): The experiment log string to be put in.
 			attached_file_path (str): The path of the attached file. Defaults to None.
 		"""
-		# TODO: Support files.
+		self.put_many(
+			experiment_name=experiment_name,
+			logs=[log_str],
+			attached_file_paths=[attached_file_path],
+		)
+
+	def put_many(
+		self,
+		experiment_name: str,
+		logs: List[str],
+		attached_file_paths: Optional[List[Optional[str]]] = None,
+		persist: bool = False,
+	) -> int:
+		r"""
+		Put in a batch of experiment logs into a specific experiment store, such as the records of an instrument.
+
+		The new log nodes are linked in order after the last log node, and are embedded in one batched call.
+		The links of the last log node, the last store node and the experiment node are updated in the docstore
+		without re-embedding.
+
+		Args:
+			experiment_name (str): An existing experiment name.
+			logs (List[str]): The experiment log strings in chronological order.
+			attached_file_paths (Optional[List[Optional[str]]]): The paths of the attached files of each log.
+				Defaults to None.
+			persist (bool): Whether to persist the storage after putting. Defaults to False.
+
+		Returns:
+			int: The number of the put logs.
+		"""
+		if attached_file_paths is not None and len(attached_file_paths) != len(logs):
+			raise ValueError("The number of the attached files should be the same as the number of the logs.")
+		if not logs:
+			return 0
+
 		root_node = self._get_node(node_id=INIT_NODE_NAME)
 		experiments = root_node.child_nodes
 		if experiments is None or experiment_name not in [expr.node_id for expr in experiments]:
 			raise ValueError(f"The experiment {experiment_name} of user {self.user_id} does not exist.")
 
-		extra_metadata = None
-		if attached_file_path is not None:
-			record_path = self.record_attachment(file_path=attached_file_path)
-			extra_metadata = {
-				EXPERIMENT_LOG_ATTACHMENT_KEY: record_path,
-			}
-
-		new_log_node = self._new_node(
-			text=log_str,
-			node_type=LOG_NODE_TYPE,
-			extra_metadata=extra_metadata,
-		)
 		expr_node = self._get_node(node_id=experiment_name)
 		last_store_name = f"{experiment_name}_{EXPERIMENT_LAST_NODE_ID_PREFIX}"
 		last_store_node = self._get_node(node_id=last_store_name)
-		last_log_id = last_store_node.text
-		last_log_node = self._get_node(last_log_id)
-		last_log_node.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(
-			node_id=new_log_node.node_id
-		)
-		new_log_node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(
-			node_id=last_log_node.node_id
-		)
-		new_log_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(
-			node_id=expr_node.node_id
-		)
-		last_store_node.set_content(new_log_node.node_id)
-		self._update_node(node_id=last_log_id, node=last_log_node)
-		self._update_node(node_id=last_store_name, node=last_store_node)
+		last_log_node = self._get_node(last_store_node.text)
+
+		new_log_nodes = []
+		prev_node = last_log_node
+		for idx, log_str in enumerate(logs):
+			extra_metadata = None
+			if attached_file_paths is not None and attached_file_paths[idx] is not None:
+				record_path = self.record_attachment(file_path=attached_file_paths[idx])
+				extra_metadata = {
+					EXPERIMENT_LOG_ATTACHMENT_KEY: record_path,
+				}
+
+			new_log_node = self._new_node(
+				text=log_str,
+				node_type=LOG_NODE_TYPE,
+				extra_metadata=extra_metadata,
+			)
+			prev_node.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(
+				node_id=new_log_node.node_id
+			)
+			new_log_node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(
+				node_id=prev_node.node_id
+			)
+			new_log_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(
+				node_id=expr_node.node_id
+			)
+			new_log_nodes.append(new_log_node)
+			prev_node = new_log_node
 
+		last_store_node.set_content(new_log_nodes[-1].node_id)
 		log_node_list = expr_node.child_nodes or []
-		log_node_list.append(
-			RelatedNodeInfo(node_id=new_log_node.node_id)
+		log_node_list.extend(
+			[RelatedNodeInfo(node_id=node.node_id) for node in new_log_nodes]
 		)
 		expr_node.relationships[NodeRelationship.CHILD] = log_node_list
-		self._update_node(node_id=experiment_name, node=expr_node)
-		print("Parent: ", new_log_node.parent_node.node_id)
-		self.vector_index.insert_nodes([new_log_node])
+
+		# One embedding call for the whole batch.
+		self.vector_index.insert_nodes(new_log_nodes)
+		for node in new_log_nodes:
+			timestamp = node.metadata[LOG_TIMESTAMP_NAME]
+			self.time_index.add(key=experiment_name, node_id=node.node_id, timestamp=timestamp)
+			self.time_index.add(key=LOG_TIME_INDEX_ALL_KEY, node_id=node.node_id, timestamp=timestamp)
+		# The links do not change the embedded contents, update them in the docstore only.
+		self.vector_index.docstore.add_documents(
+			[last_log_node, last_store_node, expr_node],
+			allow_update=True,
+		)
+		if persist:
+			self.persist()
+		return len(new_log_nodes)
+
+	def put_stream(
+		self,
+		experiment_name: str,
+		logs: Iterable[str],
+		batch_size: int = EXPERIMENT_LOG_BATCH_SIZE,
+		persist: bool = True,
+	) -> int:
+		r"""
+		Put in a stream of experiment logs, such as the records read from an instrument output.
+
+		The logs are consumed in batches of `batch_size`, each batch is put through `put_many`.
+		The storage is persisted once after the stream is exhausted.
+
+		Args:
+			experiment_name (str): An existing experiment name.
+			logs (Iterable[str]): The experiment log strings in chronological order.
+			batch_size (int): The number of logs embedded together. Defaults to `EXPERIMENT_LOG_BATCH_SIZE`.
+			persist (bool): Whether to persist the storage after putting. Defaults to True.
+
+		Returns:
+			int: The number of the put logs.
+		"""
+		if batch_size < 1:
+			raise ValueError("The batch size should be at least 1.")
+
+		log_iter = iter(logs)
+		put_num = 0
+		while True:
+			batch = list(islice(log_iter, batch_size))
+			if not batch:
+				break
+			put_num += self.put_many(experiment_name=experiment_name, logs=batch)
+		if persist and put_num > 0:
+			self.persist()
+		return put_num
 
 	def persist(self, persist_dir: str = None):
 		r"""
@@ -481,7 +659,48 @@ class ExperimentLog(object):
 		if not fs.exists(persist_dir):
 			fs.makedirs(persist_dir)
 		self.vector_index.storage_context.persist(persist_dir=persist_dir)
+		self.time_index.persist(persist_dir=persist_dir)
+
+
+	@staticmethod
+	def vacuum_root_ids(docstore: BaseDocumentStore) -> List[str]:
+		r""" The root nodes of the storage: the root node, the recent experiment node and the last-log info nodes. """
+		root_ids = [INIT_NODE_NAME, RECENT_EXPERIMENT_NODE_NAME]
+		if docstore.document_exists(INIT_NODE_NAME):
+			experiments = docstore.get_node(INIT_NODE_NAME).child_nodes or []
+			root_ids.extend([f"{expr.node_id}_{EXPERIMENT_LAST_NODE_ID_PREFIX}" for expr in experiments])
+		return root_ids
+
+	def check_consistency(self) -> List[str]:
+		r""" Check the consistency of the storage, refer to `check_storage`. """
+		return check_storage(
+			storage_context=self.vector_index.storage_context,
+			index_id=EXPERIMENT_LOG_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
 
+	def vacuum(self) -> VacuumReport:
+		r"""
+		Persist the storage, rewrite it with only the nodes reachable from the root nodes and reload it.
+		Refer to `vacuum_storage`.
+
+		Returns:
+			VacuumReport: The removed contents and the reclaimed bytes.
+		"""
+		self.persist()
+		report = vacuum_storage(
+			persist_dir=self.persist_dir,
+			index_id=EXPERIMENT_LOG_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+		self.vector_index = load_index_from_storage(
+			storage_context=StorageContext.from_defaults(persist_dir=self.persist_dir),
+			index_id=EXPERIMENT_LOG_VECTOR_INDEX_ID,
+			embed_model=self.vector_index._embed_model,
+		)
+		self.time_index.delete(report.removed_node_ids)
+		self.time_index.persist(persist_dir=self.persist_dir)
+		return report
 
 if __name__ == "__main__":
 	from labridge.models.utils import get_models
@@ -7,9 +7,10 @@ from llama_index.core.schema import NodeWithScore
 from llama_index.core.vector_stores.types import MetadataFilters
 from llama_index.core.schema import MetadataMode
 
-from typing import List, Any
+from typing import List, Any, Optional
 
 from labridge.func_modules.memory.experiment.experiment_log import ExperimentLog
+from labridge.func_modules.memory.time_index import LOG_TIME_INDEX_ALL_KEY
 from labridge.func_modules.memory.base import LogBaseRetriever
 
 
@@ -67,6 +68,38 @@ class ExperimentLogRetriever(LogBaseRetriever):
 		self.memory_vector_retriever._filters = [self._log_node_filter(),]
 		self.memory_vector_retriever._node_ids = None
 
+	def _get_candidate_node_ids(
+		self,
+		start_date: Optional[str],
+		end_date: Optional[str],
+		experiment_name: Optional[str],
+	) -> Optional[List[str]]:
+		r"""
+		Get the candidate log node ids of the experiment and the date range from the time index of the memory.
+
+		Args:
+			start_date (Optional[str]): The start date.
+			end_date (Optional[str]): The end date.
+			experiment_name (Optional[str]): The experiment name, ignored if it does not exist.
+
+		Returns:
+			Optional[List[str]]: The candidate node ids, None if neither the experiment nor the date range is given.
+		"""
+		if experiment_name is None or not self.memory.is_expr_exist(experiment_name):
+			experiment_name = None
+
+		if None in [start_date, end_date]:
+			if experiment_name is None:
+				return None
+			return self.memory.get_expr_log_node_ids(experiment_name)
+
+		start, end = self._parse_time_range(start_date_str=start_date, end_date_str=end_date)
+		return self.memory.time_index.between(
+			key=experiment_name or LOG_TIME_INDEX_ALL_KEY,
+			start=start,
+			end=end,
+		)
+
 	@dispatcher.span
 	def retrieve(
 		self,
@@ -109,20 +142,15 @@ class ExperimentLogRetriever(LogBaseRetriever):
 
 		self.reset_vector_retriever()
 
-		if experiment_name is None or not self.memory.is_expr_exist(experiment_name):
-			retrieve_node_ids = None
-		else:
-			retrieve_node_ids = self.memory.get_expr_log_node_ids(experiment_name)
-
-		filters = [self._log_node_filter(), ]
-		if None not in [start_date, end_date]:
-			# get the candidate date list.
-			date_list = self._parse_date(start_date_str=start_date, end_date_str=end_date)
-			filters.append(
-				self.get_date_filter(date_list=date_list),
-			)
+		retrieve_node_ids = self._get_candidate_node_ids(
+			start_date=start_date,
+			end_date=end_date,
+			experiment_name=experiment_name,
+		)
+		if retrieve_node_ids is not None and not retrieve_node_ids:
+			return []
 
-		metadata_filters = MetadataFilters(filters=filters)
+		metadata_filters = MetadataFilters(filters=[self._log_node_filter(), ])
 
 		self.memory_vector_retriever._filters = metadata_filters
 		self.memory_vector_retriever._node_ids = retrieve_node_ids
@@ -174,20 +202,15 @@ class ExperimentLogRetriever(LogBaseRetriever):
 			self.memory_vector_retriever = self.get_memory_vector_retriever()
 		self.reset_vector_retriever()
 
-		if experiment_name is None or not self.memory.is_expr_exist(experiment_name):
-			retrieve_node_ids = None
-		else:
-			retrieve_node_ids = self.memory.get_expr_log_node_ids(experiment_name)
-
-		filters = [self._log_node_filter(), ]
-		if None not in [start_date, end_date]:
-			# get the candidate date list.
-			date_list = self._parse_date(start_date_str=start_date, end_date_str=end_date)
-			filters.append(
-				self.get_date_filter(date_list=date_list)
-			)
+		retrieve_node_ids = self._get_candidate_node_ids(
+			start_date=start_date,
+			end_date=end_date,
+			experiment_name=experiment_name,
+		)
+		if retrieve_node_ids is not None and not retrieve_node_ids:
+			return []
 
-		metadata_filters = MetadataFilters(filters=filters)
+		metadata_filters = MetadataFilters(filters=[self._log_node_filter(), ])
 
 		self.memory_vector_retriever._filters = metadata_filters
 		self.memory_vector_retriever._node_ids = retrieve_node_ids
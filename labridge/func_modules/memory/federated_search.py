@@ -0,0 +1,462 @@
+import asyncio
+import fsspec
+import hashlib
+import logging
+import threading
+import llama_index.core.instrumentation as instrument
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_index.core import Settings, load_index_from_storage
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.indices.vector_store.retrievers.retriever import VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage import StorageContext
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+from labridge.accounts.users import AccountManager
+from labridge.common.utils.time import parse_date_list, str_to_datetime
+from labridge.func_modules.memory.base import (
+	LOG_DATE_NAME,
+	MEMORY_NODE_TYPE_NAME,
+	LOG_NODE_TYPE,
+	get_log_timestamp,
+)
+from labridge.func_modules.memory.time_index import LogTimeIndex, LOG_TIME_INDEX_ALL_KEY
+from labridge.func_modules.memory.chat.chat_memory import (
+	CHAT_MEMORY_PERSIST_DIR,
+	CHAT_MEMORY_VECTOR_INDEX_ID,
+	MEMORY_FIRST_NODE_NAME,
+)
+from labridge.func_modules.memory.experiment.experiment_log import (
+	EXPERIMENT_LOG_PERSIST_DIR,
+	EXPERIMENT_LOG_VECTOR_INDEX_ID,
+)
+from labridge.func_modules.paper.store.temporary_store import (
+	TMP_PAPER_VECTOR_INDEX_PERSIST_DIR,
+	TMP_PAPER_VECTOR_INDEX_ID,
+	TMP_PAPER_DATE,
+	TMP_PAPER_NODE_TYPE_KEY,
+	TMP_PAPER_DOC_NODE_TYPE,
+)
+
+
+dispatcher = instrument.get_dispatcher(__name__)
+logger = logging.getLogger(__name__)
+
+
+EXPERIMENT_LOG_SOURCE = "experiment_log"
+CHAT_MEMORY_SOURCE = "chat_memory"
+RECENT_PAPER_SOURCE = "recent_papers"
+
+# {source: (persist directory relative to the root, vector index id)}
+FEDERATED_SEARCH_SOURCES = {
+	EXPERIMENT_LOG_SOURCE: (EXPERIMENT_LOG_PERSIST_DIR, EXPERIMENT_LOG_VECTOR_INDEX_ID),
+	CHAT_MEMORY_SOURCE: (CHAT_MEMORY_PERSIST_DIR, CHAT_MEMORY_VECTOR_INDEX_ID),
+	RECENT_PAPER_SOURCE: (TMP_PAPER_VECTOR_INDEX_PERSIST_DIR, TMP_PAPER_VECTOR_INDEX_ID),
+}
+
+# Recorded in the metadata of the searched nodes.
+FEDERATED_SOURCE_KEY = "source"
+FEDERATED_MEMORY_ID_KEY = "memory_id"
+
+FEDERATED_SEARCH_WORKERS = 8
+FEDERATED_SEARCH_MAX_SHARDS = 64
+FEDERATED_SEARCH_SHARD_TOP_K = 3
+FEDERATED_SEARCH_TOP_K = 8
+# The constant k of the reciprocal-rank fusion.
+RRF_K = 60
+
+# The docstore file of a persisted storage, its modification time tells whether a cached shard is stale.
+_DOCSTORE_FILE_NAME = "docstore.json"
+
+
+def reciprocal_rank_fusion(
+	result_lists: List[List[NodeWithScore]],
+	top_k: int,
+	rrf_k: int = RRF_K,
+	key_fn: Callable[[NodeWithScore], str] = None,
+) -> List[NodeWithScore]:
+	r"""
+	Merge the ranked results of several searches with reciprocal-rank fusion.
+
+	A result scores `1 / (rrf_k + rank)` in each list it appears in, with the rank starting from 1.
+	The results with the same key are merged, and the first one is kept.
+	The results with equal fused scores, such as the first results of different searches, are ordered by their
+	best original scores.
+
+	Args:
+		result_lists (List[List[NodeWithScore]]): The ranked results of each search.
+		top_k (int): The number of the merged results.
+		rrf_k (int): The constant k of the fusion. Defaults to `RRF_K`.
+		key_fn (Callable[[NodeWithScore], str]): The identity of a result. Defaults to the node id.
+
+	Returns:
+		List[NodeWithScore]: The merged results with the fused scores, in descending order.
+	"""
+	key_fn = key_fn or (lambda node: node.node.node_id)
+	fused_scores: Dict[str, float] = {}
+	best_scores: Dict[str, float] = {}
+	fused_nodes: Dict[str, NodeWithScore] = {}
+	for results in result_lists:
+		for rank, node in enumerate(results, start=1):
+			key = key_fn(node)
+			fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+			best_scores[key] = max(best_scores.get(key, float("-inf")), node.score or 0.0)
+			fused_nodes.setdefault(key, node)
+
+	ranked_keys = sorted(
+		fused_scores.keys(),
+		key=lambda key: (round(fused_scores[key], 12), best_scores[key]),
+		reverse=True,
+	)
+	return [NodeWithScore(node=fused_nodes[key].node, score=fused_scores[key]) for key in ranked_keys[:top_k]]
+
+
+def _result_key(node: NodeWithScore) -> str:
+	r"""
+	The identity of a result in the fusion.
+	The same paper content read by several users is one result, while the same log or chat text of different
+	members are different results, so that each member is named.
+	"""
+	content_hash = hashlib.sha256(node.node.get_content().encode("utf-8")).hexdigest()
+	source = node.node.metadata[FEDERATED_SOURCE_KEY]
+	if source == RECENT_PAPER_SOURCE:
+		return f"{source}:{content_hash}"
+	return f"{source}:{node.node.metadata[FEDERATED_MEMORY_ID_KEY]}:{content_hash}"
+
+
+class SearchShard(object):
+	r"""
+	The loaded vector index of a store of a user, with the ordered ids of its log nodes.
+
+	Args:
+		source (str): One of `FEDERATED_SEARCH_SOURCES`.
+		memory_id (str): The user_id or chat_group_id.
+		persist_dir (str): The persist directory of the store.
+		vector_index (VectorStoreIndex): The vector index.
+		time_index (Optional[LogTimeIndex]): The time index of the log nodes, None for the paper stores.
+		version (float): The modification time of the persisted docstore.
+	"""
+	def __init__(
+		self,
+		source: str,
+		memory_id: str,
+		persist_dir: str,
+		vector_index: VectorStoreIndex,
+		time_index: Optional[LogTimeIndex],
+		version: float,
+	):
+		self.source = source
+		self.memory_id = memory_id
+		self.persist_dir = persist_dir
+		self.vector_index = vector_index
+		self.time_index = time_index
+		self.version = version
+
+
+class SearchShardCache(object):
+	r"""
+	A LRU cache of the loaded shards, shared by the search threads.
+	A shard is reloaded once its persisted docstore is modified.
+
+	Args:
+		embed_model (BaseEmbedding): The used embedding model.
+		max_shards (int): The maximum number of cached shards.
+	"""
+	def __init__(self, embed_model: BaseEmbedding, max_shards: int = FEDERATED_SEARCH_MAX_SHARDS):
+		self.embed_model = embed_model
+		self.max_shards = max_shards
+		self._shards: OrderedDict[str, SearchShard] = OrderedDict()
+		self._lock = threading.Lock()
+		self._load_locks: Dict[str, threading.Lock] = {}
+		self._fs = fsspec.filesystem("file")
+
+	def __len__(self) -> int:
+		return len(self._shards)
+
+	def _version(self, persist_dir: str) -> Optional[float]:
+		docstore_path = str(Path(persist_dir) / _DOCSTORE_FILE_NAME)
+		if not self._fs.exists(docstore_path):
+			return None
+		return Path(docstore_path).stat().st_mtime
+
+	def get(self, source: str, memory_id: str, persist_dir: str) -> Optional[SearchShard]:
+		r"""
+		Get the shard of a store, load it if not cached or stale.
+
+		Returns:
+			Optional[SearchShard]: None if the store is not persisted.
+		"""
+		version = self._version(persist_dir)
+		if version is None:
+			return None
+
+		with self._lock:
+			shard = self._shards.get(persist_dir, None)
+			if shard is not None and shard.version == version:
+				self._shards.move_to_end(persist_dir)
+				return shard
+			load_lock = self._load_locks.setdefault(persist_dir, threading.Lock())
+
+		with load_lock:
+			with self._lock:
+				shard = self._shards.get(persist_dir, None)
+			if shard is None or shard.version != version:
+				shard = self._load(source=source, memory_id=memory_id, persist_dir=persist_dir, version=version)
+
+		with self._lock:
+			self._shards[persist_dir] = shard
+			self._shards.move_to_end(persist_dir)
+			while len(self._shards) > self.max_shards:
+				self._shards.popitem(last=False)
+		return shard
+
+	def _load(self, source: str, memory_id: str, persist_dir: str, version: float) -> SearchShard:
+		_, index_id = FEDERATED_SEARCH_SOURCES[source]
+		storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+		vector_index = load_index_from_storage(
+			storage_context=storage_context,
+			index_id=index_id,
+			embed_model=self.embed_model,
+		)
+		time_index = None
+		if source != RECENT_PAPER_SOURCE:
+			time_index = LogTimeIndex.from_persist_dir(persist_dir) or self._build_time_index(source, vector_index)
+		return SearchShard(
+			source=source,
+			memory_id=memory_id,
+			persist_dir=persist_dir,
+			vector_index=vector_index,
+			time_index=time_index,
+			version=version,
+		)
+
+	@staticmethod
+	def _build_time_index(source: str, vector_index: VectorStoreIndex) -> LogTimeIndex:
+		r""" Index the log nodes of the stores persisted without a time index. """
+		time_index = LogTimeIndex()
+		for node in vector_index.docstore.docs.values():
+			if source == CHAT_MEMORY_SOURCE:
+				is_log = LOG_DATE_NAME in node.metadata and node.node_id != MEMORY_FIRST_NODE_NAME
+			else:
+				is_log = node.metadata.get(MEMORY_NODE_TYPE_NAME, None) == LOG_NODE_TYPE and node.parent_node is not None
+			if is_log:
+				time_index.add(key=LOG_TIME_INDEX_ALL_KEY, node_id=node.node_id, timestamp=get_log_timestamp(node))
+		return time_index
+
+
+class FederatedSearchRetriever(object):
+	r"""
+	This retriever searches the experiment logs, the chat memories and the recent papers of all the lab members at once.
+
+	- The query is embedded once, and each store of each user (a shard) is searched in a thread pool,
+	  so that the latency depends on the slowest shard instead of the sum of all shards.
+	- The loaded shards are cached and reloaded only when they are persisted again.
+	- The ranked results of the shards are merged with reciprocal-rank fusion.
+
+	Args:
+		embed_model (BaseEmbedding): The used embedding model. Defaults to `Settings.embed_model`.
+		max_workers (int): The number of the search threads. Defaults to `FEDERATED_SEARCH_WORKERS`.
+		shard_top_k (int): The number of results of each shard. Defaults to `FEDERATED_SEARCH_SHARD_TOP_K`.
+		top_k (int): The number of the merged results. Defaults to `FEDERATED_SEARCH_TOP_K`.
+		max_shards (int): The maximum number of cached shards. Defaults to `FEDERATED_SEARCH_MAX_SHARDS`.
+		root (str): The project root. Defaults to the root of this package.
+		memory_ids (Dict[str, List[str]]): The searched memory ids of each source.
+			Defaults to the registered users, and additionally the chat groups for the chat memories.
+	"""
+	def __init__(
+		self,
+		embed_model: BaseEmbedding = None,
+		max_workers: int = FEDERATED_SEARCH_WORKERS,
+		shard_top_k: int = FEDERATED_SEARCH_SHARD_TOP_K,
+		top_k: int = FEDERATED_SEARCH_TOP_K,
+		max_shards: int = FEDERATED_SEARCH_MAX_SHARDS,
+		root: str = None,
+		memory_ids: Dict[str, List[str]] = None,
+	):
+		self.embed_model = embed_model or Settings.embed_model
+		self.shard_top_k = shard_top_k
+		self.top_k = top_k
+		self.cache = SearchShardCache(embed_model=self.embed_model, max_shards=max_shards)
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="federated-search")
+		self._memory_ids = memory_ids
+		if root is None:
+			root = Path(__file__)
+			for idx in range(4):
+				root = root.parent
+		self._root = Path(root)
+
+	def get_memory_ids(self, source: str) -> List[str]:
+		r""" The searched memory ids of a source. """
+		if self._memory_ids is not None:
+			return self._memory_ids.get(source, [])
+		account_manager = AccountManager()
+		memory_ids = account_manager.get_users()
+		if source == CHAT_MEMORY_SOURCE:
+			memory_ids = memory_ids + account_manager.get_chat_groups()
+		return memory_ids
+
+	def _shard_jobs(self, sources: List[str]) -> List[Tuple[str, str, str]]:
+		r""" The (source, memory_id, persist_dir) of each shard. """
+		jobs = []
+		for source in sources:
+			persist_base, _ = FEDERATED_SEARCH_SOURCES[source]
+			for memory_id in self.get_memory_ids(source):
+				jobs.append((source, memory_id, str(self._root / persist_base / memory_id)))
+		return jobs
+
+	@staticmethod
+	def _parse_dates(start_date: Optional[str], end_date: Optional[str]) -> Optional[List[str]]:
+		if None in [start_date, end_date]:
+			return None
+		return parse_date_list(start_date_str=start_date, end_date_str=end_date)
+
+	def _search_shard(
+		self,
+		source: str,
+		memory_id: str,
+		persist_dir: str,
+		query_bundle: QueryBundle,
+		date_list: Optional[List[str]],
+	) -> List[NodeWithScore]:
+		r""" Search in a shard, run in the search threads. """
+		shard = self.cache.get(source=source, memory_id=memory_id, persist_dir=persist_dir)
+		if shard is None:
+			return []
+
+		filters = None
+		node_ids = None
+		if source == RECENT_PAPER_SOURCE:
+			paper_filters = [
+				MetadataFilter(key=TMP_PAPER_NODE_TYPE_KEY, value=TMP_PAPER_DOC_NODE_TYPE, operator=FilterOperator.EQ),
+			]
+			if date_list is not None:
+				paper_filters.append(MetadataFilter(key=TMP_PAPER_DATE, value=date_list, operator=FilterOperator.ANY))
+			filters = MetadataFilters(filters=paper_filters)
+		else:
+			if date_list is None:
+				node_ids = shard.time_index.all(key=LOG_TIME_INDEX_ALL_KEY)
+			else:
+				start = str_to_datetime(date_str=date_list[0], time_str="00:00:00").timestamp()
+				end = str_to_datetime(date_str=date_list[-1], time_str="23:59:59").timestamp() + 1
+				node_ids = shard.time_index.between(key=LOG_TIME_INDEX_ALL_KEY, start=start, end=end)
+			if not node_ids:
+				return []
+
+		retriever = VectorIndexRetriever(
+			index=shard.vector_index,
+			similarity_top_k=self.shard_top_k,
+			filters=filters,
+			node_ids=node_ids,
+		)
+		nodes = retriever.retrieve(query_bundle)
+		for node in nodes:
+			node.node.metadata[FEDERATED_SOURCE_KEY] = source
+			node.node.metadata[FEDERATED_MEMORY_ID_KEY] = memory_id
+		return nodes
+
+	def _try_search_shard(
+		self,
+		source: str,
+		memory_id: str,
+		persist_dir: str,
+		query_bundle: QueryBundle,
+		date_list: Optional[List[str]],
+	) -> List[NodeWithScore]:
+		r"""
+		Search in a shard, a shard failing to load or search, e.g. being persisted at the same time, is skipped
+		so that the other shards still answer.
+		"""
+		try:
+			return self._search_shard(source, memory_id, persist_dir, query_bundle, date_list)
+		except Exception as e:
+			logger.warning("Searching the %s of %s failed: %s", source, memory_id, e)
+			return []
+
+	def _fuse(self, result_lists: List[List[NodeWithScore]]) -> List[NodeWithScore]:
+		return reciprocal_rank_fusion(result_lists=result_lists, top_k=self.top_k, key_fn=_result_key)
+
+	@dispatcher.span
+	def retrieve(
+		self,
+		item_to_be_retrieved: str,
+		start_date: str = None,
+		end_date: str = None,
+		sources: List[str] = None,
+		**kwargs: Any,
+	) -> List[NodeWithScore]:
+		r"""
+		This tool is used to search the experiment logs, the chat histories and the recent papers of ALL lab members.
+		Use this tool for lab-wide questions, such as who did a specific experiment or who discussed a specific topic.
+
+		Args:
+			item_to_be_retrieved (str): This argument is necessary.
+				It denotes things that you want to search across the lab members.
+			start_date (str): This argument is optional. It denotes the start date in the format 'Year-Month-Day'.
+				If both start_date and end_date are specified, only records between the start_date and end_date
+				will be searched.
+			end_date (str): This argument is optional. It denotes the end date in the format 'Year-Month-Day'.
+			sources (List[str]): This argument is optional. The searched sources, a subset of
+				['experiment_log', 'chat_memory', 'recent_papers']. Defaults to all of them.
+			kwargs: Other arguments will be ignored.
+
+		Returns:
+			The search results, with the source and the memory_id (user_id or chat_group_id) of each result.
+		"""
+		# This docstring is used as the tool description.
+		date_list = self._parse_dates(start_date=start_date, end_date=end_date)
+		query_bundle = QueryBundle(
+			query_str=item_to_be_retrieved,
+			embedding=self.embed_model.get_query_embedding(item_to_be_retrieved),
+		)
+		futures = [
+			self._executor.submit(self._try_search_shard, source, memory_id, persist_dir, query_bundle, date_list)
+			for source, memory_id, persist_dir in self._shard_jobs(sources or list(FEDERATED_SEARCH_SOURCES.keys()))
+		]
+		return self._fuse([future.result() for future in futures])
+
+	@dispatcher.span
+	async def aretrieve(
+		self,
+		item_to_be_retrieved: str,
+		start_date: str = None,
+		end_date: str = None,
+		sources: List[str] = None,
+		**kwargs: Any,
+	) -> List[NodeWithScore]:
+		r"""
+		This tool is used to search the experiment logs, the chat histories and the recent papers of ALL lab members.
+		Use this tool for lab-wide questions, such as who did a specific experiment or who discussed a specific topic.
+
+		Args:
+			item_to_be_retrieved (str): This argument is necessary.
+				It denotes things that you want to search across the lab members.
+			start_date (str): This argument is optional. It denotes the start date in the format 'Year-Month-Day'.
+				If both start_date and end_date are specified, only records between the start_date and end_date
+				will be searched.
+			end_date (str): This argument is optional. It denotes the end date in the format 'Year-Month-Day'.
+			sources (List[str]): This argument is optional. The searched sources, a subset of
+				['experiment_log', 'chat_memory', 'recent_papers']. Defaults to all of them.
+			kwargs: Other arguments will be ignored.
+
+		Returns:
+			The search results, with the source and the memory_id (user_id or chat_group_id) of each result.
+		"""
+		date_list = self._parse_dates(start_date=start_date, end_date=end_date)
+		query_bundle = QueryBundle(
+			query_str=item_to_be_retrieved,
+			embedding=await self.embed_model.aget_query_embedding(item_to_be_retrieved),
+		)
+		loop = asyncio.get_running_loop()
+		futures = [
+			loop.run_in_executor(
+				self._executor, self._try_search_shard, source, memory_id, persist_dir, query_bundle, date_list,
+			)
+			for source, memory_id, persist_dir in self._shard_jobs(sources or list(FEDERATED_SEARCH_SOURCES.keys()))
+		]
+		return self._fuse(list(await asyncio.gather(*futures)))
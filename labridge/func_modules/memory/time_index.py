@@ -0,0 +1,129 @@
+import json
+import fsspec
+
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+LOG_TIME_INDEX_PERSIST_NAME = "log_time_index.json"
+# The key of all the indexed log nodes of a memory.
+LOG_TIME_INDEX_ALL_KEY = "__all__"
+
+
+class LogTimeIndex(object):
+	r"""
+	A time-ordered index of the log nodes in a memory, answering the recent logs and the logs in a time range
+	without scanning the docstore or parsing the date strings.
+
+	The node ids are grouped by keys, such as the experiment names, and are ordered by their timestamps in each group.
+	Nodes with the same timestamp keep their insertion order.
+
+	Args:
+		timestamps (Dict[str, List[float]]): The ordered timestamps of each key.
+		node_ids (Dict[str, List[str]]): The node ids corresponding to the timestamps.
+	"""
+	def __init__(
+		self,
+		timestamps: Dict[str, List[float]] = None,
+		node_ids: Dict[str, List[str]] = None,
+	):
+		self._timestamps = timestamps or {}
+		self._node_ids = node_ids or {}
+
+	def keys(self) -> List[str]:
+		return list(self._node_ids.keys())
+
+	def add(self, key: str, node_id: str, timestamp: float):
+		r"""
+		Add a log node.
+
+		Args:
+			key (str): The group of the node.
+			node_id (str): The node id.
+			timestamp (float): The timestamp of the node.
+		"""
+		timestamps = self._timestamps.setdefault(key, [])
+		node_ids = self._node_ids.setdefault(key, [])
+		idx = bisect_right(timestamps, timestamp)
+		timestamps.insert(idx, timestamp)
+		node_ids.insert(idx, node_id)
+
+	def delete(self, node_ids: Iterable[str]):
+		r"""
+		Remove the log nodes from all the groups.
+
+		Args:
+			node_ids (Iterable[str]): The removed node ids.
+		"""
+		removed = set(node_ids)
+		for key in self.keys():
+			kept = [
+				(timestamp, node_id) for timestamp, node_id in zip(self._timestamps[key], self._node_ids[key])
+				if node_id not in removed
+			]
+			self._timestamps[key] = [timestamp for timestamp, _ in kept]
+			self._node_ids[key] = [node_id for _, node_id in kept]
+
+	def all(self, key: str) -> List[str]:
+		r""" All node ids of a group in time order. """
+		return list(self._node_ids.get(key, []))
+
+	def last(self, key: str, num: int) -> List[str]:
+		r"""
+		The most recent node ids of a group.
+
+		Args:
+			key (str): The group.
+			num (int): The number of nodes.
+
+		Returns:
+			List[str]: At most `num` node ids, in time order.
+		"""
+		if num < 1:
+			return []
+		return self._node_ids.get(key, [])[-num:]
+
+	def between(self, key: str, start: float, end: float) -> List[str]:
+		r"""
+		The node ids of a group recorded in the time range [start, end).
+
+		Args:
+			key (str): The group.
+			start (float): The start timestamp, included.
+			end (float): The end timestamp, excluded.
+
+		Returns:
+			List[str]: The node ids in time order.
+		"""
+		timestamps = self._timestamps.get(key, [])
+		start_idx = bisect_left(timestamps, start)
+		end_idx = bisect_left(timestamps, end)
+		return self._node_ids[key][start_idx:end_idx] if timestamps else []
+
+	def to_dict(self) -> dict:
+		return {"timestamps": self._timestamps, "node_ids": self._node_ids}
+
+	def persist(self, persist_dir: str):
+		r""" Save to `LOG_TIME_INDEX_PERSIST_NAME` in the persist directory of the memory. """
+		fs = fsspec.filesystem("file")
+		if not fs.exists(persist_dir):
+			fs.makedirs(persist_dir)
+		with fs.open(str(Path(persist_dir) / LOG_TIME_INDEX_PERSIST_NAME), "w") as f:
+			json.dump(self.to_dict(), f)
+
+	@classmethod
+	def from_persist_dir(cls, persist_dir: str) -> Optional["LogTimeIndex"]:
+		r"""
+		Load from the persist directory of a memory.
+
+		Returns:
+			Optional[LogTimeIndex]: None if the memory is persisted without a time index.
+		"""
+		persist_path = str(Path(persist_dir) / LOG_TIME_INDEX_PERSIST_NAME)
+		fs = fsspec.filesystem("file")
+		if not fs.exists(persist_path):
+			return None
+		with fs.open(persist_path, "r") as f:
+			index_dict = json.load(f)
+		return cls(timestamps=index_dict["timestamps"], node_ids=index_dict["node_ids"])
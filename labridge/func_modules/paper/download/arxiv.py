@@ -8,6 +8,8 @@ from enum import Enum
 from arxiv import Search, Client, SortCriterion, SortOrder, Result
 from typing import Optional, List, Dict
 
+from .async_arxiv import AsyncArxivClient, ARXIV_CLIENT, format_query_url
+
 
 ARXIV_CATEGORY_PATH = "documents/cfgs/research_category.json"
 
@@ -74,12 +76,7 @@ class ArxivClient(Client):
 
 	def query_format(self, url_args: dict) -> str:
 		r""" Formatted url for searching in arXiv. """
-		query = url_args["search_query"]
-		suffix = f"search_query={query}"
-		for key in url_args.keys():
-			if key != "search_query":
-				suffix += f"&{key}={url_args[key]}"
-		return self.query_url_format.format(suffix)
+		return format_query_url(url_args, self.query_url_format)
 
 	def _format_url(self, search: Search, start: int, page_size: int) -> str:
 		r""" Formatted url for searching in arXiv. """
@@ -201,18 +198,18 @@ class ArxivDailyDownloader(object):
 
 	Attributes:
 		category (ArxivCategory): Storing the research fields categories.
-		client (ArxivClient): For Fetching papers.
+		client (AsyncArxivClient): For Fetching and downloading papers.
 		recent_days (int): papers dating back to `recent_days` ago from today will be obtained.
 	"""
 
 	category: ArxivCategory
-	client: ArxivClient
+	client: AsyncArxivClient
 	recent_days: int
 
-	def __init__(self, recent_days: int = 1):
+	def __init__(self, recent_days: int = 1, client: Optional[AsyncArxivClient] = None):
 		self.today = datetime.date.today()
 		self.category = ArxivCategory()
-		self.client = ArxivClient()
+		self.client = client or ARXIV_CLIENT
 		self.recent_days = recent_days
 		self.search = Search(
 			query="cat:cs.AI",
@@ -240,7 +237,17 @@ class ArxivDailyDownloader(object):
 		r""" Check if the date is 'recent' """
 		return start_date <= date <= end_date
 
-	def get_daily_papers_info(self, relevant_categories: List[str]) -> List[Result]:
+	def _daily_query(self, relevant_categories: List[str]) -> str:
+		r""" The query of the valid categories. """
+		query = ""
+		for cat in relevant_categories:
+			if self._is_valid_category(cat):
+				if len(query) > 0:
+					query += "+OR+"
+				query += f"cat:{cat}"
+		return query
+
+	async def aget_daily_papers_info(self, relevant_categories: List[str]) -> List[Result]:
 		r"""
 		Get the recent papers relevant to the input categories.
 
@@ -254,27 +261,53 @@ class ArxivDailyDownloader(object):
 		Return:
 			List[Result]: Recent papers information.
 		"""
-		query = ""
-		for cat in relevant_categories:
-			if self._is_valid_category(cat):
-				if len(query) > 0:
-					query += "+OR+"
-				query += f"cat:{cat}"
-
+		query = self._daily_query(relevant_categories)
 		daily_papers = []
 		if len(query) == 0:
 			return daily_papers
 
 		self.search.query = query
 		start_date = self.today - datetime.timedelta(days=self.recent_days)
-		for result in self.client.results(search=self.search):
-			submit_date = result.published
+		async for result in self.client.aresults(
+			query=query,
+			sort_by=self.search.sort_by,
+			sort_order=self.search.sort_order,
+		):
+			submit_date = result.published.date()
 			if not self._valid_date(date=submit_date, start_date=start_date, end_date=self.today):
 				break
 			daily_papers.append(result)
 		return daily_papers
 
-	def download_papers(self, paper_dict: Dict[Result, str]):
+	def get_daily_papers_info(self, relevant_categories: List[str]) -> List[Result]:
+		r"""
+		Get the recent papers relevant to the input categories.
+		Refer to `aget_daily_papers_info` for details.
+
+		Args:
+			relevant_categories (List[str]): The recent papers in these categories will be counted.
+
+		Return:
+			List[Result]: Recent papers information.
+		"""
+		return self.client.run_sync(self.aget_daily_papers_info(relevant_categories=relevant_categories))
+
+	async def adownload_papers(self, paper_dict: Dict[Result, str]) -> List[Optional[str]]:
+		r"""
+		Download the selected papers concurrently.
+
+		Args:
+			paper_dict (Dict[Result, str]):
+				- key: paper (Result)
+				- value: save_dir (str)
+
+		Returns:
+			List[Optional[str]]: The paths of the downloaded papers, None for the failed ones.
+		"""
+		items = [(paper.pdf_url, str(Path(save_dir) / f"{paper.title}.pdf")) for paper, save_dir in paper_dict.items()]
+		return await self.client.adownload_pdfs(items)
+
+	def download_papers(self, paper_dict: Dict[Result, str]) -> List[Optional[str]]:
 		r"""
 		Download the selected papers.
 
@@ -282,9 +315,11 @@ class ArxivDailyDownloader(object):
 			paper_dict (Dict[Result, str]):
 				- key: paper (Result)
 				- value: save_dir (str)
+
+		Returns:
+			List[Optional[str]]: The paths of the downloaded papers, None for the failed ones.
 		"""
-		for paper in paper_dict.keys():
-			paper.download_pdf(dirpath=paper_dict[paper], filename=f"{paper.title}.pdf")
+		return self.client.run_sync(self.adownload_papers(paper_dict=paper_dict))
 
 
 class ArxivSearcher(object):
@@ -294,13 +329,13 @@ class ArxivSearcher(object):
 	Attributes:
 		max_results_num (int): Maximum number of results in a search.
 		category (ArxivCategory): The arXiv research category.
-		client (ArxivClient): Client responsible for searching.
+		client (AsyncArxivClient): Client responsible for searching.
 		searcher (Search): The parameters of searching.
 	"""
-	def __init__(self, max_results_num: int = 5):
+	def __init__(self, max_results_num: int = 5, client: Optional[AsyncArxivClient] = None):
 		self.max_results_num = max_results_num
 		self.category = ArxivCategory()
-		self.client = ArxivClient()
+		self.client = client or ARXIV_CLIENT
 		self.searcher = Search(
 			query="",
 			sort_by=SortCriterion.Relevance,
@@ -321,7 +356,7 @@ class ArxivSearcher(object):
 		else:
 			raise ValueError("Unsupported search mode.")
 
-	def search(
+	async def asearch(
 		self,
 		search_str: str,
 		max_results_num: int = None,
@@ -338,19 +373,39 @@ class ArxivSearcher(object):
 		Returns:
 			List[Result]: The search results.
 		"""
-		# query = f"ti:{search_str}+OR+abs:{search_str}"
-		# query = f"ti:{search_str}"
 		search_mode = search_mode or ArxivSearchMode.Title
-		self.searcher.query = self.construct_query(
+		query = self.construct_query(
 			search_str=search_str,
 			search_mode=search_mode,
 		)
-		max_results_num = max_results_num or self.max_results_num
-		count = 0
-		results = []
-		for result in self.client.results(search=self.searcher):
-			count += 1
-			results.append(result)
-			if count >= max_results_num:
-				break
-		return results
+		return await self.client.asearch(
+			query=query,
+			max_results=max_results_num or self.max_results_num,
+			sort_by=self.searcher.sort_by,
+			sort_order=self.searcher.sort_order,
+		)
+
+	def search(
+		self,
+		search_str: str,
+		max_results_num: int = None,
+		search_mode: ArxivSearchMode = None,
+	) -> List[Result]:
+		r"""
+		Search according to the title or abstract.
+
+		Args:
+			search_str (str): The search string, typically the title or abstract.
+			max_results_num (int): Maximum num of results. Defaults to None.
+			search_mode (ArxivSearchMode): Search mode.
+
+		Returns:
+			List[Result]: The search results.
+		"""
+		return self.client.run_sync(
+			self.asearch(
+				search_str=search_str,
+				max_results_num=max_results_num,
+				search_mode=search_mode,
+			)
+		)
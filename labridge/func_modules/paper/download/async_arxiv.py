@@ -0,0 +1,387 @@
+import time
+import httpx
+import fsspec
+import asyncio
+import hashlib
+import logging
+import feedparser
+
+from pathlib import Path
+from arxiv import Search, Result, SortCriterion, SortOrder
+from typing import Optional, List, Dict, Tuple, Any, AsyncGenerator, Coroutine
+
+from labridge.common.utils.rate_limit import AsyncTokenBucket
+from labridge.common.utils.atomic_write import atomic_write
+from .async_utils import run_coroutine_sync
+
+
+logger = logging.getLogger(__name__)
+
+
+ARXIV_QUERY_URL_FORMAT = "https://export.arxiv.org/api/query?{}"
+ARXIV_CACHE_DIR = "storage/paper_cache/arxiv"
+ARXIV_SEARCH_CACHE_DIR_NAME = "search"
+ARXIV_PDF_CACHE_DIR_NAME = "pdf"
+
+# arXiv's Terms of Use ask for no more than one API request every three seconds.
+ARXIV_API_RATE = 1 / 3
+ARXIV_DOWNLOAD_RATE = 1.0
+ARXIV_MAX_CONCURRENT_DOWNLOADS = 4
+# Search results change as new papers are submitted.
+ARXIV_SEARCH_CACHE_TTL = 3600
+ARXIV_PAGE_SIZE = 100
+ARXIV_NUM_RETRIES = 3
+ARXIV_TIMEOUT = 60.0
+
+PDF_MAGIC = b"%PDF"
+
+
+def format_query_url(url_args: Dict[str, Any], query_url_format: str = ARXIV_QUERY_URL_FORMAT) -> str:
+	r"""
+	Formatted url for searching in arXiv.
+	The search query is not url-encoded, to keep the advanced search syntax such as `ti:memristor+OR+abs:memristor`.
+	"""
+	query = url_args["search_query"]
+	suffix = f"search_query={query}"
+	for key in url_args.keys():
+		if key != "search_query":
+			suffix += f"&{key}={url_args[key]}"
+	return query_url_format.format(suffix)
+
+
+def arxiv_short_id(url: str) -> str:
+	r"""
+	The short id of an arXiv entry from its entry id or PDF url.
+	For example, both `http://arxiv.org/abs/2107.05580v1` and `http://arxiv.org/pdf/2107.05580v1` give `2107.05580v1`.
+	"""
+	for sep in ("arxiv.org/abs/", "arxiv.org/pdf/"):
+		if sep in url:
+			url = url.split(sep)[-1]
+			break
+	else:
+		url = url.rstrip("/").split("/")[-1]
+	if url.endswith(".pdf"):
+		url = url[:-len(".pdf")]
+	return url
+
+
+class ArxivDiskCache(object):
+	r"""
+	An on-disk cache of the arXiv search responses and the downloaded PDFs.
+
+	- The raw Atom feed of a search page is stored by the hash of the page url, and expires after `search_ttl` seconds.
+	- A PDF is stored by its versioned arXiv id, e.g. `2107.05580v1.pdf`, and never expires.
+
+	Args:
+		cache_dir (str): The cache directory. Defaults to `ARXIV_CACHE_DIR` under the project root.
+		search_ttl (float): Seconds before a cached search response expires.
+	"""
+	def __init__(
+		self,
+		cache_dir: Optional[str] = None,
+		search_ttl: float = ARXIV_SEARCH_CACHE_TTL,
+	):
+		self.cache_dir = cache_dir or self._default_cache_dir()
+		self.search_ttl = search_ttl
+		self._fs = fsspec.filesystem("file")
+
+	def _default_cache_dir(self) -> str:
+		r""" Default cache directory. """
+		root = Path(__file__)
+		for i in range(5):
+			root = root.parent
+		return str(root / ARXIV_CACHE_DIR)
+
+	def _write(self, file_path: str, content: bytes):
+		r""" Write the file atomically, through a temporary file unique to the writer. """
+		atomic_write(file_path, content)
+
+	def search_path(self, url: str) -> str:
+		url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+		return str(Path(self.cache_dir) / ARXIV_SEARCH_CACHE_DIR_NAME / f"{url_hash}.xml")
+
+	def pdf_path(self, short_id: str) -> str:
+		return str(Path(self.cache_dir) / ARXIV_PDF_CACHE_DIR_NAME / f"{short_id.replace('/', '_')}.pdf")
+
+	def get_search(self, url: str) -> Optional[bytes]:
+		r""" Get the cached response of a search page, None if not cached or expired. """
+		file_path = self.search_path(url)
+		try:
+			if time.time() - Path(file_path).stat().st_mtime > self.search_ttl:
+				return None
+			with self._fs.open(file_path, "rb") as f:
+				return f.read()
+		except OSError:
+			return None
+
+	def put_search(self, url: str, content: bytes):
+		self._write(self.search_path(url), content)
+
+	def get_pdf(self, short_id: str) -> Optional[str]:
+		r""" Get the path of a cached PDF, None if not cached. """
+		file_path = self.pdf_path(short_id)
+		if self._fs.exists(file_path):
+			return file_path
+		return None
+
+
+class _LoopState(object):
+	r"""
+	The HTTP client, download slots and in-flight PDF downloads of an event loop,
+	they can not be shared across event loops.
+	"""
+	def __init__(self, client: httpx.AsyncClient, max_concurrent_downloads: int):
+		self.client = client
+		self.download_slots = asyncio.Semaphore(max_concurrent_downloads)
+		self.pdf_downloads: Dict[str, asyncio.Future] = {}
+
+
+class AsyncArxivClient(object):
+	r"""
+	An async client of the arXiv API and PDF downloads.
+
+	- All requests of an event loop go through one pooled `httpx.AsyncClient`.
+	- The API requests and the downloads are throttled by token buckets, shared by all loops and threads.
+	- The search responses and the PDFs are cached on disk, see `ArxivDiskCache`.
+	- PDFs are downloaded concurrently, at most `max_concurrent_downloads` at a time.
+
+	Args:
+		query_url_format (str): The format of the arXiv API url.
+		page_size (int): Maximum number of results fetched in a single API request.
+		api_rate (float): API requests per second.
+		download_rate (float): PDF downloads started per second.
+		max_concurrent_downloads (int): Maximum number of concurrent downloads.
+		num_retries (int): Number of times to retry a failing request.
+		timeout (float): The timeout of a request in seconds.
+		cache (ArxivDiskCache): The disk cache. Defaults to the cache under the project root.
+	"""
+	def __init__(
+		self,
+		query_url_format: str = ARXIV_QUERY_URL_FORMAT,
+		page_size: int = ARXIV_PAGE_SIZE,
+		api_rate: float = ARXIV_API_RATE,
+		download_rate: float = ARXIV_DOWNLOAD_RATE,
+		max_concurrent_downloads: int = ARXIV_MAX_CONCURRENT_DOWNLOADS,
+		num_retries: int = ARXIV_NUM_RETRIES,
+		timeout: float = ARXIV_TIMEOUT,
+		cache: Optional[ArxivDiskCache] = None,
+	):
+		self.query_url_format = query_url_format
+		self.page_size = page_size
+		self.max_concurrent_downloads = max_concurrent_downloads
+		self.num_retries = num_retries
+		self.timeout = timeout
+		self.cache = cache or ArxivDiskCache()
+		self.api_limiter = AsyncTokenBucket(rate=api_rate)
+		self.download_limiter = AsyncTokenBucket(rate=download_rate)
+		self._fs = fsspec.filesystem("file")
+		self._loop_states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+
+	def _loop_state(self) -> _LoopState:
+		loop = asyncio.get_running_loop()
+		state = self._loop_states.get(loop, None)
+		if state is None:
+			client = httpx.AsyncClient(
+				timeout=self.timeout,
+				follow_redirects=True,
+				headers={"user-agent": "labridge"},
+			)
+			state = _LoopState(client=client, max_concurrent_downloads=self.max_concurrent_downloads)
+			self._loop_states[loop] = state
+		return state
+
+	async def aclose(self):
+		r""" Close the HTTP client of the running event loop. """
+		state = self._loop_states.pop(asyncio.get_running_loop(), None)
+		if state is not None:
+			await state.client.aclose()
+
+	def run_sync(self, coro: Coroutine) -> Any:
+		r"""
+		Run a coroutine of this client from synchronous code, the HTTP client of the temporary loop is closed at the end.
+
+		Note:
+			The synchronous wrappers built on it must not be called from async code, which should await the
+			async methods instead. Refer to `run_coroutine_sync`.
+		"""
+		async def _run():
+			try:
+				return await coro
+			finally:
+				await self.aclose()
+
+		return run_coroutine_sync(_run())
+
+	async def _aget(self, url: str, limiter: AsyncTokenBucket) -> httpx.Response:
+		r""" GET with throttling, retry on transport errors, server errors and `429 Too Many Requests`. """
+		client = self._loop_state().client
+		for try_idx in range(self.num_retries + 1):
+			await limiter.acquire()
+			last_try = try_idx >= self.num_retries
+			try:
+				response = await client.get(url)
+			except httpx.TransportError as e:
+				if last_try:
+					raise
+				logger.debug("Got error (try %d): %s", try_idx, e)
+				continue
+			if (response.status_code >= 500 or response.status_code == 429) and not last_try:
+				logger.debug("Got status %d (try %d): %s", response.status_code, try_idx, url)
+				continue
+			response.raise_for_status()
+			return response
+
+	async def _aget_feed(self, url: str) -> feedparser.FeedParserDict:
+		content = self.cache.get_search(url)
+		if content is None:
+			response = await self._aget(url, limiter=self.api_limiter)
+			content = response.content
+			feed = feedparser.parse(content)
+			# Do not cache an empty page, arXiv occasionally returns one by mistake.
+			if feed.entries:
+				self.cache.put_search(url, content)
+			return feed
+		return feedparser.parse(content)
+
+	async def aresults(
+		self,
+		query: str,
+		sort_by: SortCriterion = SortCriterion.Relevance,
+		sort_order: SortOrder = SortOrder.Descending,
+		max_results: Optional[int] = None,
+	) -> AsyncGenerator[Result, None]:
+		r"""
+		Search in arXiv, yield the results page by page.
+
+		Args:
+			query (str): The search query, refer to `ArxivClient` for the advanced search syntax.
+			sort_by (SortCriterion): The sort criterion.
+			sort_order (SortOrder): The sort order.
+			max_results (Optional[int]): Maximum number of results. Defaults to None, yield all results.
+
+		Returns:
+			AsyncGenerator[Result, None]: The results.
+		"""
+		url_args = Search(query=query, sort_by=sort_by, sort_order=sort_order)._url_args()
+		page_size = self.page_size if max_results is None else min(self.page_size, max_results)
+		offset, count = 0, 0
+		while True:
+			url_args.update({"start": offset, "max_results": page_size})
+			feed = await self._aget_feed(format_query_url(url_args, self.query_url_format))
+			if not feed.entries:
+				return
+			for entry in feed.entries:
+				try:
+					yield Result._from_feed_entry(entry)
+				except Result.MissingFieldError as e:
+					logger.warning("Skipping partial result: %s", e)
+					continue
+				count += 1
+				if max_results is not None and count >= max_results:
+					return
+			offset += len(feed.entries)
+			total_results = int(feed.feed.get("opensearch_totalresults", offset))
+			if offset >= total_results:
+				return
+
+	async def asearch(
+		self,
+		query: str,
+		max_results: int,
+		sort_by: SortCriterion = SortCriterion.Relevance,
+		sort_order: SortOrder = SortOrder.Descending,
+	) -> List[Result]:
+		r"""
+		Search in arXiv.
+
+		Args:
+			query (str): The search query.
+			max_results (int): Maximum number of results.
+			sort_by (SortCriterion): The sort criterion.
+			sort_order (SortOrder): The sort order.
+
+		Returns:
+			List[Result]: The results.
+		"""
+		return [
+			result async for result in self.aresults(
+				query=query,
+				sort_by=sort_by,
+				sort_order=sort_order,
+				max_results=max_results,
+			)
+		]
+
+	async def _afetch_pdf(self, pdf_url: str, short_id: str) -> str:
+		r"""
+		Download a PDF into the cache, return the cached path.
+		The concurrent requests of the same entry share a single download.
+		"""
+		cached_path = self.cache.get_pdf(short_id)
+		if cached_path is not None:
+			return cached_path
+
+		pdf_downloads = self._loop_state().pdf_downloads
+		download = pdf_downloads.get(short_id, None)
+		if download is None:
+			download = asyncio.ensure_future(self._adownload_to_cache(pdf_url=pdf_url, short_id=short_id))
+			pdf_downloads[short_id] = download
+			download.add_done_callback(lambda _: pdf_downloads.pop(short_id, None))
+		# A cancelled waiter does not cancel the download shared with the others.
+		return await asyncio.shield(download)
+
+	async def _adownload_to_cache(self, pdf_url: str, short_id: str) -> str:
+		async with self._loop_state().download_slots:
+			# Another event loop may have downloaded it while waiting for the slot.
+			cached_path = self.cache.get_pdf(short_id)
+			if cached_path is not None:
+				return cached_path
+			response = await self._aget(pdf_url, limiter=self.download_limiter)
+			if not response.content.startswith(PDF_MAGIC):
+				raise ValueError(f"The content of {pdf_url} is not a PDF.")
+			cached_path = self.cache.pdf_path(short_id)
+			self.cache._write(cached_path, response.content)
+			return cached_path
+
+	async def adownload_pdf(self, pdf_url: str, save_path: str, short_id: Optional[str] = None) -> str:
+		r"""
+		Download a PDF, the PDFs that have been downloaded before are copied from the cache.
+
+		Args:
+			pdf_url (str): The PDF url.
+			save_path (str): The save path.
+			short_id (Optional[str]): The versioned arXiv id. Defaults to the id parsed from `pdf_url`.
+
+		Returns:
+			str: The save path.
+		"""
+		short_id = short_id or arxiv_short_id(pdf_url)
+		cached_path = await self._afetch_pdf(pdf_url=pdf_url, short_id=short_id)
+		if cached_path != save_path:
+			dir_path = str(Path(save_path).parent)
+			if not self._fs.exists(dir_path):
+				self._fs.makedirs(dir_path)
+			self._fs.cp_file(cached_path, save_path)
+		return save_path
+
+	async def adownload_pdfs(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+		r"""
+		Download PDFs concurrently.
+
+		Args:
+			items (List[Tuple[str, str]]): The `(pdf_url, save_path)` pairs.
+
+		Returns:
+			List[Optional[str]]: The save paths, None for the failed downloads.
+		"""
+		async def _download(pdf_url: str, save_path: str) -> Optional[str]:
+			try:
+				return await self.adownload_pdf(pdf_url=pdf_url, save_path=save_path)
+			except Exception as e:
+				logger.warning("Download failed: %s, error: %s", pdf_url, e)
+				return None
+
+		return list(await asyncio.gather(*[_download(pdf_url, save_path) for pdf_url, save_path in items]))
+
+
+ARXIV_CLIENT = AsyncArxivClient()
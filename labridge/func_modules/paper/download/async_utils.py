@@ -1,5 +1,9 @@
+import asyncio
 import aiohttp
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine
+
 
 async def adownload_file(url: str, save_path: str) -> str:
 	r"""
@@ -23,3 +27,29 @@ async def adownload_file(url: str, save_path: str) -> str:
 	return save_path
 
 
+
+
+def run_coroutine_sync(coro: Coroutine) -> Any:
+	r"""
+	Run a coroutine from synchronous code.
+
+	If the calling thread is already running an event loop (e.g. a sync tool called inside an async server),
+	the coroutine runs in a new event loop of a worker thread instead of failing with nested loops.
+
+	Note:
+		In that case the running event loop is blocked until the coroutine completes,
+		so it must not be called from async code, which should await the coroutine instead.
+
+	Args:
+		coro (Coroutine): The coroutine.
+
+	Returns:
+		Any: The result of the coroutine.
+	"""
+	try:
+		asyncio.get_running_loop()
+	except RuntimeError:
+		return asyncio.run(coro)
+
+	with ThreadPoolExecutor(max_workers=1) as executor:
+		return executor.submit(asyncio.run, coro).result()
@@ -1,29 +1,81 @@
 import json
-import numpy as np
+import asyncio
 
 import httpx
 from httpx import AsyncClient
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Any, Sequence
 from labridge.func_modules.paper.download.arxiv import ArxivSearcher, ArxivSearchMode
 
+from .doi_cache import DOICache
+
 
 CROSSREF_BASE_URL = "https://api.crossref.org/works/"
 MAX_REQUEST_TRY = 5
 MISMATCH_TOLERANCE = 5
 
+CROSSREF_MAX_CONNECTIONS = 10
+CROSSREF_REQUEST_TIMEOUT = 20.0
+DOI_RESOLVE_CONCURRENCY = 5
+
+ARXIV_CACHE_PREFIX = "arxiv:"
+
+
+def _char_match_masks(pattern: str) -> Dict[str, int]:
+	r""" For each char in the pattern, a bitmask marking the positions where the char appears. """
+	masks: Dict[str, int] = {}
+	for idx, char in enumerate(pattern):
+		masks[char] = masks.get(char, 0) | (1 << idx)
+	return masks
+
+
+def _bit_parallel_lcs_len(masks: Dict[str, int], pattern_len: int, text: str) -> int:
+	r"""
+	The bit-parallel LCS length (Allison-Dix, Hyyrö), processing one char of the text per step over all the
+	positions of the pattern at once.
+
+	Args:
+		masks (Dict[str, int]): The char match masks of the pattern, obtained by `_char_match_masks`.
+		pattern_len (int): The length of the pattern.
+		text (str): The text compared with the pattern.
+
+	Returns:
+		int: The length of the longest common subsequence.
+	"""
+	full_mask = (1 << pattern_len) - 1
+	v = full_mask
+	for char in text:
+		u = v & masks.get(char, 0)
+		v = ((v + u) | (v - u)) & full_mask
+	return pattern_len - bin(v).count("1")
+
 
 def lcs_len(str1: str, str2: str) -> int:
-	len1 = len(str1)
-	len2 = len(str2)
-	len_array = np.zeros((len1 + 1, len2 + 1), dtype=int)
+	r""" The length of the longest common subsequence of two strings. """
+	if len(str1) < len(str2):
+		str1, str2 = str2, str1
+	return _bit_parallel_lcs_len(_char_match_masks(str2), len(str2), str1)
+
+
+def title_mismatch_lens(candidate_titles: Sequence[str], title: str) -> List[int]:
+	r"""
+	The number of chars in the `title` that are not matched by each of the candidate titles.
+	The match masks of the title are built once and shared by all the candidates of a search response.
+
+	Args:
+		candidate_titles (Sequence[str]): The titles of the searched results.
+		title (str): The input paper title.
+
+	Returns:
+		List[int]: The mismatch lengths, in the same order as the candidate titles.
+	"""
+	masks = _char_match_masks(title)
+	title_len = len(title)
+	return [title_len - _bit_parallel_lcs_len(masks, title_len, candidate) for candidate in candidate_titles]
 
-	for i in range(1, len1 + 1):
-		for j in range(1, len2 + 1):
-			if str1[i - 1] == str2[j - 1]:
-				len_array[i][j] = len_array[i - 1][j - 1] + 1
-			else:
-				len_array[i][j] = max(len_array[i - 1][j], len_array[i][j - 1])
-	return len_array[-1][-1]
+
+def title_mismatch_len(candidate_title: str, title: str) -> int:
+	r""" The number of chars in the `title` that are not matched by the `candidate_title`. """
+	return title_mismatch_lens([candidate_title], title)[0]
 
 
 class ArXivWorker(object):
@@ -31,9 +83,20 @@ class ArXivWorker(object):
 	This is a worker using the arXiv API to obtain the DOI of a paper.
 
 	If the found paper has no DOI yet, use the entry_id of arXiv instead.
+
+	Args:
+		cache (DOICache): The cache of DOI lookups. If not given, nothing is cached.
 	"""
-	def __init__(self):
-		self.searcher = ArxivSearcher()
+	def __init__(self, cache: Optional[DOICache] = None):
+		self._searcher = None
+		self.cache = cache
+
+	@property
+	def searcher(self) -> ArxivSearcher:
+		r""" The arXiv searcher, created on first use since it may fetch the arXiv categories through network. """
+		if self._searcher is None:
+			self._searcher = ArxivSearcher()
+		return self._searcher
 
 	def check_doi(
 		self,
@@ -52,16 +115,20 @@ class ArXivWorker(object):
 		Returns:
 			bool: Whether the input doi match the input title according to the search results in arXiv.
 		"""
-		search_items = self.searcher.search(
-			search_str=input_doi,
-			search_mode=ArxivSearchMode.DOI,
-		)
-		if len(search_items) < 1:
-			return False
-		item = search_items[0]
-		paper_title = item.title
-		common_len = lcs_len(paper_title, title)
-		mismatch_len = len(title) - common_len
+		cache_key = f"{ARXIV_CACHE_PREFIX}{input_doi}"
+		metadata = self.cache.get_metadata(cache_key) if self.cache is not None else None
+		if metadata is None:
+			search_items = self.searcher.search(
+				search_str=input_doi,
+				search_mode=ArxivSearchMode.DOI,
+			)
+			if len(search_items) < 1:
+				return False
+			metadata = {"title": search_items[0].title}
+			if self.cache is not None:
+				self.cache.put_metadata(cache_key, metadata)
+
+		mismatch_len = title_mismatch_len(metadata["title"], title)
 		return mismatch_len <= mismatch_tolerance
 
 	def find_doi_by_title(
@@ -71,12 +138,10 @@ class ArXivWorker(object):
 		mismatch_tolerance: int = 5,
 	) -> Optional[str]:
 		search_items = self.searcher.search(search_str=title, max_results_num=results_num)
-		match_results: List[Tuple[int, int]] = []
-		for idx, item in enumerate(search_items):
-			paper_title = item.title
-			common_len = lcs_len(paper_title, title)
-			mismatch_len = len(title) - common_len
-			match_results.append((idx, mismatch_len))
+		if len(search_items) < 1:
+			return None
+		mismatch_lens = title_mismatch_lens([item.title for item in search_items], title)
+		match_results: List[Tuple[int, int]] = list(enumerate(mismatch_lens))
 
 		match_results.sort(key=lambda x: x[1])
 		if match_results[0][1] > mismatch_tolerance:
@@ -96,13 +161,62 @@ class CrossRefWorker(object):
 	This is a worker using the CrossRef API to obtain the DOI of a paper.
 
 	Refer to https://www.crossref.org/documentation/retrieve-metadata/rest-api/
+
+	The sync and async HTTP clients are created once and reused, so that the connections to CrossRef are pooled.
+
+	Args:
+		base_url (str): The base url of the CrossRef `works` API. Can be set to a local stub server in tests.
+		cache (DOICache): The cache of DOI lookups. If not given, nothing is cached.
+		max_connections (int): The maximum connections in the connection pool.
+		timeout (float): The timeout of a request in seconds.
 	"""
 	def __init__(
 		self,
 		base_url: str = CROSSREF_BASE_URL,
+		cache: Optional[DOICache] = None,
+		max_connections: int = CROSSREF_MAX_CONNECTIONS,
+		timeout: float = CROSSREF_REQUEST_TIMEOUT,
 	):
 		self.base_url = base_url
-		self.async_client = AsyncClient()
+		self.cache = cache
+		self._limits = httpx.Limits(
+			max_connections=max_connections,
+			max_keepalive_connections=max_connections,
+		)
+		self._timeout = timeout
+		self.client = httpx.Client(limits=self._limits, timeout=self._timeout)
+		self._async_client = None
+
+	@property
+	def async_client(self) -> AsyncClient:
+		r""" The shared async client, created lazily in the running event loop. """
+		if self._async_client is None or self._async_client.is_closed:
+			self._async_client = AsyncClient(limits=self._limits, timeout=self._timeout)
+		return self._async_client
+
+	async def aclose(self):
+		r""" Close the async client. """
+		if self._async_client is not None:
+			await self._async_client.aclose()
+			self._async_client = None
+
+	def _brief_metadata(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		r""" Keep the useful fields of a CrossRef work item. Return None if the item has no title. """
+		titles = item.get("title", None)
+		if not titles:
+			return None
+		container_titles = item.get("container-title", None) or [None]
+		date_parts = item.get("issued", {}).get("date-parts", None) or [[None]]
+		authors = [
+			" ".join([author.get("given", ""), author.get("family", "")]).strip()
+			for author in item.get("author", [])
+		]
+		return {
+			"title": titles[0],
+			"container_title": container_titles[0],
+			"publish_year": date_parts[0][0],
+			"authors": authors,
+		}
 
 	def _get_doi_from_api_data(
 		self,
@@ -112,15 +226,14 @@ class CrossRefWorker(object):
 		mismatch_tolerance: int = MISMATCH_TOLERANCE,
 	):
 		items = api_data["message"]["items"]
-		match_results = []
-		for idx, item in enumerate(items[: results_num]):
-			title_msg = item.get("title", None)
-			if title_msg is None:
-				match_results.append((idx, MISMATCH_TOLERANCE + 1))
-				continue
-			common_len = lcs_len(item["title"][0], title)
-			mismatch_len = len(title) - common_len
-			match_results.append((idx, mismatch_len))
+		if len(items) < 1:
+			return None
+		candidates = items[: results_num]
+		titled_idxs = [idx for idx, item in enumerate(candidates) if item.get("title", None)]
+		mismatch_lens = title_mismatch_lens([candidates[idx]["title"][0] for idx in titled_idxs], title)
+		match_results = [(idx, MISMATCH_TOLERANCE + 1) for idx in range(len(candidates))]
+		for idx, mismatch_len in zip(titled_idxs, mismatch_lens):
+			match_results[idx] = (idx, mismatch_len)
 
 		match_results.sort(key=lambda x: x[1])
 		if match_results[0][1] > mismatch_tolerance:
@@ -129,10 +242,43 @@ class CrossRefWorker(object):
 
 		try:
 			doi = items[match_idx]["DOI"]
-			return doi
 		except KeyError:
 			return None
 
+		if self.cache is not None:
+			self.cache.put_metadata(doi, self._brief_metadata(items[match_idx]))
+		return doi
+
+	def _metadata_from_response(self, input_doi: str, response: httpx.Response) -> Optional[Dict[str, Any]]:
+		r""" Parse the response of a DOI request and cache the metadata. """
+		if response.status_code != 200:
+			return None
+
+		api_data = json.loads(response.text)
+		metadata = self._brief_metadata(api_data["message"])
+		if metadata is not None and self.cache is not None:
+			self.cache.put_metadata(input_doi, metadata)
+		return metadata
+
+	def get_metadata(self, input_doi: str) -> Optional[Dict[str, Any]]:
+		r"""
+		Get the brief metadata of a DOI, from the cache or through CrossRef.
+
+		Args:
+			input_doi (str): The DOI.
+
+		Returns:
+			Optional[Dict[str, Any]]: The brief metadata, including the `title`. If the DOI is not found, return None.
+		"""
+		metadata = self.cache.get_metadata(input_doi) if self.cache is not None else None
+		if metadata is not None:
+			return metadata
+		try:
+			response = self.client.get(self.base_url + input_doi)
+		except httpx.HTTPError:
+			return None
+		return self._metadata_from_response(input_doi=input_doi, response=response)
+
 	def check_doi(
 		self,
 		title: str,
@@ -150,16 +296,41 @@ class CrossRefWorker(object):
 		Returns:
 			bool: Whether the input doi match the input title according to the search results in CrossRef.
 		"""
-		url = self.base_url + input_doi
-		response = httpx.get(url)
-
-		if response.status_code != 200:
+		metadata = self.get_metadata(input_doi=input_doi)
+		if metadata is None:
 			return False
 
-		api_data = json.loads(response.text)
-		paper_title = api_data["message"]["title"][0]
-		common_len = lcs_len(paper_title, title)
-		mismatch_len = len(title) - common_len
+		mismatch_len = title_mismatch_len(metadata["title"], title)
+		return mismatch_len <= mismatch_tolerance
+
+	async def acheck_doi(
+		self,
+		title: str,
+		input_doi: str,
+		mismatch_tolerance: int = 5,
+	) -> bool:
+		r"""
+		Asynchronously check whether the title of the searched result of the doi matches the input title.
+
+		Args:
+			title (str): The input paper title.
+			input_doi (str): The input doi.
+			mismatch_tolerance (int): The tolerance of mismatch between the input title and the title of searched result.
+
+		Returns:
+			bool: Whether the input doi match the input title according to the search results in CrossRef.
+		"""
+		metadata = self.cache.get_metadata(input_doi) if self.cache is not None else None
+		if metadata is None:
+			try:
+				response = await self.async_client.get(self.base_url + input_doi)
+			except httpx.HTTPError:
+				return False
+			metadata = self._metadata_from_response(input_doi=input_doi, response=response)
+			if metadata is None:
+				return False
+
+		mismatch_len = title_mismatch_len(metadata["title"], title)
 		return mismatch_len <= mismatch_tolerance
 
 	def find_doi_by_title(
@@ -180,19 +351,18 @@ class CrossRefWorker(object):
 		Returns:
 			Optional[str]: The DOI of the paper. Return None if not found.
 		"""
-		query = f"?query.title={title}"
-		url = self.base_url + query
+		params = {"query.title": title, "rows": results_num}
 
 		try_times = 0
 		response = None
 		while try_times < MAX_REQUEST_TRY:
 			try:
-				response = httpx.get(url)
+				response = self.client.get(self.base_url, params=params)
 				break
-			except:
+			except httpx.HTTPError:
 				try_times += 1
 
-		if response is None:
+		if response is None or response.status_code != 200:
 			return None
 		api_data = json.loads(response.text)
 		doi = self._get_doi_from_api_data(
@@ -220,17 +390,19 @@ class CrossRefWorker(object):
 		Returns:
 			Optional[str]: The DOI of the paper. Return None if not found.
 		"""
-		query = f"?query.title={title}"
-		url = self.base_url + query
+		params = {"query.title": title, "rows": results_num}
 
 		try_times = 0
 		response = None
 		while try_times < MAX_REQUEST_TRY:
 			try:
-				response = await self.async_client.get(url=url)
+				response = await self.async_client.get(self.base_url, params=params)
 				break
-			except:
+			except httpx.HTTPError:
 				try_times += 1
+
+		if response is None or response.status_code != 200:
+			return None
 		api_data = json.loads(response.text)
 		doi = self._get_doi_from_api_data(
 			title=title,
@@ -245,19 +417,30 @@ class DOIWorker(object):
 	r"""
 	This class works to find the DOI of a paper through multiple approaches.
 
+	The found title -> DOI pairs and the DOI metadata are recorded in a `DOICache`,
+	so that the same paper is never resolved through the network twice.
+
 	Args:
 		max_results_num (int): Maximum num of results in searching.
 		title_mismatch_tolerance (int): Maximum mismatch between the searched title and the given title.
+		cache (DOICache): The cache of DOI lookups. Defaults to the on-disk cache under the project root.
+		crossref_base_url (str): The base url of the CrossRef `works` API.
+		max_concurrency (int): The maximum number of titles resolved concurrently in `afind_dois_by_titles`.
 	"""
 	def __init__(
 		self,
 		max_results_num: int = 5,
 		title_mismatch_tolerance: int = 5,
+		cache: Optional[DOICache] = None,
+		crossref_base_url: str = CROSSREF_BASE_URL,
+		max_concurrency: int = DOI_RESOLVE_CONCURRENCY,
 	):
 		self.max_results_num = max_results_num
 		self.title_mismatch_tolerance = title_mismatch_tolerance
-		self.crossref_worker = CrossRefWorker()
-		self.arxiv_worker = ArXivWorker()
+		self.max_concurrency = max_concurrency
+		self.cache = cache or DOICache()
+		self.crossref_worker = CrossRefWorker(base_url=crossref_base_url, cache=self.cache)
+		self.arxiv_worker = ArXivWorker(cache=self.cache)
 
 	def check_doi(
 		self,
@@ -290,6 +473,51 @@ class DOIWorker(object):
 		)
 		return valid_doi
 
+	async def acheck_doi(
+		self,
+		title: str,
+		input_doi: str,
+		title_mismatch_tolerance: int = 5,
+	) -> bool:
+		r"""
+		Asynchronously check whether the given doi matches the title.
+
+		Args:
+			title (str): The input title.
+			input_doi (str): The input doi
+			title_mismatch_tolerance (int): Tolerance to the mismatch between the input title and the searched title.
+
+		Returns:
+			bool: Whether the input doi is valid.
+		"""
+		valid_doi = await self.crossref_worker.acheck_doi(
+			title=title,
+			input_doi=input_doi,
+			mismatch_tolerance=title_mismatch_tolerance,
+		)
+		if valid_doi:
+			return valid_doi
+		# The arxiv package is synchronous.
+		valid_doi = await asyncio.to_thread(
+			self.arxiv_worker.check_doi,
+			title=title,
+			input_doi=input_doi,
+			mismatch_tolerance=title_mismatch_tolerance,
+		)
+		return valid_doi
+
+	def get_doi_metadata(self, doi: str) -> Optional[Dict[str, Any]]:
+		r"""
+		Get the brief metadata (title, container title, publish year, authors) of a DOI registered in CrossRef.
+
+		Args:
+			doi (str): The DOI.
+
+		Returns:
+			Optional[Dict[str, Any]]: The brief metadata. If the DOI is not found, return None.
+		"""
+		return self.crossref_worker.get_metadata(input_doi=doi)
+
 	def find_doi_by_title(self, title: str, input_doi: str = None) -> Optional[str]:
 		r"""
 		Find DOI based on the given title and given doi.
@@ -315,21 +543,99 @@ class DOIWorker(object):
 			if doi_valid:
 				return input_doi
 
+		doi = self.cache.get_doi(title)
+		if doi:
+			return doi
+
 		doi = self.crossref_worker.find_doi_by_title(
 			title=title,
 			results_num=self.max_results_num,
 			mismatch_tolerance=self.title_mismatch_tolerance,
 		)
+		if doi is None:
+			doi = self.arxiv_worker.find_doi_by_title(
+				title=title,
+				results_num=self.max_results_num,
+				mismatch_tolerance=self.title_mismatch_tolerance,
+			)
+		if doi:
+			self.cache.put_doi(title, doi)
+		return doi
+
+	async def afind_doi_by_title(self, title: str, input_doi: str = None) -> Optional[str]:
+		r"""
+		Asynchronously find DOI based on the given title and given doi.
+		Refer to `find_doi_by_title` for details.
+
+		Args:
+			title (str): The given title. Obtained through methods such as extraction by LLM.
+			input_doi (str): The given doi. Obtained through methods such as extraction by LLM.
+
+		Returns:
+			Optional[str]: If valid DOI found, return the DOI. Otherwise, return None.
+		"""
+		if input_doi:
+			doi_valid = await self.acheck_doi(
+				title=title,
+				input_doi=input_doi,
+				title_mismatch_tolerance=self.title_mismatch_tolerance,
+			)
+			if doi_valid:
+				return input_doi
+
+		doi = self.cache.get_doi(title)
 		if doi:
 			return doi
 
-		doi = self.arxiv_worker.find_doi_by_title(
+		doi = await self.crossref_worker.afind_doi_by_title(
 			title=title,
 			results_num=self.max_results_num,
 			mismatch_tolerance=self.title_mismatch_tolerance,
 		)
+		if doi is None:
+			doi = await asyncio.to_thread(
+				self.arxiv_worker.find_doi_by_title,
+				title=title,
+				results_num=self.max_results_num,
+				mismatch_tolerance=self.title_mismatch_tolerance,
+			)
+		if doi:
+			self.cache.put_doi(title, doi)
 		return doi
 
+	async def afind_dois_by_titles(
+		self,
+		titles: List[str],
+		input_dois: Optional[List[Optional[str]]] = None,
+		max_concurrency: Optional[int] = None,
+	) -> List[Optional[str]]:
+		r"""
+		Resolve the DOIs of many titles concurrently, typically used in bulk ingestion.
+		At most `max_concurrency` titles are resolved at the same time, sharing the pooled connections.
+
+		Args:
+			titles (List[str]): The paper titles.
+			input_dois (Optional[List[Optional[str]]]): The given dois corresponding to the titles. Defaults to None.
+			max_concurrency (Optional[int]): Defaults to `self.max_concurrency`.
+
+		Returns:
+			List[Optional[str]]: The DOIs in the same order as the titles. None for the titles that are not resolved.
+		"""
+		input_dois = input_dois or [None] * len(titles)
+		if len(input_dois) != len(titles):
+			raise ValueError("The lengths of titles and input_dois should be the same.")
+
+		semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+		async def resolve(title: str, input_doi: Optional[str]) -> Optional[str]:
+			async with semaphore:
+				return await self.afind_doi_by_title(title=title, input_doi=input_doi)
+
+		tasks = [resolve(title, input_doi) for title, input_doi in zip(titles, input_dois)]
+		dois = await asyncio.gather(*tasks)
+		self.cache.persist()
+		return dois
+
 
 if __name__ == "__main__":
 	# worker = ArXivWorker()
@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+from labridge.common.utils.json_cache import JsonFileCache
+
+
+DOI_CACHE_PERSIST_PATH = "storage/paper_cache/doi_cache.json"
+
+DOI_CACHE_TITLE_KEY = "title_to_doi"
+DOI_CACHE_METADATA_KEY = "doi_to_metadata"
+
+
+def normalize_title(title: str) -> str:
+	r""" Lower-cased title with collapsed whitespaces, used as the key of the title cache. """
+	return " ".join(title.lower().split())
+
+
+def normalize_doi(doi: str) -> str:
+	r""" DOIs are case-insensitive. """
+	return doi.strip().lower()
+
+
+class DOICache(object):
+	r"""
+	An on-disk cache of the DOI lookups through CrossRef and arXiv.
+
+	Two mappings are recorded in a JSON file:
+
+	- title_to_doi: `{normalized title: doi}`
+	- doi_to_metadata: `{normalized doi: brief metadata}`, the brief metadata includes at least the `title`.
+
+	The cache is shared by all users, thus re-ingesting a paper or ingesting the same paper for different users
+	does not repeat the network round trips. All `DOICache` instances of the same file share one `JsonFileCache`,
+	whose puts are persisted in batches.
+
+	Args:
+		persist_path (str): The path of the cache file. Defaults to `DOI_CACHE_PERSIST_PATH` under the project root.
+		auto_persist (bool): Whether to persist the puts once a batch of them is pending. Defaults to True.
+			The remaining puts are persisted by `persist`, or at exit.
+	"""
+	def __init__(
+		self,
+		persist_path: Optional[str] = None,
+		auto_persist: bool = True,
+	):
+		self.persist_path = persist_path or self._default_persist_path()
+		self.auto_persist = auto_persist
+		self._cache = JsonFileCache.shared(
+			persist_path=self.persist_path,
+			sections=[DOI_CACHE_TITLE_KEY, DOI_CACHE_METADATA_KEY],
+		)
+
+	def _default_persist_path(self) -> str:
+		r""" Default persist path. """
+		root = Path(__file__)
+		for i in range(6):
+			root = root.parent
+		return str(root / DOI_CACHE_PERSIST_PATH)
+
+	def load(self):
+		r""" Reload the cache from `self.persist_path`, keeping the puts not persisted yet. """
+		self._cache.load()
+
+	def persist(self):
+		r""" Persist the pending puts, merged with the entries written by others. The file is replaced atomically. """
+		self._cache.persist()
+
+	def _put(self, key: str, value: Any, section: str):
+		if self._cache.put(key=key, value=value, section=section) and self.auto_persist:
+			self._cache.persist()
+
+	def get_doi(self, title: str) -> Optional[str]:
+		r"""
+		Get the cached DOI of a title.
+
+		Args:
+			title (str): The paper title.
+
+		Returns:
+			Optional[str]: The DOI. If the title is not cached, return None.
+		"""
+		return self._cache.get(key=normalize_title(title), section=DOI_CACHE_TITLE_KEY)
+
+	def put_doi(self, title: str, doi: str):
+		r"""
+		Record the DOI of a title.
+
+		Args:
+			title (str): The paper title.
+			doi (str): The DOI (or the arXiv entry id) found for the title.
+		"""
+		self._put(key=normalize_title(title), value=doi, section=DOI_CACHE_TITLE_KEY)
+
+	def get_metadata(self, doi: str) -> Optional[Dict[str, Any]]:
+		r"""
+		Get the cached metadata of a DOI.
+
+		Args:
+			doi (str): The DOI.
+
+		Returns:
+			Optional[Dict[str, Any]]: The brief metadata. If the DOI is not cached, return None.
+		"""
+		return self._cache.get(key=normalize_doi(doi), section=DOI_CACHE_METADATA_KEY)
+
+	def put_metadata(self, doi: str, metadata: Dict[str, Any]):
+		r"""
+		Record the metadata of a DOI.
+
+		Args:
+			doi (str): The DOI.
+			metadata (Dict[str, Any]): The brief metadata, including the `title`.
+		"""
+		self._put(key=normalize_doi(doi), value=metadata, section=DOI_CACHE_METADATA_KEY)
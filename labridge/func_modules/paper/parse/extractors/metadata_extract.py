@@ -1,3 +1,6 @@
+import re
+import pymupdf
+
 from llama_index.core.settings import llm_from_settings_or_context
 from llama_index.core.schema import Document, TransformComponent
 from llama_index.readers.file.pymu_pdf import PyMuPDFReader
@@ -7,11 +10,11 @@ from llama_index.core import ServiceContext, Settings
 from llama_index.core.utils import print_text
 from llama_index.core.llms import LLM
 
-from typing import Dict, List, Union, Tuple, Optional
+from typing import Dict, List, Union, Tuple, Optional, Any
 from pathlib import Path
 
 from labridge.common.query_engine.query_engines import SingleQueryEngine
-from .doi import DOIWorker
+from .doi import DOIWorker, title_mismatch_len
 
 
 r""" a dictionary of {'metadata': 'description'} """
@@ -57,6 +60,94 @@ DEFAULT_OPTIONAL_METADATA = {
 }
 
 
+# Refer to https://www.crossref.org/blog/dois-and-matching-regular-expressions/
+DOI_PATTERN = re.compile(r"10\.\d{4,9}/[-._;()/:A-Z0-9]+", re.IGNORECASE)
+DOI_TRAILING_CHARS = ".,;:"
+NON_ALNUM_PATTERN = re.compile(r"[^0-9a-z]")
+HEURISTIC_MAX_DOI_NUM = 3
+HEURISTIC_MIN_TITLE_LENGTH = 10
+INVALID_PDF_TITLE_PREFIXES = ("microsoft word", "untitled", "slide")
+INVALID_PDF_TITLE_SUFFIXES = (".pdf", ".doc", ".docx", ".dvi", ".tex", ".indd")
+# The keywords line of the first page, e.g. "Keywords: memristor; neural network" or "Index Terms—memristor, CNN".
+KEYWORDS_LINE_PATTERN = re.compile(r"^\s*(?:key\s*words|index\s+terms)\s*[:.\-\u2013\u2014]\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+KEYWORDS_MAX_CHARS = 300
+# The necessary metadata not asked from the LLM once the Title and DOI are found without it.
+# The missing Paper keywords are extracted from the paper summary later, refer to `PaperStorage._paper_keywords`.
+HEURISTIC_DEFERRED_METADATA = (PAPER_LEVEL_KEYWORDS, )
+
+
+def find_dois(text: str, max_num: int = HEURISTIC_MAX_DOI_NUM) -> List[str]:
+	r"""
+	Find the DOIs in a text, in the order of appearance.
+
+	Args:
+		text (str): The text, such as the first page of a paper.
+		max_num (int): The maximum number of DOIs to return.
+
+	Returns:
+		List[str]: The distinct DOIs.
+	"""
+	dois = []
+	for match in DOI_PATTERN.finditer(text):
+		doi = match.group(0).rstrip(DOI_TRAILING_CHARS)
+		# A DOI in parentheses, e.g. "(doi:10.1038/s41586-020-1942-4)".
+		if doi.endswith(")") and doi.count("(") < doi.count(")"):
+			doi = doi[:-1].rstrip(DOI_TRAILING_CHARS)
+		if doi not in dois:
+			dois.append(doi)
+		if len(dois) >= max_num:
+			break
+	return dois
+
+
+def find_keywords(text: str) -> Optional[str]:
+	r"""
+	Find the keywords listed in a text, such as the first page of a paper.
+
+	Args:
+		text (str): The text.
+
+	Returns:
+		Optional[str]: The comma-separated keywords. If no keywords line is found, return None.
+	"""
+	match = KEYWORDS_LINE_PATTERN.search(text)
+	if match is None:
+		return None
+	keywords = [word.strip() for word in re.split(r"[;,\u00b7\u2022]", match.group(1)[:KEYWORDS_MAX_CHARS])]
+	keywords = [word.rstrip(".") for word in keywords if word]
+	if len(keywords) < 1:
+		return None
+	return ", ".join(keywords)
+
+
+def is_valid_title(title: Optional[str]) -> bool:
+	r""" Filter out the empty titles and the placeholders left by the authoring tools in the PDF info. """
+	if not title:
+		return False
+	title = title.strip()
+	if len(title) < HEURISTIC_MIN_TITLE_LENGTH:
+		return False
+	lowered = title.lower()
+	return not (lowered.startswith(INVALID_PDF_TITLE_PREFIXES) or lowered.endswith(INVALID_PDF_TITLE_SUFFIXES))
+
+
+def pdf_title_candidates(doc: pymupdf.Document) -> List[str]:
+	r""" The titles recorded in the PDF: the title in the info dictionary, and the first TOC entry. """
+	candidates = []
+	info_title = (doc.metadata or {}).get("title", None)
+	if is_valid_title(info_title):
+		candidates.append(info_title.strip())
+
+	toc = doc.get_toc()
+	if len(toc) > 0 and is_valid_title(toc[0][1]):
+		candidates.append(toc[0][1].strip())
+	return candidates
+
+
+def _alnum_text(text: str) -> str:
+	return NON_ALNUM_PATTERN.sub("", text.lower())
+
+
 class PaperMetadataExtractor:
 	r"""
 	This class uses LLM to extracts metadata from a paper.
@@ -64,6 +155,10 @@ class PaperMetadataExtractor:
 	The LLM is instructed to extract all `DEFAULT_NECESSARY_METADATA`.
 	The LLM is encourages to extract `DEFAULT_OPTIONAL_METADATA`.
 
+	Before the LLM, the Title and DOI are looked up in cheap sources: the DOIs in the first page, the title in the
+	PDF info and the TOC. If a pair is validated through the DOI cache (or CrossRef), the LLM is only asked for the
+	necessary metadata still lacked except the `HEURISTIC_DEFERRED_METADATA`, in a single call if any.
+
 	Args:
 		llm (LLM): The used LLM.
 		necessary_metadata (Dict[str, str]): The LLM is instructed to extract all necessary_metadata.
@@ -72,6 +167,7 @@ class PaperMetadataExtractor:
 			Defaults to `DEFAULT_OPTIONAL_METADATA`.
 		max_retry_times (int): The maximum retry times for extracting necessary_metadata.
 		service_context (ServiceContext): The context including llm, embed_model, etc.
+		heuristic_first (bool): Whether to try the deterministic Title and DOI extraction before the LLM.
 	"""
 
 	def __init__(
@@ -81,6 +177,7 @@ class PaperMetadataExtractor:
 		optional_metadata: Dict[str, str] = None,
 		max_retry_times: int = 2,
 		service_context: ServiceContext = None,
+		heuristic_first: bool = True,
 	):
 		self.necessary_metadata = necessary_metadata or DEFAULT_NECESSARY_METADATA
 		self.optional_metadata = optional_metadata or DEFAULT_OPTIONAL_METADATA
@@ -93,6 +190,7 @@ class PaperMetadataExtractor:
 		self.doi_worker = DOIWorker()
 		self.query_engine = SingleQueryEngine(llm=llm, prompt_tmpl=self.prompt_tmpl)
 		self.max_retry_times = max_retry_times
+		self.heuristic_first = heuristic_first
 
 	def _default_transformations(self) -> List[TransformComponent]:
 		return [
@@ -259,39 +357,199 @@ class PaperMetadataExtractor:
 
 		return lack_necessary_metadata, lack_optional_metadata
 
+	def _doi_brief_metadata(self, metadata: Dict[str, Any]) -> Dict[str, str]:
+		r""" Convert the brief metadata of a DOI to the paper metadata names. """
+		paper_metadata = dict()
+		if metadata.get("authors", None) and "Authors" in self.necessary_metadata.keys():
+			paper_metadata["Authors"] = ", ".join(metadata["authors"])
+		if metadata.get("publish_year", None) and "Publish year" in self.optional_metadata.keys():
+			paper_metadata["Publish year"] = str(metadata["publish_year"])
+		return paper_metadata
+
+	def _read_first_page(self, pdf_path: Union[Path, str]) -> Tuple[str, List[str]]:
+		r""" Open the PDF once, and read the text of its first page and the title candidates recorded in it. """
+		with pymupdf.open(pdf_path) as doc:
+			first_page = doc[0].get_text() if doc.page_count > 0 else ""
+			return first_page, pdf_title_candidates(doc)
+
+	def heuristic_extract(
+		self,
+		pdf_path: Union[Path, str] = None,
+		first_page: str = None,
+		known_metadata: Dict[str, str] = None,
+		pdf_titles: List[str] = None,
+	) -> Optional[Dict[str, str]]:
+		r"""
+		Extract the Title and DOI without the LLM.
+
+		The DOI candidates are the known DOI and the DOIs in the first page;
+		the title candidates are the known title, the title in the PDF info and the first TOC entry.
+
+		1. A DOI is accepted if its registered title matches a title candidate, or appears in the first page.
+		2. Otherwise, the DOI of a title candidate is searched.
+
+		The keywords listed in the first page, if any, are returned as the Paper keywords.
+
+		Args:
+			pdf_path (Union[Path, str]): The file path of the paper.
+			first_page (str): The text of the first page. If not given, read from the `pdf_path`.
+			known_metadata (Dict[str, str]): Existing metadata obtained by approaches such as arXiv API.
+			pdf_titles (List[str]): The title candidates recorded in the PDF. If not given, read from the `pdf_path`.
+
+		Returns:
+			Optional[Dict[str, str]]: The Title, DOI and the other metadata registered with the DOI.
+				If no valid pair is found, return None.
+		"""
+		known_metadata = known_metadata or dict()
+		title_candidates = [known_metadata[PAPER_TITLE]] if is_valid_title(known_metadata.get(PAPER_TITLE)) else []
+		if first_page is None or pdf_titles is None:
+			if pdf_path is None:
+				if first_page is None:
+					raise ValueError("pdf_path and first_page can not both be None.")
+				pdf_titles = pdf_titles or []
+			else:
+				read_page, read_titles = self._read_first_page(pdf_path)
+				first_page = read_page if first_page is None else first_page
+				pdf_titles = read_titles if pdf_titles is None else pdf_titles
+		title_candidates.extend(pdf_titles)
+
+		doi_candidates = [known_metadata[PAPER_DOI]] if known_metadata.get(PAPER_DOI) else []
+		doi_candidates.extend(doi for doi in find_dois(first_page) if doi not in doi_candidates)
+
+		paper_metadata = None
+		tolerance = self.doi_worker.title_mismatch_tolerance
+		page_text = _alnum_text(first_page)
+		for doi in doi_candidates:
+			metadata = self.doi_worker.get_doi_metadata(doi)
+			if metadata is None:
+				continue
+			registered_title = metadata["title"]
+			matched = [title for title in title_candidates if title_mismatch_len(registered_title, title) <= tolerance]
+			if len(matched) > 0 or _alnum_text(registered_title) in page_text:
+				paper_metadata = self._doi_brief_metadata(metadata)
+				paper_metadata.update({PAPER_TITLE: matched[0] if matched else registered_title, PAPER_DOI: doi})
+				break
+
+		if paper_metadata is None:
+			for title in title_candidates:
+				doi = self.doi_worker.find_doi_by_title(title=title)
+				if doi is not None:
+					paper_metadata = {PAPER_TITLE: title, PAPER_DOI: doi}
+					break
+
+		if paper_metadata is None:
+			return None
+		keywords = find_keywords(first_page)
+		if keywords is not None and PAPER_LEVEL_KEYWORDS in self.necessary_metadata.keys():
+			paper_metadata[PAPER_LEVEL_KEYWORDS] = keywords
+		return paper_metadata
+
+	def _fill_lacked_metadata(
+		self,
+		paper_metadata: Dict[str, str],
+		first_page: str,
+		show_progress: bool = True,
+	) -> Dict[str, str]:
+		r"""
+		Fill the necessary metadata still lacked after `heuristic_extract`, such as an Abstract not parsed from
+		the paper, with a single LLM call over the first page that asks for the lacked metadata only.
+		The `HEURISTIC_DEFERRED_METADATA` are not asked, and no LLM call is made if nothing else lacks.
+		The found metadata, such as the Title and DOI, are never overwritten.
+
+		Args:
+			paper_metadata (Dict[str, str]): The found metadata.
+			first_page (str): The text of the first page.
+			show_progress (bool): Whether to show the inner progress.
+
+		Returns:
+			Dict[str, str]: The filled metadata.
+		"""
+		lack_necessary_metadata, lack_optional_metadata = self._lacked_metadata(paper_metadata)
+		for key in HEURISTIC_DEFERRED_METADATA:
+			lack_necessary_metadata.pop(key, None)
+		if len(lack_necessary_metadata.keys()) < 1:
+			return paper_metadata
+
+		new_metadata = self._extract_metadata(
+			pdf_docs=[Document(text=first_page)],
+			necessary_metadata=lack_necessary_metadata,
+			optional_metadata=lack_optional_metadata or None,
+		)
+		if show_progress:
+			print_text(f">>>\tLacked metadata extracted: {list(new_metadata.keys())}", color="cyan", end="\n")
+		for key, val in new_metadata.items():
+			if key not in paper_metadata.keys():
+				paper_metadata[key] = val
+		return paper_metadata
+
 	def extract_paper_metadata(
 		self,
 		pdf_path: Union[Path, str] = None,
 		pdf_docs: List[Document] = None,
 		show_progress: bool = True,
 		extra_metadata: dict = None,
+		parsed_metadata: Dict[str, str] = None,
 	) -> Optional[Dict[str, str]]:
 		r"""
 		Extract required metadata from a paper.
 		Title and DOI is necessary, we will use the CrossRef API to get the DOI of a paper according to its title.
 		If any of them misses, this method will return None.
 
+		The PDF is opened once, only its first page is read. The metadata already parsed from the paper,
+		such as the Abstract, are used as they are.
+
+		The Title and DOI are first looked up by `heuristic_extract`. If found, the LLM is only called for the
+		necessary metadata still lacked, except the `HEURISTIC_DEFERRED_METADATA`: for a paper whose Abstract
+		is parsed, no LLM call is made. Otherwise, the LLM extracts all the lacked necessary metadata.
+
 		Args:
 			pdf_path (Union[Path, str]): The file path of the paper.
 			pdf_docs (List[Document]): If the pdf_path is not provided, the provided pdf_docs will be used.
 				pdf_docs and pdf_path can not all be None.
 			show_progress (bool): Whether to show the inner progress.
 			extra_metadata (dict): Existing metadata obtained by approaches such as arXiv API.
+			parsed_metadata (Dict[str, str]): The metadata parsed from the paper, such as the Abstract.
 
 		Returns:
 			Dict[str, str]: The extracted metadata.
 		"""
-		if pdf_path:
-			pdf_docs = PyMuPDFReader().load_data(file_path=pdf_path)
-		elif pdf_docs is None:
+		if not pdf_path and pdf_docs is None:
 			raise ValueError("pdf_path and pdf_docs can not both be None.")
 
+		if pdf_path:
+			first_page, pdf_titles = self._read_first_page(pdf_path)
+		else:
+			first_page, pdf_titles = pdf_docs[0].text, []
+
 		paper_metadata = extra_metadata or dict()
+		for key, val in (parsed_metadata or {}).items():
+			if val and key not in paper_metadata.keys():
+				paper_metadata[key] = val
+
+		if self.heuristic_first:
+			heuristic_metadata = self.heuristic_extract(
+				first_page=first_page,
+				known_metadata=paper_metadata,
+				pdf_titles=pdf_titles,
+			)
+			if heuristic_metadata is not None:
+				if show_progress:
+					print_text(f">>>\tTitle and DOI found without LLM: {heuristic_metadata[PAPER_DOI]}", color="cyan", end="\n")
+				for key, val in heuristic_metadata.items():
+					if key in (PAPER_TITLE, PAPER_DOI) or key not in paper_metadata.keys():
+						paper_metadata[key] = val
+				return self._fill_lacked_metadata(
+					paper_metadata=paper_metadata,
+					first_page=first_page,
+					show_progress=show_progress,
+				)
+
+		first_page_docs = [Document(text=first_page)]
 		lack_necessary_metadata, _ = self._lacked_metadata(paper_metadata)
 		retry_count = 0
 		while len(lack_necessary_metadata.keys()) > 0 and retry_count <= self.max_retry_times:
 			new_metadata = self._extract_metadata(
-				pdf_docs=pdf_docs,
+				pdf_docs=first_page_docs,
 				necessary_metadata=lack_necessary_metadata,
 				optional_metadata=self.optional_metadata,
 			)
@@ -1,10 +1,20 @@
+import re
+import pymupdf
+
 from llama_index.core.settings import llm_from_settings_or_context
 from llama_index.core.llms import LLM
 from llama_index.core import ServiceContext, Settings
 
 from enum import Enum
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional, Dict
+
+from labridge.common.utils.hash import file_sha256
+from labridge.common.utils.json_cache import JsonFileCache
+
+
+PAPER_SOURCE_CACHE_PERSIST_PATH = "storage/paper_cache/source_cache.json"
+SOURCE_ANALYZE_MAX_PAGES = 30
 
 
 class PaperSource(str, Enum):
@@ -13,6 +23,54 @@ class PaperSource(str, Enum):
 	IEEE = "IEEE"
 
 
+# A whole word, the same as a `\w+` token equal to the keyword.
+NATURE_KEYWORD_PATTERN = re.compile(rf"\b{PaperSource.NATURE.value}\b", re.IGNORECASE)
+
+
+class PaperSourceCache(object):
+	r"""
+	An on-disk cache of the analyzed paper sources, keyed by the SHA-256 of the paper file.
+	All instances of the same file share one `JsonFileCache`, refer to `DOICache`.
+
+	Args:
+		persist_path (str): The path of the cache file. Defaults to `PAPER_SOURCE_CACHE_PERSIST_PATH` under the project root.
+		auto_persist (bool): Whether to persist the puts once a batch of them is pending. Defaults to True.
+	"""
+	def __init__(
+		self,
+		persist_path: Optional[str] = None,
+		auto_persist: bool = True,
+	):
+		self.persist_path = persist_path or self._default_persist_path()
+		self.auto_persist = auto_persist
+		self._cache = JsonFileCache.shared(persist_path=self.persist_path)
+
+	def _default_persist_path(self) -> str:
+		r""" Default persist path. """
+		root = Path(__file__)
+		for i in range(6):
+			root = root.parent
+		return str(root / PAPER_SOURCE_CACHE_PERSIST_PATH)
+
+	def load(self):
+		r""" Reload the cache from `self.persist_path`, keeping the puts not persisted yet. """
+		self._cache.load()
+
+	def persist(self):
+		r""" Persist the pending puts. The file is replaced atomically. """
+		self._cache.persist()
+
+	def get_source(self, content_hash: str) -> Optional["PaperSource"]:
+		source = self._cache.get(key=content_hash)
+		if source is None:
+			return None
+		return PaperSource(source)
+
+	def put_source(self, content_hash: str, source: "PaperSource"):
+		if self._cache.put(key=content_hash, value=source.value) and self.auto_persist:
+			self._cache.persist()
+
+
 class PaperSourceAnalyzer:
 	r"""
 	This class analyze the source of the paper, such as 'Nature', 'IEEE'.
@@ -20,20 +78,48 @@ class PaperSourceAnalyzer:
 	In default, the source analysis bases on keyword occurrence count.
 	Also, LLM can be used to help analyzing the source.
 
+	The pages are scanned lazily, until the keyword count exceeds the threshold or `max_pages` pages are scanned.
+	The analyzed sources are cached by the file hash, so a paper is never analyzed twice.
+
 	Args:
 		llm (LLM): The used LLM.
 		service_context (ServiceContext): The service context.
 		keyword_count_threshold (int): A PaperSource is selected as a candidate
 			only if its corresponding keyword occurrence count exceed this threshold.
+		max_pages (int): The maximum number of pages scanned in the keyword analysis.
+		cache (PaperSourceCache): The cache of analyzed sources. Defaults to the on-disk cache under the project root.
 	"""
 	def __init__(
 		self,
 		llm: LLM = None,
 		service_context: ServiceContext = None,
 		keyword_count_threshold: int = 10,
+		max_pages: int = SOURCE_ANALYZE_MAX_PAGES,
+		cache: Optional[PaperSourceCache] = None,
 	):
 		self.llm = llm or llm_from_settings_or_context(Settings, service_context)
 		self.keyword_count_threshold = keyword_count_threshold
+		self.max_pages = max_pages
+		self.cache = cache or PaperSourceCache()
+
+	def _subject_source(self, doc: pymupdf.Document) -> Optional[PaperSource]:
+		r""" Analyze the paper source according to the subject in the PDF info. """
+		src_string = (doc.metadata or {}).get("subject", None)
+		if not src_string or len(src_string) < len(PaperSource.NATURE):
+			return None
+		if PaperSource.NATURE.upper() in src_string.upper():
+			return PaperSource.NATURE
+		return PaperSource.IEEE
+
+	def _keyword_source(self, doc: pymupdf.Document) -> PaperSource:
+		r""" Analyze the paper source according to the keyword count, stop once the count exceeds the threshold. """
+		count = 0
+		for page_idx in range(min(doc.page_count, self.max_pages)):
+			for _ in NATURE_KEYWORD_PATTERN.finditer(doc[page_idx].get_text()):
+				count += 1
+				if count > self.keyword_count_threshold:
+					return PaperSource.NATURE
+		return PaperSource.IEEE
 
 	def reader_analyze(self, paper_path: Union[Path, str]) -> PaperSource:
 		"""
@@ -45,21 +131,8 @@ class PaperSourceAnalyzer:
 		Returns:
 			PaperSource: The paper source.
 		"""
-		import PyPDF2
-
-		with open(paper_path, 'rb') as file:
-			fileReader = PyPDF2.PdfReader(file)
-			file_info = fileReader.trailer['/Info']
-
-		source = None
-		if '/Subject' in file_info.keys():
-			src_string = file_info['/Subject']
-			if len(src_string) >= len(PaperSource.NATURE):
-				source = PaperSource.IEEE
-				for start in range(len(src_string) - len(PaperSource.NATURE) + 1):
-					if src_string[start: start + len(PaperSource.NATURE)].upper() == PaperSource.NATURE.upper():
-						source = PaperSource.NATURE
-		return source
+		with pymupdf.open(paper_path) as doc:
+			return self._subject_source(doc)
 
 	def llm_analyze(self, paper_path: Union[Path, str]) -> PaperSource:
 		""" TODO: using llm. """
@@ -75,28 +148,13 @@ class PaperSourceAnalyzer:
 		Returns:
 			PaperSource: The analyzed paper source.
 		"""
-		import pymupdf
-		import re
-
-		doc = pymupdf.open(paper_path)
-		pages = [page.get_text() for page in doc]
-
-		""" Searching in the text."""
-		source = None
-		count = 0
-		for page_text in pages:
-			for t in re.findall(r"\w+", page_text):
-				if t.strip().upper() == PaperSource.NATURE.upper():
-					count += 1
-		if count > self.keyword_count_threshold:
-			source = PaperSource.NATURE
-		else:
-			source = PaperSource.IEEE
-		return source
+		with pymupdf.open(paper_path) as doc:
+			return self._keyword_source(doc)
 
 	def analyze_source(self, paper_path: Union[Path, str], use_llm = False) -> PaperSource:
 		r"""
-		Sequentially use `reader_analyze`, `keyword_analyze`, and `llm_analyze` to analyze the paper source
+		Sequentially use `reader_analyze`, `keyword_analyze`, and `llm_analyze` to analyze the paper source.
+		The PDF is opened only once, and the result is cached by the file hash.
 
 		Args:
 			paper_path (Union[Path, str]): The paper path.
@@ -105,11 +163,18 @@ class PaperSourceAnalyzer:
 		Returns:
 			PaperSource
 		"""
-		source = self.reader_analyze(paper_path)
-		if source is None:
-			source = self.keyword_analyze(paper_path)
+		content_hash = file_sha256(str(paper_path))
+		source = self.cache.get_source(content_hash)
+		if source is not None:
+			return source
+
+		with pymupdf.open(paper_path) as doc:
+			source = self._subject_source(doc)
+			if source is None:
+				source = self._keyword_source(doc)
 		if source is None and use_llm:
 			source = self.llm_analyze(paper_path)
 		if source is None:
 			source = PaperSource.DEFAULT
+		self.cache.put_source(content_hash, source)
 		return source
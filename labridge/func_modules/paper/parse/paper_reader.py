@@ -18,6 +18,7 @@ from llama_index.core.llms import LLM
 
 from .parsers.base import MetadataContents, ChunkContents, CONTENT_TYPE_NAME
 from .parsers.auto import auto_parse_paper
+from .parsed_cache import ParsedPaperCache, ParsedPaper
 from .extractors.source_analyze import PaperSourceAnalyzer
 from .extractors.metadata_extract import (
 	PaperMetadataExtractor,
@@ -86,6 +87,8 @@ class PaperReader:
 		required_exts: Optional[List[str]] = None,
 		num_files_limit: Optional[int] = None,
 		fs: Optional[fsspec.AbstractFileSystem] = None,
+		parsed_cache: Optional[ParsedPaperCache] = None,
+		use_parsed_cache: bool = True,
 	):
 		self.metadata_extractor = None
 		self.extract_metadata = extract_metadata
@@ -111,6 +114,9 @@ class PaperReader:
 		self.required_exts = required_exts
 		self.num_files_limit = num_files_limit
 		self.fs = fs or LocalFileSystem()
+		self.parsed_cache = None
+		if use_parsed_cache:
+			self.parsed_cache = parsed_cache or ParsedPaperCache()
 		root = Path(__file__)
 		for i in range(5):
 			root = root.parent
@@ -166,43 +172,69 @@ class PaperReader:
 			raise ValueError("Expect a PDF file.")
 		if show_progress:
 			print_text(f">>> Loading {file_path}", color="blue", end="\n")
-		parsed_docs = auto_parse_paper(
-			file_path=file_path,
-			source_analyzer=self.source_analyzer,
-			use_llm_for_source=self.use_llm_for_source
-		)
-
-		chunk_docs, extra_docs, metadata_docs = [], [], []
-		for doc in parsed_docs:
-			if doc.metadata[CONTENT_TYPE_NAME] in MetadataContents:
-				metadata_docs.append(doc)
-			elif doc.metadata[CONTENT_TYPE_NAME] in ChunkContents:
-				chunk_docs.append(doc)
-			else:
-				extra_docs.append(doc)
+
+		content_hash, parsed_paper = None, None
+		if self.parsed_cache is not None:
+			content_hash = self.parsed_cache.file_hash(str(file_path))
+			parsed_paper = self.parsed_cache.get_parsed(content_hash)
+			if parsed_paper is not None and show_progress:
+				print_text(f">>>\tParsed contents found in cache.", color="cyan", end="\n")
+
+		cache_dirty = parsed_paper is None
+		if parsed_paper is None:
+			parsed_docs = auto_parse_paper(
+				file_path=file_path,
+				source_analyzer=self.source_analyzer,
+				use_llm_for_source=self.use_llm_for_source
+			)
+
+			chunk_docs, extra_docs, metadata_docs = [], [], []
+			for doc in parsed_docs:
+				if doc.metadata[CONTENT_TYPE_NAME] in MetadataContents:
+					metadata_docs.append(doc)
+				elif doc.metadata[CONTENT_TYPE_NAME] in ChunkContents:
+					chunk_docs.append(doc)
+				else:
+					extra_docs.append(doc)
+			parsed_paper = ParsedPaper(chunk_docs=chunk_docs, extra_docs=extra_docs, metadata_docs=metadata_docs)
 
 		# metadata
 		paper_metadata = dict()
 
 		if self.extract_metadata:
-			paper_metadata = self.metadata_extractor.extract_paper_metadata(
-				pdf_path=file_path,
-				extra_metadata=extra_metadata,
-			)
-			if paper_metadata is None:
-				print(f"Loading DOI failed: {file_path}")
-				return None
+			if parsed_paper.paper_metadata is None:
+				extracted_metadata = self.metadata_extractor.extract_paper_metadata(
+					pdf_path=file_path,
+					extra_metadata=extra_metadata,
+					parsed_metadata={
+						meta_doc.metadata[CONTENT_TYPE_NAME]: meta_doc.text for meta_doc in parsed_paper.metadata_docs
+					},
+				)
+				if extracted_metadata is None:
+					print(f"Loading DOI failed: {file_path}")
+					return None
+				parsed_paper.paper_metadata = dict(extracted_metadata)
+				cache_dirty = True
+			else:
+				extracted_metadata = dict(parsed_paper.paper_metadata)
+				extracted_metadata.update(extra_metadata or {})
+			paper_metadata = extracted_metadata
 
-			for meta_doc in metadata_docs:
+			for meta_doc in parsed_paper.metadata_docs:
 				metadata_name = meta_doc.metadata[CONTENT_TYPE_NAME]
 				if metadata_name not in paper_metadata.keys():
 					paper_metadata[metadata_name] = meta_doc.text
 
+		# Cached without the path-dependent metadata, the same paper may be stored in different paths.
+		if self.parsed_cache is not None and cache_dirty:
+			self.parsed_cache.put_parsed(content_hash, parsed_paper)
+
 		possessor = self.get_paper_possessor(file_path)
 		paper_metadata[PAPER_POSSESSOR] = possessor
 		paper_metadata[PAPER_REL_FILE_PATH] = str(file_path.relative_to(self.root))
 
-		for idx, doc in enumerate(parsed_docs):
+		chunk_docs, extra_docs = parsed_paper.chunk_docs, parsed_paper.extra_docs
+		for idx, doc in enumerate(chunk_docs + extra_docs):
 			doc.metadata.update(paper_metadata)
 			if self.filename_as_id:
 				rel_path = str(file_path.relative_to(self.root))
@@ -0,0 +1,188 @@
+import fsspec
+import logging
+import msgpack
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Any
+
+from llama_index.core.schema import Document
+
+from labridge.common.utils.hash import file_sha256
+from labridge.common.utils.atomic_write import atomic_write
+from .parsers.base import PAPER_PARSER_VERSION
+
+
+PARSED_PAPER_CACHE_DIR = "storage/paper_cache/parsed_papers"
+
+PARSED_CHUNK_DOCS_KEY = "chunk_docs"
+PARSED_EXTRA_DOCS_KEY = "extra_docs"
+PARSED_METADATA_DOCS_KEY = "metadata_docs"
+PARSED_METADATA_KEY = "paper_metadata"
+
+PARSED_DOC_TEXT_KEY = "text"
+PARSED_DOC_METADATA_KEY = "metadata"
+PARSED_DOC_EXCLUDED_EMBED_KEY = "excluded_embed_metadata_keys"
+PARSED_DOC_EXCLUDED_LLM_KEY = "excluded_llm_metadata_keys"
+
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedPaper(object):
+	r"""
+	The cached parsing result of a paper.
+
+	Args:
+		chunk_docs (List[Document]): The docs for retrieving, such as main text, methods.
+		extra_docs (List[Document]): The docs of supplementary information, such as references.
+		metadata_docs (List[Document]): The docs of paper level metadata, such as abstract.
+		paper_metadata (Optional[Dict[str, Any]]): The metadata extracted by the `PaperMetadataExtractor`,
+			excluding the path-dependent ones such as the possessor and the relative file path.
+			None if the metadata is not extracted.
+	"""
+	def __init__(
+		self,
+		chunk_docs: List[Document],
+		extra_docs: List[Document],
+		metadata_docs: List[Document],
+		paper_metadata: Optional[Dict[str, Any]] = None,
+	):
+		self.chunk_docs = chunk_docs
+		self.extra_docs = extra_docs
+		self.metadata_docs = metadata_docs
+		self.paper_metadata = paper_metadata
+
+
+def _pack_docs(docs: List[Document]) -> List[Dict[str, Any]]:
+	return [
+		{
+			PARSED_DOC_TEXT_KEY: doc.text,
+			PARSED_DOC_METADATA_KEY: doc.metadata,
+			PARSED_DOC_EXCLUDED_EMBED_KEY: doc.excluded_embed_metadata_keys,
+			PARSED_DOC_EXCLUDED_LLM_KEY: doc.excluded_llm_metadata_keys,
+		}
+		for doc in docs
+	]
+
+
+def _unpack_docs(packed_docs: List[Dict[str, Any]]) -> List[Document]:
+	return [
+		Document(
+			text=packed_doc[PARSED_DOC_TEXT_KEY],
+			extra_info=packed_doc[PARSED_DOC_METADATA_KEY],
+			excluded_embed_metadata_keys=packed_doc[PARSED_DOC_EXCLUDED_EMBED_KEY],
+			excluded_llm_metadata_keys=packed_doc[PARSED_DOC_EXCLUDED_LLM_KEY],
+		)
+		for packed_doc in packed_docs
+	]
+
+
+class ParsedPaperCache(object):
+	r"""
+	An on-disk cache of the parsed papers, keyed by the SHA-256 of the paper file and the parser version.
+
+	Each paper is stored in a msgpack file `{content_hash}_v{parser_version}.msgpack`, thus rebuilding the indices
+	(e.g. with another chunk size) reuses the parsed contents and extracted metadata,
+	without calling the PDF library or the LLM again.
+
+	The text, metadata and excluded metadata keys of each doc are cached. The doc ids are not cached, as the same
+	paper may be stored in different paths, the reader assigns new ids to the docs read from the cache.
+
+	Args:
+		cache_dir (str): The directory of the cache files. Defaults to `PARSED_PAPER_CACHE_DIR` under the project root.
+		parser_version (str): The parser version. Defaults to `PAPER_PARSER_VERSION`.
+	"""
+	def __init__(
+		self,
+		cache_dir: Optional[str] = None,
+		parser_version: str = PAPER_PARSER_VERSION,
+	):
+		self.cache_dir = cache_dir or self._default_cache_dir()
+		self.parser_version = parser_version
+		self._fs = fsspec.filesystem("file")
+		self._file_hashes: Dict[str, Tuple[int, float, str]] = {}
+
+	def _default_cache_dir(self) -> str:
+		r""" Default cache directory. """
+		root = Path(__file__)
+		for i in range(5):
+			root = root.parent
+		return str(root / PARSED_PAPER_CACHE_DIR)
+
+	def _entry_path(self, content_hash: str) -> str:
+		return str(Path(self.cache_dir) / f"{content_hash}_v{self.parser_version}.msgpack")
+
+	def file_hash(self, file_path: str) -> Optional[str]:
+		r"""
+		Get the content hash of a paper file, re-hashing it only if its size or mtime changed.
+
+		Args:
+			file_path (str): The paper file path.
+
+		Returns:
+			Optional[str]: The hash. If the file does not exist, return None.
+		"""
+		try:
+			stat = Path(file_path).stat()
+		except OSError:
+			return None
+
+		cached = self._file_hashes.get(file_path, None)
+		if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime):
+			return cached[2]
+
+		content_hash = file_sha256(file_path, fs=self._fs)
+		self._file_hashes[file_path] = (stat.st_size, stat.st_mtime, content_hash)
+		return content_hash
+
+	def get_parsed(self, content_hash: str) -> Optional[ParsedPaper]:
+		r"""
+		Get the cached parsing result of a paper.
+
+		Args:
+			content_hash (str): The content hash of the paper.
+
+		Returns:
+			Optional[ParsedPaper]: The parsing result. If not cached or the cache file is broken, return None.
+		"""
+		entry_path = self._entry_path(content_hash)
+		if not self._fs.exists(entry_path):
+			return None
+		try:
+			with self._fs.open(entry_path, "rb") as f:
+				entry = msgpack.unpackb(f.read(), raw=False)
+			return ParsedPaper(
+				chunk_docs=_unpack_docs(entry[PARSED_CHUNK_DOCS_KEY]),
+				extra_docs=_unpack_docs(entry[PARSED_EXTRA_DOCS_KEY]),
+				metadata_docs=_unpack_docs(entry[PARSED_METADATA_DOCS_KEY]),
+				paper_metadata=entry[PARSED_METADATA_KEY],
+			)
+		except (OSError, ValueError, KeyError, TypeError, msgpack.UnpackException):
+			return None
+
+	def put_parsed(self, content_hash: str, parsed_paper: ParsedPaper) -> bool:
+		r"""
+		Cache the parsing result of a paper. The file is replaced atomically.
+		If the metadata can not be serialized by msgpack, the paper is not cached,
+		rather than caching metadata that differs from the parsed ones.
+
+		Args:
+			content_hash (str): The content hash of the paper.
+			parsed_paper (ParsedPaper): The parsing result.
+
+		Returns:
+			bool: Whether the parsing result is cached.
+		"""
+		entry = {
+			PARSED_CHUNK_DOCS_KEY: _pack_docs(parsed_paper.chunk_docs),
+			PARSED_EXTRA_DOCS_KEY: _pack_docs(parsed_paper.extra_docs),
+			PARSED_METADATA_DOCS_KEY: _pack_docs(parsed_paper.metadata_docs),
+			PARSED_METADATA_KEY: parsed_paper.paper_metadata,
+		}
+		try:
+			packed_entry = msgpack.packb(entry, use_bin_type=True)
+		except (TypeError, ValueError, OverflowError) as e:
+			logger.warning("The parsing result of %s is not cached, unserializable metadata: %s", content_hash, e)
+			return False
+		atomic_write(self._entry_path(content_hash), packed_entry)
+		return True
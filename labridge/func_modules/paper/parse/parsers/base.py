@@ -1,3 +1,4 @@
+import re
 import pymupdf
 
 from abc import abstractmethod
@@ -9,6 +10,9 @@ from llama_index.core.schema import Document
 
 CONTENT_TYPE_NAME = "Content type"
 
+# Bump it once the separators or the splitting logic change, so that the cached parsing results are invalidated.
+PAPER_PARSER_VERSION = "1"
+
 # Content names:
 # Note: no '_' is allowed in a Content name.
 ABSTRACT = "Abstract"
@@ -52,6 +56,46 @@ def get_sep_idx(text: str, separators: List[Tuple[str]], tolerance: int):
 	return sep_idx
 
 
+class SeparatorMatcher(object):
+	r"""
+	The separators compiled into one case-insensitive regex, equivalent to `get_sep_idx`.
+
+	For each group of separators, a lookahead checks whether any of them starts within the first `tolerance` chars
+	of the text (newlines removed). The lookaheads are alternated in the order of the groups, so that the first
+	matched group wins, as in `get_sep_idx`.
+
+	Args:
+		separators (List[Tuple[str]]): Each tuple includes the separators that separate two components.
+		tolerance (int): The tolerance of mismatch chars.
+	"""
+	def __init__(self, separators: List[Tuple[str]], tolerance: int):
+		self.separators = separators
+		self.tolerance = tolerance
+		max_start = max(tolerance, 1) - 1
+		alternatives = []
+		for idx, each_separators in enumerate(separators):
+			seps = "|".join(re.escape(sep) for sep in each_separators)
+			alternatives.append(f"(?=.{{0,{max_start}}}(?:{seps}))(?P<sep{idx}>)")
+		self._pattern = re.compile("|".join(alternatives), re.IGNORECASE | re.DOTALL) if alternatives else None
+
+	def get_sep_idx(self, text: str) -> int:
+		r"""
+		Get the index of the first separator group matching the text.
+
+		Args:
+			text (str): The text of a block.
+
+		Returns:
+			int: The index of the separator group, -1 if none matches.
+		"""
+		if self._pattern is None:
+			return -1
+		matched = self._pattern.match(text.replace("\n", ""))
+		if matched is None:
+			return -1
+		return int(matched.lastgroup[len("sep"):])
+
+
 class BasePaperParser:
 	r"""
 	This is the base paper parser.
@@ -71,6 +115,16 @@ class BasePaperParser:
 		self.separators = separators
 		self.content_names = content_names
 		self.separator_tolerance = separator_tolerance
+		self._separator_matcher = None
+
+	@property
+	def separator_matcher(self) -> SeparatorMatcher:
+		r""" The compiled matcher of `self.separators`, compiled again only if the separators are changed. """
+		matcher = self._separator_matcher
+		if matcher is None or matcher.separators != self.separators or matcher.tolerance != self.separator_tolerance:
+			matcher = SeparatorMatcher(separators=self.separators, tolerance=self.separator_tolerance)
+			self._separator_matcher = matcher
+		return matcher
 
 	@abstractmethod
 	def parse_title(self, file_path: Union[str, Path]) -> str:
@@ -140,6 +194,7 @@ class BasePaperParser:
 			raise TypeError("file_path must be a string or Path.")
 
 		separators = self.separators
+		separator_matcher = self.separator_matcher
 		doc = pymupdf.open(file_path)
 		pages = [page.get_textpage() for page in doc]
 
@@ -152,7 +207,7 @@ class BasePaperParser:
 			if idx == 0:
 				page_blocks.pop(0)
 			for each_block in page_blocks:
-				sep_idx = get_sep_idx(each_block[text_in_block], separators, self.separator_tolerance)
+				sep_idx = separator_matcher.get_sep_idx(each_block[text_in_block])
 				if sep_p < len(separators) and sep_idx >= sep_p:
 					text_list = [block[text_in_block] for block in text_blocks]
 					text = ''.join(text_list)
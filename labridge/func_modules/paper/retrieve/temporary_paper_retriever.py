@@ -293,6 +293,7 @@ class RecentPaperRetriever:
 			item_to_be_retrieved=item_to_be_retrieved,
 			confine_node_ids=node_ids_range,
 		)
+		self.paper_store.mark_retrieved(node_ids=[node.node_id for node in relevant_nodes])
 		if self._final_use_context:
 			relevant_nodes = self._add_context(content_nodes=relevant_nodes)
 
@@ -363,6 +364,7 @@ class RecentPaperRetriever:
 			item_to_be_retrieved=item_to_be_retrieved,
 			confine_node_ids=node_ids_range,
 		)
+		self.paper_store.mark_retrieved(node_ids=[node.node_id for node in relevant_nodes])
 		if self._final_use_context:
 			relevant_nodes = self._add_context(content_nodes=relevant_nodes)
 		return relevant_nodes
@@ -0,0 +1,159 @@
+r"""
+The ingestion journal of the shared paper storage.
+
+Persisting the `SharedPaperStorage` re-serializes the whole vector stores, which is too expensive to do after every
+paper of a bulk ingestion. Instead, once a paper is ingested, the nodes it created or updated (along with their
+embeddings) are appended to a JSON Lines journal as a checkpoint. If the ingestion is interrupted, the journal is
+replayed on the last persisted storage and the ingestion resumes from the first paper not in the journal.
+The journal is cleared after the storage is fully persisted.
+"""
+
+import os
+import json
+import fsspec
+
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional
+
+
+SHARED_PAPER_INGEST_JOURNAL_NAME = "ingest_journal.jsonl"
+
+JOURNAL_RECORD_TYPE_KEY = "type"
+JOURNAL_PAPER_KEY = "paper"
+JOURNAL_PAPER_ID_KEY = "paper_id"
+JOURNAL_INDICES_KEY = "indices"
+JOURNAL_UPSERT_KEY = "upsert"
+JOURNAL_DELETE_KEY = "delete"
+JOURNAL_NODE_KEY = "node"
+JOURNAL_EMBEDDING_KEY = "embedding"
+
+
+class JournalRecordType(object):
+	PAPER = "paper"
+	DIR_SUMMARY = "dir_summary"
+
+
+class IngestJournal(object):
+	r"""
+	An append-only journal, each line records a completed paper:
+
+	```
+	{
+		"type": "paper",
+		"paper": raw paper path,
+		"paper_id": node id of the paper node,
+		"indices": {
+			index_name: {
+				"upsert": [{"node": node json, "embedding": List[float]}, ...],
+				"delete": [node_id, ...],
+			},
+		},
+	}
+	```
+
+	Other changes, such as the updated directory summaries, are recorded with their own `JournalRecordType`
+	and the `indices` only, refer to `append_changes`. A line without the type is a paper record.
+
+	Each line is flushed and synced to disk once written, a truncated last line (crash while writing) is ignored.
+
+	Args:
+		persist_path (str): The path of the journal file.
+			The `SharedPaperStorage` keeps it beside its persist directory, named `SHARED_PAPER_INGEST_JOURNAL_NAME`.
+	"""
+	def __init__(self, persist_path: str):
+		self.persist_path = persist_path
+		self._fs = fsspec.filesystem("file")
+		self._record_num: Optional[int] = None
+
+	def _read_records(self) -> Iterator[Dict[str, Any]]:
+		if not self._fs.exists(self.persist_path):
+			return
+		with open(self.persist_path, "r", encoding="utf-8") as f:
+			for line in f:
+				if not line.endswith("\n"):
+					break
+				try:
+					yield json.loads(line)
+				except ValueError:
+					break
+
+	def records(self, record_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+		r"""
+		Iterate over the complete records in the journal.
+
+		Args:
+			record_type (Optional[str]): Only the records of this `JournalRecordType`. Defaults to all records.
+		"""
+		for record in self._read_records():
+			if record_type is None or record.get(JOURNAL_RECORD_TYPE_KEY, JournalRecordType.PAPER) == record_type:
+				yield record
+
+	@property
+	def record_num(self) -> int:
+		r""" The number of the complete records, counted once and then kept along with the appends. """
+		if self._record_num is None:
+			self._record_num = sum(1 for _ in self._read_records())
+		return self._record_num
+
+	def completed_papers(self) -> Dict[str, str]:
+		r"""
+		Get the papers recorded in the journal.
+
+		Returns:
+			Dict[str, str]: `{raw paper path: paper node id}`.
+		"""
+		return {
+			record[JOURNAL_PAPER_KEY]: record[JOURNAL_PAPER_ID_KEY]
+			for record in self.records(record_type=JournalRecordType.PAPER)
+		}
+
+	def append(
+		self,
+		paper: str,
+		paper_id: str,
+		indices: Dict[str, Dict[str, List[Any]]],
+	):
+		r"""
+		Append the checkpoint of a completed paper.
+
+		Args:
+			paper (str): The raw paper path.
+			paper_id (str): The node id of the paper node.
+			indices (Dict[str, Dict[str, List[Any]]]): The upserted nodes and the deleted node ids of each index.
+		"""
+		self._append_record(
+			{
+				JOURNAL_RECORD_TYPE_KEY: JournalRecordType.PAPER,
+				JOURNAL_PAPER_KEY: paper,
+				JOURNAL_PAPER_ID_KEY: paper_id,
+				JOURNAL_INDICES_KEY: indices,
+			}
+		)
+
+	def append_changes(self, record_type: str, indices: Dict[str, Dict[str, List[Any]]]):
+		r"""
+		Append the changes not belonging to a paper.
+
+		Args:
+			record_type (str): The `JournalRecordType` of the changes.
+			indices (Dict[str, Dict[str, List[Any]]]): The upserted nodes and the deleted node ids of each index.
+		"""
+		self._append_record({JOURNAL_RECORD_TYPE_KEY: record_type, JOURNAL_INDICES_KEY: indices})
+
+	def _append_record(self, record: Dict[str, Any]):
+		record_num = self.record_num
+		dir_path = str(Path(self.persist_path).parent)
+		if not self._fs.exists(dir_path):
+			self._fs.makedirs(dir_path)
+
+		with open(self.persist_path, "a", encoding="utf-8") as f:
+			f.write(json.dumps(record, ensure_ascii=False) + "\n")
+			f.flush()
+			os.fsync(f.fileno())
+		self._record_num = record_num + 1
+
+	def clear(self):
+		r""" Remove the journal, called after the storage is fully persisted. """
+		if self._fs.exists(self.persist_path):
+			self._fs.rm(self.persist_path)
+		self._record_num = 0
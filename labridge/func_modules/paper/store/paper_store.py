@@ -1,21 +1,31 @@
 import os
-
-from typing import Optional, List, Union, cast, Dict, Any
+import json
+import fsspec
+import pymupdf
+import hashlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Union, cast, Dict, Any, Set
 from pathlib import Path
 
 from llama_index.core.indices.document_summary import DocumentSummaryIndex
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.base.embeddings.base import BaseEmbedding
-from llama_index.readers.file.pymu_pdf import PyMuPDFReader
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.service_context import ServiceContext
 from llama_index.core.storage import StorageContext
 from llama_index.core import load_index_from_storage
 from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from llama_index.core.indices.base import BaseIndex
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
 from llama_index.core.base.response.schema import Response
 from llama_index.core.utils import print_text
 from llama_index.core.llms import LLM
 from llama_index.core.schema import (
+	BaseNode,
 	Document,
 	TransformComponent,
 	NodeRelationship,
@@ -58,6 +68,16 @@ from ..prompt.synthesize.paper_summarize import (
 )
 
 from ..synthesizer.summarize import PaperBatchSummarize
+from labridge.common.utils.atomic_write import atomic_write
+from .ingest_journal import (
+	IngestJournal,
+	JournalRecordType,
+	JOURNAL_INDICES_KEY,
+	JOURNAL_UPSERT_KEY,
+	JOURNAL_DELETE_KEY,
+	JOURNAL_NODE_KEY,
+	JOURNAL_EMBEDDING_KEY,
+)
 
 
 PAPER_VECTOR_INDEX_ID = "vector_index"
@@ -76,6 +96,12 @@ DEFAULT_PAPER_VECTOR_PERSIST_DIR = "storage/papers/vector_index"
 DEFAULT_PAPER_SUMMARY_PERSIST_DIR = "storage/papers/paper_summary_index"
 DEFAULT_DIRECTORY_SUMMARY_PERSIST_DIR = "storage/papers/directory_summary_index"
 
+DIR_SUMMARY_JOURNAL_NAME = "directory_summary_journal.jsonl"
+DIR_SUMMARY_JOURNAL_MAX_RECORDS = 64
+PAPER_KEYWORDS_CACHE_NAME = "paper_keywords_cache.json"
+DIR_SUMMARY_MAX_CONCURRENCY = 4
+DIR_PRESELECT_TOP_K = 10
+
 
 class PaperStorage(object):
 	r"""
@@ -131,6 +157,9 @@ class PaperStorage(object):
 		self.paper_summary_query = paper_summary_query
 		if summary_synthesizer is None:
 			self.summary_synthesizer = PaperBatchSummarize(llm=self.llm, max_tokens=8000, overlap_chunk_num=1)
+		# The ids of the docs in each index, updated incrementally on insertion.
+		self._vector_doc_ids: Optional[Set[str]] = None
+		self._paper_summary_doc_ids: Optional[Set[str]] = None
 
 		if (vector_index is None or paper_summary_index is None) and (docs is None or extra_docs is None):
 			raise ValueError("Please provide (docs, extra_docs) or existed (vector_index, summary_index).")
@@ -280,6 +309,36 @@ class PaperStorage(object):
 				return False
 		return True
 
+	@property
+	def vector_doc_ids(self) -> Set[str]:
+		r""" The ids of the docs in the vector index. """
+		if self._vector_doc_ids is None:
+			self._vector_doc_ids = set(self.vector_index.docstore.get_all_ref_doc_info().keys())
+		return self._vector_doc_ids
+
+	@property
+	def paper_summary_doc_ids(self) -> Set[str]:
+		r""" The ids of the docs in the summary index. """
+		if self._paper_summary_doc_ids is None:
+			self._paper_summary_doc_ids = set(self.paper_summary_index.docstore.get_all_ref_doc_info().keys())
+		return self._paper_summary_doc_ids
+
+	def _insert_docs(self, index: BaseIndex, docs: List[Document]):
+		r"""
+		Insert docs to an index in one batch, equivalent to `index.insert` for each doc.
+		The nodes of all docs are embedded (or summarized) together in `insert_nodes`.
+
+		Args:
+			index (BaseIndex): The vector index or the summary index.
+			docs (List[Document]): The docs to insert.
+		"""
+		if len(docs) < 1:
+			return
+		nodes = run_transformations(docs, index._transformations)
+		index.insert_nodes(nodes)
+		for doc in docs:
+			index.docstore.set_document_hash(doc.get_doc_id(), doc.hash)
+
 	def insert(self, paper_docs: List[Document], extra_docs: List[Document]):
 		r"""
 		Add new papers to index.
@@ -288,6 +347,9 @@ class PaperStorage(object):
 		Encourage you to build a storage with one paper first, then use `insert` methods to add other papers,
 		because we can control the summarize query depending on each doc's type.
 
+		The docs already in the indices are skipped. The new docs are inserted to the summary index in one batch
+		per doc type, and to the vector index in one batch.
+
 		Args:
 			paper_docs (List[Document]): these docs will be summarized; chunked and vectorized.
 			extra_docs (List[Document]): these docs are stored in docstore.
@@ -295,17 +357,25 @@ class PaperStorage(object):
 		if not self._are_valid_docs(paper_docs + extra_docs):
 			raise ValueError(f"Doc not in paper warehouse.")
 
+		summary_docs: Dict[str, Dict[str, Document]] = {}
+		vector_docs: Dict[str, Document] = {}
 		for doc in paper_docs:
 			doc_type = doc.metadata[CONTENT_TYPE_NAME]
 			if doc_type not in SummarizeQueries.keys():
 				raise ValueError(f'Invalid paper doc type: {doc_type}. Acceptable: {list(SummarizeQueries.keys())}.')
-			sum_query = SummarizeQueries[doc_type]
-			self.paper_summary_index._response_synthesizer._summary_query = sum_query
 
-			if doc.doc_id not in self.paper_summary_index.docstore.get_all_ref_doc_info().keys():
-				self.paper_summary_index.insert(document=doc)
-			if doc.doc_id not in self.vector_index.docstore.get_all_ref_doc_info().keys():
-				self.vector_index.insert(document=doc)
+			if doc.doc_id not in self.paper_summary_doc_ids:
+				summary_docs.setdefault(doc_type, {}).setdefault(doc.doc_id, doc)
+			if doc.doc_id not in self.vector_doc_ids:
+				vector_docs.setdefault(doc.doc_id, doc)
+
+		for doc_type, docs in summary_docs.items():
+			self.paper_summary_index._response_synthesizer._summary_query = SummarizeQueries[doc_type]
+			self._insert_docs(index=self.paper_summary_index, docs=list(docs.values()))
+			self.paper_summary_doc_ids.update(docs.keys())
+
+		self._insert_docs(index=self.vector_index, docs=list(vector_docs.values()))
+		self.vector_doc_ids.update(vector_docs.keys())
 
 		self.vector_index.docstore.add_documents(extra_docs)
 		self.paper_summary_index.docstore.add_documents(extra_docs)
@@ -349,7 +419,9 @@ class PaperDirectorySummaryStore:
 		paper_summary_persist_dir (str): the directory storing the paper summary index.
 		directory_summary_persist_dir (str): the directory storing the directory summary index.
 		service_context (ServiceContext): service_context
-		dir_choice_batch_size (int):
+		dir_preselect_top_k (int): the number of directories shortlisted by embedding similarity for the LLM to
+			choose from when matching a new paper.
+		max_concurrency (int): the max number of directories summarized concurrently.
 	"""
 	def __init__(
 		self,
@@ -359,7 +431,8 @@ class PaperDirectorySummaryStore:
 		paper_summary_persist_dir: Union[str, os.PathLike] = None,
 		directory_summary_persist_dir: Union[str, os.PathLike] = None,
 		service_context: Optional[ServiceContext] = None,
-		dir_choice_batch_size: int = 5,
+		dir_preselect_top_k: int = DIR_PRESELECT_TOP_K,
+		max_concurrency: int = DIR_SUMMARY_MAX_CONCURRENCY,
 	):
 		root = Path(__file__)
 		for i in range(5):
@@ -381,149 +454,325 @@ class PaperDirectorySummaryStore:
 			path=directory_summary_persist_dir,
 			default=root / DEFAULT_DIRECTORY_SUMMARY_PERSIST_DIR,
 		)
-		if not Path(self.directory_summary_persist_dir).exists():
-			self._auto_construct()
-		directory_storage_context = StorageContext.from_defaults(persist_dir=self.directory_summary_persist_dir)
-		self.directory_summary_index = load_index_from_storage(
-			storage_context=directory_storage_context,
-			index_id=DIR_SUMMARY_INDEX_ID,
-			service_context=self.service_context,
+		self.dir_preselect_top_k = dir_preselect_top_k
+		self.max_concurrency = max_concurrency
+		self.dir_synthesizer = get_response_synthesizer(
+			llm=self.llm,
+			response_mode=ResponseMode.COMPACT_ACCUMULATE,
 		)
-		self.dir_choice_batch_size = dir_choice_batch_size
+		self._fs = fsspec.filesystem("file")
+		self._lock = threading.Lock()
+		self._paper_summary_index: Optional[DocumentSummaryIndex] = None
+		self._paper_summary_mtime: Optional[float] = None
 
+		persist_parent = Path(self.directory_summary_persist_dir).parent
+		self.summary_journal = IngestJournal(persist_path=str(persist_parent / DIR_SUMMARY_JOURNAL_NAME))
+		self._keywords_cache_path = str(persist_parent / PAPER_KEYWORDS_CACHE_NAME)
+		self._keywords_cache: Dict[str, str] = self._load_keywords_cache()
+
+		if not Path(self.directory_summary_persist_dir).exists():
+			self.directory_summary_index = self._new_directory_summary_index()
+			self._auto_construct()
+		else:
+			directory_storage_context = StorageContext.from_defaults(persist_dir=self.directory_summary_persist_dir)
+			self.directory_summary_index = load_index_from_storage(
+				storage_context=directory_storage_context,
+				index_id=DIR_SUMMARY_INDEX_ID,
+				service_context=self.service_context,
+			)
+			self._replay_journal()
 
 	def _path_format(self, path: Union[os.PathLike, str], default: Path) -> str:
 		if path is None:
 			return str(default)
 		return path
 
-	def _auto_summarize_dir(self, directory: str, verbose: bool = False):
-		r"""
-		Automatically summarize each directory under the given directory.
-		The given directory must be under the paper root.
-		"""
-		if directory != self.paper_root and Path(self.paper_root) not in Path(directory).parents:
-			raise ValueError("Invalid directory. The input directory should be under the paper warehouse.")
-
-		paper_summary_storage_context = StorageContext.from_defaults(persist_dir=self.paper_summary_persist_dir)
-		paper_summary_index = load_index_from_storage(
-			storage_context=paper_summary_storage_context,
-			index_id=PAPER_SUMMARY_INDEX_ID,
+	def _new_directory_summary_index(self) -> DocumentSummaryIndex:
+		r""" An empty directory summary index, with the paper root as the only node. """
+		rel_paper_root = Path(self.paper_root).relative_to(self.root)
+		root_node = TextNode(text="", id_=str(rel_paper_root), )
+		root_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id="Paper warehouse", )
+		dir_summary_index = DocumentSummaryIndex(
+			nodes=[root_node, ],
+			llm=self.llm,
+			embed_model=self.embed_model,
 			service_context=self.service_context,
+			response_synthesizer=self.dir_synthesizer,
 		)
-		doc_id_to_summary_id = paper_summary_index.index_struct.doc_id_to_summary_id
-
-		if not Path(self.directory_summary_persist_dir).exists():
-			rel_paper_root = Path(self.paper_root).relative_to(self.root)
-			root_node = TextNode(text="", id_=str(rel_paper_root), )
-			root_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id="Paper warehouse", )
-			dir_summary_index = DocumentSummaryIndex(
-				nodes=[root_node, ],
-				llm=self.llm,
-				embed_model=self.embed_model,
+		dir_summary_index.set_index_id(DIR_SUMMARY_INDEX_ID)
+		return dir_summary_index
+
+	def _get_paper_summary_index(self) -> DocumentSummaryIndex:
+		r""" The paper summary index, reloaded only if it is persisted again since the last load. """
+		docstore_path = Path(self.paper_summary_persist_dir) / "docstore.json"
+		mtime = docstore_path.stat().st_mtime if docstore_path.exists() else None
+		if self._paper_summary_index is None or mtime != self._paper_summary_mtime:
+			paper_summary_storage_context = StorageContext.from_defaults(persist_dir=self.paper_summary_persist_dir)
+			self._paper_summary_index = load_index_from_storage(
+				storage_context=paper_summary_storage_context,
+				index_id=PAPER_SUMMARY_INDEX_ID,
 				service_context=self.service_context,
-				response_synthesizer=get_response_synthesizer(
-					llm=self.llm,
-					response_mode=ResponseMode.COMPACT_ACCUMULATE
-				),
 			)
-		else:
-			directory_storage_context = StorageContext.from_defaults(persist_dir=self.directory_summary_persist_dir)
-			dir_summary_index = load_index_from_storage(
-				storage_context=directory_storage_context,
-				index_id=DIR_SUMMARY_INDEX_ID,
-				service_context=self.service_context,
+			self._paper_summary_mtime = mtime
+		return self._paper_summary_index
+
+	def _load_keywords_cache(self) -> Dict[str, str]:
+		if not self._fs.exists(self._keywords_cache_path):
+			return {}
+		with self._fs.open(self._keywords_cache_path, "rb") as f:
+			return json.load(f)
+
+	def _persist_keywords_cache(self):
+		# Snapshot under the lock, as the summarizing threads may add keywords meanwhile.
+		with self._lock:
+			keywords_cache = dict(self._keywords_cache)
+		atomic_write(self._keywords_cache_path, json.dumps(keywords_cache, ensure_ascii=False))
+
+	def _paper_keywords(self, paper_summary_node: BaseNode) -> str:
+		r""" Get the keywords of a paper, extracted from its summary only once. """
+		if PAPER_LEVEL_KEYWORDS in paper_summary_node.metadata.keys():
+			return paper_summary_node.metadata[PAPER_LEVEL_KEYWORDS]
+
+		summary_hash = hashlib.sha256(paper_summary_node.get_content().encode("utf-8")).hexdigest()
+		paper_keywords = self._keywords_cache.get(summary_hash, None)
+		if paper_keywords is None:
+			keywords_response = self.dir_synthesizer.synthesize(
+				query=PAPER_KEYWORDS_EXTRACT_QUERY,
+				nodes=[NodeWithScore(node=paper_summary_node)]
 			)
-		dir_id_to_summary_id = dir_summary_index.index_struct.doc_id_to_summary_id
+			paper_keywords = cast(Response, keywords_response).response
+			with self._lock:
+				self._keywords_cache[summary_hash] = paper_keywords
+		return paper_keywords
+
+	def _dir_child_nodes(self, current_dir: Path, possessor: str, verbose: bool = False) -> List[BaseNode]:
+		r""" The paper summary nodes (with keywords) and the directory summary nodes of the children of a directory. """
+		paper_summary_index = self._get_paper_summary_index()
+		doc_id_to_summary_id = paper_summary_index.index_struct.doc_id_to_summary_id
+		dir_id_to_summary_id = self.directory_summary_index.index_struct.doc_id_to_summary_id
+		current_dir_id = str(current_dir.relative_to(self.root))
+
+		nodes = []
+		for child in sorted(current_dir.iterdir()):
+			if not child.is_dir() and child.suffix == ".pdf":
+				rel_paper = str(child.relative_to(self.root))
+				child_main_text = rel_paper + f"_{MAINTEXT}"
+				child_methods = rel_paper + f"_{METHODS}"
+				for doc_id in (child_main_text, child_methods):
+					if doc_id not in doc_id_to_summary_id.keys() and verbose:
+						print(f"{doc_id} not stored into the PaperStorage yet, "
+							  f"please insert it into the PaperStorage first.")
+					if doc_id in doc_id_to_summary_id.keys():
+						summary_id = doc_id_to_summary_id[doc_id]
+						paper_summary_node = paper_summary_index.docstore.get_node(summary_id)
+						paper_keywords = self._paper_keywords(paper_summary_node=paper_summary_node)
+
+						# filter metadata (possessor & paper keywords)
+						paper_summary_node.metadata = {
+							PAPER_POSSESSOR: possessor,
+							PAPER_LEVEL_KEYWORDS: paper_keywords,
+						}
+						paper_summary_node.set_content("")
+						paper_summary_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+							node_id=current_dir_id,
+						)
+						nodes.append(paper_summary_node)
+			elif child.is_dir():
+				child_dir_id = str(child.relative_to(self.root))
+				if child_dir_id in dir_id_to_summary_id.keys():
+					child_summary_id = dir_id_to_summary_id[child_dir_id]
+					dir_summary_node = self.directory_summary_index.docstore.get_node(child_summary_id)
+					dir_summary_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+						node_id=current_dir_id,
+					)
+					nodes.append(dir_summary_node)
+		return nodes
+
+	def _summarize_single_dir(self, current_dir: Path, verbose: bool = False) -> Optional[TextNode]:
+		r"""
+		Summarize a directory based on its children, whose summaries are up to date.
+
+		Args:
+			current_dir (Path): The directory.
+			verbose (bool): Whether to show progress.
+
+		Returns:
+			Optional[TextNode]: The new summary node of the directory, not stored yet.
+				If the directory has no summarized children, return None.
+		"""
+		if not current_dir.is_dir():
+			return None
 
-		def dfs(current_dir: Path):
-			if not current_dir.is_dir():
-				return
+		current_dir_id = str(current_dir.relative_to(self.root))
+		possessor = current_dir.relative_to(self.paper_root).parts[0]
+		print_text(f">>> Processing: {current_dir}", color="blue", end="\n")
+		nodes = self._dir_child_nodes(current_dir=current_dir, possessor=possessor, verbose=verbose)
+		if len(nodes) < 1:
+			return None
 
-			for child in current_dir.iterdir():
-				dfs(child)
+		# Summarize current directory based on its children
+		summary_response = self.dir_synthesizer.synthesize(
+			query=DIR_SUMMARIZE_QUERY,
+			nodes=[NodeWithScore(node=n) for n in nodes],
+		)
+		summary_response = cast(Response, summary_response)
+		return TextNode(
+			text="",
+			relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=current_dir_id)},
+			metadata={
+				PAPER_POSSESSOR: possessor,
+				PAPER_LEVEL_KEYWORDS: summary_response.response,
+			},
+		)
 
+	def _put_dir_summary_nodes(self, dir_summary_nodes: List[BaseNode]) -> List[str]:
+		r"""
+		Replace the summary nodes of the directories in the directory summary index.
+		The nodes should already have embeddings.
+
+		Args:
+			dir_summary_nodes (List[BaseNode]): The new summary nodes, their `ref_doc_id` is the directory id.
+
+		Returns:
+			List[str]: The ids of the replaced summary nodes.
+		"""
+		index = self.directory_summary_index
+		dir_id_to_summary_id = index.index_struct.doc_id_to_summary_id
+		old_summary_ids = []
+		for node in dir_summary_nodes:
+			old_summary_id = dir_id_to_summary_id.get(node.ref_doc_id, None)
+			if old_summary_id is not None:
+				old_summary_ids.append(old_summary_id)
+				index.docstore.delete_document(old_summary_id, raise_error=False)
+			dir_id_to_summary_id[node.ref_doc_id] = node.node_id
+
+		if len(old_summary_ids) > 0:
+			index.vector_store.delete_nodes(old_summary_ids)
+		index.docstore.add_documents(dir_summary_nodes)
+		index.vector_store.add(dir_summary_nodes)
+		index.storage_context.index_store.add_index_struct(index.index_struct)
+		return old_summary_ids
+
+	def _replay_journal(self):
+		r""" Apply the directory summaries updated since the last full persist. """
+		# The records written before the record types, without a type, are directory summaries as well.
+		for record in self.summary_journal.records():
+			changes = record[JOURNAL_INDICES_KEY][DIR_SUMMARY_INDEX_ID]
 			nodes = []
-			current_dir_id = str(current_dir.relative_to(self.root))
-			if current_dir_id == DEFAULT_PAPER_WAREHOUSE_DIR:
-				return
-
-			possessor = current_dir_id.split('/')[2]
-			print_text(f">>> Processing: {current_dir}", color="blue", end="\n")
-			for child in current_dir.iterdir():
-				if not child.is_dir() and child.suffix == ".pdf":
-					rel_paper = str(child.relative_to(self.root))
-					child_main_text = rel_paper + f"_{MAINTEXT}"
-					child_methods = rel_paper + f"_{METHODS}"
-					for doc_id in (child_main_text, child_methods):
-						if doc_id not in doc_id_to_summary_id.keys() and verbose:
-							print(f"{doc_id} not stored into the PaperStorage yet, "
-								  f"please insert it into the PaperStorage first.")
-						if doc_id in doc_id_to_summary_id.keys():
-							summary_id = doc_id_to_summary_id[doc_id]
-							paper_summary_node = paper_summary_index.docstore.get_node(summary_id)
-							# Get the paper keywords
-							if PAPER_LEVEL_KEYWORDS in paper_summary_node.metadata.keys():
-								paper_keywords = paper_summary_node.metadata[PAPER_LEVEL_KEYWORDS]
-							else:
-								# extract keywords.
-								paper_keywords = dir_summary_index._response_synthesizer.synthesize(
-									query=PAPER_KEYWORDS_EXTRACT_QUERY,
-									nodes=[NodeWithScore(node=paper_summary_node)]
-								)
-
-							# filter metadata (possessor & paper keywords)
-							paper_summary_node.metadata = {
-								PAPER_POSSESSOR: possessor,
-								PAPER_LEVEL_KEYWORDS: paper_keywords,
-							}
-							paper_summary_node.set_content("")
-							paper_summary_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
-								node_id=current_dir_id,
-							)
-							nodes.append(paper_summary_node)
-				elif child.is_dir():
-					child_dir_id = str(child.relative_to(self.root))
-					if child_dir_id in dir_id_to_summary_id.keys():
-						child_summary_id = dir_id_to_summary_id[child_dir_id]
-						dir_summary_node = dir_summary_index.docstore.get_node(child_summary_id)
-						dir_summary_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
-							node_id=current_dir_id,
-						)
-						nodes.append(dir_summary_node)
+			for item in changes[JOURNAL_UPSERT_KEY]:
+				node = json_to_doc(item[JOURNAL_NODE_KEY])
+				node.embedding = item[JOURNAL_EMBEDDING_KEY]
+				nodes.append(node)
+			self._put_dir_summary_nodes(dir_summary_nodes=nodes)
+
+	def persist(self):
+		r""" Persist the whole directory summary index, and clear the journal. """
+		self.directory_summary_index.storage_context.persist(persist_dir=str(self.directory_summary_persist_dir))
+		self.summary_journal.clear()
+
+	def _persist_changes(self, dir_summary_nodes: List[BaseNode], old_summary_ids: List[str]):
+		r"""
+		Persist the updated directory summaries only, by appending them to the journal.
+		The whole index is persisted once the journal grows over `DIR_SUMMARY_JOURNAL_MAX_RECORDS` records.
+		"""
+		if not Path(self.directory_summary_persist_dir).exists():
+			self.persist()
+			return
+
+		self.summary_journal.append_changes(
+			record_type=JournalRecordType.DIR_SUMMARY,
+			indices={
+				DIR_SUMMARY_INDEX_ID: {
+					JOURNAL_UPSERT_KEY: [
+						{JOURNAL_NODE_KEY: doc_to_json(node), JOURNAL_EMBEDDING_KEY: node.embedding}
+						for node in dir_summary_nodes
+					],
+					JOURNAL_DELETE_KEY: old_summary_ids,
+				},
+			},
+		)
+		if self.summary_journal.record_num > DIR_SUMMARY_JOURNAL_MAX_RECORDS:
+			self.persist()
 
-			# Summarize current directory based on its children
-			nodes_with_scores = [NodeWithScore(node=n) for n in nodes]
+	def _dirty_dir_levels(self, dirty_dirs: List[Union[str, os.PathLike]]) -> List[List[Path]]:
+		r"""
+		Get the directories to re-summarize: the dirty directories and their ancestors under the paper root.
 
-			if len(nodes_with_scores) > 0:
-				summary_response = dir_summary_index._response_synthesizer.synthesize(
-					query=DIR_SUMMARIZE_QUERY,
-					nodes=nodes_with_scores,
-				)
+		Returns:
+			List[List[Path]]: The directories grouped by depth, deepest first.
+		"""
+		paper_root = Path(self.paper_root)
+		to_update = set()
+		for directory in dirty_dirs:
+			directory = Path(directory)
+			if not directory.is_absolute():
+				directory = self.root / directory
+			if directory.suffix == ".pdf":
+				directory = directory.parent
+			if directory != paper_root and paper_root not in directory.parents:
+				raise ValueError("Invalid directory. The input directory should be under the paper warehouse.")
+			while directory != paper_root:
+				to_update.add(directory)
+				directory = directory.parent
+
+		levels: Dict[int, List[Path]] = {}
+		for directory in to_update:
+			levels.setdefault(len(directory.parts), []).append(directory)
+		return [sorted(levels[depth]) for depth in sorted(levels.keys(), reverse=True)]
+
+	def update_dirs(self, dirty_dirs: List[Union[str, os.PathLike]], verbose: bool = False) -> List[str]:
+		r"""
+		Incrementally update the directory summaries after papers are added to (or removed from) some directories.
 
-				summary_response = cast(Response, summary_response)
-				dir_summary_node = TextNode(
-					text="",
-					relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=current_dir_id)},
-					metadata={
-						PAPER_POSSESSOR: possessor,
-						PAPER_LEVEL_KEYWORDS: summary_response.response,
-					},
-				)
+		Only the dirty directories and their ancestors are re-summarized, bottom-up.
+		The directories of the same depth (thus in sibling subtrees) are summarized concurrently.
+		The keywords of each paper summary are extracted only once and cached.
+		Only the changed summary nodes are persisted.
+
+		Args:
+			dirty_dirs (List[Union[str, os.PathLike]]): The changed directories (or the changed paper files),
+				absolute or relative to the project root.
+			verbose (bool): Whether to show progress.
 
-				dir_summary_index.docstore.add_documents([dir_summary_node])
-				dir_summary_index._index_struct.doc_id_to_summary_id[current_dir_id] = dir_summary_node.node_id
+		Returns:
+			List[str]: The ids of the re-summarized directories.
+		"""
+		levels = self._dirty_dir_levels(dirty_dirs=dirty_dirs)
+		updated_nodes, old_summary_ids = [], []
+		with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+			for level_dirs in levels:
+				dir_summary_nodes = executor.map(
+					lambda current_dir: self._summarize_single_dir(current_dir=current_dir, verbose=verbose),
+					level_dirs,
+				)
+				dir_summary_nodes = [node for node in dir_summary_nodes if node is not None]
+				if len(dir_summary_nodes) < 1:
+					continue
+
+				id_to_embed_map = embed_nodes(dir_summary_nodes, self.embed_model)
+				for node in dir_summary_nodes:
+					node.embedding = id_to_embed_map[node.node_id]
+				# The parent level reads these summaries.
+				old_summary_ids.extend(self._put_dir_summary_nodes(dir_summary_nodes=dir_summary_nodes))
+				updated_nodes.extend(dir_summary_nodes)
+
+		if len(updated_nodes) > 0:
+			self._persist_changes(dir_summary_nodes=updated_nodes, old_summary_ids=old_summary_ids)
+			self._persist_keywords_cache()
+		return [node.ref_doc_id for node in updated_nodes]
 
-				id_to_embed_map = embed_nodes([dir_summary_node,], self.embed_model)
-				node_with_embedding = dir_summary_node.copy()
-				node_with_embedding.embedding = id_to_embed_map[dir_summary_node.node_id]
-				dir_summary_index._vector_store.add([node_with_embedding, ])
-				dir_summary_index._storage_context.index_store.add_index_struct(dir_summary_index._index_struct)
+	def _auto_summarize_dir(self, directory: str, verbose: bool = False):
+		r"""
+		Automatically summarize each directory under the given directory.
+		The given directory must be under the paper root.
+		"""
+		if directory != self.paper_root and Path(self.paper_root) not in Path(directory).parents:
+			raise ValueError("Invalid directory. The input directory should be under the paper warehouse.")
 
-		dfs(Path(directory))
-		if dir_summary_index.index_id != DIR_SUMMARY_INDEX_ID:
-			dir_summary_index.set_index_id(DIR_SUMMARY_INDEX_ID)
-		dir_summary_index.storage_context.persist(persist_dir=str(self.directory_summary_persist_dir))
+		sub_dirs = [path for path in Path(directory).rglob("*") if path.is_dir()]
+		self.update_dirs(dirty_dirs=[directory] + sub_dirs, verbose=verbose)
+		if not Path(self.directory_summary_persist_dir).exists():
+			self.persist()
 
 	def _auto_construct(self):
 		r"""
@@ -548,6 +797,31 @@ class PaperDirectorySummaryStore:
 				dir_summary_nodes.append(summary_node)
 		return dir_summary_nodes
 
+	def preselect_dir_nodes(self, paper_summary: str, top_k: int = None) -> List[BaseNode]:
+		r"""
+		Shortlist the directory summary nodes most similar to a paper, using the stored summary embeddings.
+
+		Args:
+			paper_summary (str): the summary (or the first page) of the paper.
+			top_k (int): the number of directories to shortlist. Defaults to `self.dir_preselect_top_k`.
+
+		Returns:
+			List[BaseNode]: the valid directory summary nodes, most similar first.
+		"""
+		top_k = top_k or self.dir_preselect_top_k
+		dir_summary_nodes = self.get_dir_nodes()
+		if len(dir_summary_nodes) <= top_k:
+			return dir_summary_nodes
+
+		query = VectorStoreQuery(
+			query_embedding=self.embed_model.get_query_embedding(paper_summary),
+			similarity_top_k=top_k,
+			node_ids=[node.node_id for node in dir_summary_nodes],
+		)
+		query_result = self.directory_summary_index.vector_store.query(query)
+		id_to_node = {node.node_id: node for node in dir_summary_nodes}
+		return [id_to_node[node_id] for node_id in query_result.ids]
+
 	def match_directory_for_new_paper(
 		self,
 		pdf_path: str,
@@ -576,29 +850,23 @@ class PaperDirectorySummaryStore:
 			raise ValueError(f"The member {possessor} do not exist. Please sign up as a member first.")
 
 		if paper_summary is None:
-			pdf_docs = PyMuPDFReader().load_data(file_path=pdf_path)
 			# typically, the first page includes conclusive information of a paper.
-			paper_summary = pdf_docs[0].text
+			with pymupdf.open(pdf_path) as pdf_doc:
+				paper_summary = pdf_doc[0].get_text()
 
-		dir_summary_nodes = self.get_dir_nodes()
-
-		selected_nodes = []
-		selected_relevances = []
-
-		for idx in range(0, len(dir_summary_nodes), self.dir_choice_batch_size):
-			summary_nodes = dir_summary_nodes[idx: idx + self.dir_choice_batch_size]
-			dir_context_str = default_format_node_batch_fn(summary_nodes=summary_nodes)
+		# Shortlist the directories by embedding similarity, then let the LLM choose among them in one call.
+		summary_nodes = self.preselect_dir_nodes(paper_summary=paper_summary)
+		if len(summary_nodes) == 0:
+			return None
 
-			raw_response = self.llm.predict(
-				DIR_CHOICE_SELECT_PROMPT,
-				dir_context_str=dir_context_str,
-				paper_str=paper_summary,
-			)
-			raw_choices, relevances = default_parse_choice_select_answer_fn(raw_response, len(summary_nodes))
-			choice_idxs = [choice - 1 for choice in raw_choices]
-			choice_summary_nodes = [summary_nodes[ci] for ci in choice_idxs]
-			selected_nodes.extend(choice_summary_nodes)
-			selected_relevances.extend(relevances)
+		dir_context_str = default_format_node_batch_fn(summary_nodes=summary_nodes)
+		raw_response = self.llm.predict(
+			DIR_CHOICE_SELECT_PROMPT,
+			dir_context_str=dir_context_str,
+			paper_str=paper_summary,
+		)
+		raw_choices, selected_relevances = default_parse_choice_select_answer_fn(raw_response, len(summary_nodes))
+		selected_nodes = [summary_nodes[choice - 1] for choice in raw_choices]
 
 		if len(selected_nodes) == 0:
 			return None
@@ -651,7 +919,7 @@ class PaperDirectorySummaryStore:
 			summary_store = self.directory_summary_index.docstore._kvstore._data[node_collection][summary_id]
 			summary_store["__data__"]["metadata"][key] = val
 
-		self.directory_summary_index.storage_context.persist(persist_dir=self.directory_summary_persist_dir)
+		self.persist()
 
 	def set_possessor_research_categories(self, possessor_category_dict: Dict[str, List[str]]):
 		r"""
@@ -19,17 +19,21 @@ Notes: The note of the corresponding context. (Note node type.)
 import fsspec
 import json
 import hashlib
+import threading
+import contextvars
 
 from llama_index.core.indices import VectorStoreIndex
 from llama_index.core.embeddings import BaseEmbedding
 from llama_index.core import load_index_from_storage
 from llama_index.core.ingestion import run_transformations
 from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.response import Response
 from llama_index.core.llms import LLM
 from llama_index.core import Settings
 from llama_index.core.readers import SimpleDirectoryReader
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.core.vector_stores.types import (
 	MetadataFilters,
 	MetadataFilter,
@@ -51,10 +55,32 @@ from typing import Dict, Any, List, Optional, Tuple, cast, Union
 
 from labridge.accounts.users import AccountManager
 from labridge.common.utils.time import get_time, str_to_datetime
+from labridge.common.utils.hash import file_sha256
 from labridge.func_modules.paper.parse.extractors.metadata_extract import PAPER_REL_FILE_PATH, PAPER_DOI
 from labridge.func_modules.paper.parse.paper_reader import PaperReader, SHARED_PAPER_WAREHOUSE_DIR
 from labridge.func_modules.paper.parse.parsers.base import CONTENT_TYPE_NAME
 from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
+from labridge.func_modules.paper.store.ingest_journal import (
+	IngestJournal,
+	SHARED_PAPER_INGEST_JOURNAL_NAME,
+	JOURNAL_INDICES_KEY,
+	JOURNAL_UPSERT_KEY,
+	JOURNAL_DELETE_KEY,
+	JOURNAL_NODE_KEY,
+	JOURNAL_EMBEDDING_KEY,
+)
+from labridge.func_modules.paper.store.summary_queue import (
+	PaperSummaryQueue,
+	PaperSummaryWorker,
+	SummaryStatus,
+	SHARED_PAPER_SUMMARY_QUEUE_NAME,
+)
+from labridge.func_modules.paper.store.warehouse_manifest import (
+	WarehouseManifest,
+	WarehouseDelta,
+	WarehouseFileStatus,
+	WAREHOUSE_FILE_HASH_KEY,
+)
 
 
 SHARED_PAPER_VECTOR_INDEX_ID = "shared_paper_vector_index"
@@ -67,6 +93,8 @@ SHARED_PAPER_ROOT_NODE_NAME = "root_node"
 SHARED_PAPER_NODE_TYPE = "node_type"
 
 SHARED_PAPER_SUMMARY_KEY = "summary"
+# The SHA-256 of the paper file when it was ingested.
+SHARED_PAPER_FILE_HASH_KEY = "file_hash"
 SHARED_PAPER_DOI_KEY = "paper_doi"
 
 SHARED_PAPER_PAGE_LABEL_KEY = "page_label"
@@ -75,6 +103,8 @@ SHARED_PAPER_TOTAL_PAGES_KEY = "total_pages"
 SHARED_PAPER_CHUNK_INIT_NOTE_KEY = "init_note_id"
 SHARED_PAPER_CHUNK_LAST_NOTE_KEY = "last_note_id"
 
+SHARED_PAPER_SUMMARY_JOURNAL_PREFIX = "summary:"
+
 SHARED_NOTE_DATE_KEY = "date"
 SHARED_NOTE_TIME_KEY = "time"
 
@@ -298,6 +328,24 @@ class SharedPaperStorage(object):
 		self.paper_reader = PaperReader(llm=llm)
 		self._summarizer = PaperBatchSummarize(llm=llm)
 		self._hash_worker = hashlib.sha256()
+		self.warehouse_manifest = WarehouseManifest(root=str(self._root))
+		self._indices = {
+			SHARED_PAPER_VECTOR_INDEX_ID: self.vector_index,
+			SHARED_PAPER_NOTES_INDEX_ID: self.notes_vector_index,
+		}
+		self._lock = threading.RLock()
+		# Per thread and per asyncio task, so that the concurrent ingestions never record into each other's checkpoint.
+		self._checkpoint_var: contextvars.ContextVar[Optional[Dict[str, Dict[str, set]]]] = contextvars.ContextVar(
+			f"shared_paper_checkpoint_{id(self)}", default=None,
+		)
+		self.ingest_journal = IngestJournal(
+			persist_path=str(Path(self.persist_dir).parent / SHARED_PAPER_INGEST_JOURNAL_NAME),
+		)
+		self._replay_journal()
+		self.summary_queue = PaperSummaryQueue(
+			persist_path=str(Path(self.persist_dir).parent / SHARED_PAPER_SUMMARY_QUEUE_NAME),
+		)
+		self._summary_worker: Optional[PaperSummaryWorker] = None
 
 	@classmethod
 	def from_storage(
@@ -416,7 +464,59 @@ class SharedPaperStorage(object):
 			self.vector_index.delete_nodes([node_id])
 		except:
 			pass
-		self.vector_index.insert_nodes([node])
+		self._insert_nodes(nodes=[node])
+		if node_id != node.node_id:
+			self._record_change(index_id=SHARED_PAPER_VECTOR_INDEX_ID, deleted_id=node_id)
+
+	def _insert_nodes(self, nodes: List[BaseNode], vector_index: VectorStoreIndex = None):
+		r""" Insert nodes into the vector_index or the given index, and record them in the current checkpoint. """
+		vector_index = vector_index or self.vector_index
+		vector_index.insert_nodes(nodes)
+		for node in nodes:
+			self._record_change(index_id=vector_index.index_id, upserted_id=node.node_id)
+
+	def _get_embedding(self, node_id: str, vector_index: VectorStoreIndex = None) -> Optional[List[float]]:
+		r""" Get the stored embedding of a node in the vector_index, return None if it is not available. """
+		vector_index = vector_index or self.vector_index
+		try:
+			return vector_index.vector_store.get(node_id)
+		except (KeyError, AttributeError, NotImplementedError):
+			return None
+
+	def _update_node_keep_embedding(self, node_id: str, node: BaseNode):
+		r"""
+		Update a node in the vector_index, reusing the stored embedding of `node_id`.
+		Used when only the relationships or the path metadata of a node change, to avoid re-embedding.
+		"""
+		node.embedding = self._get_embedding(node_id=node_id)
+		self._delete_nodes(node_ids=[node_id])
+		self._insert_nodes(nodes=[node])
+
+	def _update_node_in_place(self, node: BaseNode):
+		r"""
+		Update an existing node in the vector_index in place, keeping its embedding.
+		Used when only the metadata of a node changes in the background, e.g. its summary. No entry of the vector store
+		is added or removed, so that the retrievals iterating the vector store concurrently are not disturbed.
+		"""
+		vector_data = getattr(self.vector_index.vector_store, "data", None)
+		if vector_data is None or node.node_id not in vector_data.embedding_dict:
+			self._update_node_keep_embedding(node_id=node.node_id, node=node)
+			return
+		self.vector_index.docstore.add_documents([node], allow_update=True)
+		metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+		metadata.pop("_node_content", None)
+		vector_data.metadata_dict[node.node_id] = metadata
+		self._record_change(index_id=SHARED_PAPER_VECTOR_INDEX_ID, upserted_id=node.node_id)
+
+	def _delete_nodes(self, node_ids: List[str], vector_index: VectorStoreIndex = None):
+		r""" Delete nodes from the vector store, the index struct and the docstore of the vector_index or the given index. """
+		vector_index = vector_index or self.vector_index
+		vector_index.delete_nodes(node_ids, delete_from_docstore=True)
+		index_struct = vector_index.index_struct
+		for node_id in node_ids:
+			index_struct.nodes_dict.pop(node_id, None)
+			self._record_change(index_id=vector_index.index_id, deleted_id=node_id)
+		vector_index.storage_context.index_store.add_index_struct(index_struct)
 
 	def _update_note_index_node(self, node_id: str, node: BaseNode):
 		r""" Update a node in the notes_vector_index, if the node with `node_id` does not exist, create one. """
@@ -424,7 +524,84 @@ class SharedPaperStorage(object):
 			self.notes_vector_index.delete_nodes([node_id])
 		except:
 			pass
-		self.notes_vector_index.insert_nodes([node])
+		self._insert_nodes(nodes=[node], vector_index=self.notes_vector_index)
+		if node_id != node.node_id:
+			self._record_change(index_id=SHARED_PAPER_NOTES_INDEX_ID, deleted_id=node_id)
+
+	@property
+	def _checkpoint_changes(self) -> Optional[Dict[str, Dict[str, set]]]:
+		r""" The changes recorded in the current checkpoint of this thread or asyncio task. """
+		return self._checkpoint_var.get()
+
+	@_checkpoint_changes.setter
+	def _checkpoint_changes(self, changes: Optional[Dict[str, Dict[str, set]]]):
+		self._checkpoint_var.set(changes)
+
+	def _record_change(self, index_id: str, upserted_id: str = None, deleted_id: str = None):
+		r""" Record an upserted or deleted node in the current checkpoint, if a checkpoint is in progress. """
+		if self._checkpoint_changes is None:
+			return
+		changes = self._checkpoint_changes[index_id]
+		if upserted_id is not None:
+			changes[JOURNAL_DELETE_KEY].discard(upserted_id)
+			changes[JOURNAL_UPSERT_KEY].add(upserted_id)
+		if deleted_id is not None:
+			changes[JOURNAL_UPSERT_KEY].discard(deleted_id)
+			changes[JOURNAL_DELETE_KEY].add(deleted_id)
+
+	def _begin_checkpoint(self):
+		r""" Start recording the changes of a paper. """
+		self._checkpoint_changes = defaultdict(lambda: {JOURNAL_UPSERT_KEY: set(), JOURNAL_DELETE_KEY: set()})
+
+	def _checkpoint(self, paper: str, paper_id: str):
+		r"""
+		Append the changes recorded since `_begin_checkpoint` to the ingestion journal,
+		including the current contents and embeddings of the upserted nodes.
+
+		Args:
+			paper (str): The raw paper path.
+			paper_id (str): The node id of the ingested paper node.
+		"""
+		with self._lock:
+			self._append_checkpoint(paper=paper, paper_id=paper_id)
+		self._checkpoint_changes = None
+
+	def _append_checkpoint(self, paper: str, paper_id: str):
+		indices = {}
+		for index_id, changes in self._checkpoint_changes.items():
+			vector_index = self._indices[index_id]
+			upserted = []
+			for node_id in changes[JOURNAL_UPSERT_KEY]:
+				node = vector_index.docstore.get_node(node_id, raise_error=False)
+				if node is None:
+					continue
+				upserted.append(
+					{
+						JOURNAL_NODE_KEY: doc_to_json(node),
+						JOURNAL_EMBEDDING_KEY: self._get_embedding(node_id=node_id, vector_index=vector_index),
+					}
+				)
+			indices[index_id] = {
+				JOURNAL_UPSERT_KEY: upserted,
+				JOURNAL_DELETE_KEY: list(changes[JOURNAL_DELETE_KEY]),
+			}
+		self.ingest_journal.append(paper=paper, paper_id=paper_id, indices=indices)
+
+	def _replay_journal(self):
+		r""" Apply the checkpoints in the ingestion journal, which are not persisted yet. No node is re-embedded. """
+		for record in self.ingest_journal.records():
+			for index_id, changes in record[JOURNAL_INDICES_KEY].items():
+				vector_index = self._indices[index_id]
+				nodes = []
+				for item in changes[JOURNAL_UPSERT_KEY]:
+					node = json_to_doc(item[JOURNAL_NODE_KEY])
+					node.embedding = item[JOURNAL_EMBEDDING_KEY]
+					nodes.append(node)
+				self._delete_nodes(
+					node_ids=changes[JOURNAL_DELETE_KEY] + [node.node_id for node in nodes],
+					vector_index=vector_index,
+				)
+				vector_index.insert_nodes(nodes)
 
 	def _get_node(self, node_id: str) -> Optional[BaseNode]:
 		r""" Get node from the vector_index. """
@@ -517,6 +694,8 @@ class SharedPaperStorage(object):
 			text="",
 			id_=paper_rel_path,
 			metadata=metadata,
+			excluded_embed_metadata_keys=[SHARED_PAPER_FILE_HASH_KEY],
+			excluded_llm_metadata_keys=[SHARED_PAPER_FILE_HASH_KEY],
 		)
 		self._insert_as_child_nodes(node=dir_node, child_nodes=[paper_node])
 		return dir_node, paper_node
@@ -614,16 +793,27 @@ class SharedPaperStorage(object):
 		for node in to_update_nodes:
 			self._update_node(node_id=node.node_id, node=node)
 
-	def summarize_paper(self, paper_node_id: str) -> Optional[str]:
-		r"""
-		Summarize a paper in the shared paper storage.
-
-		Args:
-			paper_node_id (str): The node id of the corresponding paper node.
+	def _get_paper_content_nodes(self, paper_node: BaseNode) -> List[NodeWithScore]:
+		r""" Get the chunk nodes of a paper node for summarizing. """
+		content_ids = [child.node_id for child in paper_node.child_nodes]
+		content_nodes = self._get_nodes(
+			node_ids=content_ids,
+			node_types=[SharedPaperNodeType.PAPER_CHUNK]
+		)
+		return [NodeWithScore(node=n) for n in content_nodes]
+
+	def _set_paper_summary(self, paper_node_id: str, summary: str) -> bool:
+		r""" Record the summary in the paper node, return False if the paper node no longer exists. """
+		with self._lock:
+			paper_node = self._get_node(node_id=paper_node_id)
+			if paper_node is None:
+				return False
+			paper_node.metadata[SHARED_PAPER_SUMMARY_KEY] = summary
+			self._update_node_in_place(node=paper_node)
+			return True
 
-		Returns:
-			Optional[str]: The summary of th paper. If the paper does not exist, return None.
-		"""
+	def _summarize_paper(self, paper_node_id: str) -> Optional[str]:
+		r""" Summarize a paper and record the summary in the paper node, without updating the summary queue. """
 		paper_node = self._get_node(node_id=paper_node_id)
 		if paper_node is None:
 			return None
@@ -632,19 +822,28 @@ class SharedPaperStorage(object):
 		if summary is not None:
 			return summary
 
-		content_ids = [child.node_id for child in paper_node.child_nodes]
-		content_nodes = self._get_nodes(
-			node_ids=content_ids,
-			node_types=[SharedPaperNodeType.PAPER_CHUNK]
-		)
-
-		nodes_with_scores = [NodeWithScore(node=n) for n in content_nodes]
+		nodes_with_scores = self._get_paper_content_nodes(paper_node=paper_node)
 		# get the summary for each doc_id
 		summary_response = self._summarizer.synthesize(nodes=nodes_with_scores, query="")
 		summary_response = cast(Response, summary_response)
 		summary = summary_response.response
-		paper_node.metadata[SHARED_PAPER_SUMMARY_KEY] = summary
-		self._update_node(node_id=paper_node.node_id, node=paper_node)
+		if not self._set_paper_summary(paper_node_id=paper_node_id, summary=summary):
+			return None
+		return summary
+
+	def summarize_paper(self, paper_node_id: str) -> Optional[str]:
+		r"""
+		Summarize a paper in the shared paper storage.
+
+		Args:
+			paper_node_id (str): The node id of the corresponding paper node.
+
+		Returns:
+			Optional[str]: The summary of th paper. If the paper does not exist, return None.
+		"""
+		summary = self._summarize_paper(paper_node_id=paper_node_id)
+		if summary is not None:
+			self.summary_queue.mark_done(paper_id=paper_node_id)
 		return summary
 
 	async def asummarize_paper(self, paper_node_id: str) -> Optional[str]:
@@ -662,23 +861,82 @@ class SharedPaperStorage(object):
 			return None
 
 		summary = paper_node.metadata.get(SHARED_PAPER_SUMMARY_KEY, None)
-		if summary is not None:
-			return summary
+		if summary is None:
+			nodes_with_scores = self._get_paper_content_nodes(paper_node=paper_node)
+			# get the summary for each doc_id
+			summary_response = await self._summarizer.asynthesize(nodes=nodes_with_scores, query="")
+			summary_response = cast(Response, summary_response)
+			summary = summary_response.response
+			if not self._set_paper_summary(paper_node_id=paper_node_id, summary=summary):
+				return None
+		self.summary_queue.mark_done(paper_id=paper_node_id)
+		return summary
 
-		content_ids = [child.node_id for child in paper_node.child_nodes]
-		content_nodes = self._get_nodes(
-			node_ids=content_ids,
-			node_types=[SharedPaperNodeType.PAPER_CHUNK]
-		)
+	def summary_status(self, paper_node_id: str) -> Optional[str]:
+		r"""
+		Get the summary status of a paper.
 
-		nodes_with_scores = [NodeWithScore(node=n) for n in content_nodes]
-		# get the summary for each doc_id
-		summary_response = await self._summarizer.asynthesize(nodes=nodes_with_scores, query="")
-		summary_response = cast(Response, summary_response)
-		summary = summary_response.response
-		paper_node.metadata[SHARED_PAPER_SUMMARY_KEY] = summary
-		self._update_node(node_id=paper_node.node_id, node=paper_node)
-		return summary
+		Args:
+			paper_node_id (str): The node id of the corresponding paper node.
+
+		Returns:
+			Optional[str]: One of `SummaryStatus`: pending, running, done or failed.
+				If the paper was never queued, `done` if it has a summary, otherwise None.
+		"""
+		status = self.summary_queue.status(paper_id=paper_node_id)
+		if status is not None:
+			return status
+		paper_node = self._get_node(node_id=paper_node_id)
+		if paper_node is not None and paper_node.metadata.get(SHARED_PAPER_SUMMARY_KEY, None) is not None:
+			return SummaryStatus.DONE
+		return None
+
+	def run_summary_job(self, paper_id: str) -> bool:
+		r"""
+		Summarize a pending paper in the summary queue, used by the `PaperSummaryWorker`.
+		The updated paper node is checkpointed in the ingestion journal before the job is marked as done.
+
+		Args:
+			paper_id (str): The node id of the paper node.
+
+		Returns:
+			bool: Whether the paper is summarized.
+		"""
+		if not self.summary_queue.mark_running(paper_id=paper_id):
+			return False
+
+		self._begin_checkpoint()
+		try:
+			summary = self._summarize_paper(paper_node_id=paper_id)
+			if summary is None:
+				self.summary_queue.remove(paper_id=paper_id)
+				return False
+			self._checkpoint(paper=f"{SHARED_PAPER_SUMMARY_JOURNAL_PREFIX}{paper_id}", paper_id=paper_id)
+		except Exception as e:
+			print(f"Failed to summarize {paper_id}: {e}")
+			self.summary_queue.mark_failed(paper_id=paper_id, error=str(e))
+			return False
+		finally:
+			self._checkpoint_changes = None
+
+		self.summary_queue.mark_done(paper_id=paper_id)
+		return True
+
+	def persist_summaries(self):
+		r""" Persist the summaries filled in by the background worker. """
+		self._finish_ingestion()
+
+	def start_summary_worker(self) -> PaperSummaryWorker:
+		r""" Start the background worker summarizing the papers in the summary queue. """
+		if self._summary_worker is None:
+			self._summary_worker = PaperSummaryWorker(storage=self)
+		self._summary_worker.start()
+		return self._summary_worker
+
+	def stop_summary_worker(self, timeout: float = None):
+		r""" Stop the background summary worker after its current job. """
+		if self._summary_worker is not None:
+			self._summary_worker.stop(timeout=timeout)
 
 	def insert_single_paper(
 		self,
@@ -686,6 +944,7 @@ class SharedPaperStorage(object):
 		raw_paper_path: str,
 		paper_summary: str = None,
 		extra_metadata: dict = None,
+		enqueue_summary: bool = False,
 	) -> Optional[str]:
 		r"""
 		Add a paper to the shared paper storage.
@@ -695,6 +954,8 @@ class SharedPaperStorage(object):
 			raw_paper_path (str): The file path of the paper.
 			paper_summary (str): If the paper has been summarized before, the summary can be provided to save cost.
 			extra_metadata (dict): Extra metadata obtained from other approaches such as ArXiv.
+			enqueue_summary (bool): Whether to put the paper into the summary queue if no `paper_summary` is given,
+				so that it is summarized later by the background worker. Defaults to False.
 
 		Returns:
 			Optional[str]: The node id of the new paper node.
@@ -738,43 +999,50 @@ class SharedPaperStorage(object):
 			return None
 
 		chunk_docs, extra_docs = read_content
-		dir_node = self._get_node(node_id=target_rel_dir)
-		if dir_node is None:
-			self.make_dirs(rel_dir=target_rel_dir)
+		with self._lock:
 			dir_node = self._get_node(node_id=target_rel_dir)
+			if dir_node is None:
+				self.make_dirs(rel_dir=target_rel_dir)
+				dir_node = self._get_node(node_id=target_rel_dir)
 
-		paper_metadata = {
-			key: chunk_docs[0].metadata[key] for key in chunk_docs[0].metadata.keys() if key != CONTENT_TYPE_NAME
-		}
-		if paper_summary:
-			paper_metadata[SHARED_PAPER_SUMMARY_KEY] = paper_summary
-		dir_node, paper_node = self._new_paper_node(dir_node=dir_node, paper_info=paper_metadata)
-		self._update_node(node_id=dir_node.node_id, node=dir_node)
-
-		# for doc in chunk_docs:
-		# 	# TODO: check whether useful for break the warning that metadata str is longer than chunk content.
-		# 	all_metadata_keys = list(doc.metadata.keys())
-		# 	doc.excluded_embed_metadata_keys = []
-		# 	doc.excluded_llm_metadata_keys = all_metadata_keys
-		# overlapped nodes
-		overlapped_chunk_nodes = run_transformations(
-			nodes=chunk_docs,
-			transformations=self._default_overlapped_transformations,
-		)
-		self._insert_as_child_nodes(node=paper_node, child_nodes=overlapped_chunk_nodes)
-		for chunk_node in overlapped_chunk_nodes:
-			self._update_node(node_id=chunk_node.node_id, node=chunk_node)
+			paper_metadata = {
+				key: chunk_docs[0].metadata[key] for key in chunk_docs[0].metadata.keys() if key != CONTENT_TYPE_NAME
+			}
+			if paper_summary:
+				paper_metadata[SHARED_PAPER_SUMMARY_KEY] = paper_summary
+			paper_metadata[SHARED_PAPER_FILE_HASH_KEY] = file_sha256(paper_path, fs=self._fs)
+			dir_node, paper_node = self._new_paper_node(dir_node=dir_node, paper_info=paper_metadata)
+			self._update_node(node_id=dir_node.node_id, node=dir_node)
+
+			# for doc in chunk_docs:
+			# 	# TODO: check whether useful for break the warning that metadata str is longer than chunk content.
+			# 	all_metadata_keys = list(doc.metadata.keys())
+			# 	doc.excluded_embed_metadata_keys = []
+			# 	doc.excluded_llm_metadata_keys = all_metadata_keys
+			# overlapped nodes
+			overlapped_chunk_nodes = run_transformations(
+				nodes=chunk_docs,
+				transformations=self._default_overlapped_transformations,
+			)
+			self._insert_as_child_nodes(node=paper_node, child_nodes=overlapped_chunk_nodes)
+			for chunk_node in overlapped_chunk_nodes:
+				self._update_node(node_id=chunk_node.node_id, node=chunk_node)
+
+			# extra docs
+			self._insert_as_child_nodes(node=paper_node, child_nodes=extra_docs)
+			for doc in extra_docs:
+				doc.metadata[SHARED_PAPER_NODE_TYPE] = SharedPaperNodeType.PAPER_EXTRA_INFO
+				self._update_node(node_id=doc.node_id, node=doc)
 
-		# extra docs
-		self._insert_as_child_nodes(node=paper_node, child_nodes=extra_docs)
-		for doc in extra_docs:
-			doc.metadata[SHARED_PAPER_NODE_TYPE] = SharedPaperNodeType.PAPER_EXTRA_INFO
-			self._update_node(node_id=doc.node_id, node=doc)
+			self._update_node(node_id=paper_node.node_id, node=paper_node)
 
-		self._update_node(node_id=paper_node.node_id, node=paper_node)
+			paper_doi = paper_metadata[PAPER_DOI]
+			self.insert_doi_node(paper_doi=paper_doi, paper_path=paper_path)
 
-		paper_doi = paper_metadata[PAPER_DOI]
-		self.insert_doi_node(paper_doi=paper_doi, paper_path=paper_path)
+		if paper_summary:
+			self.summary_queue.mark_done(paper_id=paper_node.node_id)
+		elif enqueue_summary:
+			self.summary_queue.enqueue(paper_id=paper_node.node_id)
 		return paper_node.node_id
 
 	def insert_doi_node(
@@ -826,6 +1094,22 @@ class SharedPaperStorage(object):
 		self._update_note_index_node(node_id=doi_node.node_id, node=doi_node)
 		return doi_node
 
+	def _target_rel_dirs(self, user_id: str, papers_root_dir: str, paper_paths: List[str]) -> List[str]:
+		r""" The warehouse directories of the papers, copying the directory structure under the papers_root_dir. """
+		target_dirs = []
+		for paper_path in paper_paths:
+			rel_path = str(Path(paper_path).relative_to(papers_root_dir))
+			target_rel_dir = str(Path(f"{SHARED_PAPER_WAREHOUSE_DIR}/{user_id}/{rel_path}").parent)
+			target_dirs.append(target_rel_dir)
+		return target_dirs
+
+	def _finish_ingestion(self):
+		r""" Persist the whole storage once, after which the checkpoints in the ingestion journal are dropped. """
+		with self._lock:
+			self.persist_papers()
+			self.persist_notes()
+			self.ingest_journal.clear()
+
 	def insert_papers(
 		self,
 		user_id: str,
@@ -836,37 +1120,43 @@ class SharedPaperStorage(object):
 		r"""
 		Insert papers of a user.
 
+		Each ingested paper is checkpointed in the ingestion journal, and the storage is persisted once at the end.
+		If the ingestion is interrupted, calling it again with the same papers skips those already checkpointed.
+
 		Args:
 			user_id (str): The user id of a laboratory member.
 			papers_root_dir (str): The raw root directory of these papers,
 				the directory structure will be copied to the shared paper warehouse.
 			paper_paths (List[str]): The paths of the papers.
-			enable_summarize (bool): Whether to summarize these papers.
+			enable_summarize (bool): Whether to summarize these papers. If True, the papers are put into the summary
+				queue and summarized by the background worker, refer to `start_summary_worker`.
 
 		Returns:
 			Optional[List[str]]: The paths of failed papers. If no paper fails in recording, return None.
 		"""
-
-		target_dirs = []
-		for paper_path in paper_paths:
-			rel_path = str(Path(paper_path).relative_to(papers_root_dir))
-			target_rel_dir = str(Path(f"{SHARED_PAPER_WAREHOUSE_DIR}/{user_id}/{rel_path}").parent)
-			target_dirs.append(target_rel_dir)
+		target_dirs = self._target_rel_dirs(user_id=user_id, papers_root_dir=papers_root_dir, paper_paths=paper_paths)
+		completed_papers = self.ingest_journal.completed_papers()
 
 		failed_papers = []
 		for idx, paper_path in enumerate(paper_paths):
-			paper_id = self.insert_single_paper(
-				target_rel_dir=target_dirs[idx],
-				raw_paper_path=paper_path,
-			)
-			if paper_id is None:
-				failed_papers.append(paper_path)
+			if paper_path in completed_papers:
 				continue
-			if enable_summarize:
-				self.summarize_paper(paper_node_id=paper_id)
-			self.persist_papers()
-			self.persist_notes()
 
+			self._begin_checkpoint()
+			try:
+				paper_id = self.insert_single_paper(
+					target_rel_dir=target_dirs[idx],
+					raw_paper_path=paper_path,
+					enqueue_summary=enable_summarize,
+				)
+				if paper_id is None:
+					failed_papers.append(paper_path)
+					continue
+				self._checkpoint(paper=paper_path, paper_id=paper_id)
+			finally:
+				self._checkpoint_changes = None
+
+		self._finish_ingestion()
 		if len(failed_papers) < 1:
 			return None
 		return failed_papers
@@ -881,56 +1171,257 @@ class SharedPaperStorage(object):
 		r"""
 		Asynchronously insert papers of a user.
 
+		Each ingested paper is checkpointed in the ingestion journal, and the storage is persisted once at the end.
+		If the ingestion is interrupted, calling it again with the same papers skips those already checkpointed.
+
 		Args:
 			user_id (str): The user id of a laboratory member.
 			papers_root_dir (str): The raw root directory of these papers,
 				the directory structure will be copied to the shared paper warehouse.
 			paper_paths (List[str]): The paths of the papers.
-			enable_summarize (bool): Whether to summarize these papers.
+			enable_summarize (bool): Whether to summarize these papers. If True, the papers are put into the summary
+				queue and summarized by the background worker, refer to `start_summary_worker`.
 
 		Returns:
 			Optional[List[str]]: The paths of failed papers. If no paper fails in recording, return None.
 		"""
-		target_dirs = []
-		for paper_path in paper_paths:
-			rel_path = str(Path(paper_path).relative_to(papers_root_dir))
-			target_rel_dir = f"{SHARED_PAPER_WAREHOUSE_DIR}/{user_id}/{rel_path}"
-			target_dirs.append(target_rel_dir)
+		target_dirs = self._target_rel_dirs(user_id=user_id, papers_root_dir=papers_root_dir, paper_paths=paper_paths)
+		completed_papers = self.ingest_journal.completed_papers()
 
 		failed_papers = []
 		for idx, paper_path in enumerate(paper_paths):
-			paper_id = self.insert_single_paper(
-				target_rel_dir=target_dirs[idx],
-				raw_paper_path=paper_path,
-			)
-			if paper_id is None:
-				failed_papers.append(paper_path)
+			if paper_path in completed_papers:
 				continue
-			if enable_summarize:
-				await self.asummarize_paper(paper_node_id=paper_id)
-			self.persist_papers()
-			self.persist_notes()
 
+			self._begin_checkpoint()
+			try:
+				paper_id = self.insert_single_paper(
+					target_rel_dir=target_dirs[idx],
+					raw_paper_path=paper_path,
+					enqueue_summary=enable_summarize,
+				)
+				if paper_id is None:
+					failed_papers.append(paper_path)
+					continue
+				self._checkpoint(paper=paper_path, paper_id=paper_id)
+			finally:
+				self._checkpoint_changes = None
+
+		self._finish_ingestion()
 		if len(failed_papers) < 1:
 			return None
 		return failed_papers
 
+	def delete_paper(self, paper_rel_path: str) -> bool:
+		r"""
+		Delete a paper from the vector_index, including the paper node and its chunk nodes and extra info nodes.
+		The paper node is unlinked from its directory node.
+
+		The DOI node and the notes in the notes_vector_index are kept, as they belong to the DOI and are shared by
+		all copies of the paper.
+
+		Args:
+			paper_rel_path (str): The paper path relative to the root, namely the node id of the paper node.
+
+		Returns:
+			bool: Whether the paper node exists and is deleted.
+		"""
+		with self._lock:
+			paper_node = self._get_node(node_id=paper_rel_path)
+			if paper_node is None or paper_node.metadata.get(SHARED_PAPER_NODE_TYPE) != SharedPaperNodeType.PAPER:
+				return False
+
+			child_ids = [child.node_id for child in paper_node.child_nodes or []]
+			self._delete_nodes(node_ids=child_ids + [paper_node.node_id])
+
+			if paper_node.parent_node is not None:
+				dir_node = self._get_node(node_id=paper_node.parent_node.node_id)
+				if dir_node is not None:
+					dir_node.relationships[NodeRelationship.CHILD] = [
+						child for child in dir_node.child_nodes or [] if child.node_id != paper_node.node_id
+					]
+					self._update_node_keep_embedding(node_id=dir_node.node_id, node=dir_node)
+			self.summary_queue.remove(paper_id=paper_node.node_id)
+			return True
+
+	def move_paper(self, old_rel_path: str, new_rel_path: str) -> bool:
+		r"""
+		Relink a paper that has been moved or renamed in the warehouse. The file itself is not touched.
+
+		The paper node is re-created with the new path as its node id, and its child nodes are relinked to it.
+		All nodes keep their stored embeddings, so no embedding is recomputed.
+
+		Args:
+			old_rel_path (str): The old paper path relative to the root.
+			new_rel_path (str): The new paper path relative to the root.
+
+		Returns:
+			bool: Whether the paper node exists and is moved.
+
+		Raises:
+			ValueError: If the new directory is not valid.
+		"""
+		with self._lock:
+			paper_node = self._get_node(node_id=old_rel_path)
+			if paper_node is None or paper_node.metadata.get(SHARED_PAPER_NODE_TYPE) != SharedPaperNodeType.PAPER:
+				return False
+
+			new_rel_dir = str(Path(new_rel_path).parent)
+			if self._get_node(node_id=new_rel_dir) is None:
+				self.make_dirs(rel_dir=new_rel_dir)
+
+			paper_embedding = self._get_embedding(node_id=old_rel_path)
+			if paper_node.parent_node is not None:
+				old_dir_node = self._get_node(node_id=paper_node.parent_node.node_id)
+				if old_dir_node is not None:
+					old_dir_node.relationships[NodeRelationship.CHILD] = [
+						child for child in old_dir_node.child_nodes or [] if child.node_id != old_rel_path
+					]
+					self._update_node_keep_embedding(node_id=old_dir_node.node_id, node=old_dir_node)
+
+			new_dir_node = self._get_node(node_id=new_rel_dir)
+			new_paper_node = paper_node.copy()
+			new_paper_node.id_ = new_rel_path
+			new_paper_node.metadata[PAPER_REL_FILE_PATH] = new_rel_path
+			self._insert_as_child_nodes(node=new_dir_node, child_nodes=[new_paper_node])
+			self._update_node_keep_embedding(node_id=new_dir_node.node_id, node=new_dir_node)
+
+			self._delete_nodes(node_ids=[old_rel_path])
+			new_paper_node.embedding = paper_embedding
+			self._insert_nodes(nodes=[new_paper_node])
+
+			child_ids = [child.node_id for child in new_paper_node.child_nodes or []]
+			for child_node in self._get_nodes(node_ids=child_ids):
+				child_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=new_rel_path)
+				if PAPER_REL_FILE_PATH in child_node.metadata:
+					child_node.metadata[PAPER_REL_FILE_PATH] = new_rel_path
+				self._update_node_keep_embedding(node_id=child_node.node_id, node=child_node)
+			self.summary_queue.rename(old_paper_id=old_rel_path, new_paper_id=new_rel_path)
+			return True
+
+	def _sync_insert_paper(
+		self,
+		paper_rel_path: str,
+		file_hash: str,
+		enable_summarize: bool,
+	) -> Tuple[str, Optional[str]]:
+		r"""
+		Ingest a paper found in the warehouse during sync.
+
+		A paper node already in the storage, e.g. ingested before the manifest exists, is adopted only if it was
+		ingested from the same file contents. Otherwise, including the nodes without a recorded file hash,
+		the paper is ingested again.
+
+		Args:
+			paper_rel_path (str): The paper path relative to the root.
+			file_hash (str): The scanned SHA-256 of the paper file.
+			enable_summarize (bool): Whether to put the newly ingested paper into the summary queue.
+
+		Returns:
+			Tuple[str, Optional[str]]: The `WarehouseFileStatus` and the error if failed.
+		"""
+		paper_node = self._get_node(node_id=paper_rel_path)
+		if paper_node is not None:
+			if paper_node.metadata.get(SHARED_PAPER_FILE_HASH_KEY, None) == file_hash:
+				return WarehouseFileStatus.INGESTED, None
+			self.delete_paper(paper_rel_path=paper_rel_path)
+
+		try:
+			paper_id = self.insert_single_paper(
+				target_rel_dir=str(Path(paper_rel_path).parent),
+				raw_paper_path=str(self._root / paper_rel_path),
+				enqueue_summary=enable_summarize,
+			)
+		except Exception as e:
+			return WarehouseFileStatus.FAILED, f"Failed to ingest: {e}"
+
+		if paper_id is None:
+			return WarehouseFileStatus.FAILED, "Failed to read the paper."
+		return WarehouseFileStatus.INGESTED, None
+
+	def sync(self, enable_summarize: bool = False) -> WarehouseDelta:
+		r"""
+		Sync the shared paper warehouse `SHARED_PAPER_WAREHOUSE_DIR` with the vector_index, applying only the deltas
+		since the last sync:
+
+		- Deleted papers: the nodes are deleted.
+		- Moved papers: the nodes are relinked without re-embedding.
+		- Modified papers: the nodes are deleted and the paper is ingested again.
+		- Added papers: the paper is ingested.
+
+		The warehouse state is recorded in the `WarehouseManifest`. An unchanged file costs only a `stat`,
+		so the sync is cheap enough to run periodically. Papers that fail in ingestion are retried only when
+		their contents change, the failures are reported in `WarehouseDelta.failed`.
+
+		Args:
+			enable_summarize (bool): Whether to put the newly ingested papers into the summary queue.
+
+		Returns:
+			WarehouseDelta: The applied changes.
+		"""
+		manifest = self.warehouse_manifest
+		scanned = manifest.scan()
+		delta = manifest.diff(scanned=scanned)
+		if delta.is_empty():
+			return delta
+
+		for rel_path in delta.deleted:
+			self.delete_paper(paper_rel_path=rel_path)
+			manifest.remove(rel_path)
+
+		to_insert = []
+		for old_rel_path, new_rel_path in delta.moved:
+			manifest.remove(old_rel_path)
+			try:
+				moved = self.move_paper(old_rel_path=old_rel_path, new_rel_path=new_rel_path)
+			except Exception as e:
+				delta.failed.append((new_rel_path, f"Failed to move from {old_rel_path}: {e}"))
+				self.delete_paper(paper_rel_path=old_rel_path)
+				moved = False
+
+			if moved:
+				manifest.update(new_rel_path, scanned[new_rel_path], status=WarehouseFileStatus.INGESTED)
+			else:
+				to_insert.append(new_rel_path)
+
+		for rel_path in delta.modified:
+			self.delete_paper(paper_rel_path=rel_path)
+		to_insert.extend(delta.modified)
+		to_insert.extend(delta.added)
+
+		for rel_path in to_insert:
+			status, error = self._sync_insert_paper(
+				paper_rel_path=rel_path,
+				file_hash=scanned[rel_path][WAREHOUSE_FILE_HASH_KEY],
+				enable_summarize=enable_summarize,
+			)
+			if error is not None:
+				delta.failed.append((rel_path, error))
+			manifest.update(rel_path, scanned[rel_path], status=status)
+
+		self.persist_papers()
+		self.persist_notes()
+		manifest.persist()
+		return delta
+
 	def persist_papers(self, persist_dir: str = None):
 		r""" Save the vector_index to disk. """
-		persist_dir = persist_dir or self.persist_dir
-		if not self._fs.exists(persist_dir):
-			self._fs.makedirs(persist_dir)
-		self.vector_index.storage_context.persist(persist_dir=persist_dir)
+		with self._lock:
+			persist_dir = persist_dir or self.persist_dir
+			if not self._fs.exists(persist_dir):
+				self._fs.makedirs(persist_dir)
+			self.vector_index.storage_context.persist(persist_dir=persist_dir)
 
 	def persist_notes(
 		self,
 		notes_persist_dir: str = None,
 	):
 		r""" Save the notes_vector_index to disk. """
-		notes_persist_dir = notes_persist_dir or self.notes_persist_dir
-		if not self._fs.exists(notes_persist_dir):
-			self._fs.makedirs(notes_persist_dir)
-		self.notes_vector_index.storage_context.persist(persist_dir=notes_persist_dir)
+		with self._lock:
+			notes_persist_dir = notes_persist_dir or self.notes_persist_dir
+			if not self._fs.exists(notes_persist_dir):
+				self._fs.makedirs(notes_persist_dir)
+			self.notes_vector_index.storage_context.persist(persist_dir=notes_persist_dir)
 
 	def insert_note(
 		self,
@@ -953,51 +1444,52 @@ class SharedPaperStorage(object):
 		Returns:
 			bool: successful or not.
 		"""
-		self._account_manager.check_valid_user(user_id=user_id)
-		doi_node = self._get_notes_index_node(node_id=doi)
-		if doi_node is None:
-			return False
+		with self._lock:
+			self._account_manager.check_valid_user(user_id=user_id)
+			doi_node = self._get_notes_index_node(node_id=doi)
+			if doi_node is None:
+				return False
+
+			paper_pages_num = doi_node.child_nodes[0].metadata[SHARED_PAPER_TOTAL_PAGES_KEY]
+			if page_label > paper_pages_num:
+				return False
+
+			chunk_ids = [node.node_id for node in doi_node.child_nodes]
+			page_label_filter = MetadataFilter(
+				key=SHARED_PAPER_PAGE_LABEL_KEY,
+				value=str(page_label),
+				operator=FilterOperator.EQ
+			)
+			retriever = self.notes_vector_index.as_retriever(similarity_top_k=1)
+			retriever._node_ids = chunk_ids
+			retriever._filters = MetadataFilters(filters=[page_label_filter])
 
-		paper_pages_num = doi_node.child_nodes[0].metadata[SHARED_PAPER_TOTAL_PAGES_KEY]
-		if page_label > paper_pages_num:
-			return False
+			retrieved_nodes = retriever.retrieve(chunk_info)
+			if not retrieved_nodes:
+				return False
 
-		chunk_ids = [node.node_id for node in doi_node.child_nodes]
-		page_label_filter = MetadataFilter(
-			key=SHARED_PAPER_PAGE_LABEL_KEY,
-			value=str(page_label),
-			operator=FilterOperator.EQ
-		)
-		retriever = self.notes_vector_index.as_retriever(similarity_top_k=1)
-		retriever._node_ids = chunk_ids
-		retriever._filters = MetadataFilters(filters=[page_label_filter])
-
-		retrieved_nodes = retriever.retrieve(chunk_info)
-		if not retrieved_nodes:
-			return False
-
-		target_node_id = retrieved_nodes[0].node_id
-		chunk_node = self._get_notes_index_node(node_id=target_node_id)
-		note_node = self._new_note_node(
-			user_id=user_id,
-			note=note,
-		)
-		if chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] is None:
-			chunk_node.metadata[SHARED_PAPER_CHUNK_INIT_NOTE_KEY] = note_node.node_id
-			chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] = note_node.node_id
-		else:
-			last_note_id = chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY]
-			last_note = self._get_notes_index_node(node_id=last_note_id)
-			last_note.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=note_node.node_id)
-			note_node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=last_note_id)
-			chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] = note_node.node_id
-			self._update_note_index_node(node_id=last_note_id, node=last_note)
-
-		self._insert_as_child_nodes(node=chunk_node, child_nodes=[note_node])
-		self._update_note_index_node(node_id=chunk_node.node_id, node=chunk_node)
-		self._update_note_index_node(node_id=note_node.node_id, node=note_node)
-		self.persist_notes()
-		return True
+			target_node_id = retrieved_nodes[0].node_id
+			chunk_node = self._get_notes_index_node(node_id=target_node_id)
+			note_node = self._new_note_node(
+				user_id=user_id,
+				note=note,
+			)
+			if chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] is None:
+				chunk_node.metadata[SHARED_PAPER_CHUNK_INIT_NOTE_KEY] = note_node.node_id
+				chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] = note_node.node_id
+			else:
+				last_note_id = chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY]
+				last_note = self._get_notes_index_node(node_id=last_note_id)
+				last_note.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=note_node.node_id)
+				note_node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=last_note_id)
+				chunk_node.metadata[SHARED_PAPER_CHUNK_LAST_NOTE_KEY] = note_node.node_id
+				self._update_note_index_node(node_id=last_note_id, node=last_note)
+
+			self._insert_as_child_nodes(node=chunk_node, child_nodes=[note_node])
+			self._update_note_index_node(node_id=chunk_node.node_id, node=chunk_node)
+			self._update_note_index_node(node_id=note_node.node_id, node=note_node)
+			self.persist_notes()
+			return True
 
 	def _get_chunk_notes(
 		self,
@@ -0,0 +1,261 @@
+r"""
+The background summarization of the shared papers.
+
+Summarizing a paper takes minutes of LLM time. Instead of summarizing inline when a paper is ingested, the paper is
+put into a persistent `PaperSummaryQueue`, and a `PaperSummaryWorker` fills in the summaries in the background.
+The papers are searchable by chunks immediately, and the worker only takes the LLM when no user is chatting.
+"""
+
+import json
+import fsspec
+import threading
+
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+from labridge.common.utils.atomic_write import atomic_open
+from labridge.common.utils.priority import LLMPriorityGate, LLM_PRIORITY_GATE
+
+
+SHARED_PAPER_SUMMARY_QUEUE_NAME = "summary_queue.json"
+SUMMARY_QUEUE_MAX_ATTEMPTS = 3
+SUMMARY_WORKER_POLL_INTERVAL = 5.0
+SUMMARY_QUEUE_COMPACT_MIN_RECORDS = 256
+
+SUMMARY_STATUS_KEY = "status"
+SUMMARY_ATTEMPTS_KEY = "attempts"
+SUMMARY_ERROR_KEY = "error"
+SUMMARY_QUEUE_PAPER_ID_KEY = "paper_id"
+SUMMARY_QUEUE_JOB_KEY = "job"
+
+
+class SummaryStatus(object):
+	PENDING = "pending"
+	RUNNING = "running"
+	DONE = "done"
+	FAILED = "failed"
+
+
+class PaperSummaryQueue(object):
+	r"""
+	A persistent FIFO queue of the papers to be summarized, recording the summary status of each paper:
+	`{paper_id: {"status": str, "attempts": int, "error": Optional[str]}}`.
+
+	Each status change is appended to the queue file as a JSON line `{"paper_id": str, "job": Optional[dict]}`,
+	a null job means the paper is removed. The file is compacted to one line per job once the changes outnumber
+	the jobs, so that a status change does not rewrite the whole queue.
+
+	Jobs left `running` by a crashed process are pending again once the queue is loaded.
+	A job failing `SUMMARY_QUEUE_MAX_ATTEMPTS` times is marked as `failed`.
+
+	Args:
+		persist_path (str): The path of the queue file.
+		compact_min_records (int): The queue file is never compacted below this number of lines.
+	"""
+	def __init__(self, persist_path: str, compact_min_records: int = SUMMARY_QUEUE_COMPACT_MIN_RECORDS):
+		self.persist_path = persist_path
+		self.compact_min_records = compact_min_records
+		self._fs = fsspec.filesystem("file")
+		self._condition = threading.Condition()
+		self._jobs: Dict[str, Dict[str, Any]] = {}
+		self._record_num = 0
+		self.load()
+
+	def load(self):
+		r""" Load the queue from `self.persist_path`, a truncated last line (crash while writing) is ignored. """
+		self._jobs = {}
+		self._record_num = 0
+		if not self._fs.exists(self.persist_path):
+			return
+		with open(self.persist_path, "r", encoding="utf-8") as f:
+			for line in f:
+				try:
+					record = json.loads(line)
+				except ValueError:
+					break
+				self._record_num += 1
+				if SUMMARY_QUEUE_PAPER_ID_KEY not in record:
+					# A queue persisted as a single JSON dictionary.
+					self._jobs.update(record)
+					continue
+				job = record[SUMMARY_QUEUE_JOB_KEY]
+				if job is None:
+					self._jobs.pop(record[SUMMARY_QUEUE_PAPER_ID_KEY], None)
+				else:
+					self._jobs[record[SUMMARY_QUEUE_PAPER_ID_KEY]] = job
+		for job in self._jobs.values():
+			if job[SUMMARY_STATUS_KEY] == SummaryStatus.RUNNING:
+				job[SUMMARY_STATUS_KEY] = SummaryStatus.PENDING
+
+	def persist(self):
+		r""" Compact the queue file to one line per job. The file is replaced atomically. """
+		with atomic_open(self.persist_path, mode="w") as f:
+			for paper_id, job in self._jobs.items():
+				record = {SUMMARY_QUEUE_PAPER_ID_KEY: paper_id, SUMMARY_QUEUE_JOB_KEY: job}
+				f.write(json.dumps(record, ensure_ascii=False) + "\n")
+		self._record_num = len(self._jobs)
+
+	def _append(self, paper_id: str):
+		r""" Append the current job of a paper to the queue file, compact the file if it is long enough. """
+		if self._record_num >= max(self.compact_min_records, 2 * len(self._jobs)):
+			self.persist()
+			return
+		dir_path = str(Path(self.persist_path).parent)
+		if not self._fs.exists(dir_path):
+			self._fs.makedirs(dir_path)
+		record = {SUMMARY_QUEUE_PAPER_ID_KEY: paper_id, SUMMARY_QUEUE_JOB_KEY: self._jobs.get(paper_id, None)}
+		with open(self.persist_path, "a", encoding="utf-8") as f:
+			f.write(json.dumps(record, ensure_ascii=False) + "\n")
+		self._record_num += 1
+
+	def _set_status(self, paper_id: str, status: str, error: str = None):
+		job = self._jobs.setdefault(paper_id, {SUMMARY_ATTEMPTS_KEY: 0})
+		job[SUMMARY_STATUS_KEY] = status
+		job[SUMMARY_ERROR_KEY] = error
+		self._append(paper_id)
+		self._condition.notify_all()
+
+	def status(self, paper_id: str) -> Optional[str]:
+		r"""
+		Get the summary status of a paper.
+
+		Args:
+			paper_id (str): The node id of the paper node.
+
+		Returns:
+			Optional[str]: The status in `SummaryStatus`. If the paper is never queued, return None.
+		"""
+		job = self._jobs.get(paper_id, None)
+		if job is None:
+			return None
+		return job[SUMMARY_STATUS_KEY]
+
+	def pending_num(self) -> int:
+		return sum(1 for job in self._jobs.values() if job[SUMMARY_STATUS_KEY] == SummaryStatus.PENDING)
+
+	def enqueue(self, paper_id: str):
+		r""" Queue a paper to be summarized, unless it is summarized or being summarized. """
+		with self._condition:
+			if self.status(paper_id) in (SummaryStatus.DONE, SummaryStatus.RUNNING):
+				return
+			self._jobs.pop(paper_id, None)
+			self._set_status(paper_id, SummaryStatus.PENDING)
+
+	def mark_running(self, paper_id: str) -> bool:
+		r""" Take a pending job, return False if the paper is not pending. """
+		with self._condition:
+			if self.status(paper_id) != SummaryStatus.PENDING:
+				return False
+			self._jobs[paper_id][SUMMARY_ATTEMPTS_KEY] += 1
+			self._set_status(paper_id, SummaryStatus.RUNNING)
+			return True
+
+	def mark_done(self, paper_id: str):
+		with self._condition:
+			self._set_status(paper_id, SummaryStatus.DONE)
+
+	def mark_failed(self, paper_id: str, error: str):
+		r""" Record a failed attempt, the job is pending again until it reaches the max attempts. """
+		with self._condition:
+			if paper_id not in self._jobs:
+				return
+			attempts = self._jobs[paper_id][SUMMARY_ATTEMPTS_KEY]
+			status = SummaryStatus.FAILED if attempts >= SUMMARY_QUEUE_MAX_ATTEMPTS else SummaryStatus.PENDING
+			self._set_status(paper_id, status, error=error)
+
+	def remove(self, paper_id: str):
+		r""" Forget a paper, e.g. when it is deleted. """
+		with self._condition:
+			if self._jobs.pop(paper_id, None) is not None:
+				self._append(paper_id)
+
+	def rename(self, old_paper_id: str, new_paper_id: str):
+		r""" Follow a moved paper. """
+		with self._condition:
+			job = self._jobs.pop(old_paper_id, None)
+			if job is not None:
+				self._jobs[new_paper_id] = job
+				self._append(old_paper_id)
+				self._append(new_paper_id)
+
+	def wait_next(self, timeout: float = None) -> Optional[str]:
+		r"""
+		Wait for a pending job.
+
+		Args:
+			timeout (float): The max seconds to wait.
+
+		Returns:
+			Optional[str]: The paper id of the earliest pending job, or None if timeout.
+		"""
+		def next_pending() -> Optional[str]:
+			for paper_id, job in self._jobs.items():
+				if job[SUMMARY_STATUS_KEY] == SummaryStatus.PENDING:
+					return paper_id
+			return None
+
+		with self._condition:
+			self._condition.wait_for(lambda: next_pending() is not None, timeout=timeout)
+			return next_pending()
+
+
+class PaperSummaryWorker(object):
+	r"""
+	A background thread summarizing the papers in the summary queue of a `SharedPaperStorage`, one at a time.
+
+	Before each job, the worker waits for its turn on the `LLMPriorityGate`, so it shares the LLM with the chat
+	at a lower priority. Once the queue is drained, the storage is persisted.
+
+	Args:
+		storage: The `SharedPaperStorage`.
+		gate (LLMPriorityGate): The priority gate of the LLM. Defaults to `LLM_PRIORITY_GATE`.
+		poll_interval (float): The seconds to wait for a new job or for the chat before checking again.
+	"""
+	def __init__(
+		self,
+		storage,
+		gate: LLMPriorityGate = None,
+		poll_interval: float = SUMMARY_WORKER_POLL_INTERVAL,
+	):
+		self.storage = storage
+		self.gate = gate or LLM_PRIORITY_GATE
+		self.poll_interval = poll_interval
+		self._stop_event = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	@property
+	def is_running(self) -> bool:
+		return self._thread is not None and self._thread.is_alive()
+
+	def start(self):
+		if self.is_running:
+			return
+		self._stop_event.clear()
+		self._thread = threading.Thread(target=self._run, name="paper-summary-worker", daemon=True)
+		self._thread.start()
+
+	def stop(self, timeout: float = None):
+		r""" Stop the worker after the current job. """
+		self._stop_event.set()
+		if self._thread is not None:
+			self._thread.join(timeout=timeout)
+
+	def _run(self):
+		summarized = False
+		queue = self.storage.summary_queue
+		while not self._stop_event.is_set():
+			paper_id = queue.wait_next(timeout=self.poll_interval)
+			if paper_id is None:
+				if summarized:
+					self.storage.persist_summaries()
+					summarized = False
+				continue
+
+			if not self.gate.wait_background_turn(timeout=self.poll_interval):
+				continue
+			if self._stop_event.is_set():
+				break
+			summarized = self.storage.run_summary_job(paper_id=paper_id) or summarized
+
+		if summarized:
+			self.storage.persist_summaries()
@@ -1,10 +1,15 @@
+import json
+import time
 import fsspec
+import hashlib
+import threading
 
 from llama_index.core.indices import VectorStoreIndex
 from llama_index.core.embeddings import BaseEmbedding
 from llama_index.core import load_index_from_storage
 from llama_index.core.ingestion import run_transformations
 from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
 from llama_index.core.readers import SimpleDirectoryReader
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.schema import (
@@ -15,7 +20,9 @@ from llama_index.core.schema import (
 	TransformComponent,
 )
 
-from labridge.common.utils.time import get_time
+from labridge.common.utils.time import get_time, str_to_datetime
+from labridge.common.utils.vacuum import VacuumReport, vacuum_storage, check_storage
+from labridge.common.utils.atomic_write import atomic_write
 
 from pathlib import Path
 from typing import Dict, Any, List, Optional
@@ -43,6 +50,15 @@ TMP_PAPER_FILE_PATH_KEY = "absolute_file_path"
 TMP_PAPER_NODE_TYPE_KEY = "node_type"
 TMP_PAPER_DOC_NODE_TYPE = "paper_doc_node"
 
+# Retention: the papers beyond these limits are moved to the archive, refer to `RecentPaperStore.apply_retention`.
+TMP_PAPER_MAX_NUM = 50
+TMP_PAPER_MAX_AGE_DAYS = 90
+TMP_PAPER_ARCHIVE_DIR = "archive"
+# The last retrieval time of each paper, persisted beside the vector index.
+TMP_PAPER_ACCESS_PERSIST_NAME = "paper_access.json"
+# Seconds after a retrieval before the retrieval times are written, the retrievals meanwhile are written together.
+TMP_PAPER_ACCESS_FLUSH_DELAY = 5.0
+
 
 def tmp_paper_get_file_metadata(file_path: str) -> Dict[str, Any]:
 	r"""
@@ -81,9 +97,22 @@ class RecentPaperStore(object):
 						node_1  					node_n
 	```
 
+	The store is bounded by a retention policy: the papers exceeding `max_paper_num`, or not added or retrieved
+	within `max_age_days` days, are moved to an archive with their embeddings, the least recently used first.
+	The archived papers are restored on demand without embedding again, refer to `apply_retention` and `restore`.
+
+	An archive file is written before the vector index without the archived paper is persisted, and removed only
+	after the vector index with the restored paper is persisted. An archive file of a paper in the vector index is
+	thus left by an interrupted persisting, and ignored.
+
 	Args:
 		vector_index (VectorStoreIndex): The vector database storing recent papers.
 		persist_dir (persist_dir): The persist directory of the vector database.
+		max_paper_num (int): The maximum number of papers in the vector index. Defaults to `TMP_PAPER_MAX_NUM`.
+		max_age_days (int): The papers not used within `max_age_days` days are archived.
+			Defaults to `TMP_PAPER_MAX_AGE_DAYS`.
+		access_flush_delay (float): Seconds after a retrieval before the retrieval times are written to disk.
+			Defaults to `TMP_PAPER_ACCESS_FLUSH_DELAY`.
 
 	Note:
 		The metadata `date` and `time` is recorded in a list format for the convenience of metadata filtering.
@@ -92,7 +121,10 @@ class RecentPaperStore(object):
 	def __init__(
 		self,
 		vector_index: VectorStoreIndex,
-		persist_dir: str
+		persist_dir: str,
+		max_paper_num: int = TMP_PAPER_MAX_NUM,
+		max_age_days: int = TMP_PAPER_MAX_AGE_DAYS,
+		access_flush_delay: float = TMP_PAPER_ACCESS_FLUSH_DELAY,
 	):
 		root = Path(__file__)
 		for idx in range(5):
@@ -103,6 +135,16 @@ class RecentPaperStore(object):
 		self.persist_dir = persist_dir
 		self._user_id = self.user_id
 		self._fs = fsspec.filesystem("file")
+		self.max_paper_num = max_paper_num
+		self.max_age_days = max_age_days
+		self.access_flush_delay = access_flush_delay
+		self._last_retrieved = None
+		# Serializes the changes and writes of the retrieval times.
+		self._access_lock = threading.Lock()
+		self._access_dirty = False
+		self._access_flusher: Optional[threading.Timer] = None
+		# The archive files of the restored papers, removed once the vector index is persisted.
+		self._restored_archives: Dict[str, str] = {}
 
 	@classmethod
 	def from_storage(
@@ -290,6 +332,9 @@ class RecentPaperStore(object):
 		except ValueError:
 			pass
 
+		if self.restore(paper_file_path=store_file_path):
+			return
+
 		if str(Path(paper_file_path).parent) != str(user_papers_dir):
 			self._fs.cp(paper_file_path, str(user_papers_dir))
 
@@ -344,6 +389,7 @@ class RecentPaperStore(object):
 		paper_node.relationships[NodeRelationship.CHILD] = child_nodes
 		nodes = doc_nodes + [paper_node]
 		self.vector_index.insert_nodes(nodes=nodes)
+		self.apply_retention()
 
 	def get_summary_node(self, paper_file_path: str) -> Optional[BaseNode]:
 		r"""
@@ -381,6 +427,8 @@ class RecentPaperStore(object):
 			paper_node = self._get_node(node_id=paper_file_path)
 			return paper_node
 		except Exception:
+			if self.restore(paper_file_path=paper_file_path):
+				return self._get_node(node_id=paper_file_path)
 			raise ValueError(f"{paper_file_path} does not exists in the temporary papers of user {self._user_id}.")
 
 	def insert_summary_node(self, paper_file_path: str, summary_node: TextNode):
@@ -476,9 +524,224 @@ class RecentPaperStore(object):
 		except ValueError:
 			pass
 
+	@property
+	def last_retrieved(self) -> Dict[str, float]:
+		r""" The last retrieval timestamp of each paper, loaded from the persist directory at first use. """
+		if self._last_retrieved is None:
+			access_path = str(Path(self.persist_dir) / TMP_PAPER_ACCESS_PERSIST_NAME)
+			self._last_retrieved = {}
+			if self._fs.exists(access_path):
+				with self._fs.open(access_path, "r", encoding="utf-8") as f:
+					self._last_retrieved = json.load(f)
+		return self._last_retrieved
+
+	def _persist_last_retrieved(self, persist_dir: str):
+		with self._access_lock:
+			access_path = str(Path(persist_dir) / TMP_PAPER_ACCESS_PERSIST_NAME)
+			atomic_write(access_path, json.dumps(self.last_retrieved, ensure_ascii=False))
+			self._access_dirty = False
+
+	def _schedule_access_flush(self):
+		r""" Write the retrieval times after `access_flush_delay` seconds, must be called with `self._access_lock` held. """
+		if self._access_flusher is not None and self._access_flusher.is_alive():
+			return
+		self._access_flusher = threading.Timer(self.access_flush_delay, self.flush_access)
+		self._access_flusher.daemon = True
+		self._access_flusher.start()
+
+	def flush_access(self):
+		r""" Write the unsaved retrieval times, if the store is persisted. """
+		if self._access_dirty and self._fs.exists(self.persist_dir):
+			self._persist_last_retrieved(persist_dir=self.persist_dir)
+
+	def mark_retrieved(self, node_ids: List[str]):
+		r"""
+		Record the retrieval of the papers that the nodes belong to, for the LRU retention.
+		The records are written together by `persist`, or in the background `access_flush_delay` seconds later,
+		without persisting the vector index.
+
+		Args:
+			node_ids (List[str]): The retrieved node ids, doc nodes or paper nodes.
+		"""
+		paper_ids = set()
+		for node in self._get_nodes(node_ids=node_ids):
+			paper_ids.add(node.parent_node.node_id if node.parent_node is not None else node.node_id)
+		paper_ids.discard(TMP_PAPER_ROOT_NODE_NAME)
+		if not paper_ids:
+			return
+
+		now = time.time()
+		last_retrieved = self.last_retrieved
+		with self._access_lock:
+			for paper_id in paper_ids:
+				last_retrieved[paper_id] = now
+			self._access_dirty = True
+			self._schedule_access_flush()
+
+	def _last_used(self, paper_node: BaseNode) -> float:
+		r""" The timestamp when the paper is added or lastly retrieved. """
+		added = str_to_datetime(
+			date_str=paper_node.metadata[TMP_PAPER_DATE][0],
+			time_str=paper_node.metadata[TMP_PAPER_TIME][0],
+		).timestamp()
+		return max(added, self.last_retrieved.get(paper_node.node_id, added))
+
+	def _archive_path(self, paper_file_path: str) -> str:
+		r""" The paper ids are absolute file paths, hashed as the archive file names. """
+		file_name = hashlib.sha256(paper_file_path.encode("utf-8")).hexdigest()
+		return str(Path(self.persist_dir) / TMP_PAPER_ARCHIVE_DIR / f"{file_name}.json")
+
+	def is_archived(self, paper_file_path: str) -> bool:
+		r""" Whether the paper is in the archive, and not in the vector index. """
+		return (
+			self._fs.exists(self._archive_path(paper_file_path=paper_file_path))
+			and not self.vector_index.docstore.document_exists(paper_file_path)
+		)
+
+	def archived_papers(self) -> List[str]:
+		r"""
+		The archived papers.
+
+		Returns:
+			List[str]: The file paths of the archived papers.
+		"""
+		archive_dir = str(Path(self.persist_dir) / TMP_PAPER_ARCHIVE_DIR)
+		if not self._fs.exists(archive_dir):
+			return []
+		paper_ids = []
+		for archive_path in sorted(self._fs.glob(f"{archive_dir}/*.json")):
+			with self._fs.open(archive_path, "r", encoding="utf-8") as f:
+				paper_id = json.load(f)["paper_id"]
+			if not self.vector_index.docstore.document_exists(paper_id):
+				paper_ids.append(paper_id)
+		return paper_ids
+
+	def archive(self, paper_file_path: str):
+		r"""
+		Move a paper from the vector index to the archive, with the embeddings of its nodes.
+		The paper file is kept in the recent paper warehouse.
+
+		Args:
+			paper_file_path (str): The file path of the paper, equally the node_id of the paper_node.
+		"""
+		paper_node = self._get_node(node_id=paper_file_path)
+		nodes = [paper_node] + self._get_nodes(node_ids=[child.node_id for child in paper_node.child_nodes or []])
+		vector_store = self.vector_index.vector_store
+		records = []
+		for node in nodes:
+			try:
+				embedding = vector_store.get(node.node_id)
+			except (KeyError, NotImplementedError):
+				embedding = None
+			records.append({"node": node.to_dict(), "embedding": embedding})
+
+		archive_path = self._archive_path(paper_file_path=paper_file_path)
+		atomic_write(
+			archive_path,
+			json.dumps({"paper_id": paper_file_path, "archived_at": time.time(), "records": records}, ensure_ascii=False),
+		)
+		self._restored_archives.pop(paper_file_path, None)
+
+		removed_ids = [node.node_id for node in nodes]
+		self.vector_index.delete_nodes(removed_ids, delete_from_docstore=True)
+		for node_id in removed_ids:
+			self.vector_index.index_struct.delete(node_id)
+		self.vector_index.storage_context.index_store.add_index_struct(self.vector_index.index_struct)
+
+		# The root node is only a docstore entry for the tree structure, not embedded again.
+		root_node = self._get_node(node_id=TMP_PAPER_ROOT_NODE_NAME)
+		root_node.relationships[NodeRelationship.CHILD] = [
+			paper for paper in root_node.child_nodes or [] if paper.node_id != paper_file_path
+		]
+		self.vector_index.docstore.add_documents([root_node], allow_update=True)
+
+	def restore(self, paper_file_path: str) -> bool:
+		r"""
+		Move an archived paper back to the vector index, with the archived embeddings.
+
+		Args:
+			paper_file_path (str): The file path of the paper, equally the node_id of the paper_node.
+
+		Returns:
+			bool: Whether the paper is restored. False if it is not archived.
+		"""
+		if not self.is_archived(paper_file_path=paper_file_path):
+			return False
+		archive_path = self._archive_path(paper_file_path=paper_file_path)
+		with self._fs.open(archive_path, "r", encoding="utf-8") as f:
+			records = json.load(f)["records"]
+
+		nodes = []
+		for record in records:
+			node = TextNode.from_dict(record["node"])
+			node.embedding = record["embedding"]
+			nodes.append(node)
+		self.vector_index.insert_nodes(nodes=nodes)
+
+		root_node = self._get_node(node_id=TMP_PAPER_ROOT_NODE_NAME)
+		papers = root_node.child_nodes or []
+		if paper_file_path not in [paper.node_id for paper in papers]:
+			papers.append(RelatedNodeInfo(node_id=paper_file_path))
+		root_node.relationships[NodeRelationship.CHILD] = papers
+		self.vector_index.docstore.add_documents([root_node], allow_update=True)
+
+		# Removed after the vector index is persisted, refer to `persist`.
+		self._restored_archives[paper_file_path] = archive_path
+		last_retrieved = self.last_retrieved
+		with self._access_lock:
+			last_retrieved[paper_file_path] = time.time()
+		self.apply_retention(keep=[paper_file_path])
+		return True
+
+	def apply_retention(
+		self,
+		max_paper_num: int = None,
+		max_age_days: int = None,
+		keep: List[str] = None,
+	) -> List[str]:
+		r"""
+		Archive the papers beyond the retention policy:
+
+		1. The papers not added or retrieved within `max_age_days` days.
+		2. The least recently used papers, until at most `max_paper_num` papers are left.
+
+		Args:
+			max_paper_num (int): Defaults to `self.max_paper_num`.
+			max_age_days (int): Defaults to `self.max_age_days`.
+			keep (List[str]): The papers that are never archived in this call, such as a just restored one.
+
+		Returns:
+			List[str]: The archived papers.
+		"""
+		max_paper_num = max_paper_num or self.max_paper_num
+		max_age_days = max_age_days or self.max_age_days
+		keep = set(keep or [])
+
+		root_node = self._get_node(node_id=TMP_PAPER_ROOT_NODE_NAME)
+		paper_ids = [paper.node_id for paper in root_node.child_nodes or []]
+		if not paper_ids:
+			return []
+
+		last_used = {node.node_id: self._last_used(node) for node in self._get_nodes(node_ids=paper_ids)}
+		# least recently used first.
+		candidates = sorted((paper_id for paper_id in paper_ids if paper_id not in keep), key=lambda x: last_used[x])
+		expire_before = time.time() - max_age_days * 24 * 3600
+		to_archive = [paper_id for paper_id in candidates if last_used[paper_id] < expire_before]
+		exceeded = len(paper_ids) - len(to_archive) - max_paper_num
+		if exceeded > 0:
+			to_archive.extend([paper_id for paper_id in candidates if paper_id not in to_archive][:exceeded])
+
+		last_retrieved = self.last_retrieved
+		for paper_id in to_archive:
+			self.archive(paper_file_path=paper_id)
+			with self._access_lock:
+				last_retrieved.pop(paper_id, None)
+		return to_archive
+
 	def persist(self, persist_dir: str = None):
 		r"""
 		Persis to the disk.
+		The archive files of the restored papers are removed once the vector index is persisted.
 
 		Args:
 			persist_dir (str): The save directory. Defaults to `self.persist_dir`
@@ -487,6 +750,46 @@ class RecentPaperStore(object):
 		if not self._fs.exists(persist_dir):
 			self._fs.makedirs(persist_dir)
 		self.vector_index.storage_context.persist(persist_dir=persist_dir)
+		self._persist_last_retrieved(persist_dir=persist_dir)
+		if persist_dir == self.persist_dir:
+			for paper_id, archive_path in list(self._restored_archives.items()):
+				if self._fs.exists(archive_path):
+					self._fs.rm(archive_path)
+				del self._restored_archives[paper_id]
+
+	@staticmethod
+	def vacuum_root_ids(docstore: BaseDocumentStore) -> List[str]:
+		r""" The root nodes of the storage. """
+		return [TMP_PAPER_ROOT_NODE_NAME]
+
+	def check_consistency(self) -> List[str]:
+		r""" Check the consistency of the storage, refer to `check_storage`. """
+		return check_storage(
+			storage_context=self.vector_index.storage_context,
+			index_id=TMP_PAPER_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+
+	def vacuum(self) -> VacuumReport:
+		r"""
+		Persist the storage, rewrite it with only the nodes reachable from the root node and reload it.
+		Refer to `vacuum_storage`.
+
+		Returns:
+			VacuumReport: The removed contents and the reclaimed bytes.
+		"""
+		self.persist()
+		report = vacuum_storage(
+			persist_dir=self.persist_dir,
+			index_id=TMP_PAPER_VECTOR_INDEX_ID,
+			root_ids=self.vacuum_root_ids(self.vector_index.docstore),
+		)
+		self.vector_index = load_index_from_storage(
+			storage_context=StorageContext.from_defaults(persist_dir=self.persist_dir),
+			index_id=TMP_PAPER_VECTOR_INDEX_ID,
+			embed_model=self.vector_index._embed_model,
+		)
+		return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+r"""
+The manifest of the shared paper warehouse.
+
+The manifest records the path, size, mtime and content hash of each PDF in the warehouse that has been synced into
+the `SharedPaperStorage`. Comparing it with a new scan of the warehouse gives the added, moved, modified and deleted
+papers, so that a sync only applies these deltas.
+"""
+
+import json
+import fsspec
+
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Any
+
+from labridge.common.utils.hash import file_sha256
+from labridge.common.utils.atomic_write import atomic_write
+from labridge.func_modules.paper.parse.paper_reader import SHARED_PAPER_WAREHOUSE_DIR
+
+
+WAREHOUSE_MANIFEST_PERSIST_PATH = "storage/shared_papers/warehouse_manifest.json"
+
+WAREHOUSE_FILE_SIZE_KEY = "size"
+WAREHOUSE_FILE_MTIME_KEY = "mtime"
+WAREHOUSE_FILE_HASH_KEY = "hash"
+WAREHOUSE_FILE_STATUS_KEY = "status"
+
+
+class WarehouseFileStatus(object):
+	INGESTED = "ingested"
+	FAILED = "failed"
+
+
+class WarehouseDelta(object):
+	r"""
+	The changes of the warehouse since the last sync. All paths are relative to the project root.
+
+	Args:
+		added (List[str]): Newly added papers.
+		deleted (List[str]): Deleted papers.
+		modified (List[str]): Papers whose contents changed.
+		moved (List[Tuple[str, str]]): Papers that were moved or renamed, as `(old_path, new_path)`.
+		failed (List[Tuple[str, str]]): Papers that failed to be synced, as `(path, error)`.
+	"""
+	def __init__(
+		self,
+		added: List[str] = None,
+		deleted: List[str] = None,
+		modified: List[str] = None,
+		moved: List[Tuple[str, str]] = None,
+		failed: List[Tuple[str, str]] = None,
+	):
+		self.added = added or []
+		self.deleted = deleted or []
+		self.modified = modified or []
+		self.moved = moved or []
+		self.failed = failed or []
+
+	def is_empty(self) -> bool:
+		return not (self.added or self.deleted or self.modified or self.moved)
+
+	def to_dict(self) -> Dict[str, list]:
+		return {
+			"added": self.added,
+			"deleted": self.deleted,
+			"modified": self.modified,
+			"moved": self.moved,
+			"failed": self.failed,
+		}
+
+	def __repr__(self) -> str:
+		return (
+			f"WarehouseDelta(added={len(self.added)}, deleted={len(self.deleted)}, "
+			f"modified={len(self.modified)}, moved={len(self.moved)}, failed={len(self.failed)})"
+		)
+
+
+class WarehouseManifest(object):
+	r"""
+	The manifest of the shared paper warehouse, stored as a JSON file:
+	`{rel_path: {"size": int, "mtime": float, "hash": str, "status": str}}`.
+
+	A file is re-hashed during a scan only if it is new or its size or mtime changed, so a scan of an unchanged
+	warehouse only costs a `stat` per file.
+
+	Args:
+		root (str): The project root, paths in the manifest are relative to it.
+		persist_path (str): The path of the manifest file. Defaults to `WAREHOUSE_MANIFEST_PERSIST_PATH` under the root.
+		warehouse_dir (str): The warehouse directory relative to the root. Defaults to `SHARED_PAPER_WAREHOUSE_DIR`.
+	"""
+	def __init__(
+		self,
+		root: str,
+		persist_path: str = None,
+		warehouse_dir: str = SHARED_PAPER_WAREHOUSE_DIR,
+	):
+		self.root = Path(root)
+		self.persist_path = persist_path or str(self.root / WAREHOUSE_MANIFEST_PERSIST_PATH)
+		self.warehouse_dir = warehouse_dir
+		self._fs = fsspec.filesystem("file")
+		self.records: Dict[str, Dict[str, Any]] = {}
+		self.load()
+
+	def load(self):
+		r""" Load the manifest from `self.persist_path`. """
+		if not self._fs.exists(self.persist_path):
+			return
+		with self._fs.open(self.persist_path, "rb") as f:
+			self.records = json.load(f)
+
+	def persist(self, persist_path: str = None):
+		r""" Save the manifest. The file is replaced atomically. """
+		persist_path = persist_path or self.persist_path
+		atomic_write(persist_path, json.dumps(self.records, ensure_ascii=False))
+
+	def scan(self) -> Dict[str, Dict[str, Any]]:
+		r"""
+		Scan the PDFs in the warehouse. Hidden files and directories are skipped.
+
+		Returns:
+			Dict[str, Dict[str, Any]]: `{rel_path: {"size": int, "mtime": float, "hash": str}}`.
+		"""
+		warehouse = self.root / self.warehouse_dir
+		scanned = {}
+		if not warehouse.exists():
+			return scanned
+
+		for file_path in warehouse.rglob("*.pdf"):
+			rel_parts = file_path.relative_to(warehouse).parts
+			if any(part.startswith(".") for part in rel_parts) or not file_path.is_file():
+				continue
+
+			rel_path = str(file_path.relative_to(self.root))
+			stat = file_path.stat()
+			file_info = {
+				WAREHOUSE_FILE_SIZE_KEY: stat.st_size,
+				WAREHOUSE_FILE_MTIME_KEY: stat.st_mtime,
+			}
+			record = self.records.get(rel_path, None)
+			if (
+				record is not None
+				and record[WAREHOUSE_FILE_SIZE_KEY] == stat.st_size
+				and record[WAREHOUSE_FILE_MTIME_KEY] == stat.st_mtime
+			):
+				file_info[WAREHOUSE_FILE_HASH_KEY] = record[WAREHOUSE_FILE_HASH_KEY]
+			else:
+				file_info[WAREHOUSE_FILE_HASH_KEY] = file_sha256(str(file_path), fs=self._fs)
+			scanned[rel_path] = file_info
+		return scanned
+
+	def diff(self, scanned: Dict[str, Dict[str, Any]]) -> WarehouseDelta:
+		r"""
+		Compare a scan with the manifest.
+
+		- A path in both with a different hash is modified.
+		- A path only in the manifest whose hash appears in a path only in the scan is moved,
+		if the paper was ingested successfully.
+		- The remaining paths only in the scan are added, and those only in the manifest are deleted.
+
+		Args:
+			scanned (Dict[str, Dict[str, Any]]): The result of `self.scan`.
+
+		Returns:
+			WarehouseDelta: The changes.
+		"""
+		new_paths = [path for path in scanned.keys() if path not in self.records]
+		old_paths = [path for path in self.records.keys() if path not in scanned]
+		modified = [
+			path for path in scanned.keys()
+			if path in self.records
+			and scanned[path][WAREHOUSE_FILE_HASH_KEY] != self.records[path][WAREHOUSE_FILE_HASH_KEY]
+		]
+
+		new_paths_of_hash = defaultdict(list)
+		for path in new_paths:
+			new_paths_of_hash[scanned[path][WAREHOUSE_FILE_HASH_KEY]].append(path)
+
+		moved, deleted = [], []
+		for path in old_paths:
+			record = self.records[path]
+			candidates = new_paths_of_hash.get(record[WAREHOUSE_FILE_HASH_KEY], None)
+			if candidates and record.get(WAREHOUSE_FILE_STATUS_KEY) == WarehouseFileStatus.INGESTED:
+				moved.append((path, candidates.pop(0)))
+			else:
+				deleted.append(path)
+
+		moved_to = set(new_path for _, new_path in moved)
+		added = [path for path in new_paths if path not in moved_to]
+		return WarehouseDelta(added=added, deleted=deleted, modified=modified, moved=moved)
+
+	def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+		return self.records.get(rel_path, None)
+
+	def update(self, rel_path: str, file_info: Dict[str, Any], status: str):
+		r"""
+		Record a synced file.
+
+		Args:
+			rel_path (str): The file path relative to the root.
+			file_info (Dict[str, Any]): The scanned file info.
+			status (str): The status in `WarehouseFileStatus`.
+				A failed file is retried in a later sync only if its content changes.
+		"""
+		record = dict(file_info)
+		record[WAREHOUSE_FILE_STATUS_KEY] = status
+		self.records[rel_path] = record
+
+	def remove(self, rel_path: str):
+		self.records.pop(rel_path, None)
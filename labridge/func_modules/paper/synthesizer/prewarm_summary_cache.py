@@ -0,0 +1,102 @@
+r"""
+Admin command to prewarm the paper summary cache.
+
+Summarize the PDFs under the given directories (by default, the shared paper warehouse and the recent paper warehouse)
+ahead of time, so that the papers added to the `RecentPaperStore`, the `SharedPaperStorage` or the `PaperStorage`
+later get their summaries from the `PaperSummaryCache` without waiting for the LLM.
+
+Usage:
+	python -m labridge.func_modules.paper.synthesizer.prewarm_summary_cache [--paper_dirs DIR ...]
+"""
+
+import argparse
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.readers import SimpleDirectoryReader
+from llama_index.core.schema import NodeWithScore
+
+from labridge.func_modules.paper.parse.paper_reader import SHARED_PAPER_WAREHOUSE_DIR
+from labridge.func_modules.paper.store.temporary_store import TMP_PAPER_WAREHOUSE_DIR, TMP_PAPER_FILE_PATH_KEY
+from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
+
+
+def is_summary_cached(summarizer: PaperBatchSummarize, paper_path: str) -> bool:
+	r""" Whether the summary of the paper file is in the summarizer's cache. """
+	content_hash = summarizer.summary_cache.file_hash(paper_path)
+	summary = summarizer.summary_cache.get_summary(content_hash, summarizer.summary_prompt, summarizer.model_name)
+	return summary is not None
+
+
+def prewarm_summary_cache(
+	summarizer: PaperBatchSummarize,
+	paper_paths: List[str],
+	verbose: bool = True,
+) -> List[str]:
+	r"""
+	Summarize the papers whose summaries are not cached yet.
+
+	Args:
+		summarizer (PaperBatchSummarize): The summarizer, with the same summary queries and LLM as the paper stores.
+		paper_paths (List[str]): The paths of the paper files.
+		verbose (bool): Whether to show the progress.
+
+	Returns:
+		List[str]: The newly summarized papers.
+	"""
+	splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=256, include_metadata=True)
+	summarized = []
+	for idx, paper_path in enumerate(paper_paths):
+		if is_summary_cached(summarizer=summarizer, paper_path=paper_path):
+			continue
+
+		if verbose:
+			print(f"[{idx + 1}/{len(paper_paths)}] Summarizing {paper_path}")
+		try:
+			documents = SimpleDirectoryReader(
+				input_files=[paper_path],
+				file_metadata=lambda file_path: {TMP_PAPER_FILE_PATH_KEY: file_path},
+			).load_data()
+		except Exception as e:
+			print(f"Failed to read {paper_path}: {e}")
+			continue
+
+		nodes = run_transformations(nodes=documents, transformations=[splitter])
+		summarizer.synthesize(query="", nodes=[NodeWithScore(node=n) for n in nodes])
+		summarized.append(paper_path)
+	return summarized
+
+
+def main():
+	root = Path(__file__)
+	for i in range(5):
+		root = root.parent
+
+	parser = argparse.ArgumentParser(description="Prewarm the paper summary cache.")
+	parser.add_argument(
+		"--paper_dirs",
+		nargs="+",
+		default=[str(root / SHARED_PAPER_WAREHOUSE_DIR), str(root / TMP_PAPER_WAREHOUSE_DIR)],
+		help="The directories to search PDFs in, recursively.",
+	)
+	args = parser.parse_args()
+
+	from labridge.models.utils import get_models
+
+	llm, _ = get_models()
+	summarizer = PaperBatchSummarize(llm=llm, abs_file_path_key=TMP_PAPER_FILE_PATH_KEY)
+
+	paper_paths = []
+	for paper_dir in args.paper_dirs:
+		paper_paths.extend(sorted(str(path) for path in Path(paper_dir).rglob("*.pdf")))
+
+	summarized = prewarm_summary_cache(summarizer=summarizer, paper_paths=paper_paths)
+	summarizer.summary_cache.persist()
+	print(f"Summarized {len(summarized)} papers, {len(paper_paths) - len(summarized)} already cached or failed.")
+
+
+if __name__ == "__main__":
+	main()
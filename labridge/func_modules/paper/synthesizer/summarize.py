@@ -1,4 +1,8 @@
 import asyncio
+import hashlib
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from llama_index.core.prompts.default_prompt_selectors import DEFAULT_TREE_SUMMARIZE_PROMPT_SEL
 from llama_index.core.prompts.mixin import PromptDictType
@@ -38,7 +42,10 @@ from llama_index.core.instrumentation.events.synthesis import (
 
 
 from typing import Tuple, Sequence, Any
+from pathlib import Path
 
+from labridge.func_modules.paper.parse.extractors.metadata_extract import PAPER_REL_FILE_PATH
+from labridge.func_modules.paper.synthesizer.summary_cache import PaperSummaryCache
 from labridge.func_modules.paper.prompt.synthesize.paper_summarize import (
 	PAPER_SUMMARIZE_QUERY,
 	METHODS_SUMMARIZE_QUERY,
@@ -52,6 +59,10 @@ dispatcher = instrument.get_dispatcher(__name__)
 
 SUMMARIZE_MAX_TOKENS = 10000
 SUMMARIZE_OVERLAP_CHUNK_NUM = 2
+SUMMARIZE_MAX_CONCURRENCY = 4
+# The partial summaries are cut to this ratio of their length at a time, until they fit in max_tokens.
+SUMMARIZE_TRUNCATE_RATIO = 0.9
+SUMMARIZE_TOKEN_CACHE_SIZE = 4096
 
 
 def empty_response_generator() -> Generator[str, None, None]:
@@ -67,15 +78,25 @@ class PaperBatchSummarize(BaseSynthesizer):
 	Summarize a paper in a batch style (Because of the video memory limits).
 
 	- Firstly, the paper contents are seperated into overlapped batches, with no batch exceeds the max_tokens.
-	- The batch contents are then summarized individually.
+	- The batch contents are then summarized concurrently.
+	- If those summaries exceed the max_tokens, they are batched and summarized again, level by level.
 	- Finally, those summaries are summarized to get the summary of the paper.
 
+	Thus summarizing a long paper takes about one LLM latency per level.
+
+	The summaries are cached in the `PaperSummaryCache` by (paper file hash, summary queries, LLM),
+	the paper file is found through the nodes' metadata. The cache is checked before summarizing.
+
 	Args:
 		llm (LLM): The used LLM.
 		max_tokens (int): The max_tokens of a batch, set a proper value according to the video memory size.
 		overlap_chunk_num (int): The overlap chunks between two adjacent batches.
 		summary_query (str): The summary prompt in the batch summary.
 		secondary_query (str): The summary prompt in the final summary.
+		max_concurrency (int): The max number of concurrent LLM calls in a level.
+		summary_cache (PaperSummaryCache): The summary cache. Defaults to the on-disk `PaperSummaryCache`.
+		abs_file_path_key (Optional[str]): The metadata key of the absolute paper file path, such as
+			`TMP_PAPER_FILE_PATH_KEY` of the recent papers. The relative path `PAPER_REL_FILE_PATH` is always checked.
 	"""
 	def __init__(
 		self,
@@ -84,6 +105,9 @@ class PaperBatchSummarize(BaseSynthesizer):
 		overlap_chunk_num: int = SUMMARIZE_OVERLAP_CHUNK_NUM,
 		summary_query: str = PAPER_SUMMARIZE_QUERY,
 		secondary_query: str = PAPER_SECONDARY_SUMMARIZE_QUERY,
+		max_concurrency: int = SUMMARIZE_MAX_CONCURRENCY,
+		summary_cache: PaperSummaryCache = None,
+		abs_file_path_key: Optional[str] = None,
 	):
 		super().__init__(llm=llm)
 		self._summary_template = DEFAULT_TREE_SUMMARIZE_PROMPT_SEL
@@ -96,6 +120,14 @@ class PaperBatchSummarize(BaseSynthesizer):
 		self._overlap_chunk_num = overlap_chunk_num
 		self._summary_query = summary_query
 		self._secondary_query = secondary_query
+		self._max_concurrency = max_concurrency
+		self._token_num_cache: OrderedDict[str, int] = OrderedDict()
+		self._summary_cache = summary_cache or PaperSummaryCache()
+		self._abs_file_path_key = abs_file_path_key
+		root = Path(__file__)
+		for i in range(5):
+			root = root.parent
+		self._root = root
 
 
 	@property
@@ -114,6 +146,46 @@ class PaperBatchSummarize(BaseSynthesizer):
 	def secondary_query(self, value: str):
 		self._secondary_query = value
 
+	@property
+	def summary_cache(self) -> PaperSummaryCache:
+		return self._summary_cache
+
+	@property
+	def summary_prompt(self) -> str:
+		r""" The summary queries, part of the summary cache key. """
+		return f"{self._summary_query}\n{self._secondary_query}"
+
+	@property
+	def model_name(self) -> str:
+		r""" The name of the LLM, part of the summary cache key. """
+		return f"{type(self._llm).__name__}/{self._llm.metadata.model_name}"
+
+	def paper_content_hash(self, nodes: List[NodeWithScore]) -> str:
+		r"""
+		Get the content hash of the paper the nodes belong to.
+		The paper file is found through the metadata `abs_file_path_key` (recent papers) or
+		`PAPER_REL_FILE_PATH` (shared papers and the paper warehouse).
+		If the file is not found, hash the contents of the nodes instead.
+
+		Args:
+			nodes (List[NodeWithScore]): The nodes of a paper.
+
+		Returns:
+			str: The content hash.
+		"""
+		metadata = nodes[0].node.metadata
+		paper_path = metadata.get(self._abs_file_path_key, None) if self._abs_file_path_key else None
+		if paper_path is None and metadata.get(PAPER_REL_FILE_PATH, None) is not None:
+			paper_path = str(self._root / metadata[PAPER_REL_FILE_PATH])
+
+		content_hash = self._summary_cache.file_hash(paper_path) if paper_path is not None else None
+		if content_hash is None:
+			hash_worker = hashlib.sha256()
+			for n in nodes:
+				hash_worker.update(n.node.get_content(metadata_mode=MetadataMode.NONE).encode("utf-8"))
+			content_hash = hash_worker.hexdigest()
+		return content_hash
+
 	def _get_prompts(self) -> PromptDictType:
 		"""Get prompts."""
 		return {"summary_template": self._summary_template}
@@ -123,33 +195,86 @@ class PaperBatchSummarize(BaseSynthesizer):
 		if "summary_template" in prompts:
 			self._summary_template = prompts["summary_template"]
 
-	def _calculate_batch_size(self, text_chunks: Sequence[str]) -> Tuple[bool, int]:
+	def _token_num(self, text: str) -> int:
 		r"""
-		Decide whether to use batch mode and the batch size, according to the `text_chunks` and `self.max_tokens`.
+		Get the token number of a text. The token numbers are cached per chunk text,
+		so that the chunks are tokenized only once across the levels and the repeated summaries of a paper.
 
 		Args:
-			text_chunks (Sequence[str]): The chunks of a paper.
+			text (str): A chunk or a partial summary.
 
 		Returns:
-			Tuple[bool, int]:
-				- batch_mode (bool): Whether to use batch summarize.
-				- batch_size (int): Batch size in batch summarizing.
+			int: The token number.
 		"""
-		token_num, max_node_tokens = 0, 0
-		batch_mode = False
-		for chunk in text_chunks:
-			tokens = len(
-				self._tokenizer(chunk)
-			)
-			token_num += tokens
-			max_node_tokens = max(tokens, max_node_tokens)
+		token_num = self._token_num_cache.get(text, None)
+		if token_num is not None:
+			self._token_num_cache.move_to_end(text)
+			return token_num
+
+		token_num = len(self._tokenizer(text))
+		self._token_num_cache[text] = token_num
+		if len(self._token_num_cache) > SUMMARIZE_TOKEN_CACHE_SIZE:
+			self._token_num_cache.popitem(last=False)
+		return token_num
+
+	def _fit_in_one_batch(self, text_chunks: Sequence[str]) -> bool:
+		r""" Whether the text_chunks can be summarized in a single LLM call. """
+		return len(text_chunks) <= 1 or sum(self._token_num(chunk) for chunk in text_chunks) <= self._max_tokens
 
-		if token_num < self._max_tokens:
-			return batch_mode, 0
+	def _total_token_num(self, text_chunks: Sequence[str]) -> int:
+		return sum(self._token_num(chunk) for chunk in text_chunks)
 
-		batch_mode = True
-		batch_size = self._max_tokens // max_node_tokens
-		return batch_mode, batch_size
+	def _truncate_to_fit(self, text_chunks: Sequence[str]) -> List[str]:
+		r"""
+		Truncate the partial summaries so that they fit in max_tokens together.
+		Each summary is cut in proportion to its length, so that every part of the paper is still covered.
+
+		Args:
+			text_chunks (Sequence[str]): The partial summaries.
+
+		Returns:
+			List[str]: The truncated summaries.
+		"""
+		total_tokens = self._total_token_num(text_chunks)
+		if total_tokens <= self._max_tokens:
+			return list(text_chunks)
+
+		ratio = self._max_tokens / total_tokens
+		truncated = [chunk[:int(len(chunk) * ratio)] for chunk in text_chunks]
+		while self._total_token_num(truncated) > self._max_tokens:
+			truncated = [chunk[:int(len(chunk) * SUMMARIZE_TRUNCATE_RATIO)] for chunk in truncated]
+		return truncated
+
+	def _shrunk(self, summary_texts: Sequence[str], reduced_texts: Sequence[str]) -> bool:
+		r""" Whether a reduce level shrinks the partial summaries. """
+		return self._total_token_num(reduced_texts) < self._total_token_num(summary_texts)
+
+	def pack_batches(self, text_chunks: Sequence[str], overlap_chunk_num: int = 0) -> List[List[str]]:
+		r"""
+		Pack adjacent chunks into batches, with no batch exceeds the max_tokens
+		(A chunk longer than max_tokens forms a batch alone).
+
+		Args:
+			text_chunks (Sequence[str]): The chunks of a paper, or the partial summaries.
+			overlap_chunk_num (int): The overlap chunks between two adjacent batches.
+
+		Returns:
+			List[List[str]]: The batches.
+		"""
+		token_nums = [self._token_num(chunk) for chunk in text_chunks]
+		chunk_num = len(text_chunks)
+		batches = []
+		start = 0
+		while start < chunk_num:
+			end, batch_tokens = start, 0
+			while end < chunk_num and (end == start or batch_tokens + token_nums[end] <= self._max_tokens):
+				batch_tokens += token_nums[end]
+				end += 1
+			batches.append(list(text_chunks[start: end]))
+			if end >= chunk_num:
+				break
+			start = max(end - overlap_chunk_num, start + 1)
+		return batches
 
 	def batch_chunks(self, text_chunks: Sequence[str], batch_size: int):
 		r"""
@@ -202,6 +327,47 @@ class PaperBatchSummarize(BaseSynthesizer):
 		)
 		return response
 
+	def map_batches(self, batches: List[List[str]], query_str: str) -> List[str]:
+		r"""
+		Summarize the batches of a level concurrently, with at most `self._max_concurrency` LLM calls at the same time.
+
+		Args:
+			batches (List[List[str]]): The batches.
+			query_str (str): The batch query prompt.
+
+		Returns:
+			List[str]: The summaries of the batches, in order.
+		"""
+		if len(batches) == 1 or self._max_concurrency <= 1:
+			return [self.batch_get_response(batch_chunks=batch, query_str=query_str) for batch in batches]
+
+		with ThreadPoolExecutor(max_workers=min(self._max_concurrency, len(batches))) as executor:
+			summaries = executor.map(
+				lambda batch: self.batch_get_response(batch_chunks=batch, query_str=query_str),
+				batches,
+			)
+			return list(summaries)
+
+	async def amap_batches(self, batches: List[List[str]], query_str: str) -> List[str]:
+		r"""
+		Asynchronously summarize the batches of a level, with at most `self._max_concurrency` LLM calls at the same time.
+
+		Args:
+			batches (List[List[str]]): The batches.
+			query_str (str): The batch query prompt.
+
+		Returns:
+			List[str]: The summaries of the batches, in order.
+		"""
+		semaphore = asyncio.Semaphore(max(self._max_concurrency, 1))
+
+		async def summarize_batch(batch: List[str]) -> str:
+			async with semaphore:
+				return await self.abatch_get_response(batch_chunks=batch, query_str=query_str)
+
+		summaries = await asyncio.gather(*[summarize_batch(batch) for batch in batches])
+		return list(summaries)
+
 	def get_response(
         self,
         query_str: str,
@@ -209,7 +375,13 @@ class PaperBatchSummarize(BaseSynthesizer):
         **response_kwargs: Any,
     ) -> RESPONSE_TEXT_TYPE:
 		r"""
-		Summarize a paper.
+		Summarize a paper in a map-reduce style:
+
+		- Map: the overlapped batches of chunks are summarized concurrently.
+		- Reduce: if the partial summaries exceed the max_tokens, they are packed into batches and summarized again,
+		level by level, until they fit in a single LLM call for the final summary.
+		If a level does not shrink the partial summaries, they are truncated to fit instead,
+		so that the final call never exceeds the max_tokens.
 
 		Args:
 			query_str (str): Not used.
@@ -219,29 +391,27 @@ class PaperBatchSummarize(BaseSynthesizer):
 		Returns:
 			RESPONSE_TEXT_TYPE: The summary.
 		"""
-		batch_mode, batch_size = self._calculate_batch_size(text_chunks=text_chunks)
-
-		print("summary batch size: ", batch_size)
-		print("Total chunks: ", len(text_chunks))
-		print(text_chunks[0])
-		if not batch_mode:
+		if self._fit_in_one_batch(text_chunks=text_chunks):
 			return self.batch_get_response(
 				batch_chunks=text_chunks,
 				query_str=self.summary_query,
 			)
 
-		summary_texts = []
-		for chunks in self.batch_chunks(text_chunks=text_chunks, batch_size=batch_size):
-
+		batches = self.pack_batches(text_chunks=text_chunks, overlap_chunk_num=self._overlap_chunk_num)
+		summary_texts = self.map_batches(batches=batches, query_str=self.summary_query)
 
-			response = self.batch_get_response(
-				batch_chunks=chunks,
-				query_str=self.summary_query
+		while not self._fit_in_one_batch(text_chunks=summary_texts):
+			reduced_texts = self.map_batches(
+				batches=self.pack_batches(text_chunks=summary_texts),
+				query_str=self.secondary_query,
 			)
-			summary_texts.append(response)
+			shrunk = self._shrunk(summary_texts=summary_texts, reduced_texts=reduced_texts)
+			summary_texts = reduced_texts
+			if not shrunk:
+				break
 
 		final_response = self.batch_get_response(
-			batch_chunks=summary_texts,
+			batch_chunks=self._truncate_to_fit(summary_texts),
 			query_str=self.secondary_query,
 		)
 		return final_response
@@ -253,7 +423,7 @@ class PaperBatchSummarize(BaseSynthesizer):
         **response_kwargs: Any,
     ) -> RESPONSE_TEXT_TYPE:
 		r"""
-		Summarize a paper.
+		Asynchronously summarize a paper in a map-reduce style, refer to `get_response`.
 
 		Args:
 			query_str (str): Not used.
@@ -263,24 +433,27 @@ class PaperBatchSummarize(BaseSynthesizer):
 		Returns:
 			RESPONSE_TEXT_TYPE: The summary.
 		"""
-		batch_mode, batch_size = self._calculate_batch_size(text_chunks=text_chunks)
-		if not batch_mode:
+		if self._fit_in_one_batch(text_chunks=text_chunks):
 			return await self.abatch_get_response(
 				batch_chunks=text_chunks,
 				query_str=self.summary_query,
 			)
 
-		tasks = [
-			self.abatch_get_response(
-				batch_chunks=batch_chunks,
-				query_str=self.summary_query,
-			) for batch_chunks in self.batch_chunks(text_chunks=text_chunks, batch_size=batch_size)
-		]
+		batches = self.pack_batches(text_chunks=text_chunks, overlap_chunk_num=self._overlap_chunk_num)
+		summary_texts = await self.amap_batches(batches=batches, query_str=self.summary_query)
 
-		summary_texts = await asyncio.gather(*tasks)
+		while not self._fit_in_one_batch(text_chunks=summary_texts):
+			reduced_texts = await self.amap_batches(
+				batches=self.pack_batches(text_chunks=summary_texts),
+				query_str=self.secondary_query,
+			)
+			shrunk = self._shrunk(summary_texts=summary_texts, reduced_texts=reduced_texts)
+			summary_texts = reduced_texts
+			if not shrunk:
+				break
 
-		final_response = self.batch_get_response(
-			batch_chunks=summary_texts,
+		final_response = await self.abatch_get_response(
+			batch_chunks=self._truncate_to_fit(summary_texts),
 			query_str=self.secondary_query,
 		)
 		return final_response
@@ -305,8 +478,12 @@ class PaperBatchSummarize(BaseSynthesizer):
 
 		with self._callback_manager.event(CBEventType.SYNTHESIZE,
 				payload={EventPayload.QUERY_STR: query.query_str}, ) as event:
-			response_str = self.get_response(query_str=query.query_str,
-				text_chunks=[n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes], **response_kwargs, )
+			content_hash = self.paper_content_hash(nodes=nodes)
+			response_str = self._summary_cache.get_summary(content_hash, self.summary_prompt, self.model_name)
+			if response_str is None:
+				response_str = self.get_response(query_str=query.query_str,
+					text_chunks=[n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes], **response_kwargs, )
+				self._summary_cache.put_summary(content_hash, self.summary_prompt, self.model_name, str(response_str))
 
 			additional_source_nodes = additional_source_nodes or []
 			source_nodes = list(nodes) + list(additional_source_nodes)
@@ -337,8 +514,12 @@ class PaperBatchSummarize(BaseSynthesizer):
 
 		with self._callback_manager.event(CBEventType.SYNTHESIZE,
 				payload={EventPayload.QUERY_STR: query.query_str}, ) as event:
-			response_str = await self.aget_response(query_str=query.query_str,
-				text_chunks=[n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes], **response_kwargs, )
+			content_hash = self.paper_content_hash(nodes=nodes)
+			response_str = self._summary_cache.get_summary(content_hash, self.summary_prompt, self.model_name)
+			if response_str is None:
+				response_str = await self.aget_response(query_str=query.query_str,
+					text_chunks=[n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes], **response_kwargs, )
+				self._summary_cache.put_summary(content_hash, self.summary_prompt, self.model_name, str(response_str))
 
 			additional_source_nodes = additional_source_nodes or []
 			source_nodes = list(nodes) + list(additional_source_nodes)
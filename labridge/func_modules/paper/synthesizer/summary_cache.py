@@ -0,0 +1,119 @@
+import fsspec
+import hashlib
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from labridge.common.utils.hash import file_sha256
+from labridge.common.utils.json_cache import JsonFileCache
+
+
+PAPER_SUMMARY_CACHE_PERSIST_PATH = "storage/paper_cache/summary_cache.json"
+
+
+def summary_cache_key(content_hash: str, prompt: str, model: str) -> str:
+	r"""
+	The key of a summary in the cache.
+
+	Args:
+		content_hash (str): The SHA-256 of the paper file (or of the paper contents if the file is unknown).
+		prompt (str): The summary prompts.
+		model (str): The name of the LLM.
+
+	Returns:
+		str: The cache key.
+	"""
+	prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+	return f"{content_hash}:{prompt_hash}:{model}"
+
+
+class PaperSummaryCache(object):
+	r"""
+	An on-disk cache of paper summaries, keyed by (paper content hash, summary prompt, model).
+
+	The content hash is computed from the paper file rather than the chunks, so the summary produced for the
+	`RecentPaperStore` is reused by the `SharedPaperStorage` and the `PaperStorage`, which chunk the paper differently.
+	All instances of the same file share one `JsonFileCache`, so that a summary put by one summarizer is seen by
+	the others in the process, and a persist never drops the entries put by others.
+
+	Args:
+		persist_path (str): The path of the cache file. Defaults to `PAPER_SUMMARY_CACHE_PERSIST_PATH` under the project root.
+		auto_persist (bool): Whether to persist the puts once a batch of them is pending. Defaults to True.
+			The remaining puts are persisted by `persist`, or at exit.
+	"""
+	def __init__(
+		self,
+		persist_path: Optional[str] = None,
+		auto_persist: bool = True,
+	):
+		self.persist_path = persist_path or self._default_persist_path()
+		self.auto_persist = auto_persist
+		self._fs = fsspec.filesystem("file")
+		self._cache = JsonFileCache.shared(persist_path=self.persist_path)
+		# {file_path: (size, mtime, hash)}
+		self._file_hashes: Dict[str, Tuple[int, float, str]] = {}
+
+	def _default_persist_path(self) -> str:
+		r""" Default persist path. """
+		root = Path(__file__)
+		for i in range(5):
+			root = root.parent
+		return str(root / PAPER_SUMMARY_CACHE_PERSIST_PATH)
+
+	def load(self):
+		r""" Reload the cache from `self.persist_path`, keeping the puts not persisted yet. """
+		self._cache.load()
+
+	def persist(self):
+		r""" Persist the pending puts, merged with the entries written by others. The file is replaced atomically. """
+		self._cache.persist()
+
+	def file_hash(self, file_path: str) -> Optional[str]:
+		r"""
+		Get the content hash of a paper file, re-hashing it only if its size or mtime changed.
+
+		Args:
+			file_path (str): The paper file path.
+
+		Returns:
+			Optional[str]: The hash. If the file does not exist, return None.
+		"""
+		try:
+			stat = Path(file_path).stat()
+		except OSError:
+			return None
+
+		cached = self._file_hashes.get(file_path, None)
+		if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime):
+			return cached[2]
+
+		content_hash = file_sha256(file_path, fs=self._fs)
+		self._file_hashes[file_path] = (stat.st_size, stat.st_mtime, content_hash)
+		return content_hash
+
+	def get_summary(self, content_hash: str, prompt: str, model: str) -> Optional[str]:
+		r"""
+		Get a cached summary.
+
+		Args:
+			content_hash (str): The content hash of the paper.
+			prompt (str): The summary prompts.
+			model (str): The name of the LLM.
+
+		Returns:
+			Optional[str]: The summary. If not cached, return None.
+		"""
+		return self._cache.get(key=summary_cache_key(content_hash, prompt, model))
+
+	def put_summary(self, content_hash: str, prompt: str, model: str, summary: str):
+		r"""
+		Record a summary.
+
+		Args:
+			content_hash (str): The content hash of the paper.
+			prompt (str): The summary prompts.
+			model (str): The name of the LLM.
+			summary (str): The summary.
+		"""
+		if self._cache.put(key=summary_cache_key(content_hash, prompt, model), value=summary) and self.auto_persist:
+			self._cache.persist()
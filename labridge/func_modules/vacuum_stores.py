@@ -0,0 +1,146 @@
+r"""
+Admin command to vacuum the persisted stores.
+
+Each persisted store (the experiment logs, the chat memories and the recent papers of each user, and the instruments)
+is rewritten with only the nodes reachable from its root nodes, removing the docstore entries, vectors, hashes and
+relationships left behind by the node deletions. The rewritten stores are validated by the consistency checker,
+and the reclaimed bytes are reported.
+
+Usage:
+	python -m labridge.func_modules.vacuum_stores [--stores NAME ...] [--check_only]
+"""
+
+import argparse
+import fsspec
+
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+from labridge.common.utils.vacuum import VacuumReport, vacuum_storage, check_persisted_storage
+from labridge.func_modules.memory.time_index import LogTimeIndex
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	CHAT_MEMORY_PERSIST_DIR,
+	CHAT_MEMORY_VECTOR_INDEX_ID,
+)
+from labridge.func_modules.memory.experiment.experiment_log import (
+	ExperimentLog,
+	EXPERIMENT_LOG_PERSIST_DIR,
+	EXPERIMENT_LOG_VECTOR_INDEX_ID,
+)
+from labridge.func_modules.paper.store.temporary_store import (
+	RecentPaperStore,
+	TMP_PAPER_VECTOR_INDEX_PERSIST_DIR,
+	TMP_PAPER_VECTOR_INDEX_ID,
+)
+from labridge.func_modules.instrument.store.instrument_store import (
+	InstrumentStorage,
+	DEFAULT_INSTRUMENT_VECTOR_PERSIST_DIR,
+	INSTRUMENT_VECTOR_INDEX_ID,
+)
+
+
+# {store name: (persist directory relative to the root, index id, root ids of a docstore, one storage per user)}
+VACUUM_STORES: Dict[str, Tuple[str, str, Callable[[BaseDocumentStore], List[str]], bool]] = {
+	"experiment_log": (
+		EXPERIMENT_LOG_PERSIST_DIR, EXPERIMENT_LOG_VECTOR_INDEX_ID, ExperimentLog.vacuum_root_ids, True,
+	),
+	"chat_memory": (
+		CHAT_MEMORY_PERSIST_DIR, CHAT_MEMORY_VECTOR_INDEX_ID, ChatVectorMemory.vacuum_root_ids, True,
+	),
+	"recent_papers": (
+		TMP_PAPER_VECTOR_INDEX_PERSIST_DIR, TMP_PAPER_VECTOR_INDEX_ID, RecentPaperStore.vacuum_root_ids, True,
+	),
+	"instruments": (
+		DEFAULT_INSTRUMENT_VECTOR_PERSIST_DIR, INSTRUMENT_VECTOR_INDEX_ID, InstrumentStorage.vacuum_root_ids, False,
+	),
+}
+
+
+def store_persist_dirs(root: Path, store_name: str) -> List[str]:
+	r""" The persist directories of a store, one for each user if the store is per user. """
+	persist_base, _, _, per_user = VACUUM_STORES[store_name]
+	fs = fsspec.filesystem("file")
+	persist_dir = str(root / persist_base)
+	if not fs.exists(persist_dir):
+		return []
+	if not per_user:
+		return [persist_dir]
+	return sorted(path for path in fs.ls(persist_dir, detail=False) if fs.isdir(path))
+
+
+def vacuum_store(persist_dir: str, store_name: str) -> VacuumReport:
+	r"""
+	Vacuum a persisted store without loading its embedding model,
+	the log time index of the store is updated as well.
+
+	Args:
+		persist_dir (str): The persist directory of the store.
+		store_name (str): One of `VACUUM_STORES`.
+
+	Returns:
+		VacuumReport: The removed contents and the reclaimed bytes.
+	"""
+	_, index_id, root_ids_fn, _ = VACUUM_STORES[store_name]
+	docstore = StorageContext.from_defaults(persist_dir=persist_dir).docstore
+	report = vacuum_storage(persist_dir=persist_dir, index_id=index_id, root_ids=root_ids_fn(docstore))
+	time_index = LogTimeIndex.from_persist_dir(persist_dir)
+	if time_index is not None and report.removed_node_ids:
+		time_index.delete(report.removed_node_ids)
+		time_index.persist(persist_dir)
+	return report
+
+
+def check_store(persist_dir: str, store_name: str) -> List[str]:
+	r""" Check the consistency of a persisted store, refer to `check_storage`. """
+	_, index_id, root_ids_fn, _ = VACUUM_STORES[store_name]
+	docstore = StorageContext.from_defaults(persist_dir=persist_dir).docstore
+	return check_persisted_storage(persist_dir=persist_dir, index_id=index_id, root_ids=root_ids_fn(docstore))
+
+
+def main():
+	root = Path(__file__)
+	for i in range(3):
+		root = root.parent
+
+	parser = argparse.ArgumentParser(description="Vacuum the persisted stores.")
+	parser.add_argument(
+		"--stores",
+		nargs="+",
+		choices=list(VACUUM_STORES.keys()),
+		default=list(VACUUM_STORES.keys()),
+		help="The stores to vacuum.",
+	)
+	parser.add_argument(
+		"--check_only",
+		action="store_true",
+		help="Only report the consistency problems, without rewriting the stores.",
+	)
+	args = parser.parse_args()
+
+	total_reclaimed = 0
+	for store_name in args.stores:
+		for persist_dir in store_persist_dirs(root=root, store_name=store_name):
+			if args.check_only:
+				problems = check_store(persist_dir=persist_dir, store_name=store_name)
+				print(f"{persist_dir}: {len(problems)} problems.")
+				for problem in problems:
+					print(f"\t{problem}")
+				continue
+			try:
+				report = vacuum_store(persist_dir=persist_dir, store_name=store_name)
+			except ValueError as e:
+				print(f"Failed to vacuum {persist_dir}: {e}")
+				continue
+			total_reclaimed += report.bytes_reclaimed
+			print(report)
+
+	if not args.check_only:
+		print(f"Reclaimed {total_reclaimed} bytes in total.")
+
+
+if __name__ == "__main__":
+	main()
@@ -18,11 +18,19 @@ from labridge.agent.chat_agent import ChatAgent, CacheSharedPaperStorage
 from labridge.agent.chat_msg.msg_types import ChatTextMessage, FileWithTextMessage, ChatSpeechMessage, PaperNotesReply
 from labridge.interface.utils import save_temporary_file, read_server_file, error_file
 from labridge.accounts.users import AccountManager
+from labridge.func_modules.memory.chat.memory_writer import CHAT_MEMORY_WRITER
 
 
 app = FastAPI()
 
 
+@app.on_event("shutdown")
+async def flush_chat_memory():
+    r""" Write the queued chat turns to the long-term chat memory before exiting. """
+    await asyncio.to_thread(CHAT_MEMORY_WRITER.stop)
+    await asyncio.to_thread(ChatAgent.short_memory_manager.flush)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,4 +1,7 @@
 import json
+import asyncio
+import threading
+
 from llama_index.core.base.base_query_engine import BaseQueryEngine
 from llama_index.core.bridge.pydantic import BaseModel
 from llama_index.core.tools.types import AsyncBaseTool
@@ -145,6 +148,12 @@ class RetrieverBaseTool(CheckBaseTool):
 		retrieve_fn (Callable): The retrieving function or method that will be called by the agent.
 		description (Optional[str]): The tool description. If not specified, the tool description will be set as the
 			docstring of the `retrieve_fn`.
+
+	Note:
+		The retrievers keep per-call state on the instance, such as the memory of the target user and the node id
+		filters of the vector retriever. A tool is shared by the chat sessions of all users, so the calls of a tool
+		are serialized: the sync calls by a thread lock, the async calls by an asyncio lock, the latter held
+		across the awaits of the retrieving.
 	"""
 	def __init__(
 		self,
@@ -157,6 +166,8 @@ class RetrieverBaseTool(CheckBaseTool):
 		description = description or self._retriever_fn_description_from_docstring(name=name, fn=retrieve_fn)
 
 		self._retriever = retriever
+		self._retrieve_lock = threading.Lock()
+		self._aretrieve_lock = asyncio.Lock()
 		metadata = ToolMetadata(
 			name=name,
 			description=description,
@@ -215,7 +226,8 @@ class RetrieverBaseTool(CheckBaseTool):
 
 		"""
 		retrieve_kwargs = self._get_input(**kwargs)
-		nodes = self._retrieve(retrieve_kwargs=retrieve_kwargs)
+		with self._retrieve_lock:
+			nodes = self._retrieve(retrieve_kwargs=retrieve_kwargs)
 		retrieve_output, output_log_dict = self._nodes_to_tool_output(nodes=nodes)
 		output_log_dict.update(retrieve_kwargs)
 		tool_log = self.log(log_dict=output_log_dict)
@@ -240,7 +252,8 @@ class RetrieverBaseTool(CheckBaseTool):
 
 		"""
 		retrieve_kwargs = self._get_input(**kwargs)
-		nodes = await self._aretrieve(retrieve_kwargs=retrieve_kwargs)
+		async with self._aretrieve_lock:
+			nodes = await self._aretrieve(retrieve_kwargs=retrieve_kwargs)
 		retrieve_output, output_log_dict = self._nodes_to_tool_output(nodes=nodes)
 		output_log_dict.update(retrieve_kwargs)
 		tool_log = self.log(log_dict=output_log_dict)
@@ -0,0 +1,118 @@
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import NodeWithScore, MetadataMode
+
+from labridge.func_modules.memory.federated_search import (
+	FederatedSearchRetriever,
+	FEDERATED_SOURCE_KEY,
+	FEDERATED_MEMORY_ID_KEY,
+	FEDERATED_SEARCH_WORKERS,
+	EXPERIMENT_LOG_SOURCE,
+	CHAT_MEMORY_SOURCE,
+	RECENT_PAPER_SOURCE,
+)
+from labridge.func_modules.reference.base import RefInfoBase
+from labridge.tools.base.tool_base import RetrieverBaseTool
+from labridge.tools.base.tool_log import ToolLog, TOOL_OP_DESCRIPTION, TOOL_REFERENCES
+
+from typing import List, Tuple
+
+
+FEDERATED_SOURCE_DESCRIPTIONS = {
+	EXPERIMENT_LOG_SOURCE: "the experiment log",
+	CHAT_MEMORY_SOURCE: "the chat history",
+	RECENT_PAPER_SOURCE: "the recent papers",
+}
+
+
+class FederatedSearchTool(RetrieverBaseTool):
+	r"""
+	This tool is used to search the experiment logs, the chat memories and the recent papers of all lab members.
+	The tool description is set as the docstring of the method `retrieve` of the `retriever`.
+
+	Args:
+		embed_model (BaseEmbedding): The used embedding model. If not specified, the `Setting.embed_model` will be used.
+		max_workers (int): The number of the search threads.
+		top_k (int): The number of the merged results.
+	"""
+	def __init__(
+		self,
+		embed_model: BaseEmbedding = None,
+		max_workers: int = FEDERATED_SEARCH_WORKERS,
+		top_k: int = None,
+	):
+		retriever_kwargs = {"top_k": top_k} if top_k is not None else {}
+		retriever = FederatedSearchRetriever(
+			embed_model=embed_model,
+			max_workers=max_workers,
+			**retriever_kwargs,
+		)
+		super().__init__(
+			name=FederatedSearchTool.__name__,
+			retriever=retriever,
+			retrieve_fn=retriever.retrieve,
+		)
+
+	def log(self, log_dict: dict) -> ToolLog:
+		r"""
+		Record the tool log.
+
+		Args:
+			log_dict (dict): Including the input keyword arguments and the (output, log) of retrieving.
+
+		Returns:
+			The tool log.
+		"""
+		item_to_be_retrieved = log_dict["item_to_be_retrieved"]
+		start_date = log_dict.get("start_date", None)
+		end_date = log_dict.get("end_date", None)
+
+		log_string = (
+			f"Search in the storages of all lab members.\n"
+			f"retrieve string: {item_to_be_retrieved}\n"
+		)
+		if None not in [start_date, end_date]:
+			log_string += (
+				f"start_date: {start_date}\n"
+				f"end_date: {end_date}"
+			)
+
+		log_to_system = {
+			TOOL_OP_DESCRIPTION: log_string,
+			TOOL_REFERENCES: [],
+		}
+		return ToolLog(
+			log_to_user=None,
+			log_to_system=log_to_system,
+			tool_name=self.metadata.name,
+		)
+
+	def get_ref_info(self, nodes: List[NodeWithScore]) -> List[RefInfoBase]:
+		r""" The results are quoted in the output, the files of other users are not referred. """
+		return []
+
+	def _retrieve(self, retrieve_kwargs: dict) -> List[NodeWithScore]:
+		r""" Use the retriever to retrieve relevant nodes. """
+		nodes = self._retriever.retrieve(**retrieve_kwargs)
+		return nodes
+
+	async def _aretrieve(self, retrieve_kwargs: dict) -> List[NodeWithScore]:
+		r""" Asynchronously use the retriever to retrieve relevant nodes. """
+		nodes = await self._retriever.aretrieve(**retrieve_kwargs)
+		return nodes
+
+	def _nodes_to_tool_output(self, nodes: List[NodeWithScore]) -> Tuple[str, dict]:
+		r""" output the retrieved contents in a specific format, and the output log. """
+		if not nodes:
+			return "Have retrieved nothing relevant.", {}
+
+		contents = ["Have retrieved the following contents from the storages of the lab members:"]
+		for idx, node in enumerate(nodes):
+			metadata = node.node.metadata
+			source = metadata.get(FEDERATED_SOURCE_KEY, None)
+			source_str = FEDERATED_SOURCE_DESCRIPTIONS.get(source, source)
+			content_str = (
+				f"Result {idx + 1}, from {source_str} of {metadata.get(FEDERATED_MEMORY_ID_KEY, None)}:\n"
+				f"{node.node.get_content(metadata_mode=MetadataMode.LLM)}"
+			)
+			contents.append(content_str.strip())
+		return "\n\n".join(contents), {}
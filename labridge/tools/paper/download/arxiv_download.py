@@ -51,6 +51,25 @@ def search_arxiv(search_str: str, max_results_num: int = 3) -> List[Result]:
 	return results
 
 
+async def asearch_arxiv(search_str: str, max_results_num: int = 3) -> List[Result]:
+	r"""
+	Asynchronously search in aXiv.org
+
+	Args:
+		search_str (str): the search string.
+		max_results_num (int): the maximum number of returned results. Defaults to 3.
+
+	Returns:
+		the paper info results.
+	"""
+	searcher = ArxivSearcher(max_results_num=max_results_num)
+	results = await searcher.asearch(search_str)
+	if len(results) < 1:
+		raise ValueError("Do not find relevant papers.")
+
+	return results
+
+
 class ArXivSearchDownloadTool(CallBackBaseTool):
 	r"""
 	This tool is used to search and download papers from arXiv.org for the user.
@@ -267,7 +286,7 @@ class ArXivSearchDownloadTool(CallBackBaseTool):
 		"""
 		self.account_manager.check_valid_user(user_id=user_id)
 
-		results = search_arxiv(search_str=search_str, max_results_num=self._max_results_num)
+		results = await asearch_arxiv(search_str=search_str, max_results_num=self._max_results_num)
 		indices, user_response = await self._auser_select_results(user_id=user_id, results=results)
 
 		if len(indices) < 1:
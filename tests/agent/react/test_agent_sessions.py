@@ -0,0 +1,102 @@
+import asyncio
+
+from llama_index.core.llms import MockLLM
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.memory.chat_memory_buffer import ChatMemoryBuffer
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from labridge.agent.react.react import InstructReActAgent
+from labridge.agent.react.session import AgentSessionPool
+from labridge.tools.memory.chat.retrieve import ChatMemoryRetrieverTool
+
+
+def new_agent(**kwargs) -> InstructReActAgent:
+	return InstructReActAgent.from_tools(
+		tools=[],
+		llm=MockLLM(),
+		memory=ChatMemoryBuffer.from_defaults(token_limit=3000),
+		**kwargs,
+	)
+
+
+class StatefulRetriever(object):
+	r""" Keeps the target memory on the instance across an await, as `ChatMemoryRetriever` does. """
+	def __init__(self):
+		self.memory_id = None
+
+	async def aretrieve(self, item_to_be_retrieved: str, memory_id: str, **kwargs) -> list:
+		self.memory_id = memory_id
+		await asyncio.sleep(0.05)
+		return [NodeWithScore(node=TextNode(text=f"{item_to_be_retrieved} of {self.memory_id}"), score=1.0)]
+
+
+def test_new_session():
+	agent = new_agent()
+	alice, bob = agent.new_session(), agent.new_session()
+	assert alice.agent_worker is agent.agent_worker and bob.agent_worker is agent.agent_worker
+	assert alice.memory is not bob.memory and alice.memory.token_limit == 3000
+	assert alice.state is not bob.state
+
+	alice.memory.put(ChatMessage(role=MessageRole.USER, content="Hello from alice"))
+	task = alice.create_task(input="Hello", extra_state={"system_msg": None, "user_id": "alice"})
+	assert task.task_id in alice.state.task_dict
+	assert bob.state.task_dict == {} and bob.memory.get() == []
+
+	alice.reset()
+	assert alice.state.task_dict == {} and alice.memory.get() == []
+
+	callback_manager = CallbackManager()
+	agent = new_agent(callback_manager=callback_manager, verbose=True)
+	session = agent.new_session()
+	assert session.callback_manager is callback_manager and session.verbose
+
+
+def test_shared_retriever_tool():
+	tool = ChatMemoryRetrieverTool(chat_memory_retriever=StatefulRetriever())
+
+	async def main():
+		return await asyncio.gather(*[
+			tool.acall(item_to_be_retrieved="history", memory_id=user_id, start_date=None, end_date=None)
+			for user_id in ["alice", "bob"]
+		])
+
+	outputs = asyncio.run(main())
+	assert [output.raw_output[0].node.text for output in outputs] == ["history of alice", "history of bob"]
+
+
+def test_session_pool():
+	pool = AgentSessionPool(agent_fn=new_agent, max_sessions=2)
+	assert pool.get_session("alice") is pool.get_session("alice")
+	assert pool.get_session("alice") is not pool.get_session("bob")
+
+	max_running, running_of = 0, {}
+
+	async def chat(user_id: str, content: str):
+		nonlocal max_running
+		async with pool.session(user_id=user_id) as session:
+			# The previous chat of the user is finished and its memory is reset.
+			assert running_of.get(user_id, 0) == 0 and session.memory.get() == []
+			running_of[user_id] = running_of.get(user_id, 0) + 1
+			max_running = max(max_running, pool.running_num)
+			session.memory.put(ChatMessage(role=MessageRole.USER, content=content))
+			await asyncio.sleep(0.05)
+			assert [msg.content for msg in session.memory.get()] == [content]
+			running_of[user_id] -= 1
+
+	async def main():
+		await asyncio.gather(*[
+			chat(user_id=user_id, content=f"{user_id} {idx}")
+			for user_id in ["alice", "bob", "carol"] for idx in range(2)
+		])
+
+	asyncio.run(main())
+	assert max_running == 2
+	assert pool.running_num == 0
+	assert pool.get_session("carol").memory.get() == []
+
+
+if __name__ == "__main__":
+	test_new_session()
+	test_shared_retriever_tool()
+	test_session_pool()
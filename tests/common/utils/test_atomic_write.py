@@ -0,0 +1,47 @@
+import os
+import json
+import tempfile
+import threading
+
+from pathlib import Path
+
+from labridge.common.utils.atomic_write import atomic_open, atomic_write
+
+
+def test_concurrent_writers():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		file_path = str(Path(tmp_dir) / "sub" / "records.json")
+
+		def write(idx: int):
+			for _ in range(20):
+				atomic_write(file_path, json.dumps({"writer": idx, "data": "x" * 10000}))
+
+		threads = [threading.Thread(target=write, args=(idx, )) for idx in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		with open(file_path) as f:
+			assert json.load(f)["writer"] in range(4)
+		assert os.listdir(Path(file_path).parent) == ["records.json"]
+
+
+def test_failed_write_keeps_file():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		file_path = str(Path(tmp_dir) / "paper.pdf")
+		atomic_write(file_path, b"%PDF- old")
+		try:
+			with atomic_open(file_path, mode="wb") as f:
+				f.write(b"%PDF- partial")
+				raise ConnectionError("download interrupted")
+		except ConnectionError:
+			pass
+		with open(file_path, "rb") as f:
+			assert f.read() == b"%PDF- old"
+		assert os.listdir(tmp_dir) == ["paper.pdf"]
+
+
+if __name__ == "__main__":
+	test_concurrent_writers()
+	test_failed_write_keeps_file()
@@ -0,0 +1,58 @@
+import json
+import tempfile
+import threading
+
+from pathlib import Path
+
+from labridge.common.utils.json_cache import JsonFileCache
+
+
+def test_concurrent_puts():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		cache_path = str(Path(tmp_dir) / "cache.json")
+		cache = JsonFileCache.shared(persist_path=cache_path, sections=["a", "b"])
+		assert JsonFileCache.shared(persist_path=cache_path) is cache
+
+		def put_many(thread_idx: int):
+			for idx in range(20):
+				cache.put(key=f"{thread_idx}_{idx}", value=idx, section="a")
+				cache.persist()
+
+		threads = [threading.Thread(target=put_many, args=(idx, )) for idx in range(6)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		with open(cache_path) as f:
+			data = json.load(f)
+		assert len(data["a"]) == 120 and data["b"] == {}
+		assert list(Path(tmp_dir).iterdir()) == [Path(cache_path)]
+
+
+def test_persist_in_batches_and_merge():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		cache_path = str(Path(tmp_dir) / "cache.json")
+		cache_a = JsonFileCache(persist_path=cache_path, persist_every=3)
+		cache_b = JsonFileCache(persist_path=cache_path, persist_every=3)
+
+		assert not cache_a.put(key="a1", value=1)
+		assert not cache_a.put(key="a2", value=2)
+		assert not Path(cache_path).exists()
+		assert cache_a.put(key="a3", value=3)
+		cache_a.persist()
+		assert cache_a.pending_num == 0
+
+		# The entries persisted by another instance are kept.
+		cache_b.put(key="b1", value=1)
+		cache_b.persist()
+		assert cache_b.get("a1") == 1
+		cache_a.load()
+		assert cache_a.get("b1") == 1
+		with open(cache_path) as f:
+			assert json.load(f) == {"a1": 1, "a2": 2, "a3": 3, "b1": 1}
+
+
+if __name__ == "__main__":
+	test_concurrent_puts()
+	test_persist_in_batches_and_merge()
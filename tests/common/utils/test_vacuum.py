@@ -0,0 +1,139 @@
+import tempfile
+
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from labridge.func_modules.memory.base import (
+	LOG_DATE_NAME,
+	LOG_TIME_NAME,
+	MEMORY_NODE_TYPE_NAME,
+	NOT_LOG_NODE_TYPE,
+)
+from labridge.func_modules.memory.time_index import LOG_TIME_INDEX_ALL_KEY
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	MEMORY_FIRST_NODE_NAME,
+	MEMORY_LAST_NODE_ID_NAME,
+)
+from labridge.func_modules.memory.experiment.experiment_log import (
+	ExperimentLog,
+	INIT_NODE_NAME,
+	RECENT_EXPERIMENT_NODE_NAME,
+	RECENT_EXPERIMENT_NAME_KEY,
+)
+from labridge.func_modules.vacuum_stores import vacuum_store, check_store
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedded texts. """
+	text_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.text_count += len(texts)
+		return super()._get_text_embeddings(texts)
+
+
+def new_experiment_log(persist_dir: str, embed_model: MockEmbedding) -> ExperimentLog:
+	metadata = {MEMORY_NODE_TYPE_NAME: NOT_LOG_NODE_TYPE, RECENT_EXPERIMENT_NAME_KEY: None}
+	nodes = [
+		TextNode(text="Root node", id_=INIT_NODE_NAME, metadata=dict(metadata)),
+		TextNode(text="The most recent experiment", id_=RECENT_EXPERIMENT_NODE_NAME, metadata=dict(metadata)),
+	]
+	vector_index = VectorStoreIndex(nodes=nodes, embed_model=embed_model)
+	return ExperimentLog(vector_index=vector_index, persist_dir=persist_dir)
+
+
+def churn(expr_log: ExperimentLog, num: int):
+	r""" Attach documents to the experiment and remove them as `delete_instrument_doc` does. """
+	vector_index = expr_log.vector_index
+	expr_node = vector_index.docstore.get_node("lithography")
+	doc_nodes = []
+	for idx in range(num):
+		doc_node = TextNode(text=f"Attachment {idx} " * 50, id_=f"attachment_{idx}")
+		doc_node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=f"attachment_doc_{idx}")
+		doc_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=expr_node.node_id)
+		vector_index.docstore.set_document_hash(f"attachment_doc_{idx}", f"hash_{idx}")
+		doc_nodes.append(doc_node)
+	vector_index.insert_nodes(doc_nodes)
+	# The experiment node still refers to an attachment removed from the docstore.
+	children = expr_node.child_nodes + [RelatedNodeInfo(node_id="attachment_gone")]
+	expr_node.relationships[NodeRelationship.CHILD] = children
+	vector_index.docstore.add_documents([expr_node], allow_update=True)
+	vector_index.delete_nodes([node.node_id for node in doc_nodes])
+
+
+def test_vacuum_experiment_log():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		expr_log = new_experiment_log(persist_dir=tmp_dir, embed_model=embed_model)
+		expr_log.create_experiment(experiment_name="lithography", description="Lithography.")
+		expr_log.put_many(experiment_name="lithography", logs=[f"Exposure {idx}" for idx in range(5)])
+		assert expr_log.check_consistency() == []
+
+		churn(expr_log, num=10)
+		problems = expr_log.check_consistency()
+		assert any("attachment_3" in problem and "not reachable" in problem for problem in problems)
+		assert any("missing node attachment_gone" in problem for problem in problems)
+
+		live_ids = set(expr_log.vector_index.vector_store.data.embedding_dict.keys())
+		embed_model.text_count = 0
+		report = expr_log.vacuum()
+		assert embed_model.text_count == 0
+		assert report.removed_node_ids == sorted(f"attachment_{idx}" for idx in range(10))
+		assert report.removed_hash_num >= 10
+		assert report.pruned_relation_num == 1
+		assert report.bytes_reclaimed > 0
+		assert expr_log.check_consistency() == []
+		assert set(expr_log.vector_index.vector_store.data.embedding_dict.keys()) == live_ids
+		assert expr_log.vector_index.docstore.get_document_hash("attachment_doc_3") is None
+		assert expr_log.vector_index.docstore.get_ref_doc_info("attachment_doc_3") is None
+
+		# The store keeps working after the vacuum.
+		expr_log.put(experiment_name="lithography", log_str="Develop 20s")
+		assert [node.text for node in expr_log.get_last_logs(experiment_name="lithography", num=2)] == [
+			"Exposure 4", "Develop 20s",
+		]
+		assert expr_log.check_consistency() == []
+
+		# A vacuumed store has nothing to reclaim.
+		expr_log.persist()
+		report = vacuum_store(persist_dir=tmp_dir, store_name="experiment_log")
+		assert report.removed_node_ids == [] and report.bytes_reclaimed == 0
+		reloaded = ExperimentLog.from_storage(persist_dir=tmp_dir, embed_model=embed_model)
+		assert len(reloaded.time_index.all(LOG_TIME_INDEX_ALL_KEY)) == 6
+
+
+def test_vacuum_persisted_chat_memory():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		init_node = TextNode(text="The chat history of alice.", id_=MEMORY_FIRST_NODE_NAME)
+		last_id_info_node = TextNode(text=MEMORY_FIRST_NODE_NAME, id_=MEMORY_LAST_NODE_ID_NAME)
+		memory = ChatVectorMemory(
+			vector_index=VectorStoreIndex(nodes=[init_node, last_id_info_node], embed_model=embed_model),
+			retriever_kwargs={},
+			persist_dir=tmp_dir,
+		)
+		kwargs = {LOG_DATE_NAME: "2024-08-10", LOG_TIME_NAME: "09:05:03"}
+		for idx in range(3):
+			memory.put_messages([ChatMessage(role=MessageRole.USER, content=f"Question {idx}", additional_kwargs=kwargs)])
+		# A stale node left by an interrupted update.
+		memory.vector_index.insert_nodes([TextNode(text="Stale chat record", id_="stale")])
+		memory.persist()
+
+		assert check_store(persist_dir=tmp_dir, store_name="chat_memory") == ["Node stale is not reachable from the root nodes."]
+		report = vacuum_store(persist_dir=tmp_dir, store_name="chat_memory")
+		assert report.removed_node_ids == ["stale"] and report.removed_vector_num == 1
+		assert check_store(persist_dir=tmp_dir, store_name="chat_memory") == []
+
+		reloaded = ChatVectorMemory.from_storage(persist_dir=tmp_dir, embed_model=embed_model, retriever_kwargs={})
+		assert len(reloaded.get_last_records(num=10)) == 3
+		assert reloaded.check_consistency() == []
+
+
+if __name__ == "__main__":
+	test_vacuum_experiment_log()
+	test_vacuum_persisted_chat_memory()
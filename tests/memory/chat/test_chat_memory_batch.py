@@ -0,0 +1,111 @@
+import tempfile
+
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode
+
+from labridge.func_modules.memory.base import LOG_DATE_NAME, LOG_TIME_NAME
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	MEMORY_FIRST_NODE_NAME,
+	MEMORY_LAST_NODE_ID_NAME,
+)
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedding batches. """
+	call_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.call_count += 1
+		return super()._get_text_embeddings(texts)
+
+
+def new_memory(embed_model: CountingEmbedding, persist_dir: str) -> ChatVectorMemory:
+	init_node = TextNode(text="The chat history of alice.", id_=MEMORY_FIRST_NODE_NAME)
+	last_id_info_node = TextNode(text=MEMORY_FIRST_NODE_NAME, id_=MEMORY_LAST_NODE_ID_NAME)
+	vector_index = VectorStoreIndex(nodes=[init_node, last_id_info_node], embed_model=embed_model)
+	return ChatVectorMemory(vector_index=vector_index, retriever_kwargs={}, persist_dir=persist_dir)
+
+
+def message(role: MessageRole, content: str) -> ChatMessage:
+	return ChatMessage(
+		role=role,
+		content=content,
+		additional_kwargs={LOG_DATE_NAME: "2024-08-10", LOG_TIME_NAME: "09:05:03"},
+	)
+
+
+def line(role: MessageRole, content: str) -> str:
+	return f">>> {role} message:\n{content}\n"
+
+
+def chain_texts(memory: ChatVectorMemory) -> List[str]:
+	r""" The texts of the chat nodes from the first node along `next_node`. """
+	docstore = memory.vector_index.docstore
+	node = docstore.get_node(MEMORY_FIRST_NODE_NAME)
+	texts = []
+	while node.next_node is not None:
+		next_node = docstore.get_node(node.next_node.node_id)
+		assert next_node.prev_node.node_id == node.node_id
+		texts.append(next_node.text)
+		node = next_node
+	assert docstore.get_node(MEMORY_LAST_NODE_ID_NAME).text == node.node_id
+	return texts
+
+
+def test_put_turn_with_one_embedding_call():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		memory = new_memory(embed_model, persist_dir=tmp_dir)
+		turn = [
+			message(MessageRole.USER, "Find papers about memristors."),
+			message(MessageRole.ASSISTANT, "Tool log: 3 papers are found."),
+			message(MessageRole.ASSISTANT, "Here are 3 papers."),
+		]
+		embed_model.call_count = 0
+		memory.put_messages(turn)
+		assert embed_model.call_count == 1
+
+		# A turn of several batches, following a message appended to the current batch.
+		memory.put(message(MessageRole.ASSISTANT, "Anything else?"))
+		embed_model.call_count = 0
+		memory.put_messages(
+			[
+				message(MessageRole.ASSISTANT, "Reminder: a meeting at 10:00."),
+				message(MessageRole.USER, "Summarize the first paper."),
+				message(MessageRole.ASSISTANT, "It proposes a memristor array."),
+				message(MessageRole.SYSTEM, "The user logged out."),
+			]
+		)
+		assert embed_model.call_count == 1
+
+		expected_texts = [
+			line(MessageRole.USER, "Find papers about memristors.")
+			+ line(MessageRole.ASSISTANT, "Tool log: 3 papers are found.")
+			+ line(MessageRole.ASSISTANT, "Here are 3 papers.")
+			+ line(MessageRole.ASSISTANT, "Anything else?")
+			+ line(MessageRole.ASSISTANT, "Reminder: a meeting at 10:00."),
+			line(MessageRole.USER, "Summarize the first paper.")
+			+ line(MessageRole.ASSISTANT, "It proposes a memristor array."),
+			line(MessageRole.SYSTEM, "The user logged out."),
+		]
+		assert chain_texts(memory) == expected_texts
+		# Each batch node is in the vector store exactly once.
+		embedding_ids = set(memory.vector_index.vector_store.data.embedding_dict.keys())
+		chat_node_ids = set(memory.vector_index.index_struct.nodes_dict.keys())
+		assert embedding_ids == chat_node_ids
+		assert len(chat_node_ids) == 2 + len(expected_texts)
+
+		memory.persist()
+		reloaded = ChatVectorMemory.from_storage(persist_dir=tmp_dir, embed_model=embed_model, retriever_kwargs={})
+		assert chain_texts(reloaded) == expected_texts
+		reloaded.put_messages([message(MessageRole.ASSISTANT, "Goodbye.")])
+		assert chain_texts(reloaded) == expected_texts + [line(MessageRole.ASSISTANT, "Goodbye.")]
+
+
+if __name__ == "__main__":
+	test_put_turn_with_one_embedding_call()
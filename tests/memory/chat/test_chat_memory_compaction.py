@@ -0,0 +1,186 @@
+import datetime
+import tempfile
+
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from labridge.common.utils.time import DATE_FORMAT
+from labridge.common.utils.priority import LLMPriorityGate
+from labridge.func_modules.memory.base import LOG_DATE_NAME, LOG_TIME_NAME
+from labridge.func_modules.memory.chat.retrieve import ChatMemoryRetriever
+from labridge.func_modules.memory.chat import chat_memory as chat_memory_module
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	MEMORY_FIRST_NODE_NAME,
+	MEMORY_LAST_NODE_ID_NAME,
+	CHAT_DIGEST_ID_PREFIX,
+	CHAT_MEMORY_COMPACTED_BEFORE_NAME,
+)
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedding batches. """
+	call_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.call_count += 1
+		return super()._get_text_embeddings(texts)
+
+
+def days_ago(days: int) -> str:
+	return (datetime.date.today() - datetime.timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+def new_memory(embed_model: CountingEmbedding, persist_dir: str) -> ChatVectorMemory:
+	init_node = TextNode(
+		text="The chat history of alice.",
+		id_=MEMORY_FIRST_NODE_NAME,
+		metadata={LOG_DATE_NAME: [days_ago(60)], LOG_TIME_NAME: ["08:00:00"]},
+	)
+	last_id_info_node = TextNode(text=MEMORY_FIRST_NODE_NAME, id_=MEMORY_LAST_NODE_ID_NAME)
+	vector_index = VectorStoreIndex(nodes=[init_node, last_id_info_node], embed_model=embed_model)
+	return ChatVectorMemory(vector_index=vector_index, retriever_kwargs={}, persist_dir=persist_dir)
+
+
+def chat_turn(date: str, h_m_s: str, question: str) -> List[ChatMessage]:
+	kwargs = {LOG_DATE_NAME: date, LOG_TIME_NAME: h_m_s}
+	return [
+		ChatMessage(role=MessageRole.USER, content=question, additional_kwargs=kwargs),
+		ChatMessage(role=MessageRole.ASSISTANT, content=f"Answer: {question}", additional_kwargs=kwargs),
+	]
+
+
+def chain_ids(memory: ChatVectorMemory) -> List[str]:
+	r""" The node ids along `next_node`, checking the `prev_node` links. """
+	nodes = memory._chat_node_chain()
+	for prev_node, node in zip(nodes[:-1], nodes[1:]):
+		assert node.prev_node.node_id == prev_node.node_id
+	assert memory.vector_index.docstore.get_node(MEMORY_LAST_NODE_ID_NAME).text == nodes[-1].node_id
+	return [node.node_id for node in nodes]
+
+
+def summarize(date: str, chat_records: List[str]) -> str:
+	return f"Digest on {date}: {len(chat_records)} records."
+
+
+# No chats, the digests do not wait.
+IDLE_GATE = LLMPriorityGate(idle_grace=0)
+
+
+def test_compact_into_daily_digests():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		memory = new_memory(embed_model, persist_dir=tmp_dir)
+		old_dates = [days_ago(30), days_ago(29)]
+		for date in old_dates:
+			for idx in range(3):
+				memory.put_messages(chat_turn(date, f"10:0{idx}:00", f"Question {idx} on {date}"))
+		memory.put_messages(chat_turn(days_ago(0), "09:00:00", "Recent question"))
+		recent_id = chain_ids(memory)[-1]
+
+		embed_model.call_count = 0
+		assert memory.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE) == 6
+		assert embed_model.call_count == 1
+
+		digest_ids = [f"{CHAT_DIGEST_ID_PREFIX}{date}" for date in old_dates]
+		assert chain_ids(memory) == [MEMORY_FIRST_NODE_NAME] + digest_ids + [recent_id]
+		# The raw records are removed from the index.
+		node_ids = {MEMORY_FIRST_NODE_NAME, MEMORY_LAST_NODE_ID_NAME, recent_id, *digest_ids}
+		assert set(memory.vector_index.index_struct.nodes_dict.keys()) == node_ids
+		assert set(memory.vector_index.vector_store.data.embedding_dict.keys()) == node_ids
+		assert set(memory.vector_index.docstore.docs.keys()) == node_ids
+		digest = memory.vector_index.docstore.get_node(digest_ids[0])
+		assert digest.text == f"Digest on {old_dates[0]}: 3 records."
+		assert digest.metadata[LOG_DATE_NAME] == [old_dates[0]]
+		assert digest.metadata[LOG_TIME_NAME] == ["10:00:00"]
+
+		# ... and archived with their embeddings.
+		archived = memory.load_archived_nodes(old_dates[1])
+		assert [node.text.splitlines()[1] for node, _ in archived] == [
+			f"Question {idx} on {old_dates[1]}" for idx in range(3)
+		]
+		assert all(len(embedding) == 8 for _, embedding in archived)
+
+		# Compacted at most once a day.
+		assert memory.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE) == 0
+
+		# A late record of a compacted day is merged into its digest.
+		memory.put_messages(chat_turn(old_dates[1], "23:00:00", "Late question"))
+		info_node = memory.vector_index.docstore.get_node(MEMORY_LAST_NODE_ID_NAME)
+		del info_node.metadata[CHAT_MEMORY_COMPACTED_BEFORE_NAME]
+		memory.vector_index.docstore.add_documents([info_node], allow_update=True)
+		assert memory.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE) == 1
+		assert chain_ids(memory) == [MEMORY_FIRST_NODE_NAME] + digest_ids + [recent_id]
+		digest = memory.vector_index.docstore.get_node(digest_ids[1])
+		assert digest.text == f"Digest on {old_dates[1]}: 2 records."
+		assert len(memory.load_archived_nodes(old_dates[1])) == 4
+
+		memory.persist()
+		reloaded = ChatVectorMemory.from_storage(persist_dir=tmp_dir, embed_model=embed_model, retriever_kwargs={})
+		assert chain_ids(reloaded) == chain_ids(memory)
+		reloaded.put_messages(chat_turn(days_ago(0), "09:30:00", "Another question"))
+		assert chain_ids(reloaded)[:-1] == chain_ids(memory)
+
+
+def test_compact_after_chats_and_crash():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		memory = new_memory(embed_model, persist_dir=tmp_dir)
+		date = days_ago(30)
+		for idx in range(3):
+			memory.put_messages(chat_turn(date, f"10:0{idx}:00", f"Question {idx}"))
+		ids_before = chain_ids(memory)
+
+		# The chats keep the LLM busy, the memory is left unchanged.
+		busy_gate = LLMPriorityGate(idle_grace=0)
+		busy_gate.enter_interactive()
+		timeout = chat_memory_module.CHAT_DIGEST_GATE_TIMEOUT
+		chat_memory_module.CHAT_DIGEST_GATE_TIMEOUT = 0.1
+		try:
+			assert memory.compact(keep_days=7, summarize_fn=summarize, gate=busy_gate) == 0
+		finally:
+			chat_memory_module.CHAT_DIGEST_GATE_TIMEOUT = timeout
+		assert chain_ids(memory) == ids_before
+		assert memory.load_archived_nodes(date) == []
+		info_node = memory.vector_index.docstore.get_node(MEMORY_LAST_NODE_ID_NAME)
+		assert CHAT_MEMORY_COMPACTED_BEFORE_NAME not in info_node.metadata
+
+		# A crash after the archive is written, before the index is persisted: the compaction runs again.
+		memory.persist()
+		assert memory.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE) == 3
+		reloaded = ChatVectorMemory.from_storage(persist_dir=tmp_dir, embed_model=embed_model, retriever_kwargs={})
+		assert reloaded.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE) == 3
+		assert len(reloaded.load_archived_nodes(date)) == 3
+
+
+def test_retrieve_archived_records():
+	embed_model = CountingEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		memory = new_memory(embed_model, persist_dir=tmp_dir)
+		date = days_ago(30)
+		for idx in range(3):
+			memory.put_messages(chat_turn(date, f"10:0{idx}:00", f"Question {idx}"))
+		memory.compact(keep_days=7, summarize_fn=summarize, gate=IDLE_GATE)
+
+		retriever = ChatMemoryRetriever(embed_model=embed_model, digest_record_top_k=2)
+		retriever.memory = memory
+		digest = memory.vector_index.docstore.get_node(f"{CHAT_DIGEST_ID_PREFIX}{date}")
+		chat_nodes = [NodeWithScore(node=digest, score=1.0)]
+		assert retriever._add_archived_records(chat_nodes=chat_nodes, query_embedding=None) == chat_nodes
+
+		query_embedding = embed_model.get_query_embedding("Question 1")
+		final_nodes = retriever._add_archived_records(chat_nodes=chat_nodes, query_embedding=query_embedding)
+		assert len(final_nodes) == 3
+		assert final_nodes[0].node.node_id == digest.node_id
+		times = [node.node.metadata[LOG_TIME_NAME][0] for node in final_nodes]
+		assert times == sorted(times)
+
+
+if __name__ == "__main__":
+	test_compact_into_daily_digests()
+	test_compact_after_chats_and_crash()
+	test_retrieve_archived_records()
@@ -0,0 +1,85 @@
+import time
+import threading
+
+from typing import List
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+
+from labridge.func_modules.memory.chat.memory_writer import ChatMemoryWriter
+
+
+WRITE_DELAY = 0.2
+
+
+class RecordingWriter(object):
+	r""" Records the written messages of each memory, sleeps a while to simulate embedding and persisting. """
+	def __init__(self):
+		self.writes = []
+		self.active = 0
+		self.peak = 0
+		self._lock = threading.Lock()
+
+	def __call__(self, memory_id: str, chat_messages: List[ChatMessage], embed_model=None):
+		with self._lock:
+			self.active += 1
+			self.peak = max(self.peak, self.active)
+		time.sleep(WRITE_DELAY)
+		with self._lock:
+			self.active -= 1
+			self.writes.append((memory_id, [msg.content for msg in chat_messages]))
+
+
+def turn(idx: int) -> List[ChatMessage]:
+	return [
+		ChatMessage(role=MessageRole.USER, content=f"question {idx}"),
+		ChatMessage(role=MessageRole.ASSISTANT, content=f"answer {idx}"),
+	]
+
+
+def test_ordered_coalesced_writes():
+	recorder = RecordingWriter()
+	writer = ChatMemoryWriter(write_fn=recorder, max_workers=2)
+
+	start = time.perf_counter()
+	for idx in range(4):
+		writer.submit(memory_id="alice", chat_messages=turn(idx))
+	writer.submit(memory_id="bob", chat_messages=turn(0))
+	# The request path is not blocked by the writing.
+	assert time.perf_counter() - start < WRITE_DELAY / 2
+
+	assert writer.flush(timeout=5)
+	alice_messages = [msg for memory_id, messages in recorder.writes if memory_id == "alice" for msg in messages]
+	assert alice_messages == [content for idx in range(4) for content in (f"question {idx}", f"answer {idx}")]
+	# The turns queued during the first write are written together.
+	assert len([memory_id for memory_id, _ in recorder.writes if memory_id == "alice"]) <= 2
+	# Different memories are written concurrently.
+	assert recorder.peak == 2
+	writer.stop()
+
+
+def test_flush_on_stop():
+	recorder = RecordingWriter()
+	writer = ChatMemoryWriter(write_fn=recorder, max_workers=1)
+	for user_id in ("alice", "bob", "carol"):
+		writer.submit(memory_id=user_id, chat_messages=turn(0))
+	writer.stop()
+	assert not writer.is_running
+	assert sorted(memory_id for memory_id, _ in recorder.writes) == ["alice", "bob", "carol"]
+	assert writer.pending_num == 0
+
+	# A failing write does not stop the writer.
+	def failing_write(memory_id, chat_messages, embed_model=None):
+		if memory_id == "alice":
+			raise ValueError("disk full")
+		recorder(memory_id, chat_messages)
+
+	writer.write_fn = failing_write
+	writer.submit(memory_id="alice", chat_messages=turn(1))
+	writer.submit(memory_id="bob", chat_messages=turn(1))
+	writer.stop()
+	assert recorder.writes[-1] == ("bob", ["question 1", "answer 1"])
+
+
+if __name__ == "__main__":
+	test_ordered_coalesced_writes()
+	test_flush_on_stop()
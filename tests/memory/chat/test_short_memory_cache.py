@@ -0,0 +1,119 @@
+import time
+import tempfile
+
+from pathlib import Path
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.storage.chat_store.simple_chat_store import SimpleChatStore
+
+from labridge.func_modules.memory.chat.short_memory import ShortMemoryManager, SHORT_MEMORY_PERSIST_DIR
+
+
+FLUSH_DELAY = 0.2
+
+
+class CountingChatStore(object):
+	r""" Count the reads and writes of the persisted chat stores. """
+	def __init__(self):
+		self.reads = 0
+		self.writes = 0
+		self._from_persist_path = SimpleChatStore.from_persist_path
+		self._persist = SimpleChatStore.persist
+
+	def __enter__(self):
+		counter = self
+
+		def from_persist_path(persist_path, *args, **kwargs):
+			counter.reads += 1
+			return counter._from_persist_path(persist_path, *args, **kwargs)
+
+		def persist(store, *args, **kwargs):
+			counter.writes += 1
+			return counter._persist(store, *args, **kwargs)
+
+		SimpleChatStore.from_persist_path = from_persist_path
+		SimpleChatStore.persist = persist
+		return self
+
+	def __exit__(self, *args):
+		SimpleChatStore.from_persist_path = self._from_persist_path
+		SimpleChatStore.persist = self._persist
+
+
+def new_manager(tmp_dir: str) -> ShortMemoryManager:
+	manager = ShortMemoryManager(flush_delay=FLUSH_DELAY)
+	manager._root = tmp_dir
+	return manager
+
+
+def chat_turn(idx: int):
+	return [
+		ChatMessage(role=MessageRole.USER, content=f"question {idx}"),
+		ChatMessage(role=MessageRole.ASSISTANT, content=f"answer {idx}"),
+	]
+
+
+def test_chat_turns_without_file_access():
+	with tempfile.TemporaryDirectory() as tmp_dir, CountingChatStore() as counter:
+		manager = new_manager(tmp_dir)
+		persist_path = Path(tmp_dir) / SHORT_MEMORY_PERSIST_DIR / "alice.json"
+		assert manager.load_memory(user_id="alice") is None
+
+		history = []
+		for idx in range(5):
+			loaded = manager.load_memory(user_id="alice")
+			assert loaded == (history or None)
+			history = history + chat_turn(idx)
+			manager.save_memory(user_id="alice", chat_history=history)
+
+		assert counter.reads == 0
+		assert counter.writes == 0
+		assert not persist_path.exists()
+
+		# Written once the user is idle.
+		time.sleep(FLUSH_DELAY * 3)
+		assert counter.writes == 1
+		assert persist_path.exists()
+
+		# Restored from the disk by a new manager.
+		restored = new_manager(tmp_dir).load_memory(user_id="alice")
+		assert [msg.content for msg in restored] == [msg.content for msg in history]
+		assert counter.reads == 1
+
+
+def test_expire_and_clear():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		manager = new_manager(tmp_dir)
+		manager.save_memory(user_id="alice", chat_history=chat_turn(0))
+		manager.save_memory(user_id="bob", chat_history=chat_turn(0))
+		manager.flush()
+		assert (Path(tmp_dir) / SHORT_MEMORY_PERSIST_DIR / "bob.json").exists()
+
+		manager.clear_memory(user_id="bob")
+		assert manager.load_memory(user_id="bob") is None
+		assert not (Path(tmp_dir) / SHORT_MEMORY_PERSIST_DIR / "bob.json").exists()
+
+		manager._valid_delta_hours = 0
+		manager._valid_delta_minutes = 0
+		assert manager.load_memory(user_id="alice") is None
+		assert "alice" not in manager._cache
+		assert new_manager(tmp_dir).load_memory(user_id="alice") is not None
+
+
+def benchmark(num: int = 200):
+	r""" The cost of `num` chat turns loading and saving the short-term memory. """
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		manager = new_manager(tmp_dir)
+		history = []
+		start = time.perf_counter()
+		for idx in range(num):
+			manager.load_memory(user_id="alice")
+			history = history + chat_turn(idx)
+			manager.save_memory(user_id="alice", chat_history=history)
+		print(f"{num} chat turns: {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+	test_chat_turns_without_file_access()
+	test_expire_and_clear()
+	benchmark()
@@ -0,0 +1,123 @@
+import time
+import tempfile
+
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.schema import TextNode
+
+from labridge.func_modules.memory.base import MEMORY_NODE_TYPE_NAME, NOT_LOG_NODE_TYPE
+from labridge.func_modules.memory.experiment.experiment_log import (
+	ExperimentLog,
+	INIT_NODE_NAME,
+	RECENT_EXPERIMENT_NODE_NAME,
+	EXPERIMENT_LAST_NODE_ID_PREFIX,
+)
+
+
+EXPERIMENT_NAME = "memristor_array"
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedding batches. """
+	call_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.call_count += 1
+		return super()._get_text_embeddings(texts)
+
+
+def new_experiment_log(embed_model: CountingEmbedding, persist_dir: str) -> ExperimentLog:
+	metadata = {MEMORY_NODE_TYPE_NAME: NOT_LOG_NODE_TYPE}
+	nodes = [
+		TextNode(text="Root node for the experiment logs of alice", id_=INIT_NODE_NAME, metadata=dict(metadata)),
+		TextNode(text="The most recent experiment of alice", id_=RECENT_EXPERIMENT_NODE_NAME, metadata=dict(metadata)),
+	]
+	vector_index = VectorStoreIndex(nodes=nodes, embed_model=embed_model)
+	expr_log = ExperimentLog(vector_index=vector_index, persist_dir=persist_dir)
+	expr_log.create_experiment(experiment_name=EXPERIMENT_NAME, description="Fabricate a memristor array.")
+	return expr_log
+
+
+def log_texts(expr_log: ExperimentLog) -> List[str]:
+	r""" The log texts along `next_node`, checking the other links. """
+	header = expr_log._get_node(f"{EXPERIMENT_NAME}_header")
+	node = header
+	node_ids, texts = [header.node_id], []
+	while node.next_node is not None:
+		next_node = expr_log._get_node(node.next_node.node_id)
+		assert next_node.prev_node.node_id == node.node_id
+		assert next_node.parent_node.node_id == EXPERIMENT_NAME
+		node_ids.append(next_node.node_id)
+		texts.append(next_node.text)
+		node = next_node
+	assert expr_log._get_node(f"{EXPERIMENT_NAME}_{EXPERIMENT_LAST_NODE_ID_PREFIX}").text == node.node_id
+	assert expr_log.get_expr_log_node_ids(EXPERIMENT_NAME) == node_ids
+	return texts
+
+
+def test_put_many_with_one_embedding_call():
+	embed_model = CountingEmbedding(embed_dim=8, embed_batch_size=1000)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		expr_log = new_experiment_log(embed_model, persist_dir=tmp_dir)
+		expr_log.put(experiment_name=EXPERIMENT_NAME, log_str="Exposure time 1.5s.")
+
+		logs = [f"Resistance of device {idx}: {idx * 10} kOhm." for idx in range(100)]
+		embed_model.call_count = 0
+		assert expr_log.put_many(experiment_name=EXPERIMENT_NAME, logs=logs) == 100
+		assert embed_model.call_count == 1
+
+		expected = ["Exposure time 1.5s."] + logs
+		assert log_texts(expr_log) == expected
+		embedding_ids = set(expr_log.vector_index.vector_store.data.embedding_dict.keys())
+		assert set(expr_log.get_expr_log_node_ids(EXPERIMENT_NAME)) <= embedding_ids
+
+		expr_log.persist()
+		reloaded = ExperimentLog.from_storage(persist_dir=tmp_dir, embed_model=embed_model)
+		assert log_texts(reloaded) == expected
+
+		try:
+			expr_log.put_many(experiment_name="unknown", logs=logs)
+			raise AssertionError("A ValueError should be raised.")
+		except ValueError:
+			pass
+
+
+def test_put_stream():
+	embed_model = CountingEmbedding(embed_dim=8, embed_batch_size=1000)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		expr_log = new_experiment_log(embed_model, persist_dir=tmp_dir)
+
+		def instrument_output():
+			for idx in range(25):
+				yield f"Sweep {idx}: set voltage {idx / 10:.1f} V."
+
+		embed_model.call_count = 0
+		assert expr_log.put_stream(experiment_name=EXPERIMENT_NAME, logs=instrument_output(), batch_size=10) == 25
+		assert embed_model.call_count == 3
+
+		reloaded = ExperimentLog.from_storage(persist_dir=tmp_dir, embed_model=embed_model)
+		assert log_texts(reloaded) == list(instrument_output())
+
+
+def benchmark(num: int = 200):
+	r""" Putting `num` logs one by one vs. in one batch. """
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		logs = [f"Resistance of device {idx}: {idx * 10} kOhm." for idx in range(num)]
+		expr_log = new_experiment_log(MockEmbedding(embed_dim=256), persist_dir=tmp_dir)
+		start = time.perf_counter()
+		for log_str in logs:
+			expr_log.put(experiment_name=EXPERIMENT_NAME, log_str=log_str)
+		print(f"put: {time.perf_counter() - start:.3f} s for {num} logs")
+
+		expr_log = new_experiment_log(MockEmbedding(embed_dim=256), persist_dir=tmp_dir)
+		start = time.perf_counter()
+		expr_log.put_many(experiment_name=EXPERIMENT_NAME, logs=logs)
+		print(f"put_many: {time.perf_counter() - start:.3f} s for {num} logs")
+
+
+if __name__ == "__main__":
+	test_put_many_with_one_embedding_call()
+	test_put_stream()
+	benchmark()
@@ -0,0 +1,275 @@
+import time
+import asyncio
+import datetime
+import tempfile
+import threading
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from labridge.common.utils.time import DATE_FORMAT
+from labridge.func_modules.memory.base import (
+	LOG_DATE_NAME,
+	LOG_TIME_NAME,
+	MEMORY_NODE_TYPE_NAME,
+	NOT_LOG_NODE_TYPE,
+)
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	CHAT_MEMORY_PERSIST_DIR,
+	MEMORY_FIRST_NODE_NAME,
+	MEMORY_LAST_NODE_ID_NAME,
+)
+from labridge.func_modules.memory.experiment.experiment_log import (
+	ExperimentLog,
+	EXPERIMENT_LOG_PERSIST_DIR,
+	INIT_NODE_NAME,
+	RECENT_EXPERIMENT_NODE_NAME,
+	RECENT_EXPERIMENT_NAME_KEY,
+)
+from labridge.func_modules.paper.store.temporary_store import (
+	TMP_PAPER_VECTOR_INDEX_PERSIST_DIR,
+	TMP_PAPER_VECTOR_INDEX_ID,
+	TMP_PAPER_DATE,
+	TMP_PAPER_NODE_TYPE_KEY,
+	TMP_PAPER_DOC_NODE_TYPE,
+)
+from labridge.func_modules.memory.federated_search import (
+	FederatedSearchRetriever,
+	reciprocal_rank_fusion,
+	FEDERATED_SOURCE_KEY,
+	FEDERATED_MEMORY_ID_KEY,
+	EXPERIMENT_LOG_SOURCE,
+	CHAT_MEMORY_SOURCE,
+	RECENT_PAPER_SOURCE,
+)
+
+
+VOCABULARY = ["lithography", "memristor", "deposition", "etching", "transformer"]
+
+
+class KeywordEmbedding(MockEmbedding):
+	r""" Embeds a text by the counts of the vocabulary words. """
+
+	def _embed(self, text: str) -> List[float]:
+		text = text.lower()
+		return [float(text.count(word)) + 0.01 for word in VOCABULARY]
+
+	def _get_query_embedding(self, query: str) -> List[float]:
+		return self._embed(query)
+
+	async def _aget_query_embedding(self, query: str) -> List[float]:
+		return self._embed(query)
+
+	def _get_text_embedding(self, text: str) -> List[float]:
+		return self._embed(text)
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		return [self._embed(text) for text in texts]
+
+
+def build_experiment_log(root: Path, user_id: str, logs: List[str], embed_model: KeywordEmbedding):
+	metadata = {MEMORY_NODE_TYPE_NAME: NOT_LOG_NODE_TYPE, RECENT_EXPERIMENT_NAME_KEY: None}
+	nodes = [
+		TextNode(text="Root node", id_=INIT_NODE_NAME, metadata=dict(metadata)),
+		TextNode(text="The most recent experiment", id_=RECENT_EXPERIMENT_NODE_NAME, metadata=dict(metadata)),
+	]
+	persist_dir = str(root / EXPERIMENT_LOG_PERSIST_DIR / user_id)
+	expr_log = ExperimentLog(vector_index=VectorStoreIndex(nodes=nodes, embed_model=embed_model), persist_dir=persist_dir)
+	expr_log.create_experiment(experiment_name="daily", description="Daily experiments.")
+	expr_log.put_many(experiment_name="daily", logs=logs)
+	expr_log.persist()
+	return expr_log
+
+
+def build_chat_memory(root: Path, memory_id: str, questions: List[str], date: str, embed_model: KeywordEmbedding):
+	init_node = TextNode(text=f"The chat history of {memory_id}.", id_=MEMORY_FIRST_NODE_NAME)
+	last_id_info_node = TextNode(text=MEMORY_FIRST_NODE_NAME, id_=MEMORY_LAST_NODE_ID_NAME)
+	persist_dir = str(root / CHAT_MEMORY_PERSIST_DIR / memory_id)
+	memory = ChatVectorMemory(
+		vector_index=VectorStoreIndex(nodes=[init_node, last_id_info_node], embed_model=embed_model),
+		retriever_kwargs={},
+		persist_dir=persist_dir,
+	)
+	kwargs = {LOG_DATE_NAME: date, LOG_TIME_NAME: "10:00:00"}
+	for question in questions:
+		memory.put_messages([ChatMessage(role=MessageRole.USER, content=question, additional_kwargs=kwargs)])
+	memory.persist()
+	return memory
+
+
+def build_recent_papers(root: Path, user_id: str, papers: List[str], date: str, embed_model: KeywordEmbedding):
+	nodes = [
+		TextNode(
+			text=paper,
+			metadata={TMP_PAPER_NODE_TYPE_KEY: TMP_PAPER_DOC_NODE_TYPE, TMP_PAPER_DATE: date},
+		)
+		for paper in papers
+	]
+	vector_index = VectorStoreIndex(nodes=nodes, embed_model=embed_model)
+	vector_index.set_index_id(TMP_PAPER_VECTOR_INDEX_ID)
+	vector_index.storage_context.persist(persist_dir=str(root / TMP_PAPER_VECTOR_INDEX_PERSIST_DIR / user_id))
+
+
+def build_lab(root: Path, embed_model: KeywordEmbedding) -> dict:
+	today = datetime.date.today().strftime(DATE_FORMAT)
+	old_date = (datetime.date.today() - datetime.timedelta(days=30)).strftime(DATE_FORMAT)
+	build_experiment_log(root, "alice", ["Lithography exposure 20s", "Deposition at 85 C"], embed_model)
+	build_experiment_log(root, "bob", ["Etching with CF4", "Etching with SF6"], embed_model)
+	build_chat_memory(root, "alice", ["How to train a transformer?"], old_date, embed_model)
+	build_chat_memory(root, "bob", ["Memristor lithography recipe?"], today, embed_model)
+	build_recent_papers(root, "alice", ["A memristor crossbar array."], today, embed_model)
+	build_recent_papers(root, "bob", ["A memristor crossbar array.", "Transformer on memristor."], old_date, embed_model)
+	return {
+		EXPERIMENT_LOG_SOURCE: ["alice", "bob"],
+		CHAT_MEMORY_SOURCE: ["alice", "bob", "group_without_memory"],
+		RECENT_PAPER_SOURCE: ["alice", "bob"],
+	}
+
+
+def results_of(nodes: List[NodeWithScore]) -> List[tuple]:
+	return [
+		(node.node.metadata[FEDERATED_SOURCE_KEY], node.node.metadata[FEDERATED_MEMORY_ID_KEY], node.node.get_content())
+		for node in nodes
+	]
+
+
+def test_reciprocal_rank_fusion():
+	def ranked(texts: List[str]) -> List[NodeWithScore]:
+		return [NodeWithScore(node=TextNode(text=text, id_=text), score=1.0) for text in texts]
+
+	fused = reciprocal_rank_fusion([ranked(["a", "b", "c"]), ranked(["b", "d"]), ranked(["b", "a"])], top_k=3, rrf_k=1)
+	assert [node.node.node_id for node in fused] == ["b", "a", "d"]
+	assert abs(fused[0].score - (1 / 3 + 1 / 2 + 1 / 2)) < 1e-9
+	assert abs(fused[1].score - (1 / 2 + 1 / 3)) < 1e-9
+	assert reciprocal_rank_fusion([], top_k=3) == []
+
+
+def test_federated_search():
+	embed_model = KeywordEmbedding(embed_dim=len(VOCABULARY))
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		root = Path(tmp_dir)
+		memory_ids = build_lab(root, embed_model)
+		retriever = FederatedSearchRetriever(
+			embed_model=embed_model, root=tmp_dir, memory_ids=memory_ids, shard_top_k=1, top_k=4,
+		)
+
+		results = results_of(retriever.retrieve(item_to_be_retrieved="etching"))
+		assert results[0][:2] == (EXPERIMENT_LOG_SOURCE, "bob") and results[0][2].startswith("Etching")
+		# The same paper read by alice and bob is one result.
+		assert [result[2] for result in results].count("A memristor crossbar array.") <= 1
+		assert len(retriever.cache) == 6
+
+		results = results_of(retriever.retrieve(
+			item_to_be_retrieved="memristor",
+			sources=[CHAT_MEMORY_SOURCE, RECENT_PAPER_SOURCE],
+		))
+		assert {result[0] for result in results} == {CHAT_MEMORY_SOURCE, RECENT_PAPER_SOURCE}
+
+		# Only the records and papers of today.
+		today = datetime.date.today().strftime(DATE_FORMAT)
+		results = results_of(retriever.retrieve(
+			item_to_be_retrieved="transformer", start_date=today, end_date=today,
+		))
+		assert (CHAT_MEMORY_SOURCE, "alice") not in [result[:2] for result in results]
+		assert "Transformer on memristor." not in [result[2] for result in results]
+		assert (RECENT_PAPER_SOURCE, "alice", "A memristor crossbar array.") in results
+
+		async_results = results_of(asyncio.run(retriever.aretrieve(item_to_be_retrieved="etching")))
+		assert async_results[0][:2] == (EXPERIMENT_LOG_SOURCE, "bob")
+
+
+def test_shard_cache():
+	embed_model = KeywordEmbedding(embed_dim=len(VOCABULARY))
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		root = Path(tmp_dir)
+		memory_ids = build_lab(root, embed_model)
+		retriever = FederatedSearchRetriever(
+			embed_model=embed_model, root=tmp_dir, memory_ids=memory_ids, max_shards=4,
+		)
+		retriever.retrieve(item_to_be_retrieved="lithography", sources=[EXPERIMENT_LOG_SOURCE])
+		persist_dir = str(root / EXPERIMENT_LOG_PERSIST_DIR / "alice")
+		shard = retriever.cache.get(source=EXPERIMENT_LOG_SOURCE, memory_id="alice", persist_dir=persist_dir)
+		# Not reloaded while unchanged.
+		retriever.retrieve(item_to_be_retrieved="lithography", sources=[EXPERIMENT_LOG_SOURCE])
+		assert retriever.cache.get(source=EXPERIMENT_LOG_SOURCE, memory_id="alice", persist_dir=persist_dir) is shard
+
+		# Reloaded after a new log is persisted.
+		time.sleep(0.01)
+		expr_log = ExperimentLog.from_storage(persist_dir=persist_dir, embed_model=embed_model)
+		expr_log.put(experiment_name="daily", log_str="Etching with O2 plasma")
+		expr_log.persist()
+		results = results_of(retriever.retrieve(item_to_be_retrieved="etching O2", sources=[EXPERIMENT_LOG_SOURCE]))
+		assert (EXPERIMENT_LOG_SOURCE, "alice", "Etching with O2 plasma") in results
+		assert retriever.cache.get(source=EXPERIMENT_LOG_SOURCE, memory_id="alice", persist_dir=persist_dir) is not shard
+
+		# The least recently used shards are evicted.
+		retriever.retrieve(item_to_be_retrieved="memristor")
+		assert len(retriever.cache) == 4
+
+
+def test_broken_shard_and_same_texts():
+	embed_model = KeywordEmbedding(embed_dim=len(VOCABULARY))
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		root = Path(tmp_dir)
+		memory_ids = build_lab(root, embed_model)
+		build_experiment_log(root, "carol", ["Etching with CF4"], embed_model)
+		memory_ids[EXPERIMENT_LOG_SOURCE].append("carol")
+		retriever = FederatedSearchRetriever(embed_model=embed_model, root=tmp_dir, memory_ids=memory_ids)
+
+		# The same log text of bob and carol are two results.
+		results = results_of(retriever.retrieve(item_to_be_retrieved="etching CF4", sources=[EXPERIMENT_LOG_SOURCE]))
+		assert (EXPERIMENT_LOG_SOURCE, "bob", "Etching with CF4") in results
+		assert (EXPERIMENT_LOG_SOURCE, "carol", "Etching with CF4") in results
+
+		# A store being written (a truncated docstore) is skipped, the other stores still answer.
+		with open(root / EXPERIMENT_LOG_PERSIST_DIR / "bob" / "docstore.json", "w") as f:
+			f.write('{"docstore/data": {')
+		results = results_of(retriever.retrieve(item_to_be_retrieved="etching CF4", sources=[EXPERIMENT_LOG_SOURCE]))
+		assert (EXPERIMENT_LOG_SOURCE, "carol", "Etching with CF4") in results
+		assert "bob" not in [result[1] for result in results]
+		async_results = results_of(asyncio.run(retriever.aretrieve(item_to_be_retrieved="etching")))
+		assert (EXPERIMENT_LOG_SOURCE, "carol", "Etching with CF4") in async_results
+
+
+def test_shards_searched_concurrently():
+	embed_model = KeywordEmbedding(embed_dim=len(VOCABULARY))
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		memory_ids = build_lab(Path(tmp_dir), embed_model)
+		retriever = FederatedSearchRetriever(embed_model=embed_model, root=tmp_dir, memory_ids=memory_ids)
+		retriever.retrieve(item_to_be_retrieved="memristor")
+
+		active, max_active = 0, 0
+		lock = threading.Lock()
+		search_shard = retriever._search_shard
+
+		def slow_search_shard(*args, **kwargs):
+			nonlocal active, max_active
+			with lock:
+				active += 1
+				max_active = max(max_active, active)
+			time.sleep(0.1)
+			with lock:
+				active -= 1
+			return search_shard(*args, **kwargs)
+
+		retriever._search_shard = slow_search_shard
+		start = time.perf_counter()
+		retriever.retrieve(item_to_be_retrieved="memristor")
+		elapsed = time.perf_counter() - start
+		# 7 shards of 0.1s each.
+		assert max_active > 1
+		assert elapsed < 0.5
+
+
+if __name__ == "__main__":
+	test_reciprocal_rank_fusion()
+	test_federated_search()
+	test_shard_cache()
+	test_broken_shard_and_same_texts()
+	test_shards_searched_concurrently()
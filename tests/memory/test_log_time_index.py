@@ -0,0 +1,172 @@
+import time
+import datetime
+import tempfile
+
+from pathlib import Path
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode, MetadataMode
+
+from labridge.common.utils.time import DATE_FORMAT
+from labridge.func_modules.memory.base import (
+	LOG_DATE_NAME,
+	LOG_TIME_NAME,
+	LOG_TIMESTAMP_NAME,
+	MEMORY_NODE_TYPE_NAME,
+	NOT_LOG_NODE_TYPE,
+)
+from labridge.func_modules.memory.time_index import LogTimeIndex, LOG_TIME_INDEX_ALL_KEY, LOG_TIME_INDEX_PERSIST_NAME
+from labridge.func_modules.memory.chat.chat_memory import (
+	ChatVectorMemory,
+	MEMORY_FIRST_NODE_NAME,
+	MEMORY_LAST_NODE_ID_NAME,
+	CHAT_DIGEST_ID_PREFIX,
+)
+from labridge.func_modules.memory.experiment.experiment_log import (
+	ExperimentLog,
+	INIT_NODE_NAME,
+	RECENT_EXPERIMENT_NODE_NAME,
+	RECENT_EXPERIMENT_NAME_KEY,
+)
+
+
+def test_log_time_index():
+	time_index = LogTimeIndex()
+	for idx, timestamp in enumerate([3.0, 1.0, 2.0, 2.0, 5.0]):
+		time_index.add(key="expr", node_id=f"log_{idx}", timestamp=timestamp)
+
+	assert time_index.all("expr") == ["log_1", "log_2", "log_3", "log_0", "log_4"]
+	assert time_index.last("expr", num=2) == ["log_0", "log_4"]
+	assert time_index.last("expr", num=10) == time_index.all("expr")
+	assert time_index.last("unknown", num=2) == []
+	assert time_index.between("expr", start=2.0, end=3.0) == ["log_2", "log_3"]
+	assert time_index.between("expr", start=2.5, end=10.0) == ["log_0", "log_4"]
+	assert time_index.between("unknown", start=0.0, end=10.0) == []
+
+	time_index.delete(["log_2", "log_4"])
+	assert time_index.all("expr") == ["log_1", "log_3", "log_0"]
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		assert LogTimeIndex.from_persist_dir(tmp_dir) is None
+		time_index.persist(tmp_dir)
+		assert LogTimeIndex.from_persist_dir(tmp_dir).to_dict() == time_index.to_dict()
+
+
+def new_experiment_log(persist_dir: str) -> ExperimentLog:
+	metadata = {MEMORY_NODE_TYPE_NAME: NOT_LOG_NODE_TYPE, RECENT_EXPERIMENT_NAME_KEY: None}
+	nodes = [
+		TextNode(text="Root node", id_=INIT_NODE_NAME, metadata=dict(metadata)),
+		TextNode(text="The most recent experiment", id_=RECENT_EXPERIMENT_NODE_NAME, metadata=dict(metadata)),
+	]
+	vector_index = VectorStoreIndex(nodes=nodes, embed_model=MockEmbedding(embed_dim=8))
+	return ExperimentLog(vector_index=vector_index, persist_dir=persist_dir)
+
+
+def test_experiment_log_time_index():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		expr_log = new_experiment_log(persist_dir=tmp_dir)
+		expr_log.create_experiment(experiment_name="lithography", description="Lithography.")
+		expr_log.create_experiment(experiment_name="deposition", description="Atomic layer deposition.")
+
+		start = datetime.datetime.now()
+		expr_log.put_many(experiment_name="lithography", logs=[f"Exposure {idx}" for idx in range(5)])
+		expr_log.put(experiment_name="deposition", log_str="Temperature 85 C")
+		time.sleep(0.05)
+		middle = datetime.datetime.now()
+		expr_log.put_many(experiment_name="lithography", logs=["Develop 20s", "Develop 25s"])
+
+		log_node = expr_log.get_last_logs(experiment_name="lithography", num=1)[0]
+		assert isinstance(log_node.metadata[LOG_TIMESTAMP_NAME], float)
+		assert LOG_TIMESTAMP_NAME not in log_node.get_metadata_str(mode=MetadataMode.EMBED)
+		assert LOG_TIMESTAMP_NAME not in log_node.get_metadata_str(mode=MetadataMode.LLM)
+
+		assert [node.text for node in expr_log.get_last_logs(experiment_name="lithography", num=3)] == [
+			"Exposure 4", "Develop 20s", "Develop 25s",
+		]
+		assert [node.text for node in expr_log.get_logs_between(start=middle, end=datetime.datetime.now())] == [
+			"Develop 20s", "Develop 25s",
+		]
+		assert [node.text for node in expr_log.get_logs_between(
+			start=start, end=middle, experiment_name="deposition",
+		)] == ["Temperature 85 C"]
+
+		# Loaded from the disk.
+		expr_log.persist()
+		reloaded = ExperimentLog.from_storage(persist_dir=tmp_dir, embed_model=MockEmbedding(embed_dim=8))
+		assert reloaded.time_index.to_dict() == expr_log.time_index.to_dict()
+
+		# Rebuilt for the storages persisted without a time index.
+		(Path(tmp_dir) / LOG_TIME_INDEX_PERSIST_NAME).unlink()
+		reloaded = ExperimentLog.from_storage(persist_dir=tmp_dir, embed_model=MockEmbedding(embed_dim=8))
+		assert reloaded.time_index.all("lithography") == expr_log.time_index.all("lithography")
+		assert reloaded.time_index.all(LOG_TIME_INDEX_ALL_KEY) == expr_log.time_index.all(LOG_TIME_INDEX_ALL_KEY)
+
+
+def test_recent_experiment_timestamps():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		expr_log = new_experiment_log(persist_dir=tmp_dir)
+		expr_log.create_experiment(experiment_name="lithography", description="Lithography.")
+		today = datetime.date.today()
+		yesterday, tomorrow = today - datetime.timedelta(days=1), today + datetime.timedelta(days=1)
+
+		expr_log.set_recent_experiment(
+			experiment_name="lithography",
+			start_date=yesterday.strftime(DATE_FORMAT),
+			start_time="08:00:00",
+			end_date=tomorrow.strftime(DATE_FORMAT),
+			end_time="08:00:00",
+		)
+		assert expr_log.get_recent_experiment() == "lithography"
+
+		expr_log.set_recent_experiment(
+			experiment_name="lithography",
+			start_date=yesterday.strftime(DATE_FORMAT),
+			start_time="08:00:00",
+			end_date=yesterday.strftime(DATE_FORMAT),
+			end_time="09:00:00",
+		)
+		assert expr_log.get_recent_experiment() is None
+
+
+def test_chat_memory_time_index():
+	def chat_turn(date: str, h_m_s: str, question: str):
+		kwargs = {LOG_DATE_NAME: date, LOG_TIME_NAME: h_m_s}
+		return [
+			ChatMessage(role=MessageRole.USER, content=question, additional_kwargs=kwargs),
+			ChatMessage(role=MessageRole.ASSISTANT, content="Answer", additional_kwargs=kwargs),
+		]
+
+	old_date = (datetime.date.today() - datetime.timedelta(days=30)).strftime(DATE_FORMAT)
+	today = datetime.date.today().strftime(DATE_FORMAT)
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		init_node = TextNode(text="The chat history of alice.", id_=MEMORY_FIRST_NODE_NAME)
+		last_id_info_node = TextNode(text=MEMORY_FIRST_NODE_NAME, id_=MEMORY_LAST_NODE_ID_NAME)
+		vector_index = VectorStoreIndex(nodes=[init_node, last_id_info_node], embed_model=MockEmbedding(embed_dim=8))
+		memory = ChatVectorMemory(vector_index=vector_index, retriever_kwargs={}, persist_dir=tmp_dir)
+
+		memory.put_messages(chat_turn(old_date, "10:00:00", "Old question 0"))
+		memory.put_messages(chat_turn(old_date, "11:00:00", "Old question 1"))
+		memory.put_messages(chat_turn(today, "00:00:01", "Recent question"))
+		assert len(memory.time_index.all(LOG_TIME_INDEX_ALL_KEY)) == 3
+		assert "Recent question" in memory.get_last_records(num=1)[0].text
+
+		memory.compact(keep_days=7, summarize_fn=lambda date, records: f"Digest on {date}")
+		assert memory.time_index.all(LOG_TIME_INDEX_ALL_KEY)[0] == f"{CHAT_DIGEST_ID_PREFIX}{old_date}"
+		records = memory.get_records_between(
+			start=datetime.datetime.combine(datetime.date.today(), datetime.time()),
+			end=datetime.datetime.now() + datetime.timedelta(days=1),
+		)
+		assert len(records) == 1 and "Recent question" in records[0].text
+
+		memory.persist()
+		reloaded = ChatVectorMemory.from_storage(persist_dir=tmp_dir, embed_model=MockEmbedding(embed_dim=8), retriever_kwargs={})
+		assert reloaded.time_index.to_dict() == memory.time_index.to_dict()
+
+
+if __name__ == "__main__":
+	test_log_time_index()
+	test_experiment_log_time_index()
+	test_recent_experiment_timestamps()
+	test_chat_memory_time_index()
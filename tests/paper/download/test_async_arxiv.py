@@ -0,0 +1,191 @@
+import time
+import asyncio
+import tempfile
+import threading
+
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from labridge.common.utils.rate_limit import AsyncTokenBucket
+from labridge.func_modules.paper.download.async_arxiv import AsyncArxivClient, ArxivDiskCache, arxiv_short_id
+
+
+PAPER_NUM = 5
+DOWNLOAD_DELAY = 0.3
+
+FEED_TMPL = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/"
+	xmlns:arxiv="http://arxiv.org/schemas/atom">
+	<title type="html">ArXiv Query</title>
+	<opensearch:totalResults>{total}</opensearch:totalResults>
+	<opensearch:startIndex>{start}</opensearch:startIndex>
+	{entries}
+</feed>
+"""
+
+ENTRY_TMPL = """
+	<entry>
+		<id>{base_url}/abs/2401.0000{idx}v1</id>
+		<updated>2024-01-0{day}T00:00:00Z</updated>
+		<published>2024-01-0{day}T00:00:00Z</published>
+		<title>Memristor paper {idx}</title>
+		<summary>Abstract of the memristor paper {idx}.</summary>
+		<author><name>Author {idx}</name></author>
+		<link href="{base_url}/abs/2401.0000{idx}v1" rel="alternate" type="text/html"/>
+		<link title="pdf" href="{base_url}/pdf/2401.0000{idx}v1" rel="related" type="application/pdf"/>
+		<arxiv:primary_category term="cs.ET" scheme="http://arxiv.org/schemas/atom"/>
+		<category term="cs.ET" scheme="http://arxiv.org/schemas/atom"/>
+	</entry>
+"""
+
+
+class MockArxivServer(object):
+	r""" A local server mocking the arXiv API and the PDF downloads, counting the requests. """
+	def __init__(self):
+		self.requests = []
+		self._lock = threading.Lock()
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def log_message(self, *args):
+				pass
+
+			def do_GET(self):
+				with server._lock:
+					server.requests.append(self.path)
+				url = urlparse(self.path)
+				if url.path == "/api/query":
+					args = parse_qs(url.query)
+					start, page_size = int(args["start"][0]), int(args["max_results"][0])
+					entries = "".join(
+						ENTRY_TMPL.format(base_url=server.base_url, idx=idx, day=PAPER_NUM - idx + 1)
+						for idx in range(start, min(start + page_size, PAPER_NUM))
+					)
+					content = FEED_TMPL.format(total=PAPER_NUM, start=start, entries=entries).encode("utf-8")
+				elif url.path.startswith("/pdf/"):
+					time.sleep(DOWNLOAD_DELAY)
+					content = f"%PDF-1.4 {url.path}".encode("utf-8")
+				else:
+					self.send_response(404)
+					self.end_headers()
+					return
+				self.send_response(200)
+				self.send_header("Content-Length", str(len(content)))
+				self.end_headers()
+				self.wfile.write(content)
+
+		self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+		self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+	def __enter__(self):
+		self._thread.start()
+		return self
+
+	def __exit__(self, *args):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+
+def new_client(server: MockArxivServer, tmp_dir: str, **kwargs) -> AsyncArxivClient:
+	return AsyncArxivClient(
+		query_url_format=f"{server.base_url}/api/query?{{}}",
+		cache=ArxivDiskCache(cache_dir=str(Path(tmp_dir) / "arxiv")),
+		**kwargs,
+	)
+
+
+def test_token_bucket():
+	async def main():
+		bucket = AsyncTokenBucket(rate=20, capacity=2)
+		start = time.perf_counter()
+		await asyncio.gather(*[bucket.acquire() for _ in range(6)])
+		return time.perf_counter() - start
+
+	# A burst of 2, then the other 4 are released 0.05s apart.
+	cost = asyncio.run(main())
+	assert 0.18 < cost < 0.5
+
+
+def test_search_paging_and_cache():
+	with MockArxivServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+		client = new_client(server, tmp_dir, page_size=2, api_rate=100)
+
+		async def search():
+			return await client.asearch(query="ti:memristor+OR+abs:memristor", max_results=4)
+
+		results = client.run_sync(search())
+		assert [result.title for result in results] == [f"Memristor paper {idx}" for idx in range(4)]
+		assert [arxiv_short_id(result.entry_id) for result in results] == [f"2401.0000{idx}v1" for idx in range(4)]
+		assert len(server.requests) == 2
+		assert "search_query=ti:memristor+OR+abs:memristor" in server.requests[0]
+
+		# Served by the disk cache.
+		assert [result.title for result in client.run_sync(search())] == [result.title for result in results]
+		assert len(server.requests) == 2
+
+		# Expired search responses are requested again.
+		client.cache.search_ttl = -1
+		client.run_sync(search())
+		assert len(server.requests) == 4
+
+
+def test_concurrent_downloads_and_cache():
+	with MockArxivServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+		client = new_client(server, tmp_dir, download_rate=100, max_concurrent_downloads=4)
+		pdf_urls = [f"{server.base_url}/pdf/2401.0000{idx}v1" for idx in range(4)]
+		items = [(pdf_url, str(Path(tmp_dir) / "alice" / f"paper_{idx}.pdf")) for idx, pdf_url in enumerate(pdf_urls)]
+
+		start = time.perf_counter()
+		save_paths = client.run_sync(client.adownload_pdfs(items))
+		cost = time.perf_counter() - start
+		assert save_paths == [save_path for _, save_path in items]
+		assert cost < 2 * DOWNLOAD_DELAY
+		for pdf_url, save_path in items:
+			assert Path(save_path).read_bytes().startswith(b"%PDF")
+			assert client.cache.get_pdf(arxiv_short_id(pdf_url)) is not None
+
+		# The same papers for another user are copied from the cache.
+		server.requests.clear()
+		items = [(pdf_url, str(Path(tmp_dir) / "bob" / f"paper_{idx}.pdf")) for idx, pdf_url in enumerate(pdf_urls)]
+		items.append((f"{server.base_url}/missing/2401.00009v1", str(Path(tmp_dir) / "bob" / "missing.pdf")))
+		save_paths = client.run_sync(client.adownload_pdfs(items))
+		assert save_paths[:-1] == [save_path for _, save_path in items[:-1]]
+		assert save_paths[-1] is None
+		assert server.requests == ["/missing/2401.00009v1"]
+
+
+def test_shared_inflight_download():
+	with MockArxivServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+		client = new_client(server, tmp_dir, download_rate=100, max_concurrent_downloads=4)
+		pdf_url = f"{server.base_url}/pdf/2401.00000v1"
+		items = [(pdf_url, str(Path(tmp_dir) / user / "paper.pdf")) for user in ("alice", "bob", "carol")]
+
+		save_paths = client.run_sync(client.adownload_pdfs(items))
+		assert save_paths == [save_path for _, save_path in items]
+		assert server.requests == ["/pdf/2401.00000v1"]
+		assert [path.name for path in Path(client.cache.pdf_path("2401.00000v1")).parent.iterdir()] == ["2401.00000v1.pdf"]
+
+
+def benchmark(num: int = 8):
+	r""" Downloading `num` papers concurrently vs. one by one, each download takes `DOWNLOAD_DELAY` seconds. """
+	with MockArxivServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+		for max_concurrent in (1, 4):
+			client = new_client(server, tmp_dir, download_rate=100, max_concurrent_downloads=max_concurrent)
+			client.cache.cache_dir = str(Path(tmp_dir) / f"arxiv_{max_concurrent}")
+			items = [
+				(f"{server.base_url}/pdf/2401.{idx:05d}v1", str(Path(tmp_dir) / f"{max_concurrent}_{idx}.pdf"))
+				for idx in range(num)
+			]
+			start = time.perf_counter()
+			client.run_sync(client.adownload_pdfs(items))
+			print(f"max_concurrent_downloads={max_concurrent}: {time.perf_counter() - start:.2f} s for {num} papers")
+
+
+if __name__ == "__main__":
+	test_token_bucket()
+	test_search_paging_and_cache()
+	test_concurrent_downloads_and_cache()
+	test_shared_inflight_download()
+	benchmark()
@@ -0,0 +1,108 @@
+import json
+import asyncio
+import tempfile
+import threading
+
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from labridge.func_modules.paper.parse.extractors.doi import DOIWorker
+from labridge.func_modules.paper.parse.extractors.doi_cache import DOICache
+
+
+STUB_WORKS = {
+	"10.1000/memristor.cnn": "Fully hardware-implemented memristor convolutional neural network",
+	"10.1000/alpha.star": "Grandmaster level in StarCraft II using multi-agent reinforcement learning",
+}
+
+
+class StubCrossRefHandler(BaseHTTPRequestHandler):
+	r""" A local stub of the CrossRef `works` API. """
+	request_count = 0
+
+	def do_GET(self):
+		StubCrossRefHandler.request_count += 1
+		url = urlparse(self.path)
+		doi = url.path[len("/works/"):]
+		if doi:
+			if doi not in STUB_WORKS:
+				self.send_response(404)
+				self.end_headers()
+				return
+			body = {"message": {"DOI": doi, "title": [STUB_WORKS[doi]]}}
+		else:
+			query_title = parse_qs(url.query)["query.title"][0]
+			items = [
+				{"DOI": doi, "title": [title]} for doi, title in STUB_WORKS.items()
+				if title.lower() == query_title.lower()
+			]
+			body = {"message": {"items": items}}
+		data = json.dumps(body).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+	server = ThreadingHTTPServer(("127.0.0.1", 0), StubCrossRefHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def new_doi_worker(server: ThreadingHTTPServer, cache_path: str) -> DOIWorker:
+	host, port = server.server_address
+	return DOIWorker(
+		cache=DOICache(persist_path=cache_path),
+		crossref_base_url=f"http://{host}:{port}/works/",
+	)
+
+
+def test_doi_cache_persists_lookups():
+	server = start_stub_server()
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		cache_path = str(Path(tmp_dir) / "doi_cache.json")
+		title = STUB_WORKS["10.1000/memristor.cnn"]
+
+		worker = new_doi_worker(server, cache_path)
+		StubCrossRefHandler.request_count = 0
+		assert worker.find_doi_by_title(title=title) == "10.1000/memristor.cnn"
+		assert StubCrossRefHandler.request_count == 1
+		assert worker.check_doi(title=title, input_doi="10.1000/memristor.cnn")
+		assert StubCrossRefHandler.request_count == 1
+
+		# A new worker, e.g. ingesting the same paper for another user, hits the on-disk cache.
+		worker = new_doi_worker(server, cache_path)
+		StubCrossRefHandler.request_count = 0
+		assert worker.find_doi_by_title(title=title.upper()) == "10.1000/memristor.cnn"
+		assert worker.find_doi_by_title(title=title, input_doi="10.1000/memristor.cnn") == "10.1000/memristor.cnn"
+		assert StubCrossRefHandler.request_count == 0
+	server.shutdown()
+
+
+def test_async_batch_resolution():
+	server = start_stub_server()
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		cache_path = str(Path(tmp_dir) / "doi_cache.json")
+		worker = new_doi_worker(server, cache_path)
+		titles = list(STUB_WORKS.values()) * 3
+
+		async def resolve():
+			dois = await worker.afind_dois_by_titles(titles=titles, max_concurrency=2)
+			await worker.crossref_worker.aclose()
+			return dois
+
+		dois = asyncio.run(resolve())
+		assert dois == list(STUB_WORKS.keys()) * 3
+		assert DOICache(persist_path=cache_path).get_doi(titles[1]) == "10.1000/alpha.star"
+	server.shutdown()
+
+
+if __name__ == "__main__":
+	test_doi_cache_persists_lookups()
+	test_async_batch_resolution()
@@ -0,0 +1,142 @@
+import tempfile
+
+import pymupdf
+
+from pathlib import Path
+from typing import Any, List
+
+from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from labridge.func_modules.paper.parse.extractors.doi import DOIWorker
+from labridge.func_modules.paper.parse.extractors.doi_cache import DOICache
+from labridge.func_modules.paper.parse.extractors.metadata_extract import (
+	PaperMetadataExtractor,
+	PAPER_TITLE,
+	PAPER_DOI,
+	PAPER_ABSTRACT,
+	PAPER_LEVEL_KEYWORDS,
+	DEFAULT_NECESSARY_METADATA,
+	find_dois,
+	find_keywords,
+)
+
+
+TITLE = "Fully hardware-implemented memristor convolutional neural network"
+DOI = "10.1038/s41586-020-1942-4"
+# No server listens on the port, CrossRef requests fail at once.
+UNREACHABLE_CROSSREF_URL = "http://127.0.0.1:9/works/"
+
+
+KEYWORDS = "memristor, convolutional neural network"
+ABSTRACT = "Memristor-enabled neuromorphic computing systems provide a fast and energy-efficient approach."
+
+
+class LackedMetadataLLM(CustomLLM):
+	r""" Answers the lacked metadata, and records the prompts. """
+	prompts: List[str] = []
+
+	@property
+	def metadata(self) -> LLMMetadata:
+		return LLMMetadata(model_name="lacked-metadata-llm")
+
+	@llm_completion_callback()
+	def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+		self.prompts.append(prompt)
+		return CompletionResponse(
+			text=(
+				f"**{PAPER_TITLE}**: A wrong title\n\n"
+				f"**{PAPER_LEVEL_KEYWORDS}**: An asked keyword\n\n"
+				f"**{PAPER_ABSTRACT}**: {ABSTRACT}\n\n"
+			)
+		)
+
+	@llm_completion_callback()
+	def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+		raise NotImplementedError
+
+
+def write_pdf(pdf_path: str, text: str, info_title: str = None):
+	doc = pymupdf.open()
+	page = doc.new_page()
+	page.insert_textbox(pymupdf.Rect(72, 72, 540, 720), text, fontsize=10)
+	if info_title is not None:
+		doc.set_metadata({"title": info_title})
+	doc.save(pdf_path)
+	doc.close()
+
+
+def new_extractor(tmp_dir: str) -> PaperMetadataExtractor:
+	cache = DOICache(persist_path=str(Path(tmp_dir) / "doi_cache.json"))
+	cache.put_metadata(DOI, {"title": TITLE, "publish_year": 2020, "authors": ["Peng Yao", "Huaqiang Wu"]})
+	extractor = PaperMetadataExtractor(llm=LackedMetadataLLM())
+	extractor.doi_worker = DOIWorker(cache=cache, crossref_base_url=UNREACHABLE_CROSSREF_URL)
+	return extractor
+
+
+def test_find_dois():
+	text = (
+		"Nature | Vol 577 | 30 January 2020 (https://doi.org/10.1038/s41586-020-1942-4). "
+		"See also doi:10.1109/JSSC.2019.2951363, and 10.1038/s41586-020-1942-4.\n"
+		"Not a DOI: 10.12/abc."
+	)
+	assert find_dois(text) == [DOI, "10.1109/JSSC.2019.2951363"]
+	assert find_keywords("Abstract\nKeywords: memristor; convolutional neural network.\n1 Introduction") == KEYWORDS
+	assert find_keywords("Index Terms\u2014memristor, convolutional neural network") == KEYWORDS
+	assert find_keywords("The keywords of this paper are listed below.") is None
+
+
+def test_title_and_doi_without_llm():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		extractor = new_extractor(tmp_dir)
+
+		# A typical paper: the DOI in the page matches the title in the PDF info, and the Abstract is parsed.
+		# No LLM call is made, the Paper keywords are listed in the page.
+		pdf_path = str(Path(tmp_dir) / "info_title.pdf")
+		page = f"Article\nhttps://doi.org/{DOI}\nKeywords: memristor; convolutional neural network\nReceived: 1 March 2019"
+		write_pdf(pdf_path, text=page, info_title=TITLE)
+		metadata = extractor.extract_paper_metadata(
+			pdf_path=pdf_path,
+			show_progress=False,
+			parsed_metadata={PAPER_ABSTRACT: ABSTRACT},
+		)
+		assert metadata[PAPER_TITLE] == TITLE
+		assert metadata[PAPER_DOI] == DOI
+		assert metadata["Publish year"] == "2020"
+		assert metadata["Authors"] == "Peng Yao, Huaqiang Wu"
+		assert metadata[PAPER_LEVEL_KEYWORDS] == KEYWORDS
+		assert metadata[PAPER_ABSTRACT] == ABSTRACT
+		assert len(extractor.llm.prompts) == 0
+
+		# The Abstract is not parsed: a single LLM call over the first page asks for it only.
+		# The Paper keywords are left to the paper summary.
+		metadata = extractor.extract_paper_metadata(pdf_path=pdf_path, show_progress=False)
+		assert metadata[PAPER_TITLE] == TITLE
+		assert metadata[PAPER_ABSTRACT] == ABSTRACT
+		assert len(extractor.llm.prompts) == 1
+		prompt = extractor.llm.prompts[0]
+		assert DEFAULT_NECESSARY_METADATA[PAPER_ABSTRACT] in prompt
+		assert DEFAULT_NECESSARY_METADATA[PAPER_LEVEL_KEYWORDS] not in prompt
+		assert DEFAULT_NECESSARY_METADATA[PAPER_DOI] not in prompt
+		assert DEFAULT_NECESSARY_METADATA["Authors"] not in prompt
+
+		# Without the PDF info, the registered title of the DOI appears in the page.
+		pdf_path = str(Path(tmp_dir) / "page_title.pdf")
+		write_pdf(pdf_path, text=f"Article\nFully hardware-implemented memristor\nconvolutional neural network\n{DOI}")
+		metadata = extractor.extract_paper_metadata(
+			pdf_path=pdf_path,
+			show_progress=False,
+			parsed_metadata={PAPER_ABSTRACT: ABSTRACT},
+		)
+		assert metadata[PAPER_TITLE] == TITLE
+		assert metadata[PAPER_DOI] == DOI
+		assert PAPER_LEVEL_KEYWORDS not in metadata
+		assert len(extractor.llm.prompts) == 1
+
+		# A cited DOI whose title is not in the page is rejected.
+		assert extractor.heuristic_extract(first_page=f"Another paper. Refs: [1] doi:{DOI}") is None
+
+
+if __name__ == "__main__":
+	test_find_dois()
+	test_title_and_doi_without_llm()
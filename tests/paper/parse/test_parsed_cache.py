@@ -0,0 +1,159 @@
+import time
+import tempfile
+
+import pymupdf
+
+from pathlib import Path
+
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import Document
+
+from labridge.func_modules.paper.parse.paper_reader import PaperReader, SHARED_PAPER_WAREHOUSE_DIR
+from labridge.func_modules.paper.parse.parsed_cache import ParsedPaperCache, ParsedPaper
+from labridge.func_modules.paper.parse.parsers.base import CONTENT_TYPE_NAME, MAINTEXT, METHODS, REFERENCES
+from labridge.func_modules.paper.parse.extractors.source_analyze import PaperSourceAnalyzer, PaperSourceCache
+from labridge.func_modules.paper.parse.extractors.metadata_extract import (
+	PAPER_TITLE,
+	PAPER_DOI,
+	PAPER_POSSESSOR,
+	PAPER_REL_FILE_PATH,
+)
+
+
+TITLE = "Fully hardware-implemented memristor convolutional neural network"
+DOI = "10.1038/s41586-020-1942-4"
+
+
+class Forbidden(object):
+	r""" Fails the test if any method is called. """
+	def __getattr__(self, item):
+		raise AssertionError(f"`{item}` should not be called.")
+
+
+def write_paper(pdf_path: Path):
+	pdf_path.parent.mkdir(parents=True, exist_ok=True)
+	doc = pymupdf.open()
+	contents = [
+		["A memristor paper", "Main text about Nature memristors.", "Online content"],
+		["Methods", "Device fabrication.", "References", "1. A reference."],
+	]
+	for page_blocks in contents:
+		page = doc.new_page()
+		for idx, text in enumerate(page_blocks):
+			page.insert_text((72, 72 + 60 * idx), text, fontsize=11)
+	doc.save(str(pdf_path))
+	doc.close()
+
+
+def new_reader(tmp_dir: str) -> PaperReader:
+	reader = PaperReader(
+		llm=MockLLM(),
+		source_keyword_threshold=0,
+		parsed_cache=ParsedPaperCache(cache_dir=str(Path(tmp_dir) / "parsed_papers")),
+	)
+	reader.source_analyzer = PaperSourceAnalyzer(
+		llm=MockLLM(),
+		keyword_count_threshold=0,
+		cache=PaperSourceCache(persist_path=str(Path(tmp_dir) / "source_cache.json")),
+	)
+	reader.root = Path(tmp_dir)
+	return reader
+
+
+def extract_without_llm(pdf_path, extra_metadata=None, **kwargs):
+	metadata = dict(extra_metadata or {})
+	metadata.update({PAPER_TITLE: TITLE, PAPER_DOI: DOI})
+	return metadata
+
+
+def test_reread_without_parsing():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		warehouse = Path(tmp_dir) / SHARED_PAPER_WAREHOUSE_DIR
+		pdf_path = warehouse / "alice" / "paper.pdf"
+		write_paper(pdf_path)
+
+		reader = new_reader(tmp_dir)
+		reader.metadata_extractor.extract_paper_metadata = extract_without_llm
+		chunk_docs, extra_docs = reader.read_single_paper(pdf_path, show_progress=False)
+
+		# Another reader re-reads the same paper stored for another user.
+		copied_path = warehouse / "bob" / "paper.pdf"
+		copied_path.parent.mkdir(parents=True)
+		copied_path.write_bytes(pdf_path.read_bytes())
+		reader = new_reader(tmp_dir)
+		reader.metadata_extractor = Forbidden()
+		reader.source_analyzer = Forbidden()
+		cached_chunk_docs, cached_extra_docs = reader.read_single_paper(
+			copied_path,
+			show_progress=False,
+			extra_metadata={"Publish year": "2020"},
+		)
+
+		assert [doc.text for doc in cached_chunk_docs] == [doc.text for doc in chunk_docs]
+		assert [doc.text for doc in cached_extra_docs] == [doc.text for doc in extra_docs]
+		assert {doc.metadata[CONTENT_TYPE_NAME] for doc in cached_chunk_docs} == {MAINTEXT, METHODS}
+		assert {doc.metadata[CONTENT_TYPE_NAME] for doc in cached_extra_docs} == {REFERENCES}
+		for doc in cached_chunk_docs + cached_extra_docs:
+			assert doc.metadata[PAPER_TITLE] == TITLE
+			assert doc.metadata[PAPER_DOI] == DOI
+			assert doc.metadata["Publish year"] == "2020"
+			assert doc.metadata[PAPER_POSSESSOR] == "bob"
+			assert doc.metadata[PAPER_REL_FILE_PATH] == str(Path(SHARED_PAPER_WAREHOUSE_DIR) / "bob" / "paper.pdf")
+			assert doc.doc_id.startswith(doc.metadata[PAPER_REL_FILE_PATH])
+
+		# The results of another parser version are not reused.
+		content_hash = reader.parsed_cache.file_hash(str(copied_path))
+		assert reader.parsed_cache.get_parsed(content_hash) is not None
+		reader.parsed_cache.parser_version = "next"
+		assert reader.parsed_cache.get_parsed(content_hash) is None
+
+
+def test_cache_entry():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		cache = ParsedPaperCache(cache_dir=str(Path(tmp_dir) / "parsed_papers"))
+		doc = Document(
+			text="Main text.",
+			extra_info={CONTENT_TYPE_NAME: MAINTEXT, "pages": [1, 2]},
+			excluded_embed_metadata_keys=["pages"],
+			excluded_llm_metadata_keys=["pages"],
+		)
+		assert cache.put_parsed("hash", ParsedPaper(chunk_docs=[doc], extra_docs=[], metadata_docs=[]))
+		cached_doc = cache.get_parsed("hash").chunk_docs[0]
+		assert cached_doc.text == doc.text
+		assert cached_doc.metadata == doc.metadata
+		assert cached_doc.excluded_embed_metadata_keys == ["pages"]
+		assert cached_doc.excluded_llm_metadata_keys == ["pages"]
+
+		# Unserializable metadata is not cached as strings.
+		doc.metadata["pages"] = {1, 2}
+		assert not cache.put_parsed("other_hash", ParsedPaper(chunk_docs=[doc], extra_docs=[], metadata_docs=[]))
+		assert cache.get_parsed("other_hash") is None
+		assert sorted(p.name for p in Path(cache.cache_dir).iterdir()) == [Path(cache._entry_path("hash")).name]
+
+
+def benchmark(num: int = 50):
+	r""" Re-reading a paper from the parsed cache vs. parsing it again (without the LLM). """
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		pdf_path = Path(tmp_dir) / SHARED_PAPER_WAREHOUSE_DIR / "alice" / "paper.pdf"
+		write_paper(pdf_path)
+		reader = new_reader(tmp_dir)
+		reader.metadata_extractor.extract_paper_metadata = extract_without_llm
+		reader.read_single_paper(pdf_path, show_progress=False)
+
+		start = time.perf_counter()
+		for _ in range(num):
+			reader.read_single_paper(pdf_path, show_progress=False)
+		cached_time = time.perf_counter() - start
+
+		reader.parsed_cache = None
+		start = time.perf_counter()
+		for _ in range(num):
+			reader.read_single_paper(pdf_path, show_progress=False)
+		parse_time = time.perf_counter() - start
+		print(f"parse: {parse_time * 1e3 / num:.2f} ms/paper, cached: {cached_time * 1e3 / num:.2f} ms/paper")
+
+
+if __name__ == "__main__":
+	test_reread_without_parsing()
+	test_cache_entry()
+	benchmark()
@@ -0,0 +1,98 @@
+import time
+import random
+import tempfile
+
+import pymupdf
+
+from pathlib import Path
+
+from labridge.func_modules.paper.parse.parsers.base import (
+	SeparatorMatcher,
+	get_sep_idx,
+	CONTENT_TYPE_NAME,
+	MAINTEXT,
+	METHODS,
+	REFERENCES,
+)
+from labridge.func_modules.paper.parse.parsers.nature_parser import NaturePaperParser, NATURE_SEPARATORS
+from labridge.func_modules.paper.parse.parsers.ieee_parser import IEEE_SEPARATORS
+
+
+FILLER_WORDS = ["memristor", "array", "the", "of", "conductance", "in", "network", "weight", "Fig.", "1"]
+
+
+def random_blocks(separators, num: int, seed: int = 0):
+	r""" Text blocks like those extracted by PyMuPDF, some starting with (variants of) the separators. """
+	rng = random.Random(seed)
+	all_seps = [sep for each_separators in separators for sep in each_separators] + ["Method", "Referee"]
+	blocks = []
+	for _ in range(num):
+		words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(0, 40))]
+		if rng.random() < 0.5:
+			sep = rng.choice(all_seps)
+			sep = "".join(c.upper() if rng.random() < 0.3 else c for c in sep)
+			if rng.random() < 0.3:
+				cut = rng.randint(0, len(sep))
+				sep = sep[:cut] + "\n" + sep[cut:]
+			prefix = rng.choice(["", "1", "1 ", "IV.", "\n", "  ", "10. "])
+			words.insert(0, prefix + sep)
+		blocks.append(" ".join(words) + "\n")
+	return blocks
+
+
+def test_matcher_matches_reference():
+	for separators in (NATURE_SEPARATORS, IEEE_SEPARATORS):
+		for tolerance in (0, 1, 3, 5):
+			matcher = SeparatorMatcher(separators=separators, tolerance=tolerance)
+			for block in random_blocks(separators, num=2000, seed=tolerance):
+				assert matcher.get_sep_idx(block) == get_sep_idx(block, separators, tolerance), block
+
+
+def test_parse_paper_components():
+	parser = NaturePaperParser()
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		pdf_path = str(Path(tmp_dir) / "paper.pdf")
+		doc = pymupdf.open()
+		contents = [
+			["A memristor paper", "Abstract text.", "Main text about memristors."],
+			["More main text.", "Online content", "Any methods, additional references."],
+			["Methods", "Device fabrication.", "DATA AVAILABILITY", "The data are available."],
+			["References", "1. A reference."],
+		]
+		for page_blocks in contents:
+			page = doc.new_page()
+			for idx, text in enumerate(page_blocks):
+				page.insert_text((72, 72 + 60 * idx), text, fontsize=11)
+		doc.save(pdf_path)
+		doc.close()
+
+		documents = parser.parse_paper(pdf_path)
+		texts = {document.metadata[CONTENT_TYPE_NAME]: document.text for document in documents}
+		assert texts[MAINTEXT] == "Abstract text.\nMain text about memristors.\nMore main text.\n"
+		assert texts[METHODS] == "Methods\nDevice fabrication.\n"
+		# The references before and after the methods are merged.
+		assert texts[REFERENCES].startswith("Online content\n")
+		assert "DATA AVAILABILITY\n" in texts[REFERENCES] and texts[REFERENCES].endswith("1. A reference.\n")
+
+
+def benchmark(num: int = 20000):
+	r""" Micro-benchmark: `get_sep_idx` vs. the compiled matcher on Nature-like text blocks. """
+	blocks = random_blocks(NATURE_SEPARATORS, num=num, seed=7)
+	matcher = SeparatorMatcher(separators=NATURE_SEPARATORS, tolerance=3)
+
+	start = time.perf_counter()
+	for block in blocks:
+		get_sep_idx(block, NATURE_SEPARATORS, 3)
+	reference_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for block in blocks:
+		matcher.get_sep_idx(block)
+	compiled_time = time.perf_counter() - start
+	print(f"get_sep_idx: {reference_time * 1e6 / num:.2f} us/block, compiled: {compiled_time * 1e6 / num:.2f} us/block")
+
+
+if __name__ == "__main__":
+	test_matcher_matches_reference()
+	test_parse_paper_components()
+	benchmark()
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+
+import pymupdf
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.llms import MockLLM
+
+from labridge.func_modules.paper.parse.extractors.source_analyze import (
+	PaperSourceAnalyzer,
+	PaperSourceCache,
+	PaperSource,
+)
+
+
+def write_pdf(pdf_path: str, pages: List[str], subject: str = None):
+	doc = pymupdf.open()
+	for text in pages:
+		page = doc.new_page()
+		page.insert_textbox(pymupdf.Rect(72, 72, 540, 720), text, fontsize=10)
+	if subject is not None:
+		doc.set_metadata({"subject": subject})
+	doc.save(pdf_path)
+	doc.close()
+
+
+def new_analyzer(tmp_dir: str, max_pages: int = 30) -> PaperSourceAnalyzer:
+	return PaperSourceAnalyzer(
+		llm=MockLLM(),
+		keyword_count_threshold=3,
+		max_pages=max_pages,
+		cache=PaperSourceCache(persist_path=str(Path(tmp_dir) / "source_cache.json")),
+	)
+
+
+def test_keyword_and_subject():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		analyzer = new_analyzer(tmp_dir, max_pages=2)
+
+		pdf_path = str(Path(tmp_dir) / "nature.pdf")
+		write_pdf(pdf_path, pages=["NATURE | nature, Nature.", "Nature Electronics", "Filler."])
+		assert analyzer.keyword_analyze(pdf_path) == PaperSource.NATURE
+
+		# `Naturally` is not the keyword, and the pages beyond `max_pages` are not scanned.
+		pdf_path = str(Path(tmp_dir) / "late_nature.pdf")
+		write_pdf(pdf_path, pages=["Naturally, natures.", "Filler.", "Nature " * 10])
+		assert analyzer.keyword_analyze(pdf_path) == PaperSource.IEEE
+		assert new_analyzer(tmp_dir, max_pages=3).keyword_analyze(pdf_path) == PaperSource.NATURE
+
+		pdf_path = str(Path(tmp_dir) / "subject.pdf")
+		write_pdf(pdf_path, pages=["Nature " * 10], subject="IEEE Journal of Solid-State Circuits")
+		assert analyzer.reader_analyze(pdf_path) == PaperSource.IEEE
+		assert analyzer.analyze_source(pdf_path) == PaperSource.IEEE
+
+		write_pdf(pdf_path, pages=["Filler."], subject="Nature Electronics, doi:10.1038/s41928")
+		assert analyzer.analyze_source(pdf_path) == PaperSource.NATURE
+
+
+def test_source_cached_by_content():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		pdf_path = str(Path(tmp_dir) / "paper.pdf")
+		write_pdf(pdf_path, pages=["Nature " * 5])
+		assert new_analyzer(tmp_dir).analyze_source(pdf_path) == PaperSource.NATURE
+
+		def no_analyze(doc):
+			raise AssertionError("The cached source should be used.")
+
+		# A copy of the same paper, analyzed by a fresh analyzer that loads the cache from disk.
+		copied_path = str(Path(tmp_dir) / "copied.pdf")
+		shutil.copy(pdf_path, copied_path)
+		analyzer = new_analyzer(tmp_dir)
+		analyzer._keyword_source = no_analyze
+		analyzer._subject_source = no_analyze
+		assert analyzer.analyze_source(copied_path) == PaperSource.NATURE
+
+
+if __name__ == "__main__":
+	test_keyword_and_subject()
+	test_source_cached_by_content()
@@ -0,0 +1,99 @@
+import random
+import string
+import time
+
+import numpy as np
+
+from labridge.func_modules.paper.parse.extractors.doi import (
+	lcs_len,
+	title_mismatch_lens,
+	MISMATCH_TOLERANCE,
+)
+
+
+def dp_lcs_len(str1: str, str2: str) -> int:
+	r""" The former O(n·m) dynamic programming implementation, used as the reference. """
+	len1 = len(str1)
+	len2 = len(str2)
+	len_array = np.zeros((len1 + 1, len2 + 1), dtype=int)
+
+	for i in range(1, len1 + 1):
+		for j in range(1, len2 + 1):
+			if str1[i - 1] == str2[j - 1]:
+				len_array[i][j] = len_array[i - 1][j - 1] + 1
+			else:
+				len_array[i][j] = max(len_array[i - 1][j], len_array[i][j - 1])
+	return len_array[-1][-1]
+
+
+def perturb(title: str, edits: int, rng: random.Random) -> str:
+	chars = list(title)
+	for _ in range(edits):
+		pos = rng.randrange(len(chars))
+		op = rng.choice(("insert", "delete", "replace"))
+		if op == "insert":
+			chars.insert(pos, rng.choice(string.ascii_letters))
+		elif op == "delete" and len(chars) > 1:
+			chars.pop(pos)
+		else:
+			chars[pos] = rng.choice(string.ascii_letters)
+	return "".join(chars)
+
+
+def random_cases(num: int, seed: int = 0):
+	rng = random.Random(seed)
+	alphabet = string.ascii_letters + "  -:,"
+	cases = []
+	for _ in range(num):
+		title = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 150)))
+		if not title:
+			cases.append((title, ["", "abc"]))
+			continue
+		candidates = [perturb(title, rng.randint(0, 12), rng) for _ in range(5)]
+		candidates.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 150))))
+		cases.append((title, candidates))
+	return cases
+
+
+def test_lcs_len_matches_reference():
+	for title, candidates in random_cases(num=60):
+		for candidate in candidates:
+			assert lcs_len(candidate, title) == dp_lcs_len(candidate, title)
+			assert lcs_len(title, candidate) == dp_lcs_len(candidate, title)
+
+
+def test_title_mismatch_lens_match_decisions():
+	for title, candidates in random_cases(num=60, seed=1):
+		mismatch_lens = title_mismatch_lens(candidates, title)
+		ref_lens = [len(title) - dp_lcs_len(candidate, title) for candidate in candidates]
+		assert mismatch_lens == ref_lens
+		assert [m <= MISMATCH_TOLERANCE for m in mismatch_lens] == [m <= MISMATCH_TOLERANCE for m in ref_lens]
+
+
+def benchmark(num_cases: int = 50):
+	r""" Micro-benchmark: reference DP vs. bit-parallel LCS on CrossRef-like responses (5 candidates per title). """
+	cases = random_cases(num=num_cases, seed=2)
+
+	start = time.perf_counter()
+	ref_decisions = [
+		[len(title) - dp_lcs_len(candidate, title) <= MISMATCH_TOLERANCE for candidate in candidates]
+		for title, candidates in cases
+	]
+	dp_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	decisions = [
+		[m <= MISMATCH_TOLERANCE for m in title_mismatch_lens(candidates, title)]
+		for title, candidates in cases
+	]
+	bit_time = time.perf_counter() - start
+
+	assert decisions == ref_decisions
+	print(f"Responses: {num_cases}, equal match decisions: {decisions == ref_decisions}")
+	print(f"DP LCS:           {dp_time * 1000:.2f} ms")
+	print(f"Bit-parallel LCS: {bit_time * 1000:.2f} ms")
+	print(f"Speedup:          {dp_time / bit_time:.1f}x")
+
+
+if __name__ == "__main__":
+	benchmark()
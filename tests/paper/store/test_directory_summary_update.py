@@ -0,0 +1,177 @@
+import time
+import tempfile
+import threading
+
+from pathlib import Path
+from typing import Any, List
+
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.document_summary import DocumentSummaryIndex
+from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import Document
+from llama_index.core.storage import StorageContext
+from llama_index.core import load_index_from_storage
+
+from labridge.func_modules.paper.parse.parsers.base import MAINTEXT
+from labridge.func_modules.paper.store.ingest_journal import JournalRecordType
+from labridge.func_modules.paper.store.paper_store import (
+	PaperDirectorySummaryStore,
+	PAPER_SUMMARY_INDEX_ID,
+)
+
+
+PROJECT_ROOT = Path(__file__).parents[3]
+PAPERS = [
+	"alice/a1.pdf",
+	"alice/cim/c1.pdf",
+	"alice/cim/c2.pdf",
+	"alice/nn/n1.pdf",
+	"bob/b1.pdf",
+]
+
+
+class CountingLLM(CustomLLM):
+	r""" Records the prompts, sleeps a while to simulate the latency. """
+	delay: float = 0.0
+	prompts: List[str] = []
+	active: int = 0
+	peak: int = 0
+	_lock: Any = threading.Lock()
+
+	@property
+	def metadata(self) -> LLMMetadata:
+		return LLMMetadata(model_name="counting")
+
+	@llm_completion_callback()
+	def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+		with self._lock:
+			self.prompts.append(prompt)
+			self.active += 1
+			self.peak = max(self.peak, self.active)
+		time.sleep(self.delay)
+		with self._lock:
+			self.active -= 1
+		if "Research paper:" in prompt:
+			return CompletionResponse(text="Doc: 1, Relevance: 8\nDoc: 2, Relevance: 6")
+		return CompletionResponse(text=f"keywords {len(self.prompts)}")
+
+	@llm_completion_callback()
+	def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+		raise NotImplementedError
+
+
+def add_papers(tmp_dir: Path, paper_root: Path, papers: List[str]):
+	r""" Create the paper files and add their summaries to the paper summary index. """
+	persist_dir = str(tmp_dir / "paper_summary_index")
+	docs = []
+	for paper in papers:
+		paper_path = paper_root / paper
+		paper_path.parent.mkdir(parents=True, exist_ok=True)
+		paper_path.touch()
+		doc_id = f"{paper_path.relative_to(PROJECT_ROOT)}_{MAINTEXT}"
+		docs.append(Document(text=f"The paper {paper}.", doc_id=doc_id))
+
+	if Path(persist_dir).exists():
+		index = load_index_from_storage(StorageContext.from_defaults(persist_dir=persist_dir), index_id=PAPER_SUMMARY_INDEX_ID)
+		for doc in docs:
+			index.insert(doc)
+	else:
+		index = DocumentSummaryIndex.from_documents(documents=docs)
+		index.set_index_id(PAPER_SUMMARY_INDEX_ID)
+	index.storage_context.persist(persist_dir=persist_dir)
+
+
+def new_store(tmp_dir: Path, paper_root: Path, llm: CountingLLM) -> PaperDirectorySummaryStore:
+	return PaperDirectorySummaryStore(
+		llm=llm,
+		embed_model=Settings.embed_model,
+		paper_root=str(paper_root),
+		paper_summary_persist_dir=str(tmp_dir / "paper_summary_index"),
+		directory_summary_persist_dir=str(tmp_dir / "directory_summary_index"),
+	)
+
+
+def dir_summaries(store: PaperDirectorySummaryStore) -> dict:
+	index = store.directory_summary_index
+	return {
+		dir_id: index.docstore.get_node(summary_id).metadata
+		for dir_id, summary_id in index.index_struct.doc_id_to_summary_id.items()
+	}
+
+
+def test_update_only_dirty_ancestors():
+	Settings.llm = CountingLLM()
+	Settings.embed_model = MockEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory(dir=PROJECT_ROOT) as tmp_dir:
+		tmp_dir = Path(tmp_dir)
+		paper_root = tmp_dir / "papers"
+		add_papers(tmp_dir, paper_root, PAPERS)
+		rel_root = paper_root.relative_to(PROJECT_ROOT)
+
+		llm = CountingLLM(delay=0.2, prompts=[])
+		store = new_store(tmp_dir, paper_root, llm)
+		# 5 paper keywords + 4 directories + the root node.
+		assert len(llm.prompts) == 10
+		# The sibling directories `alice/cim` and `alice/nn` are summarized concurrently.
+		assert llm.peak > 1
+		summaries = dir_summaries(store)
+		assert {str(rel_root / d) for d in ("alice", "alice/cim", "alice/nn", "bob")} <= summaries.keys()
+
+		docstore_path = tmp_dir / "directory_summary_index" / "docstore.json"
+		docstore_mtime = docstore_path.stat().st_mtime
+		add_papers(tmp_dir, paper_root, ["alice/cim/c3.pdf"])
+
+		llm.prompts = []
+		updated = store.update_dirs([paper_root / "alice/cim/c3.pdf"])
+		assert sorted(updated) == [str(rel_root / "alice"), str(rel_root / "alice/cim")]
+		# Only the keywords of the new paper are extracted.
+		assert len(llm.prompts) == 3
+		# Only the changed summaries are written, to the journal.
+		assert docstore_path.stat().st_mtime == docstore_mtime
+		assert store.summary_journal.record_num == 1
+		assert len(list(store.summary_journal.records(record_type=JournalRecordType.DIR_SUMMARY))) == 1
+		assert store.summary_journal.completed_papers() == {}
+		assert len(store.directory_summary_index.vector_store.data.embedding_dict) == 5
+
+		llm.prompts = []
+		reloaded = new_store(tmp_dir, paper_root, llm)
+		assert len(llm.prompts) == 0
+		assert dir_summaries(reloaded) == dir_summaries(store)
+		assert len(reloaded.directory_summary_index.docstore.docs) == len(store.directory_summary_index.docstore.docs)
+
+
+def test_match_directory_single_llm_call():
+	Settings.llm = CountingLLM()
+	Settings.embed_model = MockEmbedding(embed_dim=8)
+	with tempfile.TemporaryDirectory(dir=PROJECT_ROOT) as tmp_dir:
+		tmp_dir = Path(tmp_dir)
+		paper_root = tmp_dir / "papers"
+		add_papers(tmp_dir, paper_root, PAPERS)
+		rel_root = paper_root.relative_to(PROJECT_ROOT)
+
+		llm = CountingLLM(prompts=[])
+		store = new_store(tmp_dir, paper_root, llm)
+		store.dir_preselect_top_k = 2
+		shortlist = store.preselect_dir_nodes(paper_summary="compute-in-memory")
+		assert len(shortlist) == 2
+
+		llm.prompts = []
+		best_dir = store.match_directory_for_new_paper(
+			pdf_path=str(paper_root / "new.pdf"),
+			possessor="alice",
+			paper_summary="compute-in-memory",
+		)
+		assert len(llm.prompts) == 1
+		assert "Document 2" in llm.prompts[0] and "Document 3" not in llm.prompts[0]
+		shortlisted_dirs = [node.ref_doc_id for node in shortlist]
+		assert best_dir in shortlisted_dirs
+		# The deepest one among the chosen directories.
+		assert not any(Path(best_dir) in Path(d).parents for d in shortlisted_dirs)
+		assert Path(best_dir).is_relative_to(rel_root)
+
+
+if __name__ == "__main__":
+	test_update_only_dirty_ancestors()
+	test_match_directory_single_llm_call()
@@ -0,0 +1,174 @@
+import asyncio
+import tempfile
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from labridge.func_modules.paper.parse.extractors.metadata_extract import PAPER_REL_FILE_PATH
+from labridge.func_modules.paper.store.shared_paper_store import (
+	SharedPaperStorage,
+	SharedPaperNodeType,
+	SHARED_PAPER_NODE_TYPE,
+	SHARED_PAPER_ROOT_NODE_NAME,
+)
+from labridge.func_modules.paper.store.ingest_journal import (
+	JOURNAL_PAPER_KEY,
+	JOURNAL_INDICES_KEY,
+	JOURNAL_UPSERT_KEY,
+	JOURNAL_NODE_KEY,
+)
+
+
+USER_DIR = str(Path("documents/shared_papers/alice/cim"))
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedded texts. """
+	embed_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.embed_count += len(texts)
+		return super()._get_text_embeddings(texts)
+
+	def _get_text_embedding(self, text: str) -> List[float]:
+		self.embed_count += 1
+		return super()._get_text_embedding(text)
+
+
+class CrashError(Exception):
+	pass
+
+
+def new_storage(tmp_dir: str, embed_model: CountingEmbedding) -> SharedPaperStorage:
+	root_node = TextNode(text="root", id_=SHARED_PAPER_ROOT_NODE_NAME, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.ROOT})
+	dir_node = TextNode(text="cim", id_=USER_DIR, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.DIR})
+	root_node.relationships[NodeRelationship.CHILD] = [RelatedNodeInfo(node_id=USER_DIR)]
+	dir_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=SHARED_PAPER_ROOT_NODE_NAME)
+	notes_root = TextNode(text="notes root", id_=SHARED_PAPER_ROOT_NODE_NAME)
+	storage = SharedPaperStorage(
+		llm=MockLLM(),
+		vector_index=VectorStoreIndex(nodes=[root_node, dir_node], embed_model=embed_model),
+		notes_vector_index=VectorStoreIndex(nodes=[notes_root], embed_model=embed_model),
+		persist_dir=str(Path(tmp_dir) / "vector_index"),
+		notes_persist_dir=str(Path(tmp_dir) / "notes_vector_index"),
+	)
+	storage.persist_papers()
+	storage.persist_notes()
+	return storage
+
+
+def load_storage(tmp_dir: str, embed_model: CountingEmbedding) -> SharedPaperStorage:
+	return SharedPaperStorage.from_storage(
+		persist_dir=str(Path(tmp_dir) / "vector_index"),
+		notes_persist_dir=str(Path(tmp_dir) / "notes_vector_index"),
+		llm=MockLLM(),
+		embed_model=embed_model,
+	)
+
+
+def fake_insert_single_paper(storage: SharedPaperStorage, crash_at: str = None, enqueued: list = None):
+	r""" Ingest a paper as a paper node with two chunks, without parsing a PDF. """
+	ingested = []
+
+	def insert_single_paper(target_rel_dir: str, raw_paper_path: str, enqueue_summary: bool = False, **kwargs):
+		if enqueued is not None:
+			enqueued.append(enqueue_summary)
+		if raw_paper_path == crash_at:
+			raise CrashError(raw_paper_path)
+		paper_path = str(Path(target_rel_dir) / Path(raw_paper_path).name)
+		dir_node = storage._get_node(node_id=target_rel_dir)
+		dir_node, paper_node = storage._new_paper_node(dir_node=dir_node, paper_info={PAPER_REL_FILE_PATH: paper_path})
+		storage._update_node(node_id=dir_node.node_id, node=dir_node)
+		chunks = [TextNode(text=f"{raw_paper_path} chunk {i}") for i in range(2)]
+		storage._insert_as_child_nodes(node=paper_node, child_nodes=chunks)
+		for chunk in chunks:
+			storage._update_node(node_id=chunk.node_id, node=chunk)
+		storage._update_node(node_id=paper_node.node_id, node=paper_node)
+		ingested.append(raw_paper_path)
+		return paper_node.node_id
+
+	storage.insert_single_paper = insert_single_paper
+	return ingested
+
+
+def test_resume_interrupted_ingestion():
+	embed_model = CountingEmbedding(embed_dim=8)
+	papers_root = "/raw/alice"
+	papers = [f"{papers_root}/cim/p{i}.pdf" for i in range(5)]
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir, embed_model)
+		fake_insert_single_paper(storage, crash_at=papers[3])
+		try:
+			storage.insert_papers(user_id="alice", papers_root_dir=papers_root, paper_paths=papers, enable_summarize=False)
+		except CrashError:
+			pass
+		# Nothing is persisted by the interrupted run except the journal.
+		assert len(list(storage.ingest_journal.records())) == 3
+
+		embed_model.embed_count = 0
+		storage = load_storage(tmp_dir, embed_model)
+		assert embed_model.embed_count == 0
+		dir_node = storage._get_node(node_id=USER_DIR)
+		assert len(dir_node.child_nodes) == 3
+		for child in dir_node.child_nodes:
+			paper_node = storage._get_node(node_id=child.node_id)
+			assert len(paper_node.child_nodes) == 2
+			for chunk in paper_node.child_nodes:
+				assert chunk.node_id in storage.vector_index.vector_store.data.embedding_dict
+
+		# The papers are queued for the background summary worker, not summarized inline.
+		enqueued = []
+		ingested = fake_insert_single_paper(storage, enqueued=enqueued)
+		storage.summarize_paper = None
+		assert storage.insert_papers(
+			user_id="alice", papers_root_dir=papers_root, paper_paths=papers, enable_summarize=True
+		) is None
+		assert ingested == papers[3:]
+		assert enqueued == [True, True]
+		assert list(storage.ingest_journal.records()) == []
+
+		storage = load_storage(tmp_dir, embed_model)
+		assert len(storage._get_node(node_id=USER_DIR).child_nodes) == 5
+
+
+def test_concurrent_checkpoints():
+	embed_model = CountingEmbedding(embed_dim=8)
+	papers = [f"/raw/alice/cim/p{i}.pdf" for i in range(2)]
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir, embed_model)
+		fake_insert_single_paper(storage)
+
+		async def ingest(paper: str):
+			storage._begin_checkpoint()
+			paper_id = storage.insert_single_paper(target_rel_dir=USER_DIR, raw_paper_path=paper)
+			# The other ingestion records its changes meanwhile.
+			await asyncio.sleep(0.01)
+			storage._checkpoint(paper=paper, paper_id=paper_id)
+
+		async def ingest_all():
+			await asyncio.gather(*[ingest(paper) for paper in papers])
+
+		asyncio.run(ingest_all())
+		records = list(storage.ingest_journal.records())
+		assert len(records) == 2
+		for record in records:
+			texts = [
+				str(upserted[JOURNAL_NODE_KEY])
+				for changes in record[JOURNAL_INDICES_KEY].values()
+				for upserted in changes[JOURNAL_UPSERT_KEY]
+			]
+			other_paper = [paper for paper in papers if paper != record[JOURNAL_PAPER_KEY]][0]
+			assert any(record[JOURNAL_PAPER_KEY] in text for text in texts)
+			assert not any(other_paper in text for text in texts)
+
+
+if __name__ == "__main__":
+	test_resume_interrupted_ingestion()
+	test_concurrent_checkpoints()
@@ -0,0 +1,102 @@
+import time
+import tempfile
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import Document
+
+from labridge.func_modules.paper.parse.parsers.base import CONTENT_TYPE_NAME, MAINTEXT, METHODS
+from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
+from labridge.func_modules.paper.synthesizer.summary_cache import PaperSummaryCache
+from labridge.func_modules.paper.store.paper_store import PaperStorage
+
+
+# `PaperStorage` only accepts docs whose paths exist under the project root.
+PAPER_REL_PATH = "README.md"
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedding batches. """
+	batch_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.batch_count += 1
+		return super()._get_text_embeddings(texts)
+
+
+def new_docs(start: int, num: int, doc_type: str = MAINTEXT) -> List[Document]:
+	return [
+		Document(
+			text=f"Paper {i}. Compute-in-memory accelerator number {i}.",
+			doc_id=f"{PAPER_REL_PATH}_{doc_type}_{i}",
+			metadata={CONTENT_TYPE_NAME: doc_type},
+		)
+		for i in range(start, start + num)
+	]
+
+
+def new_storage(tmp_dir: str, docs: List[Document]) -> PaperStorage:
+	Settings.llm = MockLLM()
+	Settings.embed_model = CountingEmbedding(embed_dim=8)
+	summarizer = PaperBatchSummarize(
+		llm=Settings.llm,
+		summary_cache=PaperSummaryCache(persist_path=str(Path(tmp_dir) / "summary_cache.json"), auto_persist=False),
+	)
+	return PaperStorage(
+		docs=docs,
+		extra_docs=[],
+		vector_persist_dir=str(Path(tmp_dir) / "vector_index"),
+		paper_summary_persist_dir=str(Path(tmp_dir) / "paper_summary_index"),
+		summary_synthesizer=summarizer,
+	)
+
+
+def test_insert_skips_existing_docs():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir, docs=new_docs(0, 3))
+		assert storage.vector_doc_ids == {doc.doc_id for doc in new_docs(0, 3)}
+
+		Settings.embed_model.batch_count = 0
+		docs = new_docs(2, 4) + new_docs(0, 2, doc_type=METHODS)
+		storage.insert(paper_docs=docs + docs[:2], extra_docs=[])
+		# One embedding batch for the vector index, one per doc type for the summaries.
+		assert Settings.embed_model.batch_count == 3
+
+		all_ids = {doc.doc_id for doc in new_docs(0, 6) + new_docs(0, 2, doc_type=METHODS)}
+		assert storage.vector_doc_ids == all_ids
+		assert storage.paper_summary_doc_ids == all_ids
+
+		storage = PaperStorage.from_storage(
+			vector_persist_dir=storage.vector_persist_dir,
+			paper_summary_persist_dir=storage.paper_summary_persist_dir,
+			summary_synthesizer=storage.summary_synthesizer,
+		)
+		assert storage.vector_doc_ids == all_ids
+		assert storage.paper_summary_doc_ids == all_ids
+		assert set(storage.vector_index.docstore.get_all_ref_doc_info().keys()) == all_ids
+
+		Settings.embed_model.batch_count = 0
+		storage.insert(paper_docs=new_docs(0, 6), extra_docs=[])
+		assert Settings.embed_model.batch_count == 0
+
+
+def benchmark(max_doc_num: int = 5000, step: int = 1000):
+	r""" Insert `step` docs at a time up to `max_doc_num` docs; the time per batch should stay flat. """
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir, docs=new_docs(0, 1))
+		storage.persist = lambda *args, **kwargs: None
+		for start in range(1, max_doc_num, step):
+			docs = new_docs(start, min(step, max_doc_num - start))
+			begin = time.perf_counter()
+			storage.insert(paper_docs=docs, extra_docs=[])
+			cost = time.perf_counter() - begin
+			print(f"{start + len(docs)} docs: {cost:.2f} s for {len(docs)} docs, {cost / len(docs) * 1e3:.2f} ms/doc")
+
+
+if __name__ == "__main__":
+	test_insert_skips_existing_docs()
+	benchmark()
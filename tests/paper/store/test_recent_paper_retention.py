@@ -0,0 +1,123 @@
+import json
+import shutil
+import datetime
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.indices.vector_store import VectorStoreIndex
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from labridge.common.utils.time import DATE_FORMAT, TIME_FORMAT
+from labridge.func_modules.paper.store.temporary_store import (
+	RecentPaperStore,
+	TMP_PAPER_ROOT_NODE_NAME,
+	TMP_PAPER_VECTOR_INDEX_PERSIST_DIR,
+	TMP_PAPER_DATE,
+	TMP_PAPER_TIME,
+	TMP_PAPER_NODE_TYPE_KEY,
+	TMP_PAPER_DOC_NODE_TYPE,
+	TMP_PAPER_ACCESS_PERSIST_NAME,
+)
+
+
+PROJECT_ROOT = Path(__file__).parents[3]
+TEST_USER = "__test_recent_paper_retention__"
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedded texts. """
+	text_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.text_count += len(texts)
+		return super()._get_text_embeddings(texts)
+
+
+def add_paper(store: RecentPaperStore, paper_id: str, days_ago: int, doc_num: int = 2):
+	r""" Insert a paper as `RecentPaperStore.put` does, added `days_ago` days ago. """
+	added = datetime.datetime.now() - datetime.timedelta(days=days_ago)
+	date, h_m_s = added.strftime(DATE_FORMAT), added.strftime(TIME_FORMAT)
+	paper_node = TextNode(id_=paper_id, text=f"The paper {paper_id}", metadata={TMP_PAPER_DATE: [date], TMP_PAPER_TIME: [h_m_s]})
+	doc_nodes = [
+		TextNode(
+			id_=f"{paper_id}_doc_{idx}",
+			text=f"Content {idx} of {paper_id}",
+			metadata={TMP_PAPER_NODE_TYPE_KEY: TMP_PAPER_DOC_NODE_TYPE, TMP_PAPER_DATE: [date], TMP_PAPER_TIME: [h_m_s]},
+		)
+		for idx in range(doc_num)
+	]
+	for doc_node in doc_nodes:
+		doc_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=paper_id)
+	paper_node.relationships[NodeRelationship.CHILD] = [RelatedNodeInfo(node_id=node.node_id) for node in doc_nodes]
+	store.vector_index.insert_nodes(doc_nodes + [paper_node])
+
+	root_node = store.vector_index.docstore.get_node(TMP_PAPER_ROOT_NODE_NAME)
+	root_node.relationships[NodeRelationship.CHILD] = (root_node.child_nodes or []) + [RelatedNodeInfo(node_id=paper_id)]
+	store.vector_index.docstore.add_documents([root_node], allow_update=True)
+
+
+def active_papers(store: RecentPaperStore) -> List[str]:
+	return [paper.node_id for paper in store.vector_index.docstore.get_node(TMP_PAPER_ROOT_NODE_NAME).child_nodes]
+
+
+def test_recent_paper_retention():
+	embed_model = CountingEmbedding(embed_dim=8)
+	persist_dir = PROJECT_ROOT / TMP_PAPER_VECTOR_INDEX_PERSIST_DIR / TEST_USER
+	try:
+		root_node = TextNode(text=f"Root node for the temporary papers of {TEST_USER}", id_=TMP_PAPER_ROOT_NODE_NAME)
+		store = RecentPaperStore(
+			vector_index=VectorStoreIndex(nodes=[root_node], embed_model=embed_model),
+			persist_dir=str(persist_dir),
+			max_paper_num=2,
+			max_age_days=90,
+			access_flush_delay=60,
+		)
+		for paper_id, days_ago in [("old.pdf", 200), ("b.pdf", 10), ("c.pdf", 5), ("d.pdf", 1)]:
+			add_paper(store, paper_id=paper_id, days_ago=days_ago)
+		store.persist()
+
+		# b.pdf is the most recently used after a retrieval.
+		access_path = persist_dir / TMP_PAPER_ACCESS_PERSIST_NAME
+		store.mark_retrieved(node_ids=["b.pdf_doc_1"])
+		# The retrieval times are written later in batch, not at each retrieval.
+		assert json.loads(access_path.read_text()) == {}
+		store.flush_access()
+		assert set(json.loads(access_path.read_text()).keys()) == {"b.pdf"}
+		assert store.apply_retention() == ["old.pdf", "c.pdf"]
+		assert active_papers(store) == ["b.pdf", "d.pdf"]
+		assert sorted(store.archived_papers()) == ["c.pdf", "old.pdf"]
+		# Interrupted before persisting, the archived papers are still in the persisted vector index.
+		interrupted = RecentPaperStore.from_storage(persist_dir=str(persist_dir), embed_model=embed_model)
+		assert interrupted.archived_papers() == []
+		assert not interrupted.is_archived("c.pdf") and not interrupted.restore(paper_file_path="c.pdf")
+		vector_ids = set(store.vector_index.vector_store.data.embedding_dict.keys())
+		assert not any(node_id.startswith(("old.pdf", "c.pdf")) for node_id in vector_ids)
+		assert not any(node_id.startswith(("old.pdf", "c.pdf")) for node_id in store.vector_index.index_struct.nodes_dict)
+		assert not any(node_id.startswith(("old.pdf", "c.pdf")) for node_id in store.vector_index.docstore.docs)
+
+		# Restored without embedding again, and the least recently used other paper is archived instead.
+		embed_model.text_count = 0
+		assert store.restore(paper_file_path="c.pdf")
+		assert embed_model.text_count == 0
+		assert not store.restore(paper_file_path="unknown.pdf")
+		assert active_papers(store) == ["b.pdf", "c.pdf"]
+		assert store.is_archived("d.pdf") and not store.is_archived("c.pdf")
+		assert store.vector_index.docstore.get_node("c.pdf").child_nodes[0].node_id == "c.pdf_doc_0"
+		retrieved = store.vector_index.as_retriever(similarity_top_k=10).retrieve("Content")
+		assert "c.pdf_doc_1" in [node.node_id for node in retrieved]
+
+		assert Path(store._archive_path("c.pdf")).exists()
+		store.persist()
+		assert not Path(store._archive_path("c.pdf")).exists()
+		reloaded = RecentPaperStore.from_storage(persist_dir=str(persist_dir), embed_model=embed_model)
+		assert active_papers(reloaded) == ["b.pdf", "c.pdf"]
+		assert set(reloaded.last_retrieved.keys()) == {"b.pdf", "c.pdf"}
+		assert sorted(reloaded.archived_papers()) == ["d.pdf", "old.pdf"]
+	finally:
+		shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	test_recent_paper_retention()
@@ -0,0 +1,190 @@
+import time
+import tempfile
+
+from pathlib import Path
+
+from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from labridge.common.utils.priority import LLMPriorityGate
+from labridge.func_modules.paper.parse.extractors.metadata_extract import PAPER_REL_FILE_PATH
+from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
+from labridge.func_modules.paper.synthesizer.summary_cache import PaperSummaryCache
+from labridge.func_modules.paper.store.summary_queue import (
+	PaperSummaryQueue,
+	PaperSummaryWorker,
+	SummaryStatus,
+	SUMMARY_QUEUE_MAX_ATTEMPTS,
+)
+from labridge.func_modules.paper.store.shared_paper_store import (
+	SharedPaperStorage,
+	SharedPaperNodeType,
+	SHARED_PAPER_NODE_TYPE,
+	SHARED_PAPER_ROOT_NODE_NAME,
+	SHARED_PAPER_SUMMARY_KEY,
+)
+
+
+USER_DIR = str(Path("documents/shared_papers/alice/cim"))
+
+
+def new_storage(tmp_dir: str) -> SharedPaperStorage:
+	root_node = TextNode(text="root", id_=SHARED_PAPER_ROOT_NODE_NAME, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.ROOT})
+	dir_node = TextNode(text="cim", id_=USER_DIR, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.DIR})
+	root_node.relationships[NodeRelationship.CHILD] = [RelatedNodeInfo(node_id=USER_DIR)]
+	dir_node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=SHARED_PAPER_ROOT_NODE_NAME)
+	notes_root = TextNode(text="notes root", id_=SHARED_PAPER_ROOT_NODE_NAME)
+	embed_model = MockEmbedding(embed_dim=8)
+	storage = SharedPaperStorage(
+		llm=MockLLM(),
+		vector_index=VectorStoreIndex(nodes=[root_node, dir_node], embed_model=embed_model),
+		notes_vector_index=VectorStoreIndex(nodes=[notes_root], embed_model=embed_model),
+		persist_dir=str(Path(tmp_dir) / "vector_index"),
+		notes_persist_dir=str(Path(tmp_dir) / "notes_vector_index"),
+	)
+	storage._summarizer = PaperBatchSummarize(
+		llm=MockLLM(),
+		summary_cache=PaperSummaryCache(persist_path=str(Path(tmp_dir) / "summary_cache.json")),
+	)
+	storage.persist_papers()
+	storage.persist_notes()
+	return storage
+
+
+def add_paper(storage: SharedPaperStorage, name: str) -> str:
+	r""" Add a paper node with two chunks without parsing a PDF, and queue it for summarizing. """
+	dir_node = storage._get_node(node_id=USER_DIR)
+	dir_node, paper_node = storage._new_paper_node(
+		dir_node=dir_node, paper_info={PAPER_REL_FILE_PATH: str(Path(USER_DIR) / name)},
+	)
+	storage._update_node(node_id=dir_node.node_id, node=dir_node)
+	chunks = [
+		TextNode(text=f"{name} chunk {i}", metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.PAPER_CHUNK})
+		for i in range(2)
+	]
+	storage._insert_as_child_nodes(node=paper_node, child_nodes=chunks)
+	for chunk in chunks:
+		storage._update_node(node_id=chunk.node_id, node=chunk)
+	storage._update_node(node_id=paper_node.node_id, node=paper_node)
+	storage.summary_queue.enqueue(paper_id=paper_node.node_id)
+	return paper_node.node_id
+
+
+def test_summary_queue_status():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		persist_path = str(Path(tmp_dir) / "summary_queue.json")
+		queue = PaperSummaryQueue(persist_path=persist_path)
+		queue.enqueue(paper_id="a")
+		queue.enqueue(paper_id="b")
+		assert queue.pending_num() == 2
+		assert queue.wait_next(timeout=0) == "a"
+
+		assert queue.mark_running(paper_id="a")
+		assert not queue.mark_running(paper_id="a")
+		assert queue.wait_next(timeout=0) == "b"
+
+		# A job left running by a crashed process is pending again.
+		queue = PaperSummaryQueue(persist_path=persist_path)
+		assert queue.status(paper_id="a") == SummaryStatus.PENDING
+
+		# The interrupted attempt counts.
+		for _ in range(SUMMARY_QUEUE_MAX_ATTEMPTS - 1):
+			assert queue.mark_running(paper_id="a")
+			queue.mark_failed(paper_id="a", error="timeout")
+		assert queue.status(paper_id="a") == SummaryStatus.FAILED
+
+		queue.mark_running(paper_id="b")
+		queue.mark_done(paper_id="b")
+		queue.enqueue(paper_id="b")
+		queue.rename(old_paper_id="b", new_paper_id="c")
+		queue = PaperSummaryQueue(persist_path=persist_path)
+		assert queue.status(paper_id="b") is None
+		assert queue.status(paper_id="c") == SummaryStatus.DONE
+		assert queue.wait_next(timeout=0) is None
+
+
+def test_summary_queue_appends_changes():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		persist_path = str(Path(tmp_dir) / "summary_queue.json")
+		queue = PaperSummaryQueue(persist_path=persist_path, compact_min_records=8)
+		for idx in range(3):
+			queue.enqueue(paper_id=f"p{idx}")
+			assert queue.mark_running(paper_id=f"p{idx}")
+			queue.mark_done(paper_id=f"p{idx}")
+		with open(persist_path) as f:
+			# 8 changes are appended, the 9th compacts the file to one line per job.
+			assert len(f.readlines()) == 3
+		queue.enqueue(paper_id="p3")
+		with open(persist_path) as f:
+			assert len(f.readlines()) == 4
+
+		queue.remove(paper_id="p0")
+		queue = PaperSummaryQueue(persist_path=persist_path)
+		assert queue.status(paper_id="p0") is None
+		assert queue.status(paper_id="p2") == SummaryStatus.DONE
+
+		# A queue file of the single dictionary format is loaded as well.
+		with open(persist_path, "w") as f:
+			f.write('{"p5": {"status": "running", "attempts": 1, "error": null}}\n')
+		assert PaperSummaryQueue(persist_path=persist_path).status(paper_id="p5") == SummaryStatus.PENDING
+
+
+def test_summary_updated_in_place():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir)
+		paper_id = add_paper(storage, name="p0.pdf")
+		vector_data = storage.vector_index.vector_store.data
+		embedding_ids = list(vector_data.embedding_dict.keys())
+		embedding = vector_data.embedding_dict[paper_id]
+
+		# A retrieval iterating the vector store is not disturbed by the summary update.
+		embedding_iter = iter(vector_data.embedding_dict.items())
+		next(embedding_iter)
+		assert storage._set_paper_summary(paper_node_id=paper_id, summary="A summary.")
+		list(embedding_iter)
+
+		assert list(vector_data.embedding_dict.keys()) == embedding_ids
+		assert vector_data.embedding_dict[paper_id] == embedding
+		assert vector_data.metadata_dict[paper_id][SHARED_PAPER_SUMMARY_KEY] == "A summary."
+		assert storage._get_node(node_id=paper_id).metadata[SHARED_PAPER_SUMMARY_KEY] == "A summary."
+
+
+def test_summary_worker_yields_to_chat():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		storage = new_storage(tmp_dir)
+		paper_ids = [add_paper(storage, name=f"p{i}.pdf") for i in range(2)]
+		storage.persist_papers()
+		assert storage.summary_status(paper_node_id=paper_ids[0]) == SummaryStatus.PENDING
+
+		gate = LLMPriorityGate(idle_grace=0.1)
+		worker = PaperSummaryWorker(storage=storage, gate=gate, poll_interval=0.1)
+		with gate.interactive():
+			worker.start()
+			time.sleep(0.5)
+			assert storage.summary_queue.pending_num() == 2
+
+		deadline = time.time() + 10
+		while storage.summary_queue.pending_num() > 0 and time.time() < deadline:
+			time.sleep(0.05)
+		worker.stop()
+		for paper_id in paper_ids:
+			assert storage.summary_status(paper_node_id=paper_id) == SummaryStatus.DONE
+
+		storage = SharedPaperStorage.from_storage(
+			persist_dir=storage.persist_dir,
+			notes_persist_dir=storage.notes_persist_dir,
+			llm=MockLLM(),
+			embed_model=MockEmbedding(embed_dim=8),
+		)
+		for paper_id in paper_ids:
+			assert storage._get_node(node_id=paper_id).metadata[SHARED_PAPER_SUMMARY_KEY]
+		assert list(storage.ingest_journal.records()) == []
+
+
+if __name__ == "__main__":
+	test_summary_queue_status()
+	test_summary_queue_appends_changes()
+	test_summary_updated_in_place()
+	test_summary_worker_yields_to_chat()
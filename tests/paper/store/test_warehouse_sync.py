@@ -0,0 +1,187 @@
+import os
+import tempfile
+
+from pathlib import Path
+from typing import List
+
+from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from labridge.func_modules.paper.parse.extractors.metadata_extract import PAPER_REL_FILE_PATH
+from labridge.func_modules.paper.store.shared_paper_store import (
+	SharedPaperStorage,
+	SharedPaperNodeType,
+	SHARED_PAPER_NODE_TYPE,
+	SHARED_PAPER_ROOT_NODE_NAME,
+	SHARED_PAPER_FILE_HASH_KEY,
+)
+from labridge.func_modules.paper.store.warehouse_manifest import (
+	WarehouseManifest,
+	WarehouseFileStatus,
+)
+
+
+WAREHOUSE = "documents/shared_papers"
+
+
+class CountingEmbedding(MockEmbedding):
+	r""" Counts the embedded texts. """
+	embed_count: int = 0
+
+	def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+		self.embed_count += len(texts)
+		return super()._get_text_embeddings(texts)
+
+	def _get_text_embedding(self, text: str) -> List[float]:
+		self.embed_count += 1
+		return super()._get_text_embedding(text)
+
+
+def write_pdf(root: Path, rel_path: str, content: bytes):
+	file_path = root / rel_path
+	file_path.parent.mkdir(parents=True, exist_ok=True)
+	file_path.write_bytes(content)
+
+
+def test_manifest_delta_detection():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		root = Path(tmp_dir)
+		write_pdf(root, f"{WAREHOUSE}/alice/cim/a.pdf", b"paper a")
+		write_pdf(root, f"{WAREHOUSE}/alice/cim/b.pdf", b"paper b")
+		write_pdf(root, f"{WAREHOUSE}/alice/cim/c.pdf", b"paper c")
+		write_pdf(root, f"{WAREHOUSE}/alice/.trash/d.pdf", b"paper d")
+
+		manifest = WarehouseManifest(root=tmp_dir)
+		scanned = manifest.scan()
+		delta = manifest.diff(scanned)
+		assert sorted(delta.added) == sorted(str(Path(f"{WAREHOUSE}/alice/cim/{n}.pdf")) for n in "abc")
+		for rel_path in delta.added:
+			manifest.update(rel_path, scanned[rel_path], status=WarehouseFileStatus.INGESTED)
+		manifest.persist()
+
+		manifest = WarehouseManifest(root=tmp_dir)
+		assert manifest.diff(manifest.scan()).is_empty()
+
+		os.renames(root / f"{WAREHOUSE}/alice/cim/a.pdf", root / f"{WAREHOUSE}/alice/rl/a_renamed.pdf")
+		write_pdf(root, f"{WAREHOUSE}/alice/cim/b.pdf", b"paper b, revised")
+		os.remove(root / f"{WAREHOUSE}/alice/cim/c.pdf")
+		write_pdf(root, f"{WAREHOUSE}/alice/cim/e.pdf", b"paper e")
+
+		delta = manifest.diff(manifest.scan())
+		assert delta.moved == [
+			(str(Path(f"{WAREHOUSE}/alice/cim/a.pdf")), str(Path(f"{WAREHOUSE}/alice/rl/a_renamed.pdf")))
+		]
+		assert delta.modified == [str(Path(f"{WAREHOUSE}/alice/cim/b.pdf"))]
+		assert delta.deleted == [str(Path(f"{WAREHOUSE}/alice/cim/c.pdf"))]
+		assert delta.added == [str(Path(f"{WAREHOUSE}/alice/cim/e.pdf"))]
+
+
+def build_storage(embed_model: CountingEmbedding):
+	r""" root -> alice -> {cim, rl}, with one paper of two chunks under cim. """
+	root_node = TextNode(text="root", id_=SHARED_PAPER_ROOT_NODE_NAME, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.ROOT})
+	user_node = TextNode(text="alice", id_="alice", metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.USER})
+	dir_ids = [str(Path(f"{WAREHOUSE}/alice/cim")), str(Path(f"{WAREHOUSE}/alice/rl"))]
+	dir_nodes = [
+		TextNode(text=f"The directory of {d}", id_=d, metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.DIR})
+		for d in dir_ids
+	]
+	paper_path = str(Path(f"{WAREHOUSE}/alice/cim/a.pdf"))
+	paper_node = TextNode(
+		text="",
+		id_=paper_path,
+		metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.PAPER, PAPER_REL_FILE_PATH: paper_path},
+	)
+	chunk_nodes = [
+		TextNode(
+			text=f"chunk {i}",
+			metadata={SHARED_PAPER_NODE_TYPE: SharedPaperNodeType.PAPER_CHUNK, PAPER_REL_FILE_PATH: paper_path},
+		)
+		for i in range(2)
+	]
+
+	def link(parent, children):
+		parent.relationships[NodeRelationship.CHILD] = [RelatedNodeInfo(node_id=c.node_id) for c in children]
+		for c in children:
+			c.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=parent.node_id)
+
+	link(root_node, [user_node])
+	link(user_node, dir_nodes)
+	link(dir_nodes[0], [paper_node])
+	link(paper_node, chunk_nodes)
+
+	nodes = [root_node, user_node, *dir_nodes, paper_node, *chunk_nodes]
+	notes_root = TextNode(text="notes root", id_=SHARED_PAPER_ROOT_NODE_NAME)
+	storage = SharedPaperStorage(
+		llm=MockLLM(),
+		vector_index=VectorStoreIndex(nodes=nodes, embed_model=embed_model),
+		notes_vector_index=VectorStoreIndex(nodes=[notes_root], embed_model=embed_model),
+		persist_dir="",
+		notes_persist_dir="",
+	)
+	return storage, dir_ids, paper_path, [c.node_id for c in chunk_nodes]
+
+
+def test_move_and_delete_paper():
+	embed_model = CountingEmbedding(embed_dim=8)
+	storage, dir_ids, old_path, chunk_ids = build_storage(embed_model)
+	new_path = str(Path(f"{WAREHOUSE}/alice/rl/a.pdf"))
+
+	embed_model.embed_count = 0
+	assert storage.move_paper(old_rel_path=old_path, new_rel_path=new_path)
+	assert embed_model.embed_count == 0
+
+	assert storage._get_node(old_path) is None
+	assert storage._get_node(dir_ids[0]).child_nodes == []
+	assert [c.node_id for c in storage._get_node(dir_ids[1]).child_nodes] == [new_path]
+	paper_node = storage._get_node(new_path)
+	assert paper_node.metadata[PAPER_REL_FILE_PATH] == new_path
+	assert paper_node.parent_node.node_id == dir_ids[1]
+	for chunk_id in chunk_ids:
+		chunk_node = storage._get_node(chunk_id)
+		assert chunk_node.parent_node.node_id == new_path
+		assert chunk_node.metadata[PAPER_REL_FILE_PATH] == new_path
+
+	assert storage.delete_paper(paper_rel_path=new_path)
+	assert embed_model.embed_count == 0
+	assert storage._get_node(dir_ids[1]).child_nodes == []
+	vector_index = storage.vector_index
+	for node_id in [new_path, *chunk_ids]:
+		assert storage._get_node(node_id) is None
+		assert node_id not in vector_index.vector_store.data.embedding_dict
+		assert node_id not in vector_index.index_struct.nodes_dict
+	assert not storage.delete_paper(paper_rel_path=new_path)
+
+
+def test_sync_adopts_only_same_contents():
+	embed_model = CountingEmbedding(embed_dim=8)
+	storage, dir_ids, paper_path, chunk_ids = build_storage(embed_model)
+	paper_node = storage._get_node(paper_path)
+	paper_node.metadata[SHARED_PAPER_FILE_HASH_KEY] = "hash_a"
+	storage._update_node_keep_embedding(node_id=paper_path, node=paper_node)
+
+	ingested = []
+
+	def insert_single_paper(target_rel_dir: str, raw_paper_path: str, **kwargs):
+		ingested.append(raw_paper_path)
+		raise ValueError("broken pdf")
+
+	storage.insert_single_paper = insert_single_paper
+	assert storage._sync_insert_paper(paper_path, file_hash="hash_a", enable_summarize=False) == (
+		WarehouseFileStatus.INGESTED, None,
+	)
+	assert ingested == []
+
+	# The file was replaced: the old nodes are removed and the paper is ingested again.
+	status, error = storage._sync_insert_paper(paper_path, file_hash="hash_b", enable_summarize=False)
+	assert status == WarehouseFileStatus.FAILED and "broken pdf" in error
+	assert len(ingested) == 1
+	assert storage._get_node(paper_path) is None
+	assert all(storage._get_node(chunk_id) is None for chunk_id in chunk_ids)
+
+
+if __name__ == "__main__":
+	test_manifest_delta_detection()
+	test_move_and_delete_paper()
+	test_sync_adopts_only_same_contents()
@@ -0,0 +1,199 @@
+import json
+import time
+import asyncio
+import tempfile
+import threading
+
+from typing import Any
+
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from labridge.func_modules.paper.store.temporary_store import TMP_PAPER_FILE_PATH_KEY
+from labridge.func_modules.paper.synthesizer.summarize import PaperBatchSummarize
+from labridge.func_modules.paper.synthesizer.summary_cache import PaperSummaryCache
+
+
+LLM_LATENCY = 0.05
+
+
+class SlowSummaryLLM(CustomLLM):
+	r""" Returns a short summary after a fixed latency, and records the peak number of concurrent calls. """
+	calls: int = 0
+	running: int = 0
+	peak: int = 0
+
+	@property
+	def metadata(self) -> LLMMetadata:
+		return LLMMetadata()
+
+	def _enter(self):
+		with _lock:
+			self.calls += 1
+			self.running += 1
+			self.peak = max(self.peak, self.running)
+
+	def _exit(self):
+		with _lock:
+			self.running -= 1
+
+	@llm_completion_callback()
+	def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+		self._enter()
+		time.sleep(LLM_LATENCY)
+		self._exit()
+		return CompletionResponse(text="summary " * 100)
+
+	@llm_completion_callback()
+	async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+		self._enter()
+		await asyncio.sleep(LLM_LATENCY)
+		self._exit()
+		return CompletionResponse(text="summary " * 100)
+
+	def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+		raise NotImplementedError
+
+
+_lock = threading.Lock()
+
+
+class ShrinkingSummaryLLM(CustomLLM):
+	r""" Summarizes a context by dropping a fraction of its words, and records the contexts. """
+	keep_ratio: float = 0.9
+	contexts: list = []
+
+	@property
+	def metadata(self) -> LLMMetadata:
+		return LLMMetadata()
+
+	@llm_completion_callback()
+	def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+		context = prompt.split("---------------------\n")[1].rsplit("\n---------------------", 1)[0]
+		self.contexts.append(context)
+		words = context.split()
+		return CompletionResponse(text=" ".join(words[:int(len(words) * self.keep_ratio)]))
+
+	def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+		raise NotImplementedError
+
+
+def paper_chunks(num: int = 40):
+	return [f"chunk {i} " + "content " * 200 for i in range(num)]
+
+
+def temp_summary_cache() -> PaperSummaryCache:
+	return PaperSummaryCache(persist_path=f"{tempfile.mkdtemp()}/summary_cache.json")
+
+
+def test_pack_batches_within_max_tokens():
+	summarizer = PaperBatchSummarize(
+		llm=SlowSummaryLLM(), max_tokens=1000, overlap_chunk_num=1, summary_cache=temp_summary_cache(),
+	)
+	chunks = paper_chunks()
+	batches = summarizer.pack_batches(text_chunks=chunks, overlap_chunk_num=1)
+	assert batches[0][0] == chunks[0] and batches[-1][-1] == chunks[-1]
+	for batch, next_batch in zip(batches[:-1], batches[1:]):
+		assert batch[-1] == next_batch[0]
+	for batch in batches:
+		assert sum(summarizer._token_num(chunk) for chunk in batch) <= 1000
+	# token numbers are cached per chunk
+	assert set(chunks).issubset(summarizer._token_num_cache.keys())
+
+
+def test_map_reduce_levels_and_concurrency():
+	# 40 chunks of ~200 tokens, 4 chunks per batch -> 13 batch summaries of ~100 tokens,
+	# which exceed max_tokens and are reduced to 2 summaries before the final summary.
+	llm = SlowSummaryLLM()
+	summarizer = PaperBatchSummarize(
+		llm=llm, max_tokens=900, overlap_chunk_num=1, max_concurrency=4, summary_cache=temp_summary_cache(),
+	)
+	start = time.perf_counter()
+	summarizer.get_response(query_str="", text_chunks=paper_chunks())
+	sync_time = time.perf_counter() - start
+	sync_calls = llm.calls
+	assert llm.peak == 4
+	assert sync_calls == 13 + 2 + 1
+	# sequential calls would take sync_calls * LLM_LATENCY
+	assert sync_time < sync_calls * LLM_LATENCY * 0.6
+
+	llm = SlowSummaryLLM()
+	summarizer = PaperBatchSummarize(
+		llm=llm, max_tokens=900, overlap_chunk_num=1, max_concurrency=3, summary_cache=temp_summary_cache(),
+	)
+	asyncio.run(summarizer.aget_response(query_str="", text_chunks=paper_chunks()))
+	assert llm.peak == 3
+	assert llm.calls == sync_calls
+
+
+def test_reduce_until_fit():
+	# The summaries shrink slowly: more levels than expected are needed, the final call still fits.
+	llm = ShrinkingSummaryLLM(keep_ratio=0.9)
+	summarizer = PaperBatchSummarize(
+		llm=llm, max_tokens=900, overlap_chunk_num=0, max_concurrency=1, summary_cache=temp_summary_cache(),
+	)
+	summarizer.get_response(query_str="", text_chunks=paper_chunks(20))
+	# 5 batches in the map level, then more than 4 reduce levels of at most 5 batches.
+	assert len(llm.contexts) > 5 + 4 * 5 + 1
+	assert summarizer._token_num(llm.contexts[-1]) <= 900
+
+	# The summaries do not shrink at all: they are truncated to fit after one level.
+	llm = ShrinkingSummaryLLM(keep_ratio=1.0)
+	summarizer = PaperBatchSummarize(
+		llm=llm, max_tokens=900, overlap_chunk_num=0, max_concurrency=1, summary_cache=temp_summary_cache(),
+	)
+	summarizer.get_response(query_str="", text_chunks=paper_chunks(20))
+	assert len(llm.contexts) == 5 + 5 + 1
+	assert summarizer._token_num(llm.contexts[-1]) <= 900
+	# Every batch keeps its share of the final context.
+	assert all(f"chunk {idx} " in llm.contexts[-1] for idx in range(0, 20, 4))
+
+
+def test_summary_cache_shared_across_chunkings():
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		paper_path = f"{tmp_dir}/paper.pdf"
+		with open(paper_path, "wb") as f:
+			f.write(b"%PDF- a paper")
+		cache_path = f"{tmp_dir}/summary_cache.json"
+
+		def paper_nodes(chunk_num: int):
+			return [
+				NodeWithScore(node=TextNode(text=chunk, metadata={TMP_PAPER_FILE_PATH_KEY: paper_path}))
+				for chunk in paper_chunks(chunk_num)
+			]
+
+		def new_summarizer() -> PaperBatchSummarize:
+			return PaperBatchSummarize(
+				llm=llm,
+				max_tokens=900,
+				summary_cache=PaperSummaryCache(persist_path=cache_path),
+				abs_file_path_key=TMP_PAPER_FILE_PATH_KEY,
+			)
+
+		llm = SlowSummaryLLM()
+		summarizer = new_summarizer()
+		summary = summarizer.synthesize(query="", nodes=paper_nodes(8)).response
+		calls = llm.calls
+
+		# Another store chunks the same paper differently, with its own summarizer and cache instance.
+		summarizer = new_summarizer()
+		assert asyncio.run(summarizer.asynthesize(query="", nodes=paper_nodes(5))).response == summary
+		assert llm.calls == calls
+
+		# A different summary prompt misses the cache.
+		summarizer.summary_query = "Summarize the methods."
+		summarizer.synthesize(query="", nodes=paper_nodes(5))
+		assert llm.calls > calls
+
+		# Both summaries are persisted, whichever instance persists.
+		new_summarizer().summary_cache.persist()
+		with open(cache_path) as f:
+			assert len(json.load(f)) == 2
+
+
+if __name__ == "__main__":
+	test_pack_batches_within_max_tokens()
+	test_map_reduce_levels_and_concurrency()
+	test_reduce_until_fit()
+	test_summary_cache_shared_across_chunkings()